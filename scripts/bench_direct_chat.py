@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the Direct Chat /api/chat hot path.
+
+Drives `Handler.do_POST` in-process (no socket, stubbed model backend, state in a
+temp dir) plus the individual stages it calls. Reports p50/p99 latency and peak
+allocation per request, and compares them against a regression threshold file.
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+
+ROOT = Path(__file__).resolve().parents[1]
+THRESHOLDS_PATH = ROOT / "DOCS" / "BENCH_DIRECT_CHAT_THRESHOLDS.json"
+BENCH_MODEL = "bench/stub-model"
+BENCH_SESSION = "bench_sess"
+BENCH_TOOLS = ["firefox", "web_search", "desktop"]
+MODEL_MESSAGE = "contame en dos lineas que paso en la batalla de trafalgar"
+LOCAL_MESSAGE = "ayuda lectura"
+# p50 carries the regression signal; p99 of a few hundred sub-ms samples is mostly
+# scheduler/GC noise, so its limit never goes below this.
+P99_FLOOR_MS = 5.0
+
+
+def _history(n: int) -> list[dict]:
+    out = []
+    for i in range(n):
+        role = "user" if i % 2 == 0 else "assistant"
+        out.append({"role": role, "content": f"mensaje {i} " + ("texto de relleno " * 12)})
+    return out
+
+
+class _BenchServer:
+    gateway_token = "bench-token"
+    gateway_port = 0
+
+
+class _StubBackend:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, backend: str, payload: dict) -> dict:
+        self.calls += 1
+        return {
+            "id": "bench",
+            "model": str(payload.get("model", "")),
+            "choices": [{"message": {"role": "assistant", "content": "Respuesta de benchmark. " * 8}}],
+        }
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[idx]
+
+
+@contextmanager
+def bench_environment() -> Iterator[Any]:
+    """Import DC with state redirected to a temp dir and the model backend stubbed."""
+    tmp = tempfile.TemporaryDirectory(prefix="dc_bench_")
+    base = Path(tmp.name)
+    set_state_dir = "OPENCLAW_STATE_DIR" not in os.environ
+    if set_state_dir:
+        os.environ["OPENCLAW_STATE_DIR"] = str(base / "state")
+    prev_dry = os.environ.get("DIRECT_CHAT_TTS_DRY_RUN")
+    os.environ["DIRECT_CHAT_TTS_DRY_RUN"] = "1"
+    sys.path.insert(0, str(ROOT / "scripts"))
+    import openclaw_direct_chat as dc  # noqa: E402
+
+    saved = {
+        "HISTORY_DIR": dc.HISTORY_DIR,
+        "VOICE_STATE_PATH": dc.VOICE_STATE_PATH,
+        "_READER_STORE": dc._READER_STORE,
+        "_model_catalog": dc._model_catalog,
+        "_call_model_backend": dc.Handler._call_model_backend,
+    }
+    history_dir = base / "histories"
+    history_dir.mkdir(parents=True, exist_ok=True)
+    catalog = {
+        "default_model": BENCH_MODEL,
+        "by_id": {BENCH_MODEL: {"id": BENCH_MODEL, "backend": "cloud", "available": True, "runtime_model": BENCH_MODEL}},
+    }
+    stub = _StubBackend()
+    try:
+        dc.HISTORY_DIR = history_dir
+        dc.VOICE_STATE_PATH = base / "direct_chat_voice.json"
+        dc._save_voice_state(dc._default_voice_state())
+        dc._READER_STORE = dc.ReaderSessionStore(state_path=base / "reading_sessions.json", lock_path=base / ".reading.lock")
+        dc._model_catalog = lambda force_refresh=False: catalog
+        dc.Handler._call_model_backend = lambda _handler, backend, payload: stub(backend, payload)
+        yield dc
+    finally:
+        dc.HISTORY_DIR = saved["HISTORY_DIR"]
+        dc.VOICE_STATE_PATH = saved["VOICE_STATE_PATH"]
+        dc._READER_STORE = saved["_READER_STORE"]
+        dc._model_catalog = saved["_model_catalog"]
+        dc.Handler._call_model_backend = saved["_call_model_backend"]
+        if set_state_dir:
+            os.environ.pop("OPENCLAW_STATE_DIR", None)
+        if prev_dry is None:
+            os.environ.pop("DIRECT_CHAT_TTS_DRY_RUN", None)
+        else:
+            os.environ["DIRECT_CHAT_TTS_DRY_RUN"] = prev_dry
+        tmp.cleanup()
+
+
+def _new_handler(dc: Any, path: str, body: bytes = b"") -> Any:
+    handler = dc.Handler.__new__(dc.Handler)
+    handler.server = _BenchServer()
+    handler.client_address = ("127.0.0.1", 0)
+    handler.command = "POST"
+    handler.path = path
+    handler.request_version = "HTTP/1.1"
+    handler.requestline = f"POST {path} HTTP/1.1"
+    handler.close_connection = True
+    headers = http.client.HTTPMessage()
+    headers["Content-Type"] = "application/json"
+    headers["Content-Length"] = str(len(body))
+    handler.headers = headers
+    handler.rfile = io.BytesIO(body)
+    handler.wfile = io.BytesIO()
+    return handler
+
+
+def post_inprocess(dc: Any, path: str, payload: dict) -> tuple[int, dict]:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    handler = _new_handler(dc, path, body)
+    handler.do_POST()
+    raw = handler.wfile.getvalue()
+    head, _sep, data = raw.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1]) if head else 0
+    try:
+        parsed = json.loads(data.decode("utf-8") or "{}")
+    except Exception:
+        parsed = {}
+    return status, parsed if isinstance(parsed, dict) else {}
+
+
+def build_scenarios(dc: Any) -> dict[str, Callable[[], Any]]:
+    history = _history(40)
+    tools = set(BENCH_TOOLS)
+    handler = _new_handler(dc, "/api/chat")
+    dc._READER_STORE.start_session(BENCH_SESSION, chunks=[f"bloque {i} " * 20 for i in range(50)], reset=True)
+    reply_payload = {
+        "reply": "Respuesta de benchmark. " * 8,
+        "raw": {"choices": [{"message": {"role": "assistant", "content": "Respuesta de benchmark. " * 8}}]},
+        "model": BENCH_MODEL,
+        "model_backend": "cloud",
+        "chat_seq": 12,
+    }
+
+    def _reader_checks() -> None:
+        dc._is_reader_control_command(MODEL_MESSAGE)
+        dc._READER_STORE.get_session(BENCH_SESSION, include_chunks=False)
+        dc._READER_STORE.is_continuous(BENCH_SESSION)
+
+    def _json_serialize() -> None:
+        handler.wfile = io.BytesIO()
+        handler._json(200, reply_payload)
+
+    chat_payload = {"session_id": "bench_chat", "message": MODEL_MESSAGE, "model": BENCH_MODEL, "history": history, "allowed_tools": BENCH_TOOLS}
+    local_payload = {"session_id": "bench_local", "message": LOCAL_MESSAGE, "model": BENCH_MODEL, "history": history, "allowed_tools": BENCH_TOOLS}
+    merged = history + [{"role": "user", "content": MODEL_MESSAGE}, {"role": "assistant", "content": "ok"}]
+
+    return {
+        "route_local_action_miss": lambda: dc._maybe_handle_local_action(MODEL_MESSAGE, tools, session_id="bench_route"),
+        "route_local_action_hit": lambda: dc._maybe_handle_local_action(LOCAL_MESSAGE, tools, session_id="bench_route"),
+        "build_messages": lambda: handler._build_messages(MODEL_MESSAGE, history, "operativo", tools, []),
+        "build_messages_budgeted": lambda: handler._build_messages(MODEL_MESSAGE, history, "operativo", tools, [], context_tokens=4096),
+        "save_history": lambda: dc._save_history("bench_hist", merged, model=BENCH_MODEL, backend="cloud"),
+        "chat_events_append": lambda: dc._chat_events_append("bench_events", role="user", content=MODEL_MESSAGE, source="ui_text"),
+        "reader_checks": _reader_checks,
+        "json_serialize": _json_serialize,
+        "post_chat_model": lambda: post_inprocess(dc, "/api/chat", chat_payload),
+        "post_chat_local_action": lambda: post_inprocess(dc, "/api/chat", local_payload),
+    }
+
+
+def measure(fn: Callable[[], Any], iterations: int, warmup: int = 10, alloc_iterations: int = 0) -> dict:
+    for _ in range(max(0, warmup)):
+        fn()
+    samples: list[float] = []
+    for _ in range(max(1, iterations)):
+        t0 = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - t0) / 1e6)
+    allocs: list[float] = []
+    n_alloc = alloc_iterations if alloc_iterations > 0 else max(1, iterations // 10)
+    tracemalloc.start()
+    try:
+        for _ in range(n_alloc):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn()
+            allocs.append((tracemalloc.get_traced_memory()[1] - before) / 1024.0)
+    finally:
+        tracemalloc.stop()
+    return {
+        "iterations": len(samples),
+        "p50_ms": round(_percentile(samples, 50), 4),
+        "p99_ms": round(_percentile(samples, 99), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "alloc_peak_kib": round(statistics.median(allocs), 2),
+    }
+
+
+def run_bench(iterations: int, only: list[str] | None = None) -> dict:
+    with bench_environment() as dc:
+        scenarios = build_scenarios(dc)
+        status, body = post_inprocess(dc, "/api/chat", {"session_id": "bench_probe", "message": MODEL_MESSAGE, "model": BENCH_MODEL})
+        if status != 200 or not body.get("reply"):
+            raise RuntimeError(f"bench probe failed: status={status} body={body}")
+        results = {}
+        for name, fn in scenarios.items():
+            if only and name not in only:
+                continue
+            results[name] = measure(fn, iterations=iterations)
+    return {"ts": time.time(), "python": sys.version.split()[0], "iterations": int(iterations), "scenarios": results}
+
+
+def compare(results: dict, thresholds: dict) -> list[str]:
+    failures: list[str] = []
+    limits = thresholds.get("scenarios", {}) if isinstance(thresholds, dict) else {}
+    for name, got in (results.get("scenarios") or {}).items():
+        lim = limits.get(name)
+        if not isinstance(lim, dict):
+            # A scenario without limits would never be regression-checked.
+            failures.append(f"{name}: no threshold (run: python3 scripts/bench_direct_chat.py snapshot --write)")
+            continue
+        for key in ("p50_ms", "p99_ms", "alloc_peak_kib"):
+            if key in lim and float(got.get(key, 0.0)) > float(lim[key]):
+                failures.append(f"{name}.{key}={got.get(key)} > {lim[key]}")
+    return failures
+
+
+def thresholds_from(results: dict, headroom: float, p99_floor_ms: float = P99_FLOOR_MS) -> dict:
+    factor = max(1.0, float(headroom))
+    floor = max(0.0, float(p99_floor_ms))
+    out = {}
+    for name, got in (results.get("scenarios") or {}).items():
+        out[name] = {
+            "p50_ms": round(max(0.05, float(got["p50_ms"]) * factor), 3),
+            "p99_ms": round(max(floor, float(got["p99_ms"]) * factor), 3),
+            "alloc_peak_kib": round(max(4.0, float(got["alloc_peak_kib"]) * factor), 1),
+        }
+    return {"headroom": factor, "p99_floor_ms": floor, "iterations": int(results.get("iterations", 0)), "scenarios": out}
+
+
+def _json_dump(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, indent=2, sort_keys=True) + "\n"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Direct Chat /api/chat hot-path micro-benchmarks")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_run = sub.add_parser("run", help="Run benchmarks and print JSON results")
+    p_run.add_argument("--iterations", type=int, default=300)
+    p_run.add_argument("--only", action="append", default=[], help="Scenario name (repeatable)")
+
+    p_snapshot = sub.add_parser("snapshot", help="Print or write thresholds from the current run")
+    p_snapshot.add_argument("--iterations", type=int, default=300)
+    p_snapshot.add_argument("--headroom", type=float, default=3.0, help="Multiplier applied to measured values")
+    p_snapshot.add_argument("--p99-floor-ms", type=float, default=P99_FLOOR_MS, help="Lowest p99 limit written")
+    p_snapshot.add_argument("--write", action="store_true", help="Write to thresholds file")
+    p_snapshot.add_argument("--thresholds", default=str(THRESHOLDS_PATH))
+
+    p_check = sub.add_parser("check", help="Fail if any scenario exceeds its threshold")
+    p_check.add_argument("--iterations", type=int, default=300)
+    p_check.add_argument("--thresholds", default=str(THRESHOLDS_PATH))
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.cmd == "run":
+        print(_json_dump(run_bench(args.iterations, only=args.only or None)), end="")
+        return 0
+    if args.cmd == "snapshot":
+        rendered = _json_dump(thresholds_from(run_bench(args.iterations), args.headroom, args.p99_floor_ms))
+        if args.write:
+            path = Path(args.thresholds)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(rendered, encoding="utf-8")
+            print(f"Wrote thresholds: {path}")
+        else:
+            print(rendered, end="")
+        return 0
+    if args.cmd == "check":
+        path = Path(args.thresholds)
+        if not path.exists():
+            print(f"Thresholds missing: {path}")
+            print("Run: python3 scripts/bench_direct_chat.py snapshot --write")
+            return 2
+        results = run_bench(args.iterations)
+        failures = compare(results, json.loads(path.read_text(encoding="utf-8")))
+        for name, got in results["scenarios"].items():
+            print(f"{name}: p50={got['p50_ms']}ms p99={got['p99_ms']}ms alloc={got['alloc_peak_kib']}KiB")
+        if failures:
+            print("BENCH_REGRESSION")
+            for line in failures:
+                print(f"- {line}")
+            return 1
+        print("BENCH_OK")
+        return 0
+    raise RuntimeError(f"Unknown command: {args.cmd}")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Throughput benchmark for `export_history_jsonl.py` on a synthetic corpus.
+
+Builds N sessions (half legacy `<sid>__<backend>__<model>.json`, half
+`<sid>.history.jsonl` logs with two model views) in a temp dir, then times a
+full export per worker count, and an incremental re-export from a checkpoint
+after touching 1% of the sessions. Prints JSON (files/s, rows/s).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import export_history_jsonl as exporter  # noqa: E402
+
+
+MODELS = [("cloud", "openai-codex_gpt-5.1-codex-mini"), ("local", "llama3.1_8b"), ("cloud", "gemini-2.5-flash")]
+WORDS = "abrí buscá youtube gemini lectura ventana voz modelo respuesta listo contame resumen dataset escritorio".split()
+
+
+def _text(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def _turns(rng: random.Random, turns: int) -> list[dict]:
+    out = []
+    for _ in range(turns):
+        out.append({"role": "user", "content": _text(rng, rng.randint(3, 14))})
+        out.append({"role": "assistant", "content": _text(rng, rng.randint(8, 60))})
+    return out
+
+
+def make_corpus(root: Path, sessions: int, turns: int = 6, seed: int = 7) -> int:
+    """Write the corpus; returns the number of files."""
+    rng = random.Random(seed)
+    root.mkdir(parents=True, exist_ok=True)
+    files = 0
+    for i in range(sessions):
+        sid = f"bench_{i:07d}"
+        if i % 2 == 0:
+            backend, model = MODELS[i % len(MODELS)]
+            (root / f"{sid}__{backend}__{model}.json").write_text(json.dumps(_turns(rng, turns), ensure_ascii=False), encoding="utf-8")
+        else:
+            lines = []
+            for backend, model in (MODELS[i % len(MODELS)], MODELS[(i + 1) % len(MODELS)]):
+                view = f"{backend}__{model}"
+                for msg in _turns(rng, turns // 2 or 1):
+                    rec = {"ts": 0.0, "view": view, "model": model, "backend": backend, **msg}
+                    lines.append(json.dumps(rec, ensure_ascii=False))
+            (root / f"{sid}{exporter.LOG_SUFFIX}").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        files += 1
+    return files
+
+
+def _export(in_dir: Path, out: Path, workers: int, shards: int, compress: str, checkpoint: Path | None = None, dedup: str = "none") -> dict:
+    argv = ["--in", str(in_dir), "--out", str(out), "--workers", str(workers), "--shards", str(shards), "--compress", compress, "--dedup", dedup]
+    if checkpoint is not None:
+        argv += ["--checkpoint", str(checkpoint)]
+    t0 = time.perf_counter()
+    summary = exporter.run_export(exporter.parse_args(argv))
+    elapsed = time.perf_counter() - t0
+    return {
+        "workers": workers,
+        "elapsed_s": round(elapsed, 3),
+        "rows": summary["rows"],
+        "files_per_s": round(summary["sessions_scanned"] / elapsed, 1),
+        "rows_per_s": round(summary["rows"] / elapsed, 1),
+        "summary": summary,
+    }
+
+
+def run_bench(sessions: int, workers: list[int], shards: int = 8, compress: str = "none", keep: str = "", dedup: str = "none") -> dict:
+    base = Path(keep) if keep else Path(tempfile.mkdtemp(prefix="bench_history_export_"))
+    try:
+        in_dir = base / "corpus"
+        t0 = time.perf_counter()
+        files = make_corpus(in_dir, sessions)
+        out: dict = {"sessions": sessions, "files": files, "corpus_s": round(time.perf_counter() - t0, 3), "shards": shards, "compress": compress, "dedup": dedup, "runs": []}
+        for w in workers:
+            res = _export(in_dir, base / f"out_w{w}" / "pairs.jsonl", w, shards, compress, dedup=dedup)
+            summary = res.pop("summary")
+            if "dedup" in summary:
+                res["dedup"] = {k: summary["dedup"][k] for k in ("kept", "exact_dropped", "near_dropped")}
+            out["runs"].append(res)
+        checkpoint = base / "checkpoint.json"
+        w = max(workers)
+        _export(in_dir, base / "out_full" / "pairs.jsonl", w, shards, compress, checkpoint=checkpoint)
+        touched = sorted(in_dir.iterdir())[:: 100]
+        for p in touched:
+            os.utime(p, ns=(p.stat().st_atime_ns, p.stat().st_mtime_ns + 1_000_000))
+        inc = _export(in_dir, base / "out_inc" / "pairs.jsonl", w, shards, compress, checkpoint=checkpoint)
+        out["incremental"] = {
+            "workers": w,
+            "elapsed_s": inc["elapsed_s"],
+            "sessions_touched": len(touched),
+            "rows": inc["rows"],
+            **inc["summary"]["checkpoint"],
+        }
+        return out
+    finally:
+        if not keep:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark export_history_jsonl.py on a synthetic corpus")
+    p.add_argument("--sessions", type=int, default=100_000)
+    p.add_argument("--workers", default=f"1,{max(2, os.cpu_count() or 2)}", help="Comma-separated worker counts")
+    p.add_argument("--shards", type=int, default=8)
+    p.add_argument("--compress", choices=("none", "gzip", "zstd"), default="none")
+    p.add_argument("--keep", default="", help="Build the corpus/outputs here and keep them")
+    p.add_argument("--dedup", choices=("none", "exact", "near"), default="none")
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    workers = [max(1, int(w)) for w in str(args.workers).split(",") if w.strip()]
+    print(json.dumps(run_bench(args.sessions, workers, shards=args.shards, compress=args.compress, keep=args.keep, dedup=args.dedup), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
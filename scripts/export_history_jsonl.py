@@ -2,22 +2,46 @@
 from __future__ import annotations
 
 import argparse
+import gzip
+import hashlib
+import io
 import json
+import os
+import sys
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterator, TextIO
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
 
-def parse_args() -> argparse.Namespace:
+from molbot_direct_chat.dataset_dedup import DedupIndex, band_keys, exact_key, pair_signature  # noqa: E402
+from molbot_direct_chat.history_store import iter_log, replay_views  # noqa: E402
+
+LOG_SUFFIX = ".history.jsonl"
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Export direct_chat_histories JSON files to JSONL dataset")
     p.add_argument("--in", dest="input_dir", required=True, help="Input directory with history JSON files")
-    p.add_argument("--out", dest="output_file", required=True, help="Output JSONL file path")
+    p.add_argument("--out", dest="output_file", required=True, help="Output JSONL file path (shard name template with --shards)")
     p.add_argument("--mode", choices=("pairs", "messages"), default="pairs", help="Export format")
     p.add_argument("--min-chars", type=int, default=1, help="Minimum chars for prompt and completion")
     p.add_argument("--max-sessions", type=int, default=0, help="Maximum number of files to process; 0 = unlimited")
     p.add_argument("--max-lines", type=int, default=0, help="Maximum lines to write; 0 = unlimited")
     p.add_argument("--since-days", type=int, default=0, help="Only include files modified in last N days; 0 = disabled")
     p.add_argument("--max-completion-chars", type=int, default=0, help="Max chars for completion; 0 = unlimited")
-    return p.parse_args()
+    p.add_argument("--workers", type=int, default=1, help="Parser processes; 1 = parse in this process")
+    p.add_argument("--batch", type=int, default=64, help="Sessions per worker task")
+    p.add_argument("--queue", type=int, default=0, help="Max tasks in flight; 0 = 4 x workers")
+    p.add_argument("--shards", type=int, default=1, help="Split output into N files by hash(session_id)")
+    p.add_argument("--compress", choices=("auto", "none", "gzip", "zstd"), default="auto", help="auto = from the --out suffix")
+    p.add_argument("--checkpoint", default="", help="Only export sessions whose files changed since this checkpoint (each run writes its own .run-NNNNN output)")
+    p.add_argument("--dedup", choices=("none", "exact", "near"), default="none", help="Drop repeated pairs (near = also MinHash/LSH)")
+    p.add_argument("--near-threshold", type=float, default=0.9, help="Estimated Jaccard at which a pair counts as near-duplicate")
+    p.add_argument("--dedup-db", default="", help="Keep the dedup index here (dedups across runs); default = temp file")
+    return p.parse_args(argv)
 
 
 def parse_meta(filename: str) -> tuple[str, str, str]:
@@ -42,6 +66,33 @@ def load_history(path: Path) -> tuple[list[dict], bool]:
     return out, False
 
 
+def iter_sources(files: list[Path]):
+    """(session_id, backend, model, source_name, messages, invalid) per legacy file or per log view.
+
+    A legacy `<scope>.json` is skipped once the session log has records for that view.
+    """
+    logged: set[str] = set()
+    log_views: list[tuple[Path, str, dict]] = []
+    for path in files:
+        if path.name.endswith(LOG_SUFFIX):
+            session_id = path.name[: -len(LOG_SUFFIX)]
+            for view, data in sorted(replay_views(iter_log(path)).items()):
+                logged.add(f"{session_id}__{view}" if view else session_id)
+                log_views.append((path, view, data))
+    for path in files:
+        if path.name.endswith(LOG_SUFFIX):
+            continue
+        if path.stem in logged:
+            continue
+        session_id, backend, model = parse_meta(path.name)
+        history, invalid_json = load_history(path)
+        yield session_id, backend, model, path.name, history, invalid_json
+    for path, view, data in log_views:
+        session_id = path.name[: -len(LOG_SUFFIX)]
+        backend, _, model = view.partition("__")
+        yield session_id, backend, model, f"{path.name}#{view}", data["messages"], False
+
+
 def iter_pairs(messages: list[dict], min_chars: int, counters: dict[str, int]):
     pending_user: str | None = None
     for item in messages:
@@ -88,8 +139,181 @@ def iter_pairs(messages: list[dict], min_chars: int, counters: dict[str, int]):
         counters["orphan_user_dropped"] += 1
 
 
-def main() -> int:
-    args = parse_args()
+COUNTER_KEYS = (
+    "invalid_role_dropped",
+    "invalid_content_dropped",
+    "empty_dropped",
+    "assistant_without_user_dropped",
+    "orphan_user_dropped",
+    "user_overwritten",
+    "short_prompt_dropped",
+    "short_completion_dropped",
+    "completion_truncated",
+)
+COMPRESS_SUFFIX = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+
+
+def session_of(path: Path) -> str:
+    if path.name.endswith(LOG_SUFFIX):
+        return path.name[: -len(LOG_SUFFIX)]
+    return parse_meta(path.name)[0]
+
+
+def group_sessions(files: list[Path]) -> list[tuple[str, list[str]]]:
+    """(session_id, file paths) sorted by session id; a session's files keep their sorted order."""
+    groups: dict[str, list[str]] = {}
+    for path in files:
+        groups.setdefault(session_of(path), []).append(str(path))
+    return sorted(groups.items())
+
+
+def export_session(session_id: str, paths: list[str], opts: dict) -> dict:
+    """Rows of one session as ready-to-write JSON lines plus its counters."""
+    counters = {k: 0 for k in COUNTER_KEYS}
+    rows: list[tuple] = []  # (backend, model, line, dedup key or None)
+    files_invalid_json = 0
+    max_completion_chars = opts["max_completion_chars"]
+    for sid, backend, model, source_name, history, invalid_json in iter_sources([Path(p) for p in paths]):
+        if invalid_json:
+            files_invalid_json += 1
+            continue
+        for prompt, completion in iter_pairs(history, min_chars=opts["min_chars"], counters=counters):
+            if max_completion_chars > 0 and len(completion) > max_completion_chars:
+                completion = completion[:max_completion_chars]
+                counters["completion_truncated"] += 1
+            base = {
+                "session_id": sid,
+                "backend": backend,
+                "model": model,
+                "source_file": source_name,
+            }
+            if opts["mode"] == "pairs":
+                row = {**base, "prompt": prompt, "completion": completion}
+            else:
+                row = {
+                    **base,
+                    "messages": [
+                        {"role": "user", "content": prompt},
+                        {"role": "assistant", "content": completion},
+                    ],
+                }
+            dedup = None
+            if opts["dedup"] != "none":
+                sig = pair_signature(prompt, completion) if opts["dedup"] == "near" else None
+                dedup = (exact_key(prompt, completion), sig, prompt, band_keys(sig) if sig is not None else None)
+            rows.append((backend, model, json.dumps(row, ensure_ascii=False) + "\n", dedup))
+    return {"session_id": session_id, "paths": paths, "rows": rows, "counters": counters, "files_invalid_json": files_invalid_json}
+
+
+def export_batch(task: tuple[list[tuple[str, list[str]]], dict]) -> list[dict]:
+    batch, opts = task
+    return [export_session(session_id, paths, opts) for session_id, paths in batch]
+
+
+def iter_results(groups: list[tuple[str, list[str]]], opts: dict, workers: int, batch: int, queue: int) -> Iterator[dict]:
+    """Per-session results in input order; at most `queue` batches parsed ahead of the writer."""
+    tasks = ((groups[i : i + batch], opts) for i in range(0, len(groups), max(1, batch)))
+    if workers <= 1:
+        for task in tasks:
+            yield from export_batch(task)
+        return
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending: deque = deque()
+    try:
+        for task in tasks:
+            pending.append(pool.submit(export_batch, task))
+            if len(pending) >= queue:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for fut in pending:
+            fut.cancel()
+        pool.shutdown(wait=True)
+
+
+def shard_of(session_id: str, shards: int) -> int:
+    if shards <= 1:
+        return 0
+    digest = hashlib.blake2b(session_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+def resolve_compress(output_file: Path, compress: str) -> str:
+    if compress != "auto":
+        return compress
+    if output_file.suffix == ".gz":
+        return "gzip"
+    if output_file.suffix == ".zst":
+        return "zstd"
+    return "none"
+
+
+def shard_paths(output_file: Path, shards: int, compress: str) -> list[Path]:
+    if shards <= 1:
+        return [output_file]
+    name = output_file.name
+    for suffix in (".gz", ".zst", ".jsonl"):
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    ext = ".jsonl" + COMPRESS_SUFFIX[compress]
+    return [output_file.with_name(f"{name}-{i:05d}-of-{shards:05d}{ext}") for i in range(shards)]
+
+
+def run_output_file(output_file: Path, run: int) -> Path:
+    """`dc_pairs.jsonl.gz` -> `dc_pairs.run-00003.jsonl.gz`: checkpoint runs never overwrite an earlier delta."""
+    name, ext = output_file.name, ""
+    for suffix in (".gz", ".zst", ".jsonl"):
+        if name.endswith(suffix):
+            name, ext = name[: -len(suffix)], suffix + ext
+    return output_file.with_name(f"{name}.run-{run:05d}{ext}")
+
+
+def open_output(path: Path, compress: str) -> TextIO:
+    """Text writer; gzip output has a zeroed header mtime so identical exports are identical bytes."""
+    raw = path.open("wb")
+    if compress == "gzip":
+        return io.TextIOWrapper(gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0), encoding="utf-8")
+    if compress == "zstd":
+        import zstandard  # type: ignore
+
+        return io.TextIOWrapper(zstandard.ZstdCompressor(level=3).stream_writer(raw), encoding="utf-8")
+    return io.TextIOWrapper(raw, encoding="utf-8")
+
+
+def file_stamp(path: Path) -> list[int]:
+    st = path.stat()
+    return [st.st_mtime_ns, st.st_size]
+
+
+def load_checkpoint(path: Path, opts: dict) -> tuple[dict[str, list[int]], bool, int]:
+    """(file stamps of the last run, reset, last run number) — stamps are dropped if the export options changed."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}, False, 0
+    if not isinstance(data, dict):
+        return {}, True, 0
+    try:
+        run = max(0, int(data.get("run", 0)))
+    except (TypeError, ValueError):
+        run = 0
+    if data.get("opts") != opts or not isinstance(data.get("files"), dict):
+        return {}, True, run
+    return {str(k): list(v) for k, v in data["files"].items()}, False, run
+
+
+def save_checkpoint(path: Path, opts: dict, files: dict[str, list[int]], run: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(
+        json.dumps({"opts": opts, "files": files, "run": run, "updated_ts": time.time()}, ensure_ascii=False), encoding="utf-8"
+    )
+    os.replace(tmp, path)
+
+
+def run_export(args: argparse.Namespace) -> dict:
+    t0 = time.monotonic()
     input_dir = Path(args.input_dir).expanduser()
     output_file = Path(args.output_file).expanduser()
     min_chars = max(0, int(args.min_chars))
@@ -97,8 +321,18 @@ def main() -> int:
     max_lines = max(0, int(args.max_lines))
     since_days = max(0, int(args.since_days))
     max_completion_chars = max(0, int(args.max_completion_chars))
+    workers = max(1, int(args.workers))
+    batch = max(1, int(args.batch))
+    queue = max(1, int(args.queue) or workers * 4)
+    shards = max(1, int(args.shards))
+    compress = resolve_compress(output_file, args.compress)
+    dedup_mode = str(args.dedup)
+    near_threshold = min(1.0, max(0.0, float(args.near_threshold)))
+    opts = {"mode": args.mode, "min_chars": min_chars, "max_completion_chars": max_completion_chars, "dedup": dedup_mode}
+    if dedup_mode == "near":
+        opts["near_threshold"] = near_threshold
 
-    files = sorted([p for p in input_dir.glob("*.json") if p.is_file()])
+    files = sorted([p for p in [*input_dir.glob("*.json"), *input_dir.glob(f"*{LOG_SUFFIX}")] if p.is_file()])
     sessions_total = len(files)
 
     if since_days > 0:
@@ -108,63 +342,86 @@ def main() -> int:
     if max_sessions > 0:
         files = files[:max_sessions]
 
+    groups = group_sessions(files)
+    checkpoint_path = Path(args.checkpoint).expanduser() if args.checkpoint else None
+    stamps: dict[str, list[int]] = {}
+    current: dict[str, list[int]] = {}
+    checkpoint_reset = False
+    sessions_unchanged = 0
+    run = 0
+    if checkpoint_path is not None:
+        previous, checkpoint_reset, run = load_checkpoint(checkpoint_path, opts)
+        stamps = {name: st for name, st in previous.items() if (input_dir / name).exists()}
+        current = {p.name: file_stamp(p) for p in files}
+        changed = []
+        for session_id, paths in groups:
+            if all(previous.get(Path(p).name) == current[Path(p).name] for p in paths):
+                sessions_unchanged += 1
+            else:
+                changed.append((session_id, paths))
+        groups = changed
+
+    output_paths = shard_paths(output_file, shards, compress)
+    if checkpoint_path is not None:
+        # Each run's delta gets its own files; skip numbers whose files exist (e.g. a deleted checkpoint).
+        run += 1
+        while any(p.exists() for p in shard_paths(run_output_file(output_file, run), shards, compress)):
+            run += 1
+        output_paths = shard_paths(run_output_file(output_file, run), shards, compress)
     output_file.parent.mkdir(parents=True, exist_ok=True)
 
-    counters = {
-        "invalid_role_dropped": 0,
-        "invalid_content_dropped": 0,
-        "empty_dropped": 0,
-        "assistant_without_user_dropped": 0,
-        "orphan_user_dropped": 0,
-        "user_overwritten": 0,
-        "short_prompt_dropped": 0,
-        "short_completion_dropped": 0,
-        "completion_truncated": 0,
-    }
+    counters = {k: 0 for k in COUNTER_KEYS}
     files_invalid_json = 0
     rows = 0
     rows_by_session: dict[str, int] = {}
     pairs_per_backend_model: dict[str, dict[str, int]] = {}
 
-    with output_file.open("w", encoding="utf-8") as f:
-        stop = False
-        for path in files:
-            session_id, backend, model = parse_meta(path.name)
-            history, invalid_json = load_history(path)
-            if invalid_json:
-                files_invalid_json += 1
-                continue
-            for prompt, completion in iter_pairs(history, min_chars=min_chars, counters=counters):
-                if max_completion_chars > 0 and len(completion) > max_completion_chars:
-                    completion = completion[:max_completion_chars]
-                    counters["completion_truncated"] += 1
-                base = {
-                    "session_id": session_id,
-                    "backend": backend,
-                    "model": model,
-                    "source_file": path.name,
-                }
-                if args.mode == "pairs":
-                    row = {**base, "prompt": prompt, "completion": completion}
-                else:
-                    row = {
-                        **base,
-                        "messages": [
-                            {"role": "user", "content": prompt},
-                            {"role": "assistant", "content": completion},
-                        ],
-                    }
-                f.write(json.dumps(row, ensure_ascii=False) + "\n")
-                rows += 1
-                rows_by_session[session_id] = rows_by_session.get(session_id, 0) + 1
-                backend_map = pairs_per_backend_model.setdefault(backend, {})
-                backend_map[model] = backend_map.get(model, 0) + 1
-
-                if max_lines > 0 and rows >= max_lines:
-                    stop = True
-                    break
-            if stop:
+    index = None
+    if dedup_mode != "none":
+        index = DedupIndex(Path(args.dedup_db).expanduser() if args.dedup_db else None, near=dedup_mode == "near", threshold=near_threshold)
+    outs = [open_output(p, compress) for p in output_paths]
+    try:
+        for res in iter_results(groups, opts, workers, batch, queue):
+            for k, v in res["counters"].items():
+                counters[k] += v
+            files_invalid_json += res["files_invalid_json"]
+            session_rows = res["rows"]
+            complete = True
+            if index is not None:
+                kept = []
+                for r in session_rows:
+                    if max_lines > 0 and rows + len(kept) >= max_lines:
+                        # Rows past the cut are not checked, so a persistent index never marks them seen.
+                        complete = False
+                        break
+                    # Owned by the session: a changed session's delta carries all of its pairs, not just the new ones.
+                    if index.check(*r[3], owner=res["session_id"]) == "unique":
+                        kept.append(r)
+                session_rows = kept
+            elif max_lines > 0 and rows + len(session_rows) > max_lines:
+                session_rows = session_rows[: max_lines - rows]
+                complete = False
+            if session_rows:
+                outs[shard_of(res["session_id"], shards)].write("".join(r[2] for r in session_rows))
+                rows += len(session_rows)
+                rows_by_session[res["session_id"]] = rows_by_session.get(res["session_id"], 0) + len(session_rows)
+                for backend, model, *_ in session_rows:
+                    backend_map = pairs_per_backend_model.setdefault(backend, {})
+                    backend_map[model] = backend_map.get(model, 0) + 1
+            if complete and checkpoint_path is not None:
+                # Stamps taken before parsing: a file rewritten mid-export is exported again next run.
+                for p in res["paths"]:
+                    stamps[Path(p).name] = current[Path(p).name]
+            if max_lines > 0 and rows >= max_lines:
                 break
+    finally:
+        for out in outs:
+            out.close()
+        dedup_stats = index.stats() if index is not None else None
+        if index is not None:
+            index.close()
+    if checkpoint_path is not None:
+        save_checkpoint(checkpoint_path, opts, stamps, run)
 
     top_sessions = sorted(rows_by_session.items(), key=lambda item: (-item[1], item[0]))[:10]
 
@@ -188,8 +445,36 @@ def main() -> int:
         "dropped": counters,
         "pairs_per_backend_model": pairs_per_backend_model,
         "top_sessions": [{"session_id": sid, "rows": cnt} for sid, cnt in top_sessions],
+        "export": {
+            "workers": workers,
+            "shards": shards,
+            "compress": compress,
+            "outputs": [str(p) for p in output_paths],
+            "elapsed_ms": int((time.monotonic() - t0) * 1000),
+        },
     }
-    print(json.dumps(summary, ensure_ascii=False))
+    if dedup_stats is not None:
+        summary["dedup"] = {"mode": dedup_mode, **dedup_stats}
+    if checkpoint_path is not None:
+        summary["checkpoint"] = {
+            "path": str(checkpoint_path),
+            "sessions_unchanged": sessions_unchanged,
+            "sessions_exported": len(groups),
+            "reset": checkpoint_reset,
+            "run": run,
+        }
+    return summary
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if resolve_compress(Path(args.output_file), args.compress) == "zstd":
+        try:
+            import zstandard  # type: ignore  # noqa: F401
+        except ImportError:
+            print(json.dumps({"ok": False, "error": "zstd output needs the zstandard package"}, ensure_ascii=False))
+            return 2
+    print(json.dumps(run_export(args), ensure_ascii=False))
     return 0
 
 
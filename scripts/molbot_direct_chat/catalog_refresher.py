@@ -0,0 +1,154 @@
+"""Background refresher for slow-to-build data (the DC model catalog).
+
+`get()` always returns the last good value; only the very first call (or an
+explicit `force`) builds inline. A daemon thread rebuilds every `interval_s`
+and as soon as one of `watch_paths` changes (polled by stat, cheap). A failed
+build keeps the previous value. Each build whose content differs bumps
+`version`; `wait_for_change` lets HTTP long-polls block until that happens.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+
+def _default_fingerprint(data: Any) -> str:
+    if isinstance(data, dict):
+        data = {k: v for k, v in data.items() if k != "ts"}
+    return json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class CatalogRefresher:
+    def __init__(
+        self,
+        build: Callable[[], Any],
+        interval_s: float = 8.0,
+        watch_paths: Iterable[Path] = (),
+        watch_interval_s: float = 1.0,
+        fingerprint: Callable[[Any], str] = _default_fingerprint,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._build = build
+        self.interval_s = float(interval_s)
+        self.watch_paths = [Path(p) for p in watch_paths]
+        self.watch_interval_s = float(watch_interval_s)
+        self._fingerprint = fingerprint
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._build_lock = threading.Lock()
+        self._data: Any = None
+        self._digest = ""
+        self._version = 0
+        self._built_at = 0.0
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._stamps = self._stat_paths()
+        self._stats = {"builds": 0, "changes": 0, "errors": 0, "watch_triggers": 0, "last_build_ms": 0}
+
+    def _stat_paths(self) -> list[tuple[int, int] | None]:
+        out: list[tuple[int, int] | None] = []
+        for p in self.watch_paths:
+            try:
+                st = p.stat()
+                out.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                out.append(None)
+        return out
+
+    def refresh(self) -> bool:
+        """Rebuild now (serialized); True if the content changed."""
+        with self._build_lock:
+            t0 = time.monotonic()
+            try:
+                data = self._build()
+            except Exception:
+                with self._cond:
+                    self._stats["errors"] += 1
+                    self._built_at = self._clock()
+                return False
+            digest = self._fingerprint(data)
+            with self._cond:
+                self._stats["builds"] += 1
+                self._stats["last_build_ms"] = int((time.monotonic() - t0) * 1000)
+                self._built_at = self._clock()
+                changed = digest != self._digest
+                self._data = data
+                if changed:
+                    self._digest = digest
+                    self._version += 1
+                    self._stats["changes"] += 1
+                    self._cond.notify_all()
+                return changed
+
+    def get(self, force: bool = False) -> Any:
+        if force or self._data is None:
+            self.refresh()
+        self.start()
+        with self._cond:
+            return self._data
+
+    def request_refresh(self) -> None:
+        """Ask the background thread to rebuild soon without waiting for it."""
+        self._built_at = float("-inf")
+        self.start()
+        self._wake.set()
+
+    def wait_for_change(self, since: int, timeout_s: float) -> tuple[int, Any]:
+        """(version, data) once version != since, or the current pair after timeout_s."""
+        self.get()
+        deadline = time.monotonic() + max(0.0, float(timeout_s))
+        with self._cond:
+            while self._version == since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._version, self._data
+
+    @property
+    def version(self) -> int:
+        with self._cond:
+            return self._version
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="catalog-refresher", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        """Stop the background thread (it exits after its current build)."""
+        self._stopped.set()
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while True:
+            self._wake.wait(self.watch_interval_s)
+            self._wake.clear()
+            if self._stopped.is_set():
+                return
+            stamps = self._stat_paths()
+            watched_changed = stamps != self._stamps
+            self._stamps = stamps
+            if watched_changed:
+                with self._cond:
+                    self._stats["watch_triggers"] += 1
+            if watched_changed or (self._clock() - self._built_at) >= self.interval_s:
+                self.refresh()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "version": self._version,
+                "age_s": round(self._clock() - self._built_at, 3) if self._data is not None else None,
+                "running": self._thread is not None,
+                **self._stats,
+            }
@@ -0,0 +1,234 @@
+"""Exact and near-duplicate filtering for dataset export, in bounded memory.
+
+- Exact: 64-bit blake2b of the normalized (prompt, completion) in an SQLite
+  `INTEGER PRIMARY KEY` table (the rowid B-tree itself, 8 bytes/key plus page
+  overhead), so the set lives on disk and only a fixed page cache is in RAM.
+- Near: MinHash signatures over word 3-grams using one-permutation hashing
+  (one hash per shingle, `num_perm` bins, rotation densification). LSH splits
+  the signature into bands; rows sharing a band bucket with a kept row are
+  compared by signature and dropped at estimated Jaccard >= threshold.
+
+Signatures and band keys are pure functions of the text, so export workers
+compute them and only the index lookups run in the (single, ordered) writer.
+
+Kept rows can record an owner (the session id). A persistent index then keeps
+an exact hit on a pair the same owner already kept, once per run, so a changed
+session is re-exported in full instead of losing the pairs of earlier runs.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import struct
+import tempfile
+import time
+import zlib
+from operator import eq
+from pathlib import Path
+
+
+NUM_PERM = 64
+BANDS = 16
+_EMPTY = 1 << 32
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    return " ".join(str(text or "").lower().split())
+
+
+def _h64(data: str) -> int:
+    return int.from_bytes(hashlib.blake2b(data.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _signed(v: int) -> int:
+    return v - (1 << 64) if v >= (1 << 63) else v
+
+
+def exact_key(prompt: str, completion: str) -> int:
+    """Signed 64-bit key (SQLite INTEGER) of the normalized pair."""
+    return _signed(_h64(normalize(prompt) + "\x1f" + normalize(completion)))
+
+
+def shingles(text: str, n: int = 3) -> set[str]:
+    words = _WORD_RE.findall(normalize(text))
+    if len(words) <= n:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + n]) for i in range(len(words) - n + 1)}
+
+
+def minhash(text: str, num_perm: int = NUM_PERM) -> tuple[int, ...]:
+    sig = [_EMPTY] * num_perm
+    crc = zlib.crc32
+    for raw in [sh.encode("utf-8") for sh in shingles(text)]:
+        # Two seeded crc32s (C speed) pick the bin and the value; blake2b per shingle dominated the cost.
+        b = crc(raw) % num_perm
+        v = crc(raw, 0x9E3779B9)
+        if v < sig[b]:
+            sig[b] = v
+    if all(v == _EMPTY for v in sig):
+        return tuple(sig)
+    dense = list(sig)
+    for i in range(num_perm):
+        if sig[i] != _EMPTY:
+            continue
+        d = 1
+        while sig[(i + d) % num_perm] == _EMPTY:
+            d += 1
+        # Borrow the next filled bin, salted by distance so borrowed bins only match the same pattern.
+        dense[i] = (sig[(i + d) % num_perm] * 31 + d) & 0xFFFFFFFF
+    return tuple(dense)
+
+
+def similarity(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    if not a or len(a) != len(b):
+        return 0.0
+    return sum(map(eq, a, b)) / len(a)
+
+
+def pair_signature(prompt: str, completion: str) -> tuple[int, ...]:
+    return minhash(prompt + "\n" + completion)
+
+
+def band_keys(sig: tuple[int, ...], bands: int = BANDS) -> list[int]:
+    """One LSH bucket key per band: band index in the high bits, crc32 of the band's values below.
+
+    A 32-bit collision only adds a candidate, which the signature comparison then rejects.
+    """
+    r = len(sig) // bands
+    fmt = f"<{r}I"
+    pack, crc = struct.pack, zlib.crc32
+    return [(b << 32) | crc(pack(fmt, *sig[b * r : (b + 1) * r])) for b in range(bands)]
+
+
+class _MisraGries:
+    """Top repeated items in O(k) memory (counts are lower bounds)."""
+
+    def __init__(self, k: int = 32) -> None:
+        self.k = k
+        self.counts: dict[str, int] = {}
+
+    def add(self, item: str) -> None:
+        if item in self.counts:
+            self.counts[item] += 1
+        elif len(self.counts) < self.k:
+            self.counts[item] = 1
+        else:
+            for key in list(self.counts):
+                self.counts[key] -= 1
+                if self.counts[key] <= 0:
+                    del self.counts[key]
+
+    def top(self, n: int = 10) -> list[dict]:
+        ranked = sorted(self.counts.items(), key=lambda kv: (-kv[1], kv[0]))[:n]
+        return [{"prompt": item[:160], "dropped_at_least": cnt} for item, cnt in ranked]
+
+
+class DedupIndex:
+    def __init__(
+        self,
+        path: Path | None = None,
+        near: bool = True,
+        threshold: float = 0.9,
+        num_perm: int = NUM_PERM,
+        bands: int = BANDS,
+        cache_mb: int = 16,
+        commit_every: int = 5000,
+    ) -> None:
+        self._tmp = None
+        if path is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix="dedup_")
+            path = Path(self._tmp.name) / "dedup.sqlite"
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.near = bool(near)
+        self.threshold = float(threshold)
+        self.num_perm = int(num_perm)
+        self.bands = int(bands)
+        self.commit_every = max(1, int(commit_every))
+        self._pending = 0
+        self._db = sqlite3.connect(str(self.path))
+        self._db.execute(f"PRAGMA cache_size=-{max(1, int(cache_mb)) * 1024}")
+        self._db.execute("PRAGMA journal_mode=OFF" if self._tmp else "PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE IF NOT EXISTS exact (h INTEGER PRIMARY KEY)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sigs (id INTEGER PRIMARY KEY, sig BLOB NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS buckets (k INTEGER PRIMARY KEY, id INTEGER NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS owners (h INTEGER PRIMARY KEY, owner TEXT NOT NULL, run INTEGER NOT NULL)")
+        self._run = time.time_ns()
+        self._sig_fmt = f"<{self.num_perm}I"
+        self._sig_size = struct.calcsize(self._sig_fmt)
+        self._top = _MisraGries()
+        self._stats = {"checked": 0, "kept": 0, "owned_kept": 0, "exact_dropped": 0, "near_dropped": 0, "near_candidates": 0}
+
+    def check(
+        self, key: int, sig: tuple[int, ...] | None = None, prompt: str = "", bands: list[int] | None = None, owner: str = ""
+    ) -> str:
+        """'unique' (and remember it), 'exact' or 'near'; `bands` may be precomputed by the caller.
+
+        With `owner`, an exact hit on a pair this owner kept in an earlier run is 'unique' again.
+        """
+        self._stats["checked"] += 1
+        cur = self._db.execute("INSERT OR IGNORE INTO exact (h) VALUES (?)", (key,))
+        if cur.rowcount == 0:
+            if owner:
+                # Claim it for this run; a repeat within the run (same run stamp) stays a duplicate.
+                cur = self._db.execute("UPDATE owners SET run = ? WHERE h = ? AND owner = ? AND run != ?", (self._run, key, owner, self._run))
+                if cur.rowcount:
+                    self._pending += 1
+                    self._stats["kept"] += 1
+                    self._stats["owned_kept"] += 1
+                    return "unique"
+            self._stats["exact_dropped"] += 1
+            if prompt:
+                self._top.add(normalize(prompt))
+            return "exact"
+        verdict = "unique"
+        if self.near and sig is not None and len(sig) == self.num_perm and any(v != _EMPTY for v in sig):
+            if bands is None or len(bands) != self.bands:
+                bands = band_keys(sig, self.bands)
+            marks = ",".join("?" * len(bands))
+            ids = sorted({row[0] for row in self._db.execute(f"SELECT id FROM buckets WHERE k IN ({marks})", bands)})
+            if ids:
+                self._stats["near_candidates"] += len(ids)
+                id_marks = ",".join("?" * len(ids))
+                for _, blob in self._db.execute(f"SELECT id, sig FROM sigs WHERE id IN ({id_marks}) ORDER BY id", ids):
+                    if len(blob) != self._sig_size:
+                        continue  # a db built with another num_perm
+                    if similarity(sig, struct.unpack(self._sig_fmt, blob)) >= self.threshold:
+                        verdict = "near"
+                        break
+            if verdict == "unique":
+                packed = struct.pack(self._sig_fmt, *(v & 0xFFFFFFFF for v in sig))
+                sid = self._db.execute("INSERT INTO sigs (sig) VALUES (?)", (packed,)).lastrowid
+                self._db.executemany("INSERT OR IGNORE INTO buckets (k, id) VALUES (?, ?)", [(k, sid) for k in bands])
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self._db.commit()
+            self._pending = 0
+        if verdict == "near":
+            self._stats["near_dropped"] += 1
+            return verdict
+        if owner:
+            self._db.execute("INSERT OR REPLACE INTO owners (h, owner, run) VALUES (?, ?, ?)", (key, owner, self._run))
+        self._stats["kept"] += 1
+        return verdict
+
+    def close(self) -> None:
+        try:
+            self._db.commit()
+            self._db.close()
+        finally:
+            if self._tmp is not None:
+                self._tmp.cleanup()
+
+    def stats(self) -> dict:
+        return {
+            **self._stats,
+            "near": self.near,
+            "threshold": self.threshold,
+            "db": None if self._tmp else str(self.path),
+            "top_exact_prompts": self._top.top(),
+        }
@@ -9,6 +9,7 @@ import uuid
 from pathlib import Path
 
 from .util import normalize_text
+from .x11_registry import shared_registry
 
 
 OPENED_WINDOWS_PATH = Path.home() / ".openclaw" / "direct_chat_opened_windows.json"
@@ -22,6 +23,9 @@ def _desktop_dir() -> Path | None:
 
 
 def _wmctrl_list() -> dict[str, str]:
+    reg = shared_registry()
+    if reg is not None:
+        return {w.win_id: (w.title.strip() or "N/A") for w in reg.windows()}
     if not shutil.which("wmctrl"):
         return {}
     try:
@@ -41,6 +45,9 @@ def _wmctrl_list() -> dict[str, str]:
 
 
 def _wmctrl_current_desktop() -> int | None:
+    reg = shared_registry()
+    if reg is not None:
+        return reg.current_desktop()
     if not shutil.which("wmctrl"):
         return None
     try:
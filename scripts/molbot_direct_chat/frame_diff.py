@@ -0,0 +1,142 @@
+"""Frame-diff progress detector for video windows.
+
+Frames are small grayscale thumbnails of the player region (the capture
+callable crops/downscales, e.g. ImageMagick `gray:-`), compared by mean
+absolute difference. Motion over at least `min_changed` consecutive sample
+pairs means "progressing"; `static_pairs` unchanged pairs in a row with no
+motion means "static". Sampling stops as soon as either is reached, so a
+decision usually takes a few hundred ms instead of two snapshots seconds apart.
+
+The last frame of each window is kept as a baseline: a follow-up call within
+`baseline_max_age_s` starts from it and needs one capture less. The pair that
+starts from the baseline still counts as motion, but does not block the static
+verdict: after a pause, baseline (playing) vs. first fresh frame (paused)
+differs even though the video is now static. Callers should also `forget` the
+window when they send a transport action.
+NumPy is used when installed; the pure-Python path handles the same sizes.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable
+
+
+def _lazy_import_numpy():
+    try:
+        import numpy as np  # type: ignore
+    except Exception:
+        return None
+    return np
+
+
+def mean_abs_diff(a: bytes, b: bytes) -> float:
+    if not a or len(a) != len(b):
+        return 255.0
+    np = _lazy_import_numpy()
+    if np is not None:
+        x = np.frombuffer(a, dtype=np.uint8).astype(np.int16)
+        y = np.frombuffer(b, dtype=np.uint8).astype(np.int16)
+        return float(np.abs(x - y).mean())
+    return sum(abs(p - q) for p, q in zip(a, b)) / float(len(a))
+
+
+class FrameDiffEngine:
+    def __init__(
+        self,
+        capture: Callable[[str], bytes | None],
+        threshold: float = 0.8,
+        sample_interval_s: float = 0.15,
+        min_changed: int = 2,
+        static_pairs: int = 3,
+        baseline_max_age_s: float = 4.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.capture = capture
+        self.threshold = float(threshold)
+        self.sample_interval_s = float(sample_interval_s)
+        self.min_changed = max(1, int(min_changed))
+        self.static_pairs = max(1, int(static_pairs))
+        self.baseline_max_age_s = float(baseline_max_age_s)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._baselines: dict[str, tuple[bytes, float]] = {}
+        self._stats = {"calls": 0, "captures": 0, "baseline_hits": 0, "changed": 0, "static": 0, "failed": 0}
+
+    def _baseline(self, key: str) -> bytes | None:
+        with self._lock:
+            hit = self._baselines.get(key)
+        if hit is None or (self._clock() - hit[1]) > self.baseline_max_age_s:
+            return None
+        return hit[0]
+
+    def _remember(self, key: str, frame: bytes) -> None:
+        with self._lock:
+            self._baselines[key] = (frame, self._clock())
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            self._baselines.pop(key, None)
+
+    def _grab(self, key: str) -> bytes | None:
+        self._bump("captures")
+        try:
+            return self.capture(key) or None
+        except Exception:
+            return None
+
+    def _bump(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _done(self, ok: bool, detail: str) -> tuple[bool, str]:
+        self._bump("changed" if ok else ("static" if detail.startswith("visual_static") else "failed"))
+        return ok, detail
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"baselines": len(self._baselines), **self._stats}
+
+    def progress(self, key: str, max_wait_s: float = 1.5) -> tuple[bool, str]:
+        """(progressing, detail) for window `key`, sampling for at most `max_wait_s`."""
+        self._bump("calls")
+        prev = self._baseline(key)
+        from_baseline = prev is not None
+        if from_baseline:
+            self._bump("baseline_hits")
+        else:
+            prev = self._grab(key)
+            if not prev:
+                return self._done(False, "visual_snap_a_failed")
+            self._remember(key, prev)
+        deadline = self._clock() + max(self.sample_interval_s, float(max_wait_s))
+        changed = 0
+        changed_fresh = 0
+        unchanged_run = 0
+        pairs = 0
+        max_diff = 0.0
+        while True:
+            self._sleep(self.sample_interval_s)
+            cur = self._grab(key)
+            if not cur:
+                return self._done(False, "visual_snap_b_failed")
+            self._remember(key, cur)
+            diff = mean_abs_diff(prev, cur)
+            prev = cur
+            pairs += 1
+            max_diff = max(max_diff, diff)
+            if diff > self.threshold:
+                changed += 1
+                if not (from_baseline and pairs == 1):
+                    changed_fresh += 1
+                unchanged_run = 0
+            else:
+                unchanged_run += 1
+            stats = f"pairs={pairs};changed={changed};max_diff={max_diff:.2f}" + (";baseline" if from_baseline else "")
+            if changed >= self.min_changed:
+                return self._done(True, f"visual_changed:{stats}")
+            if (changed_fresh == 0 and unchanged_run >= self.static_pairs) or self._clock() >= deadline:
+                return self._done(False, f"visual_static:{stats}")
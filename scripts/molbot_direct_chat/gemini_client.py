@@ -0,0 +1,254 @@
+"""Gemini API transport: pooled keep-alive session, model racing, response cache, quota counter.
+
+- `GeminiApiClient.post_generate` sends `generateContent` through one shared
+  `requests.Session`, so repeat calls reuse the TLS connection.
+- `GeminiApiClient.race` runs the same conversation against several models in
+  a thread pool; the first accepted result wins, queued runs are cancelled and
+  running ones see the cancel event before their next turn.
+- Successful answers are cached for a short TTL per (models, prompts).
+- `UsageCounter` keeps the daily quota in memory and merges it into
+  `gemini_api_usage.json` (under the same flock as before) every few seconds
+  and at exit, instead of a locked read-modify-write per call.
+"""
+
+from __future__ import annotations
+
+import atexit
+import fcntl
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+
+T = TypeVar("T")
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com"
+
+
+def _default_session() -> Any:
+    import requests  # type: ignore
+    from requests.adapters import HTTPAdapter  # type: ignore
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def cache_key(models: list[str], prompts: list[str]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([models, prompts], ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+
+class GeminiApiClient:
+    def __init__(
+        self,
+        session_factory: Callable[[], Any] | None = None,
+        max_workers: int = 4,
+        cache_ttl_s: float = 120.0,
+        cache_size: int = 128,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._session_factory = session_factory or _default_session
+        self._session: Any = None
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="gemini-api")
+        self.cache_ttl_s = float(cache_ttl_s)
+        self.cache_size = max(1, int(cache_size))
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (payload, stored_at)
+        self._cache: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._stats = {"requests": 0, "cache_hits": 0, "races": 0, "race_cancelled": 0, "errors": 0}
+
+    def session(self) -> Any:
+        with self._lock:
+            if self._session is None:
+                self._session = self._session_factory()
+            return self._session
+
+    def post_generate(self, base_url: str, model: str, api_key: str, body: dict, timeout_s: float) -> tuple[int, str]:
+        """(HTTP status, body text); network errors propagate to the caller."""
+        url = f"{base_url.rstrip('/')}/v1beta/models/{model}:generateContent"
+        with self._lock:
+            self._stats["requests"] += 1
+        try:
+            resp = self.session().post(
+                url,
+                data=json.dumps(body, ensure_ascii=False).encode("utf-8"),
+                headers={"Content-Type": "application/json; charset=utf-8", "x-goog-api-key": api_key},
+                timeout=(min(5.0, timeout_s), timeout_s),
+            )
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        return int(resp.status_code), resp.content.decode("utf-8", errors="replace")
+
+    def race(
+        self,
+        runs: list[tuple[str, Callable[[threading.Event], T]]],
+        accept: Callable[[T], bool],
+        timeout_s: float,
+    ) -> tuple[str | None, dict[str, T]]:
+        """(winner name or None, results by name); on a win only the winner's result is returned."""
+        cancel = threading.Event()
+        futures = {self._pool.submit(fn, cancel): name for name, fn in runs}
+        pending = set(futures)
+        results: dict[str, T] = {}
+        deadline = time.monotonic() + float(timeout_s)
+        with self._lock:
+            self._stats["races"] += 1
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for fut in done:
+                    try:
+                        value = fut.result()
+                    except Exception:
+                        continue
+                    if accept(value):
+                        return futures[fut], {futures[fut]: value}
+                    results[futures[fut]] = value
+            return None, results
+        finally:
+            cancel.set()
+            if pending:
+                for fut in pending:
+                    fut.cancel()
+                with self._lock:
+                    self._stats["race_cancelled"] += len(pending)
+
+    def cached(self, key: str) -> dict | None:
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is None:
+                return None
+            if (self._clock() - hit[1]) > self.cache_ttl_s:
+                self._cache.pop(key, None)
+                return None
+            self._cache.move_to_end(key)
+            self._stats["cache_hits"] += 1
+            return dict(hit[0])
+
+    def store(self, key: str, payload: dict) -> None:
+        if self.cache_ttl_s <= 0:
+            return
+        with self._lock:
+            self._cache[key] = (dict(payload), self._clock())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"cached": len(self._cache), **self._stats}
+
+
+class UsageCounter:
+    """Daily API call counter, in memory, merged into the shared usage file periodically."""
+
+    def __init__(self, flush_interval_s: float = 10.0) -> None:
+        self.flush_interval_s = float(flush_interval_s)
+        self._lock = threading.Lock()
+        self._path: Path | None = None
+        self._lock_path: Path | None = None
+        self._date = ""
+        self._synced_used = 0  # value in the file at the last load/flush
+        self._pending = 0  # reserved here, not yet written
+        self._limit = 0
+        self._flusher: threading.Thread | None = None
+        self._wake = threading.Event()
+
+    @staticmethod
+    def _today() -> str:
+        return time.strftime("%Y-%m-%d", time.localtime())
+
+    def _merge_locked(self) -> None:
+        """Add pending units to the file under its flock and adopt the merged total."""
+        assert self._path is not None and self._lock_path is not None
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_path.parent.mkdir(parents=True, exist_ok=True)
+        today = self._today()
+        with self._lock_path.open("a+", encoding="utf-8") as lockf:
+            fcntl.flock(lockf.fileno(), fcntl.LOCK_EX)
+            data: dict = {}
+            if self._path.exists():
+                try:
+                    data = json.loads(self._path.read_text(encoding="utf-8"))
+                except Exception:
+                    data = {}
+            used = int(data.get("used", 0) or 0) if str(data.get("date", "")) == today else 0
+            if self._date != today:
+                self._pending = 0  # units reserved yesterday don't count today
+            if self._pending:
+                used += self._pending
+                payload = {"date": today, "used": used, "limit": self._limit, "updated_ts": time.time()}
+                self._path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+            self._pending = 0
+            self._synced_used = used
+            self._date = today
+
+    def reserve(self, path: Path, lock_path: Path, units: int, limit: int) -> tuple[bool, int, int]:
+        with self._lock:
+            try:
+                if path != self._path or lock_path != self._lock_path:
+                    if self._path is not None and self._pending:
+                        self._merge_locked()
+                    self._path, self._lock_path, self._pending = path, lock_path, 0
+                    self._date = ""
+                self._limit = int(limit)
+                if self._date != self._today():
+                    self._merge_locked()
+            except Exception:
+                # Fail closed: if usage persistence fails, don't risk unbounded calls.
+                return False, self._synced_used + self._pending, limit
+            used = self._synced_used + self._pending
+            if used + units > limit:
+                return False, used, limit
+            self._pending += units
+            used += units
+            self._ensure_flusher()
+            return True, used, limit
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._path is None or not self._pending:
+                return
+            try:
+                self._merge_locked()
+            except Exception:
+                return
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None:
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name="gemini-usage-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"date": self._date, "used": self._synced_used + self._pending, "unflushed": self._pending, "limit": self._limit}
+
+
+GEMINI_CLIENT = GeminiApiClient()
+GEMINI_USAGE = UsageCounter()
@@ -0,0 +1,411 @@
+"""In-process guardrail: the rules of `scripts/guardrail_check.sh` without a bash fork.
+
+The rules are read from the script itself (env defaults, the dangerous-command
+regex and the tools it applies to, the param keys it inspects) plus the
+domain allowlist file, and reloaded when either file changes. Built-in
+defaults mirror the script in case it is missing or can't be parsed.
+
+Per call: the per-session tool counter is bumped in Redis exactly like the
+script does (INCR `session:<id>:tool_count`, EXPIRE on the first hit), over a
+small RESP socket client instead of a `redis-cli` fork, so the count survives
+restarts and is shared with other `guardrail_check.sh` callers. When Redis is
+unreachable the call fails open like the script's GUARDRAIL_ERROR path (or
+closed with GUARDRAIL_FAIL_CLOSED). Only the policy decision for
+(session, tool, normalized params) is cached; the cache is dropped on every
+rule reload. Denials use the script's messages and exit-code meaning.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+from urllib.parse import unquote, urlparse
+
+
+DEFAULT_ENV = {
+    "MAX_TOOLS_PER_WINDOW": "10",
+    "WINDOW_SECONDS": "3600",
+    "REDIS_URL": "redis://127.0.0.1:6379/0",
+    "ALLOWED_DOMAINS_FILE": "config/allowed_domains.txt",
+}
+DEFAULT_BLOCKED_REGEX = r"rm[[:space:]]+-rf[[:space:]]+/|mkfs(\.|[[:space:]])|dd[[:space:]]+if=|:\(\)\{:\|:\&\};:|shutdown[[:space:]]+-h|reboot"
+DEFAULT_EXEC_TOOLS = ("bash", "python", "code_exec")
+DEFAULT_DOMAIN_TOOLS = ("browser_vision",)
+DEFAULT_URL_KEYS = ("url", "href", "link", "target")
+DEFAULT_PAYLOAD_KEYS = ("cmd", "command", "code", "script", "bash", "python", "prompt")
+
+_ENV_DEFAULT_RE = re.compile(r'^(\w+)="\$\{\1:-([^}]*)\}"', re.M)
+_BLOCKED_RE = re.compile(r"^\s*BLOCKED_REGEX='([^']*)'", re.M)
+_TOOL_EQ_RE = re.compile(r'"\$TOOL_NAME"\s*==\s*"([\w.-]+)"')
+_PICK_RE = re.compile(r"^(url|payload)\s*=\s*pick\(([^)]*)\)", re.M)
+_POSIX_CLASSES = {"[[:space:]]": r"\s", "[[:digit:]]": r"\d", "[[:alnum:]]": r"[0-9A-Za-z]", "[[:alpha:]]": r"[A-Za-z]"}
+
+
+def ere_to_python(pattern: str) -> str:
+    """POSIX ERE (as used with `grep -E`) -> Python regex, for the classes the script uses."""
+    for posix, py in _POSIX_CLASSES.items():
+        pattern = pattern.replace(posix, py)
+    return pattern
+
+
+@dataclass(frozen=True)
+class GuardrailRules:
+    env_defaults: dict = field(default_factory=lambda: dict(DEFAULT_ENV))
+    blocked: re.Pattern = field(default_factory=lambda: re.compile(ere_to_python(DEFAULT_BLOCKED_REGEX), re.I))
+    exec_tools: tuple = DEFAULT_EXEC_TOOLS
+    domain_tools: tuple = DEFAULT_DOMAIN_TOOLS
+    url_keys: tuple = DEFAULT_URL_KEYS
+    payload_keys: tuple = DEFAULT_PAYLOAD_KEYS
+    source: str = "builtin"
+
+
+def parse_guardrail_script(text: str) -> GuardrailRules:
+    """Rules found in guardrail_check.sh; anything not found keeps its built-in default."""
+    env_defaults = dict(DEFAULT_ENV)
+    for name, value in _ENV_DEFAULT_RE.findall(text):
+        if name in env_defaults:
+            env_defaults[name] = value
+    blocked_src = DEFAULT_BLOCKED_REGEX
+    exec_tools = DEFAULT_EXEC_TOOLS
+    domain_tools = DEFAULT_DOMAIN_TOOLS
+    lines = text.splitlines()
+    for idx, line in enumerate(lines):
+        m = _BLOCKED_RE.match(line)
+        if m:
+            blocked_src = m.group(1)
+            # The enclosing `if [[ "$TOOL_NAME" == ... ]]` is the closest if above.
+            for prev in reversed(lines[:idx]):
+                if prev.lstrip().startswith("if "):
+                    exec_tools = tuple(_TOOL_EQ_RE.findall(prev)) or exec_tools
+                    break
+        elif "ALLOWED_DOMAINS_FILE" in line and line.lstrip().startswith("if [[ ! -f"):
+            for prev in reversed(lines[:idx]):
+                if prev.lstrip().startswith('if [[ "$TOOL_NAME"'):
+                    domain_tools = tuple(_TOOL_EQ_RE.findall(prev)) or domain_tools
+                    break
+    keys = {"url": DEFAULT_URL_KEYS, "payload": DEFAULT_PAYLOAD_KEYS}
+    for which, args in _PICK_RE.findall(text):
+        found = tuple(re.findall(r'"([^"]+)"', args))
+        if found:
+            keys[which] = found
+    try:
+        blocked = re.compile(ere_to_python(blocked_src), re.I)
+    except re.error:
+        blocked = re.compile(ere_to_python(DEFAULT_BLOCKED_REGEX), re.I)
+    return GuardrailRules(
+        env_defaults=env_defaults,
+        blocked=blocked,
+        exec_tools=exec_tools,
+        domain_tools=domain_tools,
+        url_keys=keys["url"],
+        payload_keys=keys["payload"],
+        source="script",
+    )
+
+
+def load_allowed_domains(path: Path) -> tuple[str, ...] | None:
+    """Domains of the allowlist file (comments stripped), None if the file is missing."""
+    try:
+        raw = path.read_text(encoding="utf-8")
+    except OSError:
+        return None
+    out: list[str] = []
+    for line in raw.splitlines():
+        domain = line.split("#", 1)[0].strip().lstrip(".").lower()
+        if domain:
+            out.append(domain)
+    return tuple(out)
+
+
+class GuardrailInfraError(RuntimeError):
+    """The rate-limit counter (Redis) could not be reached or answered with an error."""
+
+
+class RedisWindowCounter:
+    """`INCR key` + `EXPIRE key window` on the first hit, over one persistent RESP connection.
+
+    After a connection failure, calls fail fast for `retry_after_s` instead of
+    paying a connect timeout on every tool call.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        timeout_s: float = 0.5,
+        retry_after_s: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"unsupported redis url: {url}")
+        self.url = url
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = int(parsed.port or 6379)
+        self.db = int((parsed.path or "/0").strip("/") or 0)
+        self.username = unquote(parsed.username) if parsed.username else ""
+        self.password = unquote(parsed.password) if parsed.password else ""
+        self.timeout_s = float(timeout_s)
+        self.retry_after_s = float(retry_after_s)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sock: socket.socket | None = None
+        self._reader = None
+        self._down_until = float("-inf")
+
+    def _close(self) -> None:
+        try:
+            if self._sock is not None:
+                self._sock.close()
+        except OSError:
+            pass
+        self._sock = None
+        self._reader = None
+
+    def _send(self, *args: object) -> object:
+        out = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            raw = str(arg).encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(raw), raw))
+        self._sock.sendall(b"".join(out))
+        return self._read()
+
+    def _read(self) -> object:
+        line = self._reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("redis connection closed")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode("utf-8", "replace")
+        if kind == b"-":
+            raise GuardrailInfraError(f"redis: {body.decode('utf-8', 'replace')}")
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            n = int(body)
+            return None if n < 0 else self._reader.read(n + 2)[:-2]
+        if kind == b"*":
+            n = int(body)
+            return None if n < 0 else [self._read() for _ in range(n)]
+        raise GuardrailInfraError(f"redis: unexpected reply {line[:40]!r}")
+
+    def _connect(self) -> None:
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout_s)
+        self._reader = self._sock.makefile("rb")
+        if self.password:
+            self._send(*(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)))
+        if self.db:
+            self._send("SELECT", self.db)
+
+    def incr(self, key: str, window_s: int) -> int:
+        with self._lock:
+            if self._clock() < self._down_until:
+                raise GuardrailInfraError(f"redis no disponible ({self.host}:{self.port})")
+            # One retry covers a pooled connection the server closed while idle.
+            for attempt in (0, 1):
+                fresh = self._sock is None
+                try:
+                    if fresh:
+                        self._connect()
+                    count = int(self._send("INCR", key))
+                    if count == 1:
+                        self._send("EXPIRE", key, int(window_s))
+                    return count
+                except (OSError, ValueError, GuardrailInfraError) as exc:
+                    self._close()
+                    if fresh or attempt:
+                        self._down_until = self._clock() + self.retry_after_s
+                        if isinstance(exc, GuardrailInfraError):
+                            raise
+                        raise GuardrailInfraError(f"redis no disponible ({self.host}:{self.port}: {exc})") from exc
+            raise GuardrailInfraError("redis no disponible")
+
+
+def _pick(params: dict, keys: tuple) -> str:
+    for k in keys:
+        v = params.get(k)
+        if isinstance(v, str) and v.strip():
+            return v.strip()
+    return ""
+
+
+class GuardrailEngine:
+    def __init__(
+        self,
+        script_path: Path,
+        repo_root: Path,
+        reload_check_s: float = 1.0,
+        cache_size: int = 2048,
+        clock: Callable[[], float] = time.monotonic,
+        counter: Callable[[str, int], int] | None = None,
+    ) -> None:
+        self.script_path = Path(script_path)
+        self.repo_root = Path(repo_root)
+        self.reload_check_s = float(reload_check_s)
+        self.cache_size = max(1, int(cache_size))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._rules = GuardrailRules()
+        self._domains: tuple[str, ...] | None = None
+        self._domains_path: Path | None = None
+        self._stamps: tuple = ()
+        self._next_check = float("-inf")
+        self._cache: OrderedDict[tuple, tuple[bool, str]] = OrderedDict()
+        self._counter = counter
+        self._redis: RedisWindowCounter | None = None
+        self._audit: list[dict] = []
+        self._stats = {
+            "checks": 0,
+            "cache_hits": 0,
+            "denied": 0,
+            "reloads": 0,
+            "infra_errors": 0,
+            "audit_runs": 0,
+            "audit_mismatches": 0,
+        }
+
+    def _env(self, name: str) -> str:
+        return str(os.environ.get(name, "") or self._rules.env_defaults.get(name, DEFAULT_ENV[name]))
+
+    def _domains_file(self) -> Path:
+        p = Path(self._env("ALLOWED_DOMAINS_FILE"))
+        return p if p.is_absolute() else self.repo_root / p
+
+    @staticmethod
+    def _stamp(path: Path) -> tuple[int, int] | None:
+        try:
+            st = path.stat()
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def _maybe_reload_locked(self) -> None:
+        now = self._clock()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_check_s
+        domains_path = self._domains_file()
+        stamps = (self._stamp(self.script_path), domains_path, self._stamp(domains_path))
+        if stamps == self._stamps:
+            return
+        self._stamps = stamps
+        try:
+            self._rules = parse_guardrail_script(self.script_path.read_text(encoding="utf-8"))
+        except OSError:
+            self._rules = GuardrailRules()
+        # Re-resolve: the script may have changed the ALLOWED_DOMAINS_FILE default.
+        self._domains_path = self._domains_file()
+        self._domains = load_allowed_domains(self._domains_path)
+        self._cache.clear()
+        self._stats["reloads"] += 1
+
+    def _limits_locked(self) -> tuple[int, int, Callable[[str, int], int]]:
+        try:
+            limit = int(self._env("MAX_TOOLS_PER_WINDOW"))
+        except ValueError:
+            limit = int(DEFAULT_ENV["MAX_TOOLS_PER_WINDOW"])
+        try:
+            window = max(1, int(float(self._env("WINDOW_SECONDS"))))
+        except ValueError:
+            window = int(DEFAULT_ENV["WINDOW_SECONDS"])
+        counter = self._counter
+        if counter is None:
+            url = self._env("REDIS_URL")
+            if self._redis is None or self._redis.url != url:
+                try:
+                    self._redis = RedisWindowCounter(url)
+                except ValueError:
+                    self._redis = RedisWindowCounter(DEFAULT_ENV["REDIS_URL"])
+            counter = self._redis.incr
+        return limit, window, counter
+
+    def _decide_locked(self, tool_name: str, url: str, host: str, payload: str) -> tuple[bool, str]:
+        rules = self._rules
+        if tool_name in rules.domain_tools:
+            if not url or not host:
+                return False, f"POLICY_DENY: {tool_name} sin URL/host valido"
+            if self._domains is None:
+                return False, f"POLICY_DENY: falta allowlist {self._env('ALLOWED_DOMAINS_FILE')}"
+            if not any(host == d or host.endswith("." + d) for d in self._domains):
+                return False, f"POLICY_DENY: dominio no permitido ({host})"
+        if tool_name in rules.exec_tools and rules.blocked.search(payload):
+            return False, "POLICY_DENY: comando peligroso detectado"
+        return True, ""
+
+    def check(self, session_id: str, tool_name: str, params: dict | None = None) -> tuple[bool, str]:
+        params = params if isinstance(params, dict) else {}
+        session_id, tool_name = str(session_id), str(tool_name)
+        with self._lock:
+            self._stats["checks"] += 1
+            self._maybe_reload_locked()
+            limit, window, counter = self._limits_locked()
+        # Counted on every call, cached decision or not; the network round trip runs outside the lock.
+        try:
+            count = int(counter(f"session:{session_id}:tool_count", window))
+        except GuardrailInfraError as exc:
+            detail = f"GUARDRAIL_ERROR: {exc}"
+            fail_closed = str(os.environ.get("GUARDRAIL_FAIL_CLOSED", "0")).strip().lower() in ("1", "true", "yes")
+            with self._lock:
+                self._stats["infra_errors"] += 1
+                if fail_closed:
+                    self._stats["denied"] += 1
+            if fail_closed:
+                return False, detail
+            return True, f"guardrail_bypass_infra_error: {detail}"
+        with self._lock:
+            if count > limit:
+                self._stats["denied"] += 1
+                return False, f"RATE_LIMIT_EXCEEDED: session={session_id} count={count} limit={limit}"
+            url = _pick(params, self._rules.url_keys)
+            payload = _pick(params, self._rules.payload_keys)
+            key = (session_id, tool_name, url, payload)
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                self._stats["cache_hits"] += 1
+                ok, detail = hit
+            else:
+                host = (urlparse(url).hostname or "").lower().strip(".") if url else ""
+                ok, detail = self._decide_locked(tool_name, url, host, payload)
+                self._cache[key] = (ok, detail)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            if not ok:
+                self._stats["denied"] += 1
+                return False, detail
+        return True, f"GUARDRAIL_OK: session={session_id} tool={tool_name} count={count}"
+
+    def record_audit(self, tool_name: str, params: dict | None, inprocess: tuple[bool, str], script: tuple[bool, str]) -> None:
+        """Audit mode: compare against the subprocess verdict; keeps the last mismatches."""
+        with self._lock:
+            self._stats["audit_runs"] += 1
+            if bool(inprocess[0]) == bool(script[0]):
+                return
+            self._stats["audit_mismatches"] += 1
+            self._audit.append(
+                {
+                    "ts": time.time(),
+                    "tool": tool_name,
+                    "params": dict(params or {}),
+                    "inprocess": list(inprocess),
+                    "script": list(script),
+                }
+            )
+            del self._audit[:-20]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "rules": self._rules.source,
+                "allowed_domains": len(self._domains or ()),
+                "cached_decisions": len(self._cache),
+                "counter": "custom" if self._counter is not None else (self._redis.url if self._redis else "redis"),
+                "audit_recent": list(self._audit[-5:]),
+            }
@@ -0,0 +1,262 @@
+"""Append-only chat history: one JSONL log per session, per-model views built lazily.
+
+Each line of `<session>.history.jsonl` is either a message
+(`{"ts", "view", "model", "backend", "role", "content"}`) or a view reset
+(`{"ts", "view", "op": "reset"}`). A view is what used to be one
+`<session>__<backend>__<model>.json` file ("" = the model-less history).
+
+- `tail()` materializes a view on first use by scanning the log backwards
+  until it has `view_limit` messages or hits a reset for that view; after
+  that only bytes appended since the last read are parsed.
+- `save()` reconciles a full client history against the view: when the view
+  tail is a prefix of it only the new messages are appended, otherwise the
+  view is reset and rewritten. A turn costs one append, not a file rewrite.
+- Logs above `compact_bytes` are rewritten keeping the last `view_limit`
+  messages per view (amortized, atomic rename).
+- A view with no records yet is seeded once from its legacy JSON file.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Iterator
+
+
+_READ_CHUNK = 64 * 1024
+
+
+def clean_messages(items: Iterable) -> list[dict]:
+    out: list[dict] = []
+    for item in items:
+        if isinstance(item, dict) and item.get("role") in ("user", "assistant") and isinstance(item.get("content"), str):
+            out.append({"role": item["role"], "content": item["content"]})
+    return out
+
+
+def _parse(line: bytes) -> dict | None:
+    try:
+        rec = json.loads(line)
+    except Exception:
+        return None
+    return rec if isinstance(rec, dict) and isinstance(rec.get("view"), str) else None
+
+
+def iter_log(path: Path) -> Iterator[dict]:
+    """Every well-formed record of a log, oldest first (exporters, compaction)."""
+    try:
+        f = path.open("rb")
+    except OSError:
+        return
+    with f:
+        for line in f:
+            rec = _parse(line)
+            if rec is not None:
+                yield rec
+
+
+def replay_views(records: Iterable[dict]) -> dict[str, dict]:
+    """view -> {"model", "backend", "messages"} after applying every record in order."""
+    views: dict[str, dict] = {}
+    for rec in records:
+        view = views.setdefault(rec["view"], {"model": "", "backend": "", "messages": []})
+        if rec.get("op") == "reset":
+            view["messages"] = []
+            continue
+        msg = clean_messages([rec])
+        if msg:
+            view["messages"].append(msg[0])
+            view["model"] = str(rec.get("model", "") or view["model"])
+            view["backend"] = str(rec.get("backend", "") or view["backend"])
+    return views
+
+
+class _LogState:
+    def __init__(self, ino: int) -> None:
+        self.ino = ino
+        self.offset = 0
+        self.views: dict[str, deque] = {}
+
+
+class HistoryStore:
+    def __init__(self, view_limit: int = 200, compact_bytes: int = 4 * 1024 * 1024) -> None:
+        self.view_limit = max(1, int(view_limit))
+        self.compact_bytes = max(64 * 1024, int(compact_bytes))
+        self._lock = threading.Lock()
+        self._logs: dict[Path, _LogState] = {}
+        self._stats = {"appends": 0, "resets": 0, "bytes_appended": 0, "tail_scans": 0, "compactions": 0, "legacy_imports": 0}
+
+    # -- reading -----------------------------------------------------------
+
+    def _catch_up_locked(self, path: Path) -> _LogState:
+        try:
+            st = path.stat()
+            ino, size = st.st_ino, st.st_size
+        except OSError:
+            ino, size = 0, 0
+        state = self._logs.get(path)
+        if state is not None and state.ino == 0 and state.offset == 0:
+            state.ino = ino  # the log was created since we last looked
+        if state is None or state.ino != ino or size < state.offset:
+            state = _LogState(ino)
+            # Nothing is materialized yet: start at the end, views are built by tail scans.
+            state.offset = size
+            self._logs[path] = state
+            return state
+        if size == state.offset:
+            return state
+        with path.open("rb") as f:
+            f.seek(state.offset)
+            data = f.read(size - state.offset)
+        end = data.rfind(b"\n") + 1  # a half-written last line is read next time
+        for line in data[:end].splitlines():
+            rec = _parse(line)
+            if rec is None or rec["view"] not in state.views:
+                continue
+            self._apply(state.views[rec["view"]], rec)
+        state.offset += end
+        return state
+
+    @staticmethod
+    def _apply(view: deque, rec: dict) -> None:
+        if rec.get("op") == "reset":
+            view.clear()
+            return
+        view.extend(clean_messages([rec]))
+
+    def _scan_back_locked(self, path: Path, state: _LogState, view: str) -> tuple[deque, bool]:
+        """(last messages of `view` before state.offset, whether the log has any record for it)."""
+        self._stats["tail_scans"] += 1
+        found: list[dict] = []
+        seen = False
+        pos = state.offset
+        rest = b""
+        try:
+            f = path.open("rb")
+        except OSError:
+            return deque(maxlen=self.view_limit), False
+        with f:
+            while pos > 0 and len(found) < self.view_limit:
+                step = min(_READ_CHUNK, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + rest
+                lines = buf.split(b"\n")
+                # The first piece may be a partial line unless we reached the start.
+                rest = lines.pop(0) if pos > 0 else b""
+                stop = False
+                for line in reversed(lines):
+                    rec = _parse(line) if line else None
+                    if rec is None or rec["view"] != view:
+                        continue
+                    seen = True
+                    if rec.get("op") == "reset":
+                        stop = True
+                        break
+                    msg = clean_messages([rec])
+                    if msg:
+                        found.append(msg[0])
+                        if len(found) >= self.view_limit:
+                            stop = True
+                            break
+                if stop:
+                    break
+        found.reverse()
+        return deque(found, maxlen=self.view_limit), seen
+
+    def _view_locked(self, path: Path, view: str, legacy: Path | None) -> deque:
+        state = self._catch_up_locked(path)
+        cur = state.views.get(view)
+        if cur is not None:
+            return cur
+        cur, seen = self._scan_back_locked(path, state, view)
+        state.views[view] = cur
+        if not seen and legacy is not None:
+            try:
+                data = json.loads(legacy.read_text(encoding="utf-8"))
+            except Exception:
+                data = None
+            imported = clean_messages(data)[-self.view_limit :] if isinstance(data, list) else []
+            if imported:
+                self._stats["legacy_imports"] += 1
+                self._append_locked(path, view, "", "", imported, reset=False)
+                return self._view_locked(path, view, None)
+        return cur
+
+    def tail(self, path: Path, view: str, limit: int | None = None, legacy: Path | None = None) -> list[dict]:
+        with self._lock:
+            cur = self._view_locked(Path(path), view, legacy)
+            items = list(cur)
+        if limit is not None:
+            items = items[-max(0, int(limit)) :] if int(limit) > 0 else []
+        return [dict(it) for it in items]
+
+    # -- writing -----------------------------------------------------------
+
+    def _append_locked(self, path: Path, view: str, model: str, backend: str, messages: list[dict], reset: bool) -> None:
+        now = time.time()
+        recs: list[dict] = []
+        if reset:
+            recs.append({"ts": now, "view": view, "op": "reset"})
+        for msg in messages:
+            recs.append({"ts": now, "view": view, "model": model, "backend": backend, "role": msg["role"], "content": msg["content"]})
+        if not recs:
+            return
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in recs).encode("utf-8")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        self._stats["appends"] += 1
+        self._stats["resets"] += int(reset)
+        self._stats["bytes_appended"] += len(data)
+        state = self._catch_up_locked(path)
+        if state.offset >= self.compact_bytes:
+            self._compact_locked(path)
+
+    @staticmethod
+    def _overlap(cur: list[dict], new: list[dict]) -> int:
+        """Largest o with cur[-o:] == new[:o] (0 if none)."""
+        for o in range(min(len(cur), len(new)), 0, -1):
+            if cur[-1] == new[o - 1] and cur[-o:] == new[:o]:
+                return o
+        return 0
+
+    def save(self, path: Path, view: str, history: list, model: str = "", backend: str = "", legacy: Path | None = None) -> None:
+        path = Path(path)
+        new = clean_messages(history)[-self.view_limit :]
+        with self._lock:
+            cur = list(self._view_locked(path, view, legacy))
+            o = self._overlap(cur, new)
+            if cur and o == 0:
+                self._append_locked(path, view, model, backend, new, reset=True)
+            elif new[o:]:
+                self._append_locked(path, view, model, backend, new[o:], reset=False)
+
+    def _compact_locked(self, path: Path) -> None:
+        views = replay_views(iter_log(path))
+        tmp = path.with_name(path.name + ".tmp")
+        now = time.time()
+        with tmp.open("w", encoding="utf-8") as f:
+            for view, data in views.items():
+                # The reset keeps emptied views marked as known (no legacy re-import).
+                f.write(json.dumps({"ts": now, "view": view, "op": "reset"}) + "\n")
+                for msg in data["messages"][-self.view_limit :]:
+                    rec = {"ts": now, "view": view, "model": data["model"], "backend": data["backend"], **msg}
+                    f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        os.replace(tmp, path)
+        self._logs.pop(path, None)
+        self._stats["compactions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"open_logs": len(self._logs), "views": sum(len(s.views) for s in self._logs.values()), **self._stats}
+
+
+HISTORY = HistoryStore()
@@ -0,0 +1,169 @@
+"""Declarative intent table for DC local actions.
+
+Each intent declares the literal keywords it needs (a necessary condition, not a
+sufficient one), optional precompiled patterns and a priority. A single pass of
+a trie-compiled regex over the normalized message yields every keyword hit;
+only intents whose keywords were hit (plus `always` intents) are evaluated, in
+priority order. A handler may still return None to fall through.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable
+
+
+def _trie_regex(words: Iterable[str]) -> str:
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def _emit(node: dict) -> str:
+        terminal = "" in node
+        branches = [re.escape(ch) + _emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if terminal:
+            # Greedy optional: the longest keyword at a position wins, shorter ones
+            # are recovered by the substring closure in KeywordTrie.scan().
+            return f"(?:{body})?"
+        return body
+
+    return _emit(trie)
+
+
+class KeywordTrie:
+    """Finds every keyword occurring as a substring of a text in one regex pass."""
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        words = sorted({str(k) for k in keywords if str(k)})
+        self.keywords = tuple(words)
+        # For each keyword, the other keywords it contains: a hit on the longest
+        # keyword at a position implies hits on all of its substrings.
+        self._closure: dict[str, tuple[str, ...]] = {
+            w: tuple(o for o in words if o in w) for w in words
+        }
+        self._re = re.compile(f"(?=({_trie_regex(words)}))") if words else None
+
+    def scan(self, text: str) -> set[str]:
+        if self._re is None or not text:
+            return set()
+        hits: set[str] = set()
+        for m in self._re.finditer(text):
+            found = m.group(1)
+            if found and found not in hits:
+                hits.update(self._closure.get(found, (found,)))
+        return hits
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    handler: Callable[[Any, "re.Match[str] | None"], "dict | None"]
+    priority: int
+    keywords: tuple[str, ...] = ()
+    patterns: tuple["re.Pattern[str]", ...] = ()
+    always: bool = False
+
+
+@dataclass
+class RouteReport:
+    intent: str = ""
+    candidates: int = 0
+    evaluated: list[str] = field(default_factory=list)
+    prefilter_ms: float = 0.0
+    total_ms: float = 0.0
+    timings_ms: dict[str, float] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            "intent": self.intent,
+            "candidates": int(self.candidates),
+            "evaluated": list(self.evaluated),
+            "prefilter_ms": round(self.prefilter_ms, 4),
+            "total_ms": round(self.total_ms, 4),
+            "timings_ms": {k: round(v, 4) for k, v in self.timings_ms.items()},
+        }
+
+
+class IntentRouter:
+    def __init__(self, intents: Iterable[Intent]) -> None:
+        ordered = sorted(intents, key=lambda it: (int(it.priority), it.name))
+        names = [it.name for it in ordered]
+        if len(set(names)) != len(names):
+            raise ValueError("intent_router_duplicate_name")
+        self.intents: tuple[Intent, ...] = tuple(ordered)
+        self._always = tuple(i for i, it in enumerate(ordered) if it.always or not it.keywords)
+        by_keyword: dict[str, set[int]] = {}
+        for i, it in enumerate(ordered):
+            for kw in it.keywords:
+                by_keyword.setdefault(kw, set()).add(i)
+        self._by_keyword = {k: frozenset(v) for k, v in by_keyword.items()}
+        self._trie = KeywordTrie(by_keyword.keys())
+        self._stats_lock = threading.Lock()
+        self._stats: dict[str, dict] = {}
+        self._routes = 0
+
+    def candidates(self, text: str) -> list[Intent]:
+        idx: set[int] = set(self._always)
+        for kw in self._trie.scan(text):
+            idx.update(self._by_keyword.get(kw, ()))
+        return [self.intents[i] for i in sorted(idx)]
+
+    def dispatch(self, text: str, ctx: Any) -> tuple[dict | None, RouteReport]:
+        report = RouteReport()
+        t0 = time.perf_counter()
+        cands = self.candidates(text)
+        report.candidates = len(cands)
+        report.prefilter_ms = (time.perf_counter() - t0) * 1000.0
+        result: dict | None = None
+        for intent in cands:
+            t_intent = time.perf_counter()
+            match = None
+            if intent.patterns:
+                for pat in intent.patterns:
+                    match = pat.search(text)
+                    if match:
+                        break
+            out = intent.handler(ctx, match) if (match is not None or not intent.patterns) else None
+            elapsed = (time.perf_counter() - t_intent) * 1000.0
+            report.evaluated.append(intent.name)
+            report.timings_ms[intent.name] = elapsed
+            if out is not None:
+                report.intent = intent.name
+                result = out
+                break
+        report.total_ms = (time.perf_counter() - t0) * 1000.0
+        self._record(report)
+        return result, report
+
+    def _record(self, report: RouteReport) -> None:
+        with self._stats_lock:
+            self._routes += 1
+            for name, ms in report.timings_ms.items():
+                st = self._stats.setdefault(name, {"evaluated": 0, "matched": 0, "total_ms": 0.0, "max_ms": 0.0})
+                st["evaluated"] += 1
+                st["total_ms"] += float(ms)
+                st["max_ms"] = max(float(st["max_ms"]), float(ms))
+            if report.intent:
+                self._stats[report.intent]["matched"] += 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            per_intent = {
+                name: {
+                    "evaluated": int(st["evaluated"]),
+                    "matched": int(st["matched"]),
+                    "avg_ms": round(float(st["total_ms"]) / max(1, int(st["evaluated"])), 4),
+                    "max_ms": round(float(st["max_ms"]), 4),
+                }
+                for name, st in self._stats.items()
+            }
+            return {"routes": int(self._routes), "intents": len(self.intents), "keywords": len(self._trie.keywords), "per_intent": per_intent}
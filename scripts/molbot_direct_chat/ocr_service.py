@@ -0,0 +1,307 @@
+"""OCR service: one pass per frame yields text and word boxes, cached per frame.
+
+Engines, best first:
+- `TesserocrEngine`: a long-lived `tesserocr.PyTessBaseAPI` (no fork per call),
+  fed in-memory images through Pillow.
+- `TesseractCliEngine`: `tesseract stdin stdout -l <lang> hocr`, one fork per
+  uncached frame; images are piped in, nothing is written to disk.
+
+Both engines read `OCR_LANG` (a Tesseract language spec, default `spa+eng`), so
+text and phrase matching do not depend on which engine is installed.
+
+Regions are fractional `(x0, y0, x1, y1)` boxes of the frame. Word boxes are
+always reported in full-frame pixels. A region of an already-OCR'd frame is
+answered by filtering the cached words; a cold region is cropped first when
+Pillow is available (smaller input, faster OCR).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import html
+import os
+import re
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+
+Region = tuple[float, float, float, float]
+FULL_FRAME: Region = (0.0, 0.0, 1.0, 1.0)
+DEFAULT_LANG = "spa+eng"
+
+_HOCR_WORD_RE = re.compile(
+    r"<span[^>]*class=[\"']ocrx_word[\"'][^>]*title=[\"']([^\"']+)[\"'][^>]*>(.*?)</span>",
+    flags=re.IGNORECASE | re.DOTALL,
+)
+_HOCR_LINE_RE = re.compile(r"<span[^>]*class=[\"']ocr_line[\"'][^>]*>", flags=re.IGNORECASE)
+_BBOX_RE = re.compile(r"bbox\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)")
+_TAG_RE = re.compile(r"<[^>]+>")
+_WS_RE = re.compile(r"\s+")
+
+
+class DependencyError(RuntimeError):
+    pass
+
+
+def ocr_lang() -> str:
+    return str(os.environ.get("OCR_LANG", "") or "").strip() or DEFAULT_LANG
+
+
+def _lazy_import_tesserocr():
+    try:
+        import tesserocr  # type: ignore
+    except Exception as e:
+        raise DependencyError(f"tesserocr_unavailable:{e}")
+    return tesserocr
+
+
+def _lazy_import_pil_image():
+    try:
+        from PIL import Image  # type: ignore
+    except Exception as e:
+        raise DependencyError(f"pillow_unavailable:{e}")
+    return Image
+
+
+@dataclass(frozen=True)
+class OcrWord:
+    text: str
+    bbox: tuple[int, int, int, int]
+
+    @property
+    def center(self) -> tuple[int, int]:
+        x1, y1, x2, y2 = self.bbox
+        return (x1 + x2) // 2, (y1 + y2) // 2
+
+
+@dataclass
+class OcrResult:
+    words: list[OcrWord] = field(default_factory=list)
+    size: tuple[int, int] | None = None
+    engine: str = ""
+
+    @property
+    def text(self) -> str:
+        """Lowercased, whitespace-collapsed text (what `tesseract ... stdout` gave)."""
+        return _WS_RE.sub(" ", " ".join(w.text for w in self.words).lower()).strip()
+
+    def within(self, region: Region) -> "OcrResult":
+        if self.size is None or region == FULL_FRAME:
+            return self
+        w, h = self.size
+        x0, y0, x1, y1 = region[0] * w, region[1] * h, region[2] * w, region[3] * h
+        words = [wd for wd in self.words if x0 <= wd.center[0] <= x1 and y0 <= wd.center[1] <= y1]
+        return OcrResult(words=words, size=self.size, engine=self.engine)
+
+
+def parse_hocr(raw: str) -> list[OcrWord]:
+    words: list[OcrWord] = []
+    for m in _HOCR_WORD_RE.finditer(raw or ""):
+        body = html.unescape(_TAG_RE.sub("", m.group(2) or "")).strip()
+        if not body:
+            continue
+        bb = _BBOX_RE.search(m.group(1) or "")
+        if not bb:
+            continue
+        words.append(OcrWord(body, tuple(int(bb.group(i)) for i in range(1, 5))))  # type: ignore[arg-type]
+    return words
+
+
+def _png_size(data: bytes) -> tuple[int, int] | None:
+    if len(data) >= 24 and data[:8] == b"\x89PNG\r\n\x1a\n":
+        return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+    return None
+
+
+class TesseractCliEngine:
+    name = "tesseract_cli"
+
+    def __init__(self, binary: str = "tesseract", timeout_s: float = 10.0, lang: str = "") -> None:
+        self.binary = binary
+        self.timeout_s = float(timeout_s)
+        self.lang = lang or ocr_lang()
+
+    @staticmethod
+    def available() -> bool:
+        return bool(shutil.which("tesseract"))
+
+    def recognize(self, data: bytes) -> list[OcrWord]:
+        proc = subprocess.run(
+            [self.binary, "stdin", "stdout", "-l", self.lang, "hocr"],
+            input=data,
+            capture_output=True,
+            timeout=self.timeout_s,
+        )
+        return parse_hocr((proc.stdout or b"").decode("utf-8", errors="replace"))
+
+
+class TesserocrEngine:
+    name = "tesserocr"
+
+    def __init__(self, lang: str = "") -> None:
+        self.lang = lang or ocr_lang()
+        tesserocr = _lazy_import_tesserocr()
+        self._Image = _lazy_import_pil_image()
+        self._RIL = tesserocr.RIL
+        # No silent fallback to Tesseract's default language: a missing
+        # traineddata must not make this engine read differently from the CLI.
+        self._api = tesserocr.PyTessBaseAPI(lang=self.lang)
+        self._lock = threading.Lock()
+
+    def recognize_image(self, image: Any) -> list[OcrWord]:
+        words: list[OcrWord] = []
+        with self._lock:
+            self._api.SetImage(image)
+            self._api.Recognize()
+            it = self._api.GetIterator()
+            level = self._RIL.WORD
+            while it is not None:
+                text = (it.GetUTF8Text(level) or "").strip()
+                box = it.BoundingBox(level)
+                if text and box:
+                    words.append(OcrWord(text, tuple(int(v) for v in box)))  # type: ignore[arg-type]
+                if not it.Next(level):
+                    break
+        return words
+
+    def recognize(self, data: bytes) -> list[OcrWord]:
+        import io
+
+        return self.recognize_image(self._Image.open(io.BytesIO(data)))
+
+
+def _default_engine() -> Any:
+    try:
+        return TesserocrEngine()
+    except Exception:
+        pass
+    if TesseractCliEngine.available():
+        return TesseractCliEngine()
+    return None
+
+
+class OcrService:
+    def __init__(self, engine_factory: Callable[[], Any] | None = None, cache_size: int = 16) -> None:
+        self._engine_factory = engine_factory or _default_engine
+        self._engine: Any = None
+        self._engine_loaded = False
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[tuple, OcrResult] = OrderedDict()
+        self._cache_size = max(1, int(cache_size))
+        self._stats = {"runs": 0, "cache_hits": 0, "region_hits": 0, "crops": 0, "errors": 0}
+
+    def engine(self) -> Any:
+        with self._lock:
+            if not self._engine_loaded:
+                try:
+                    self._engine = self._engine_factory()
+                except Exception:
+                    self._engine = None
+                self._engine_loaded = True
+            return self._engine
+
+    def available(self) -> bool:
+        return self.engine() is not None
+
+    @staticmethod
+    def _frame_key(image: Path | bytes) -> tuple | None:
+        if isinstance(image, (bytes, bytearray)):
+            return ("mem", hashlib.blake2b(bytes(image), digest_size=16).hexdigest())
+        try:
+            st = Path(image).stat()
+        except Exception:
+            return None
+        return ("file", str(image), st.st_mtime_ns, st.st_size)
+
+    def _cache_get(self, key: tuple) -> OcrResult | None:
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+            return hit
+
+    def _cache_put(self, key: tuple, result: OcrResult) -> None:
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def _bump(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _crop(self, data: bytes, region: Region) -> tuple[bytes, tuple[int, int], tuple[int, int]] | None:
+        """(cropped PNG, (offset_x, offset_y), full size) or None without Pillow."""
+        try:
+            Image = _lazy_import_pil_image()
+        except DependencyError:
+            return None
+        import io
+
+        img = Image.open(io.BytesIO(data))
+        w, h = img.size
+        box = (int(region[0] * w), int(region[1] * h), int(region[2] * w), int(region[3] * h))
+        buf = io.BytesIO()
+        img.crop(box).save(buf, format="PNG")
+        return buf.getvalue(), (box[0], box[1]), (w, h)
+
+    def read(self, image: Path | bytes, region: Region | None = None) -> OcrResult:
+        region = tuple(region) if region else FULL_FRAME  # type: ignore[assignment]
+        frame = self._frame_key(image)
+        if frame is None:
+            return OcrResult()
+        full = self._cache_get(frame + (FULL_FRAME,))
+        if full is not None:
+            self._bump("cache_hits" if region == FULL_FRAME else "region_hits")
+            return full.within(region)  # type: ignore[arg-type]
+        if region != FULL_FRAME:
+            hit = self._cache_get(frame + (region,))
+            if hit is not None:
+                self._bump("cache_hits")
+                return hit
+        engine = self.engine()
+        if engine is None:
+            return OcrResult()
+        try:
+            data = bytes(image) if isinstance(image, (bytes, bytearray)) else Path(image).read_bytes()
+            offset = (0, 0)
+            size = _png_size(data)
+            payload = data
+            if region != FULL_FRAME:
+                cropped = self._crop(data, region)  # type: ignore[arg-type]
+                if cropped is not None:
+                    payload, offset, size = cropped
+                    self._bump("crops")
+            words = engine.recognize(payload)
+            if offset != (0, 0):
+                ox, oy = offset
+                words = [OcrWord(w.text, (w.bbox[0] + ox, w.bbox[1] + oy, w.bbox[2] + ox, w.bbox[3] + oy)) for w in words]
+            result = OcrResult(words=words, size=size, engine=str(getattr(engine, "name", "")))
+            if payload is data:
+                # Whole frame was OCR'd (no crop possible): cache it as such and filter.
+                self._cache_put(frame + (FULL_FRAME,), result)
+                result = result.within(region)  # type: ignore[arg-type]
+            else:
+                self._cache_put(frame + (region,), result)
+        except Exception:
+            self._bump("errors")
+            return OcrResult()
+        self._bump("runs")
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "engine": str(getattr(self._engine, "name", "")) if self._engine_loaded else "",
+                "cached_frames": len(self._cache),
+                **self._stats,
+            }
+
+
+OCR = OcrService()
@@ -0,0 +1,104 @@
+"""Local (Ollama) session mode helpers: native chat payloads and model warmup.
+
+Ollama reuses the KV cache of the previous request when the new prompt shares
+its prefix, and unloads idle models after `keep_alive`. The native `/api/chat`
+endpoint is the one that accepts `keep_alive` and `options.num_ctx`, so session
+mode always talks to it. A changed `num_ctx` reloads the model, so the value
+must be stable per model.
+
+`OllamaWarmer` loads a model in the background (a chat request with no
+messages only loads it) so the first real turn skips the load.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable
+
+
+def native_chat_payload(payload: dict, keep_alive: str, num_ctx: int) -> dict:
+    """`/v1/chat/completions`-style payload -> `/api/chat` payload with session options."""
+    options: dict[str, Any] = {}
+    if num_ctx > 0:
+        options["num_ctx"] = int(num_ctx)
+    if payload.get("temperature") is not None:
+        options["temperature"] = payload.get("temperature")
+    out: dict[str, Any] = {
+        "model": str(payload.get("model", "")).strip(),
+        "messages": payload.get("messages", []),
+        "stream": False,
+    }
+    if keep_alive:
+        out["keep_alive"] = keep_alive
+    if options:
+        out["options"] = options
+    return out
+
+
+class OllamaWarmer:
+    def __init__(self, post: Callable[..., Any] | None = None, min_interval_s: float = 60.0) -> None:
+        self._post = post
+        self.min_interval_s = float(min_interval_s)
+        self._lock = threading.Lock()
+        self._in_flight: set[str] = set()
+        self._last: dict[str, dict] = {}
+
+    def _post_fn(self) -> Callable[..., Any]:
+        if self._post is not None:
+            return self._post
+        import requests  # type: ignore
+
+        return requests.post
+
+    def warm(self, base_url: str, model: str, keep_alive: str, num_ctx: int, timeout_s: float = 300.0) -> bool:
+        """Start a background load of `model`; False if already loading or recently warmed."""
+        model = str(model or "").strip()
+        if not model:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(model)
+            if model in self._in_flight:
+                return False
+            if last and last.get("ok") and (now - float(last.get("mono", 0.0))) < self.min_interval_s:
+                return False
+            self._in_flight.add(model)
+        body = native_chat_payload({"model": model, "messages": []}, keep_alive, num_ctx)
+        threading.Thread(
+            target=self._run,
+            args=(f"{base_url.rstrip('/')}/api/chat", body, timeout_s),
+            name="ollama-warm",
+            daemon=True,
+        ).start()
+        return True
+
+    def _run(self, url: str, body: dict, timeout_s: float) -> None:
+        model = body["model"]
+        t0 = time.monotonic()
+        ok, detail = False, ""
+        try:
+            r = self._post_fn()(url, json=body, timeout=(4.0, timeout_s))
+            ok = int(getattr(r, "status_code", 500)) < 400
+            detail = "" if ok else f"HTTP {getattr(r, 'status_code', '?')}"
+        except Exception as e:
+            detail = str(e)[:200]
+        with self._lock:
+            self._in_flight.discard(model)
+            self._last[model] = {
+                "ok": ok,
+                "detail": detail,
+                "load_ms": int((time.monotonic() - t0) * 1000),
+                "ts": time.time(),
+                "mono": time.monotonic(),
+            }
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": sorted(self._in_flight),
+                "models": {m: {k: v for k, v in st.items() if k != "mono"} for m, st in self._last.items()},
+            }
+
+
+WARMER = OllamaWarmer()
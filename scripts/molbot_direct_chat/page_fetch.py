@@ -0,0 +1,343 @@
+"""Fetch + extract stage for web search results.
+
+Downloads the top result pages concurrently through one pooled
+`requests.Session`, at most `per_host` at a time per host, and returns the
+main text (readability-style: boilerplate tags dropped, densest container
+wins) split into chunks. Extracted text is cached per URL together with the
+ETag/Last-Modified validators: within `fresh_s` no request is made, after that
+a conditional GET answered with 304 reuses the cached text.
+
+Everything runs under one time budget; pages that miss it are left out of the
+current turn (their fetch still completes in the background and warms the cache).
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Any, Callable
+
+
+_SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside", "form", "button", "iframe"}
+_BLOCK_TAGS = {"p", "li", "h1", "h2", "h3", "h4", "blockquote", "pre", "td", "dd", "div", "section", "article", "main"}
+_CONTAINER_TAGS = {"article", "main", "section", "div", "body"}
+_VOID_TAGS = {"br", "img", "hr", "meta", "link", "input", "source", "wbr", "area", "col", "embed", "param", "track"}
+_WS_RE = re.compile(r"\s+")
+
+
+class _MainTextParser(HTMLParser):
+    """Collects text blocks and, per container element, how much paragraph text it holds."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.blocks: list[str] = []
+        self._buf: list[str] = []
+        # Skip mode is left only on the end tag matching the one that opened it (nested same-name tags counted);
+        # unclosed <li>/<p> or void elements inside a <nav> must not leave it stuck.
+        self._skip_tag = ""
+        self._skip_depth = 0
+        self._in_title = False
+        # Open containers: [tag, first block index, paragraph chars, bonus]
+        self._stack: list[list[Any]] = []
+        self.containers: list[tuple[int, int, float]] = []  # (start, end, score)
+
+    def _flush(self) -> None:
+        text = _WS_RE.sub(" ", "".join(self._buf)).strip()
+        self._buf = []
+        if len(text) < 2:
+            return
+        self.blocks.append(text)
+        for frame in self._stack:
+            frame[2] += len(text)
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in _VOID_TAGS:
+            if tag == "br":
+                self._buf.append(" ")
+            return
+        if self._skip_tag:
+            if tag == self._skip_tag:
+                self._skip_depth += 1
+            return
+        if tag in _SKIP_TAGS:
+            self._skip_tag = tag
+            self._skip_depth = 1
+            return
+        if tag == "title":
+            self._in_title = True
+            return
+        if tag in _BLOCK_TAGS:
+            self._flush()
+        if tag in _CONTAINER_TAGS:
+            marker = " ".join(v or "" for k, v in attrs if k in ("class", "id", "role")).lower()
+            bonus = 1.5 if tag in ("article", "main") or re.search(r"content|article|post|entry|main|body", marker) else 1.0
+            if re.search(r"comment|sidebar|footer|menu|nav|share|related|promo|cookie", marker):
+                bonus = 0.3
+            elif tag == "body":
+                bonus = 0.7
+            self._stack.append([tag, len(self.blocks), 0, bonus])
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _VOID_TAGS:
+            return
+        if self._skip_tag:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+                if self._skip_depth <= 0:
+                    self._skip_tag = ""
+            return
+        if tag == "title":
+            self._in_title = False
+            return
+        if tag in _BLOCK_TAGS:
+            self._flush()
+        if tag in _CONTAINER_TAGS:
+            for i in range(len(self._stack) - 1, -1, -1):
+                if self._stack[i][0] == tag:
+                    _, start, chars, bonus = self._stack.pop(i)
+                    self.containers.append((start, len(self.blocks), chars * bonus))
+                    break
+
+    def handle_data(self, data: str) -> None:
+        if self._skip_tag:
+            return
+        if self._in_title:
+            self.title += data
+            return
+        self._buf.append(data)
+
+    def close(self) -> None:
+        super().close()
+        self._flush()
+        while self._stack:
+            _, start, chars, bonus = self._stack.pop()
+            self.containers.append((start, len(self.blocks), chars * bonus))
+
+
+def extract_main_text(html_text: str, min_block_chars: int = 40) -> tuple[str, str]:
+    """(title, main text) of an HTML page."""
+    parser = _MainTextParser()
+    try:
+        parser.feed(html_text or "")
+        parser.close()
+    except Exception:
+        pass
+    blocks = parser.blocks
+    if parser.containers:
+        start, end, _ = max(parser.containers, key=lambda c: c[2])
+        blocks = blocks[start:end] or blocks
+    kept = [b for b in blocks if len(b) >= min_block_chars] or blocks
+    return _WS_RE.sub(" ", parser.title).strip(), "\n\n".join(kept).strip()
+
+
+def chunk_text(text: str, max_chars: int = 800) -> list[str]:
+    """Paragraph-aligned chunks of at most `max_chars` (long paragraphs are split on sentences)."""
+    chunks: list[str] = []
+    cur = ""
+    pieces: list[str] = []
+    for para in (text or "").split("\n\n"):
+        para = para.strip()
+        if not para:
+            continue
+        if len(para) <= max_chars:
+            pieces.append(para)
+            continue
+        sent_buf = ""
+        for sent in re.split(r"(?<=[.!?])\s+", para):
+            while len(sent) > max_chars:
+                pieces.append(sent[:max_chars])
+                sent = sent[max_chars:]
+            if sent_buf and len(sent_buf) + 1 + len(sent) > max_chars:
+                pieces.append(sent_buf)
+                sent_buf = sent
+            else:
+                sent_buf = f"{sent_buf} {sent}".strip()
+        if sent_buf:
+            pieces.append(sent_buf)
+    for piece in pieces:
+        if cur and len(cur) + 2 + len(piece) > max_chars:
+            chunks.append(cur)
+            cur = piece
+        else:
+            cur = f"{cur}\n\n{piece}" if cur else piece
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+
+@dataclass
+class PageText:
+    url: str
+    title: str = ""
+    chunks: list[str] = field(default_factory=list)
+    etag: str = ""
+    last_modified: str = ""
+    fetched_at: float = 0.0
+    status: str = "ok"
+
+
+def _default_session() -> Any:
+    import requests  # type: ignore
+    from requests.adapters import HTTPAdapter  # type: ignore
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=8, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) MolbotDirectChat/1.0"})
+    return session
+
+
+class PageFetcher:
+    def __init__(
+        self,
+        session_factory: Callable[[], Any] | None = None,
+        max_workers: int = 6,
+        per_host: int = 2,
+        fresh_s: float = 600.0,
+        cache_size: int = 128,
+        max_bytes: int = 1_500_000,
+        chunk_chars: int = 800,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._session_factory = session_factory or _default_session
+        self._session: Any = None
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="page-fetch")
+        self.per_host = max(1, int(per_host))
+        self.fresh_s = float(fresh_s)
+        self.cache_size = max(1, int(cache_size))
+        self.max_bytes = int(max_bytes)
+        self.chunk_chars = int(chunk_chars)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._host_slots: dict[str, threading.BoundedSemaphore] = {}
+        self._cache: OrderedDict[str, PageText] = OrderedDict()
+        self._stats = {"fetched": 0, "fresh_hits": 0, "not_modified": 0, "errors": 0, "over_budget": 0}
+
+    def session(self) -> Any:
+        with self._lock:
+            if self._session is None:
+                self._session = self._session_factory()
+            return self._session
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = (urllib.parse.urlsplit(url).hostname or "").lower()
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def _bump(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def cached(self, url: str) -> PageText | None:
+        with self._lock:
+            hit = self._cache.get(url)
+            if hit is not None:
+                self._cache.move_to_end(url)
+            return hit
+
+    def _store(self, page: PageText) -> None:
+        with self._lock:
+            self._cache[page.url] = page
+            self._cache.move_to_end(page.url)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def fetch(self, url: str, timeout_s: float = 4.0) -> PageText:
+        cached = self.cached(url)
+        if cached is not None and (self._clock() - cached.fetched_at) < self.fresh_s:
+            self._bump("fresh_hits")
+            return cached
+        headers: dict[str, str] = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        with self._host_slot(url):
+            try:
+                resp = self.session().get(url, headers=headers, timeout=max(0.5, float(timeout_s)), stream=True)
+                try:
+                    if resp.status_code == 304 and cached is not None:
+                        self._bump("not_modified")
+                        page = PageText(**{**cached.__dict__, "fetched_at": self._clock()})
+                        self._store(page)
+                        return page
+                    ctype = str(resp.headers.get("Content-Type", "")).lower()
+                    if resp.status_code != 200 or ("html" not in ctype and "text/plain" not in ctype):
+                        self._bump("errors")
+                        return PageText(url=url, status=f"http_{resp.status_code}" if resp.status_code != 200 else "not_html")
+                    raw = bytearray()
+                    for part in resp.iter_content(chunk_size=65536):
+                        raw.extend(part)
+                        if len(raw) >= self.max_bytes:
+                            break
+                    encoding = resp.encoding or "utf-8"
+                    etag = str(resp.headers.get("ETag", ""))
+                    last_modified = str(resp.headers.get("Last-Modified", ""))
+                finally:
+                    resp.close()
+            except Exception as e:
+                self._bump("errors")
+                return PageText(url=url, status=f"error:{type(e).__name__}")
+        body = bytes(raw).decode(encoding, errors="replace")
+        if "text/plain" in ctype:
+            title, text = "", body.strip()
+        else:
+            title, text = extract_main_text(body)
+        page = PageText(
+            url=url,
+            title=title,
+            chunks=chunk_text(text, self.chunk_chars),
+            etag=etag,
+            last_modified=last_modified,
+            fetched_at=self._clock(),
+        )
+        self._store(page)
+        self._bump("fetched")
+        return page
+
+    def fetch_many(self, urls: list[str], budget_s: float = 2.5) -> dict[str, PageText]:
+        """Pages that finished within `budget_s`, keyed by URL (order of `urls` preserved)."""
+        deadline = time.monotonic() + float(budget_s)
+        futures = {self._pool.submit(self.fetch, u, budget_s): u for u in dict.fromkeys(urls) if u}
+        done, pending = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        for fut in pending:
+            fut.cancel()
+            self._bump("over_budget")
+        out: dict[str, PageText] = {}
+        for fut, url in futures.items():
+            if fut in done:
+                try:
+                    out[url] = fut.result()
+                except Exception:
+                    continue
+        return out
+
+    def enrich(self, search_payload: dict, top_k: int = 3, budget_s: float = 2.5, max_chunks: int = 2) -> dict:
+        """Copy of a `searxng_search` payload whose top-k results carry `page_chunks`."""
+        results = [dict(r) for r in search_payload.get("results", []) if isinstance(r, dict)]
+        urls = [str(r.get("url", "")).strip() for r in results[: max(0, int(top_k))]]
+        pages = self.fetch_many([u for u in urls if u.startswith(("http://", "https://"))], budget_s=budget_s)
+        for r in results:
+            page = pages.get(str(r.get("url", "")).strip())
+            if page is not None and page.chunks:
+                r["page_chunks"] = page.chunks[: max(1, int(max_chunks))]
+        return {**search_payload, "results": results}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"cached_pages": len(self._cache), **self._stats}
+
+
+PAGES = PageFetcher()
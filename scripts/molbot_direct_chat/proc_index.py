@@ -0,0 +1,152 @@
+"""Cached PID -> (exe, Chrome profile directory, start time) index over /proc.
+
+Window lookups used to re-read `/proc/<pid>/cmdline` for every candidate window
+on every poll. Chrome windows of one profile share a handful of browser PIDs,
+so entries are cached per PID and keyed by the process start time (field 22 of
+`/proc/<pid>/stat`): a recycled PID gets a new start time and is re-read.
+A confirmed entry is trusted for `revalidate_s` before the stat is read again.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+
+_PROFILE_EQ_RE = re.compile(r"--profile-directory=(.+?)(?:\s--|$)")
+_PROFILE_SP_RE = re.compile(r"--profile-directory\s+(.+?)(?:\s--|$)")
+
+
+def profile_directory_from_args(args: list[str]) -> str:
+    for i, arg in enumerate(args):
+        if arg.startswith("--profile-directory="):
+            return arg.split("=", 1)[1].strip().strip("'\"")
+        if arg == "--profile-directory" and (i + 1) < len(args):
+            return args[i + 1].strip().strip("'\"")
+    merged = " ".join(args)
+    m = _PROFILE_EQ_RE.search(merged)
+    if m:
+        return m.group(1).strip().strip("'\"")
+    m = _PROFILE_SP_RE.search(merged)
+    if m:
+        return m.group(1).strip().strip("'\"")
+    return ""
+
+
+def _parse_pid(pid_raw: str | int) -> int | None:
+    try:
+        pid = int(str(pid_raw).strip())
+    except Exception:
+        return None
+    return pid if pid > 0 else None
+
+
+@dataclass(frozen=True)
+class ProcInfo:
+    pid: int
+    start_time: int
+    exe: str
+    args: tuple[str, ...]
+    profile_directory: str
+
+
+class ProcIndex:
+    def __init__(self, proc_root: Path | str = "/proc", revalidate_s: float = 1.0, max_entries: int = 1024) -> None:
+        self.proc_root = Path(proc_root)
+        self.revalidate_s = float(revalidate_s)
+        self.max_entries = max(16, int(max_entries))
+        self._lock = threading.Lock()
+        # pid -> (info, monotonic time of last start-time check)
+        self._entries: dict[int, tuple[ProcInfo, float]] = {}
+        self._stats = {"hits": 0, "revalidated": 0, "reads": 0, "invalidated": 0, "missing": 0}
+
+    def _start_time(self, pid: int) -> int | None:
+        try:
+            raw = (self.proc_root / str(pid) / "stat").read_bytes()
+        except Exception:
+            return None
+        # comm (field 2) may contain spaces/parens: split after the last ')'.
+        fields = raw[raw.rfind(b")") + 2 :].split()
+        try:
+            return int(fields[19])
+        except Exception:
+            return None
+
+    def _read(self, pid: int, start_time: int) -> ProcInfo | None:
+        base = self.proc_root / str(pid)
+        try:
+            raw = (base / "cmdline").read_bytes()
+        except Exception:
+            return None
+        args = tuple(p.decode("utf-8", errors="ignore").strip() for p in raw.split(b"\x00") if p)
+        try:
+            exe = os.readlink(base / "exe")
+        except Exception:
+            exe = args[0] if args else ""
+        return ProcInfo(pid, start_time, exe, args, profile_directory_from_args(list(args)))
+
+    def get(self, pid_raw: str | int) -> ProcInfo | None:
+        pid = _parse_pid(pid_raw)
+        if pid is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(pid)
+            if cached is not None and (now - cached[1]) < self.revalidate_s:
+                self._stats["hits"] += 1
+                return cached[0]
+        start = self._start_time(pid)
+        if start is None:
+            with self._lock:
+                if self._entries.pop(pid, None) is not None:
+                    self._stats["invalidated"] += 1
+                self._stats["missing"] += 1
+            return None
+        if cached is not None and cached[0].start_time == start:
+            with self._lock:
+                self._entries[pid] = (cached[0], now)
+                self._stats["revalidated"] += 1
+            return cached[0]
+        info = self._read(pid, start)
+        with self._lock:
+            if cached is not None:
+                self._stats["invalidated"] += 1
+            self._stats["reads"] += 1
+            if info is None:
+                self._entries.pop(pid, None)
+                return None
+            if len(self._entries) >= self.max_entries and pid not in self._entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][1])
+                self._entries.pop(oldest, None)
+            self._entries[pid] = (info, now)
+        return info
+
+    def profile_directory(self, pid_raw: str | int) -> str:
+        info = self.get(pid_raw)
+        return info.profile_directory if info is not None else ""
+
+    def resolve_many(self, pids: Iterable[str | int]) -> dict[int, ProcInfo | None]:
+        """Resolve every distinct PID once (windows of one browser share PIDs)."""
+        out: dict[int, ProcInfo | None] = {}
+        for raw in pids:
+            pid = _parse_pid(raw)
+            if pid is None or pid in out:
+                continue
+            out[pid] = self.get(pid)
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), **self._stats}
+
+
+PROC_INDEX = ProcIndex()
@@ -0,0 +1,219 @@
+"""Incremental Chrome profile -> shadow profile sync for web_ask.
+
+Only the files that carry the logged-in session are synced (cookies, login
+data, local storage, preferences, and `Local State`, which holds the key that
+decrypts cookies). A JSON manifest next to the shadow profile records each
+synced file's size, mtime and content hash:
+
+- size and mtime unchanged: the file is skipped without being read;
+- stat changed but hash unchanged (touched, not modified): only the manifest
+  is updated;
+- otherwise the file is copied, as a reflink (copy-on-write clone) when the
+  filesystem supports it, else as a plain copy.
+
+Hardlinks are never used: Chrome writes its SQLite databases in place, so a
+hardlinked shadow would write into the real profile.
+"""
+
+from __future__ import annotations
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+# Paths relative to the profile directory; directories are synced recursively.
+PROFILE_SESSION_ITEMS = (
+    "Cookies",
+    "Cookies-journal",
+    "Network/Cookies",
+    "Network/Cookies-journal",
+    "Network/TransportSecurity",
+    "Login Data",
+    "Login Data-journal",
+    "Login Data For Account",
+    "Login Data For Account-journal",
+    "Web Data",
+    "Web Data-journal",
+    "Preferences",
+    "Secure Preferences",
+    "Local Storage/leveldb",
+)
+# Paths relative to the user-data root.
+ROOT_SESSION_ITEMS = ("Local State",)
+
+_FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+_NO_REFLINK_ERRNOS = {errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL, errno.ENOTTY, errno.EBADF}
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    import fcntl
+
+    with src.open("rb") as fs_, dst.open("wb") as fd_:
+        fcntl.ioctl(fd_.fileno(), _FICLONE, fs_.fileno())
+
+
+@dataclass
+class SyncReport:
+    profile: str
+    copied: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    unchanged: int = 0
+    hashed: int = 0
+    method: str = ""
+    duration_ms: int = 0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.copied or self.removed)
+
+
+class ProfileSync:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # st_dev of destination filesystems where FICLONE was refused.
+        self._no_reflink_devs: set[int] = set()
+        self._stats = {"syncs": 0, "skipped": 0, "files_copied": 0, "reflinks": 0, "copies": 0, "hashed": 0}
+        self._last: dict[str, dict] = {}
+
+    @staticmethod
+    def manifest_path(dst_root: Path, profile_dir: str) -> Path:
+        return dst_root / f".web_ask_sync_{profile_dir}.json"
+
+    @staticmethod
+    def _load_manifest(path: Path) -> dict[str, dict]:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    @staticmethod
+    def _save_manifest(path: Path, manifest: dict[str, dict]) -> None:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _sources(src_root: Path, profile_dir: str) -> dict[str, Path]:
+        """Manifest key -> source file for every session file currently present."""
+        out: dict[str, Path] = {}
+        for rel in ROOT_SESSION_ITEMS:
+            p = src_root / rel
+            if p.is_file():
+                out[rel] = p
+        src_profile = src_root / profile_dir
+        for rel in PROFILE_SESSION_ITEMS:
+            p = src_profile / rel
+            if p.is_file():
+                out[f"{profile_dir}/{rel}"] = p
+            elif p.is_dir():
+                for child in sorted(p.rglob("*")):
+                    if child.is_file() and child.name != "LOCK":
+                        out[f"{profile_dir}/{child.relative_to(src_profile).as_posix()}"] = child
+        return out
+
+    def _copy(self, src: Path, dst: Path) -> str:
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(f".{dst.name}.sync-tmp")
+        dev = dst.parent.stat().st_dev
+        method = "copy"
+        if dev not in self._no_reflink_devs:
+            try:
+                _reflink(src, tmp)
+                method = "reflink"
+            except OSError as e:
+                if e.errno in _NO_REFLINK_ERRNOS:
+                    with self._lock:
+                        self._no_reflink_devs.add(dev)
+                else:
+                    raise
+            except ImportError:
+                with self._lock:
+                    self._no_reflink_devs.add(dev)
+        if method == "copy":
+            shutil.copyfile(src, tmp)
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+        return method
+
+    def sync(self, src_root: Path, dst_root: Path, profile_dir: str) -> SyncReport:
+        t0 = time.monotonic()
+        report = SyncReport(profile=profile_dir)
+        mpath = self.manifest_path(dst_root, profile_dir)
+        old = self._load_manifest(mpath)
+        new: dict[str, dict] = {}
+        methods: dict[str, int] = {}
+        for rel, src in self._sources(src_root, profile_dir).items():
+            try:
+                st = src.stat()
+            except OSError:
+                continue
+            entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            prev = old.get(rel) or {}
+            dst = dst_root / rel
+            dst_ok = dst.exists()
+            if dst_ok and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+                new[rel] = {**entry, "hash": prev.get("hash", "")}
+                report.unchanged += 1
+                continue
+            digest = file_digest(src)
+            report.hashed += 1
+            new[rel] = {**entry, "hash": digest}
+            if dst_ok and prev.get("hash") == digest:
+                report.unchanged += 1
+                continue
+            method = self._copy(src, dst)
+            methods[method] = methods.get(method, 0) + 1
+            report.copied.append(rel)
+        for rel in old:
+            if rel in new:
+                continue
+            try:
+                (dst_root / rel).unlink()
+            except FileNotFoundError:
+                pass
+            report.removed.append(rel)
+        if new != old:
+            dst_root.mkdir(parents=True, exist_ok=True)
+            self._save_manifest(mpath, new)
+        report.method = "+".join(sorted(methods))
+        report.duration_ms = int((time.monotonic() - t0) * 1000)
+        with self._lock:
+            self._stats["syncs"] += 1
+            if not report.changed:
+                self._stats["skipped"] += 1
+            self._stats["files_copied"] += len(report.copied)
+            self._stats["reflinks"] += methods.get("reflink", 0)
+            self._stats["copies"] += methods.get("copy", 0)
+            self._stats["hashed"] += report.hashed
+            self._last[profile_dir] = {
+                "copied": len(report.copied),
+                "removed": len(report.removed),
+                "unchanged": report.unchanged,
+                "method": report.method,
+                "duration_ms": report.duration_ms,
+                "ts": time.time(),
+            }
+        return report
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "last": dict(self._last)}
+
+
+PROFILE_SYNC = ProfileSync()
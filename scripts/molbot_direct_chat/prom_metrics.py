@@ -0,0 +1,190 @@
+"""Pre-aggregated Prometheus metrics for DC (text exposition format 0.0.4).
+
+Hot-path updates are a dict lookup plus an add under one small lock per metric
+family; nothing is computed per scrape except callback gauges (queue depths).
+No dependency on `prometheus_client`: the subset needed here is tiny.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+from typing import Callable, Iterable
+
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+MAX_SERIES_PER_FAMILY = 64
+OVERFLOW_LABEL = "other"
+
+_NAME_RE = re.compile(r"^[a-zA-Z_:][a-zA-Z0-9_:]*$")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _labels_text(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Family:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> None:
+        if not _NAME_RE.match(name):
+            raise ValueError(f"prom_metric_bad_name:{name}")
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, ...], object] = {}
+        self._callbacks: dict[tuple[str, ...], Callable[[], float]] = {}
+
+    def _key(self, labels: tuple) -> tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"prom_metric_label_count:{self.name}")
+        key = tuple(str(v) for v in labels)
+        if key not in self._series and len(self._series) >= MAX_SERIES_PER_FAMILY:
+            # Cardinality guard: unexpected label values collapse into one series.
+            key = tuple(OVERFLOW_LABEL for _ in key)
+        return key
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def set_function(self, fn: Callable[[], float], *labels: str) -> None:
+        """Series whose value is read from `fn` at scrape time (errors skip the sample)."""
+        with self._lock:
+            self._callbacks[self._key(labels)] = fn
+
+    def _render_callbacks(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._callbacks.items())
+        lines = []
+        for key, fn in items:
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            lines.append(f"{self.name}{_labels_text(self.labelnames, key)} {_fmt(value)}")
+        return lines
+
+
+class Counter(_Family):
+    """Counter updated with `inc`, or backed by an existing monotonic stat via `set_function`."""
+
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = float(self._series.get(key, 0.0)) + float(amount)
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return float(self._series.get(tuple(str(v) for v in labels), 0.0))
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._series.items())
+        lines = self.header() + [f"{self.name}{_labels_text(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+        return lines + self._render_callbacks()
+
+
+class Gauge(_Family):
+    """Gauge whose value is read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def render(self) -> list[str]:
+        return self.header() + self._render_callbacks()
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        v = float(value)
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts..., +Inf count, sum]
+                series = [0.0] * (len(self.buckets) + 2)
+                self._series[key] = series
+            for i, le in enumerate(self.buckets):
+                if v <= le:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += v
+
+    def snapshot(self, *labels: str) -> dict:
+        with self._lock:
+            series = list(self._series.get(tuple(str(v) for v in labels), []))
+        if not series:
+            return {"count": 0, "sum": 0.0}
+        return {"count": int(sum(series[:-1])), "sum": float(series[-1])}
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0.0
+            for le, count in zip(self.buckets + (math.inf,), series[:-1]):
+                cumulative += count
+                le_label = f'le="{_fmt(le)}"'
+                lines.append(f"{self.name}_bucket{_labels_text(self.labelnames, key, le_label)} {_fmt(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels_text(self.labelnames, key)} {_fmt(series[-1])}")
+            lines.append(f"{self.name}_count{_labels_text(self.labelnames, key)} {_fmt(cumulative)}")
+        return lines
+
+
+class Registry:
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._families: dict[str, _Family] = {}
+
+    def _register(self, family: _Family) -> _Family:
+        with self._lock:
+            if family.name in self._families:
+                raise ValueError(f"prom_metric_duplicate:{family.name}")
+            self._families[family.name] = family
+        return family
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))  # type: ignore[return-value]
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        with self._lock:
+            families = list(self._families.values())
+        lines: list[str] = []
+        for family in families:
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
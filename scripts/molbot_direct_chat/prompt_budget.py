@@ -0,0 +1,247 @@
+"""Token budgeting for chat prompts.
+
+`fit_messages` keeps the system prompt and the current user turn, then as many
+recent history turns as fit the model's context (minus a reply reserve).
+Older turns are folded into one extractive summary message; summary lines are
+cached per turn prefix, so each new exchange only summarizes the turns that
+just fell out of the window. The summary is capped at a fixed share of the
+budget and built only from the dropped turns, so it (and the cacheable prompt
+prefix after the system message) changes only when the dropped count does.
+
+Token counts come from `tiktoken` when installed (cached encoder), otherwise
+from a chars/token heuristic; both are cached per message text.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+
+# Per-message framing overhead (role markers, separators) in chat templates.
+MESSAGE_OVERHEAD_TOKENS = 4
+_CHARS_PER_TOKEN = 3.5
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s")
+_WS_RE = re.compile(r"\s+")
+
+
+def _lazy_import_tiktoken():
+    try:
+        import tiktoken  # type: ignore
+    except Exception:
+        return None
+    return tiktoken
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    tiktoken = _lazy_import_tiktoken()
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def estimator_name() -> str:
+    return "tiktoken" if _encoder() is not None else "heuristic"
+
+
+@lru_cache(maxsize=4096)
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _encoder()
+    if enc is not None:
+        try:
+            return len(enc.encode(text, disallowed_special=()))
+        except Exception:
+            pass
+    return int(len(text) / _CHARS_PER_TOKEN) + 1
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(str(message.get("content", ""))) + MESSAGE_OVERHEAD_TOKENS
+
+
+def _summary_line(turn: dict, max_chars: int = 160) -> str:
+    who = "Usuario" if turn.get("role") == "user" else "Asistente"
+    text = _WS_RE.sub(" ", str(turn.get("content", ""))).strip()
+    first = _SENTENCE_RE.split(text, maxsplit=1)[0]
+    if len(first) > max_chars:
+        first = first[: max_chars - 3].rstrip() + "..."
+    return f"- {who}: {first}"
+
+
+class RollingSummary:
+    """Extractive summary lines of dropped turns, cached by rolling prefix hash."""
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._lines: OrderedDict[str, tuple[str, ...]] = OrderedDict()
+        self.stats = {"hits": 0, "extended": 0}
+
+    def lines(self, turns: list[dict]) -> list[str]:
+        hashes: list[str] = []
+        h = hashlib.blake2b(digest_size=12)
+        for turn in turns:
+            h.update(f"{turn.get('role')}\x00{turn.get('content')}\x01".encode("utf-8", errors="replace"))
+            hashes.append(h.copy().hexdigest())
+        base: tuple[str, ...] = ()
+        start = 0
+        with self._lock:
+            for i in range(len(hashes) - 1, -1, -1):
+                hit = self._lines.get(hashes[i])
+                if hit is not None:
+                    self._lines.move_to_end(hashes[i])
+                    base, start = hit, i + 1
+                    break
+        if start == len(turns):
+            with self._lock:
+                self.stats["hits"] += 1
+            return list(base)
+        out = base + tuple(_summary_line(t) for t in turns[start:])
+        with self._lock:
+            self.stats["extended"] += 1
+            if hashes:
+                self._lines[hashes[-1]] = out
+                self._lines.move_to_end(hashes[-1])
+            while len(self._lines) > self.max_entries:
+                self._lines.popitem(last=False)
+        return list(out)
+
+
+SUMMARIES = RollingSummary()
+
+
+def _truncate_to_tokens(text: str, tokens: int) -> str:
+    if tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= tokens:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo]
+
+
+def fit_messages(
+    system: dict,
+    history: list[dict],
+    user: dict,
+    context_tokens: int,
+    reserve_tokens: int = 1024,
+    max_history_turns: int = 60,
+    summary_share: float = 0.15,
+    summaries: RollingSummary | None = None,
+    drop_step: int = 1,
+    tail: dict | None = None,
+) -> tuple[list[dict], dict]:
+    """(messages, report) fitting `context_tokens - reserve_tokens`.
+
+    `tail` is per-turn volatile context (e.g. web search results) placed right
+    before the user turn; it is charged before history and truncated if even
+    alone it does not fit.
+
+    With `drop_step` > 1 the number of dropped turns is rounded up to a multiple
+    of it, so the kept history (the cacheable prompt prefix) only moves every
+    few turns instead of on each one.
+    """
+    summaries = summaries or SUMMARIES
+    context_tokens = max(512, int(context_tokens))
+    reserve = min(max(0, int(reserve_tokens)), context_tokens // 2)
+    budget = context_tokens - reserve
+    used = message_tokens(system)
+
+    truncated_user = False
+    user_tokens = message_tokens(user)
+    if used + user_tokens > budget:
+        keep = budget - used - MESSAGE_OVERHEAD_TOKENS - 8
+        user = {**user, "content": _truncate_to_tokens(str(user.get("content", "")), keep) + "\n[...recortado]"}
+        user_tokens = message_tokens(user)
+        truncated_user = True
+    used += user_tokens
+
+    tail_tokens = 0
+    truncated_tail = False
+    if tail is not None:
+        tail_tokens = message_tokens(tail)
+        if used + tail_tokens > budget:
+            keep = budget - used - MESSAGE_OVERHEAD_TOKENS - 8
+            truncated_tail = True
+            if keep > 0:
+                tail = {**tail, "content": _truncate_to_tokens(str(tail.get("content", "")), keep) + "\n[...recortado]"}
+                tail_tokens = message_tokens(tail)
+            else:
+                tail, tail_tokens = None, 0
+        used += tail_tokens
+
+    candidates = history[-max(0, int(max_history_turns)) :] if max_history_turns > 0 else []
+    fits_all = len(candidates) == len(history) and sum(message_tokens(t) for t in candidates) <= budget - used
+    summary_allowance = 0 if fits_all else int(budget * summary_share)
+    room = budget - used - summary_allowance
+    kept: list[dict] = []
+    for turn in reversed(candidates):
+        cost = message_tokens(turn)
+        if cost > room:
+            break
+        kept.append(turn)
+        room -= cost
+    kept.reverse()
+    n_dropped = len(history) - len(kept)
+    if n_dropped and drop_step > 1:
+        n_dropped = min(len(history), -(-n_dropped // int(drop_step)) * int(drop_step))
+        kept = history[n_dropped:]
+    dropped = history[:n_dropped]
+    used += sum(message_tokens(t) for t in kept)
+
+    summary_msg: dict | None = None
+    summary_tokens = 0
+    if dropped:
+        lines = summaries.lines(dropped)
+        # Fixed cap (not "whatever is left"): leftover room depends on the current user turn.
+        allowance = int(budget * summary_share)
+        if used + allowance > budget:
+            allowance = max(0, budget - used)
+        chosen: list[str] = []
+        header = "Resumen de turnos anteriores de esta conversación (extractivo):"
+        cost = estimate_tokens(header) + MESSAGE_OVERHEAD_TOKENS
+        for line in reversed(lines):
+            line_cost = estimate_tokens(line) + 1
+            if cost + line_cost > allowance:
+                break
+            chosen.append(line)
+            cost += line_cost
+        if chosen:
+            chosen.reverse()
+            omitted = len(lines) - len(chosen)
+            body = "\n".join(([f"(+{omitted} turnos más antiguos omitidos)"] if omitted else []) + chosen)
+            summary_msg = {"role": "system", "content": f"{header}\n{body}"}
+            summary_tokens = message_tokens(summary_msg)
+            used += summary_tokens
+
+    messages = [system] + ([summary_msg] if summary_msg else []) + kept + ([tail] if tail else []) + [user]
+    report = {
+        "context_tokens": context_tokens,
+        "budget_tokens": budget,
+        "reserve_tokens": reserve,
+        "prompt_tokens": used,
+        "history_turns": len(history),
+        "history_kept": len(kept),
+        "history_summarized": len(dropped),
+        "summary_tokens": summary_tokens,
+        "user_truncated": truncated_user,
+        "tail_tokens": tail_tokens,
+        "tail_truncated": truncated_tail,
+        "estimator": estimator_name(),
+    }
+    return messages, report
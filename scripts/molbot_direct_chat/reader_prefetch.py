@@ -0,0 +1,202 @@
+"""Lookahead synthesis for Reader Mode continuous playback.
+
+While chunk N is being spoken, the prefetcher synthesizes the TTS pieces of
+chunks N+1..N+k in a background worker so the next `_speak_reply_async` call
+finds its audio ready. Barge-in, rewind, seek and pause bump the session
+generation: queued work is dropped and synthesized audio is deleted.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable
+
+
+SynthFn = Callable[[str], tuple[Path | None, str]]
+SplitFn = Callable[[str], list[str]]
+
+
+def _unlink_quiet(path: Path | None) -> None:
+    if path is None:
+        return
+    try:
+        path.unlink(missing_ok=True)
+    except Exception:
+        return
+
+
+class ReaderPrefetcher:
+    def __init__(
+        self,
+        synth: SynthFn,
+        split: SplitFn | None = None,
+        max_ready: int = 24,
+    ) -> None:
+        self._synth = synth
+        self._split = split or (lambda text: [str(text or "").strip()] if str(text or "").strip() else [])
+        self._max_ready = max(1, int(max_ready))
+        self._cond = threading.Condition()
+        # session_id -> generation; bumped on invalidate so in-flight work is discarded.
+        self._generation: dict[str, int] = {}
+        # session_id -> {chunk_index: chunk_id} currently planned.
+        self._planned: dict[str, dict[int, str]] = {}
+        self._jobs: deque[dict] = deque()
+        # Ready/in-flight pieces keyed by exact piece text.
+        self._ready: dict[str, dict] = {}
+        self._inflight: dict[str, dict] = {}
+        self._worker: threading.Thread | None = None
+        self._stats = {"scheduled": 0, "synth_ok": 0, "synth_failed": 0, "hits": 0, "misses": 0, "discarded": 0}
+        self._last_invalidate = {"session_id": "", "reason": "", "ts": 0.0}
+
+    def _ensure_worker_locked(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def _discard_locked(self, entry: dict) -> None:
+        self._stats["discarded"] += 1
+        _unlink_quiet(entry.get("path"))
+
+    def _drop_session_locked(self, session_id: str, keep_from_index: int | None = None, keep_ids: set[str] | None = None) -> None:
+        def _stale(item: dict) -> bool:
+            if item.get("session_id") != session_id:
+                return False
+            if keep_from_index is None:
+                return True
+            idx = int(item.get("chunk_index", -1))
+            if idx < keep_from_index:
+                return True
+            return keep_ids is not None and idx > keep_from_index and str(item.get("chunk_id", "")) not in keep_ids
+
+        self._jobs = deque(job for job in self._jobs if not _stale(job))
+        for key in [k for k, v in self._ready.items() if _stale(v)]:
+            self._discard_locked(self._ready.pop(key))
+
+    def schedule(self, session_id: str, current_index: int, upcoming: list[dict]) -> int:
+        """Plan synthesis of `upcoming` chunks ({chunk_index, chunk_id, text}) after `current_index`.
+
+        Work for chunks before `current_index` or no longer in the lookahead
+        window is dropped. Returns the number of newly queued pieces.
+        """
+        sid = str(session_id or "")
+        cur = int(current_index)
+        wanted: list[dict] = []
+        for item in upcoming or []:
+            if not isinstance(item, dict):
+                continue
+            idx = int(item.get("chunk_index", -1))
+            text = str(item.get("text", "")).strip()
+            if idx <= cur or not text:
+                continue
+            wanted.append({"chunk_index": idx, "chunk_id": str(item.get("chunk_id", "")), "text": text})
+        keep_ids = {w["chunk_id"] for w in wanted}
+        queued = 0
+        with self._cond:
+            self._drop_session_locked(sid, keep_from_index=cur, keep_ids=keep_ids)
+            gen = int(self._generation.get(sid, 0))
+            planned = {idx: cid for idx, cid in self._planned.get(sid, {}).items() if idx >= cur and (idx == cur or cid in keep_ids)}
+            for w in wanted:
+                if planned.get(w["chunk_index"]) == w["chunk_id"]:
+                    continue
+                planned[w["chunk_index"]] = w["chunk_id"]
+                for piece in self._split(w["text"]):
+                    if piece in self._ready or piece in self._inflight:
+                        continue
+                    self._jobs.append({"session_id": sid, "generation": gen, "piece": piece, **{k: w[k] for k in ("chunk_index", "chunk_id")}})
+                    queued += 1
+            self._planned[sid] = planned
+            self._stats["scheduled"] += queued
+            if queued:
+                self._ensure_worker_locked()
+                self._cond.notify_all()
+        return queued
+
+    def invalidate(self, session_id: str, reason: str = "") -> int:
+        """Cancel queued work for the session and delete any synthesized audio."""
+        sid = str(session_id or "")
+        with self._cond:
+            before = len(self._jobs) + sum(1 for v in self._ready.values() if v.get("session_id") == sid)
+            self._generation[sid] = int(self._generation.get(sid, 0)) + 1
+            self._planned.pop(sid, None)
+            self._drop_session_locked(sid)
+            after = len(self._jobs)
+            self._last_invalidate = {"session_id": sid, "reason": str(reason or "")[:80], "ts": time.time()}
+            self._cond.notify_all()
+        return max(0, before - after)
+
+    def take(self, piece: str, wait_s: float = 0.0) -> Path | None:
+        """Pop prefetched audio for `piece`; waits up to `wait_s` if it is being synthesized."""
+        key = str(piece or "").strip()
+        if not key:
+            return None
+        deadline = time.monotonic() + max(0.0, float(wait_s))
+        with self._cond:
+            while True:
+                entry = self._ready.pop(key, None)
+                if entry is not None:
+                    path = entry.get("path")
+                    if isinstance(path, Path) and path.exists():
+                        self._stats["hits"] += 1
+                        return path
+                    break
+                if key not in self._inflight:
+                    queued = [job for job in self._jobs if job.get("piece") == key]
+                    if not queued:
+                        return None
+                    # Caller synthesizes it now; drop the duplicate lookahead job.
+                    self._jobs = deque(job for job in self._jobs if job.get("piece") != key)
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(timeout=remaining)
+            self._stats["misses"] += 1
+        return None
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "queued": len(self._jobs),
+                "inflight": len(self._inflight),
+                "ready": len(self._ready),
+                "sessions": {sid: sorted(p.keys()) for sid, p in self._planned.items() if p},
+                "last_invalidate": dict(self._last_invalidate),
+                **self._stats,
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._jobs:
+                    self._cond.wait(timeout=30.0)
+                    if not self._jobs:
+                        self._worker = None
+                        return
+                job = self._jobs.popleft()
+                self._inflight[job["piece"]] = job
+            path: Path | None = None
+            try:
+                path, _detail = self._synth(job["piece"])
+            except Exception:
+                path = None
+            with self._cond:
+                self._inflight.pop(job["piece"], None)
+                current_gen = int(self._generation.get(job["session_id"], 0))
+                if path is None:
+                    self._stats["synth_failed"] += 1
+                elif current_gen != int(job["generation"]):
+                    self._discard_locked({"path": path})
+                else:
+                    self._stats["synth_ok"] += 1
+                    prev = self._ready.pop(job["piece"], None)
+                    if prev is not None:
+                        self._discard_locked(prev)
+                    self._ready[job["piece"]] = {**job, "path": path, "ts": time.time()}
+                    while len(self._ready) > self._max_ready:
+                        oldest = min(self._ready, key=lambda k: float(self._ready[k].get("ts", 0.0)))
+                        self._discard_locked(self._ready.pop(oldest))
+                self._cond.notify_all()
@@ -0,0 +1,123 @@
+"""TTL cache with stale-while-revalidate and single-flight fetches.
+
+- fresh (age < ttl_s): served from memory.
+- stale (age < ttl_s + stale_s): served from memory while one background
+  refresh runs for that key.
+- miss: fetched inline; concurrent callers for the same key wait for the one
+  in-flight fetch instead of issuing their own.
+
+Only values accepted by `cacheable` are stored (errors are never cached).
+Entries are evicted least-recently-used past `max_entries`.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException | None = None
+
+
+class SwrCache:
+    def __init__(
+        self,
+        ttl_s: float = 300.0,
+        stale_s: float = 1800.0,
+        max_entries: int = 256,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl_s = float(ttl_s)
+        self.stale_s = float(stale_s)
+        self.max_entries = max(1, int(max_entries))
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (value, stored_at)
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._flights: dict[Hashable, _Flight] = {}
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "evictions": 0,
+        }
+
+    def _store_locked(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (value, self._clock())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _run_flight(self, key: Hashable, flight: _Flight, fetch: Callable[[], Any], cacheable: Callable[[Any], bool]) -> None:
+        try:
+            flight.value = fetch()
+        except BaseException as e:  # re-raised to the waiting callers
+            flight.error = e
+        with self._lock:
+            self._flights.pop(key, None)
+            if flight.error is None and cacheable(flight.value):
+                self._store_locked(key, flight.value)
+        flight.done.set()
+
+    def _refresh_async(self, key: Hashable, flight: _Flight, fetch: Callable[[], Any], cacheable: Callable[[Any], bool]) -> None:
+        def _run() -> None:
+            self._run_flight(key, flight, fetch, cacheable)
+            if flight.error is not None or not cacheable(flight.value):
+                with self._lock:
+                    self._stats["refresh_errors"] += 1
+
+        threading.Thread(target=_run, name="swr-refresh", daemon=True).start()
+
+    def get(self, key: Hashable, fetch: Callable[[], Any], cacheable: Callable[[Any], bool] = lambda v: True) -> Any:
+        with self._lock:
+            hit = self._entries.get(key)
+            now = self._clock()
+            if hit is not None:
+                age = now - hit[1]
+                if age < self.ttl_s:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return hit[0]
+                if age < self.ttl_s + self.stale_s:
+                    self._entries.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    if key not in self._flights:
+                        flight = self._flights[key] = _Flight()
+                        self._stats["refreshes"] += 1
+                        self._refresh_async(key, flight, fetch, cacheable)
+                    return hit[0]
+                self._entries.pop(key, None)
+            flight = self._flights.get(key)
+            owner = flight is None
+            if owner:
+                flight = self._flights[key] = _Flight()
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        if owner:
+            self._run_flight(key, flight, fetch, cacheable)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "in_flight": len(self._flights), **self._stats}
@@ -0,0 +1,283 @@
+"""Lightweight request tracing for DC.
+
+A trace is opened per HTTP request (`Tracer.trace`) and stages inside it add
+spans (`Tracer.span` / `Tracer.wrap`). The active trace lives in a thread-local,
+so instrumented helpers cost one attribute lookup when nothing is being traced.
+Finished traces go to a bounded ring buffer; work that finishes later on another
+thread (e.g. TTS playback start) attaches with `Tracer.add_span`. Optionally
+every trace is appended as OTLP/JSON (one `resourceSpans` document per line).
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+
+HISTOGRAM_BUCKETS_MS = (1.0, 2.0, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0, 5000.0, 10000.0, 30000.0)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def _percentile(ordered: list[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[idx]
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attrs(attrs: dict) -> list[dict]:
+    return [{"key": str(k), "value": _otlp_value(v)} for k, v in attrs.items() if v is not None]
+
+
+class Tracer:
+    def __init__(self, capacity: int = 200, enabled: bool = True, otlp_path: Path | None = None, service_name: str = "direct_chat") -> None:
+        self.enabled = bool(enabled)
+        self.otlp_path = otlp_path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        self._traces: deque[dict] = deque(maxlen=max(1, int(capacity)))
+        self._local = threading.local()
+        self._export_errors = 0
+
+    def current(self) -> dict | None:
+        return getattr(self._local, "trace", None)
+
+    def annotate(self, **attrs: Any) -> None:
+        trace = self.current()
+        if trace is not None:
+            trace["attrs"].update(attrs)
+
+    @contextmanager
+    def trace(self, name: str, **attrs: Any) -> Iterator[dict | None]:
+        if not self.enabled:
+            yield None
+            return
+        if self.current() is not None:
+            with self.span(name, **attrs) as sp:
+                yield sp
+            return
+        trace = {
+            "trace_id": _new_id(16),
+            "span_id": _new_id(8),
+            "name": str(name),
+            "start_ns": time.time_ns(),
+            "end_ns": 0,
+            "attrs": dict(attrs),
+            "spans": [],
+        }
+        self._local.trace = trace
+        self._local.stack = [trace["span_id"]]
+        try:
+            yield trace
+        except BaseException as e:
+            trace["attrs"]["error"] = type(e).__name__
+            raise
+        finally:
+            trace["end_ns"] = time.time_ns()
+            self._local.trace = None
+            self._local.stack = []
+            with self._lock:
+                self._traces.append(trace)
+            self._export(trace, trace["spans"], include_root=True)
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[dict | None]:
+        trace = self.current()
+        if trace is None:
+            yield None
+            return
+        stack = self._local.stack
+        sp = {
+            "span_id": _new_id(8),
+            "parent_id": stack[-1] if stack else trace["span_id"],
+            "name": str(name),
+            "start_ns": time.time_ns(),
+            "end_ns": 0,
+            "attrs": dict(attrs),
+        }
+        stack.append(sp["span_id"])
+        try:
+            yield sp
+        except BaseException as e:
+            sp["attrs"]["error"] = type(e).__name__
+            raise
+        finally:
+            sp["end_ns"] = time.time_ns()
+            if stack and stack[-1] == sp["span_id"]:
+                stack.pop()
+            with self._lock:
+                trace["spans"].append(sp)
+
+    def wrap(self, name: str) -> Callable[[Callable], Callable]:
+        def _decorator(fn: Callable) -> Callable:
+            @functools.wraps(fn)
+            def _wrapped(*args: Any, **kwargs: Any) -> Any:
+                if getattr(self._local, "trace", None) is None:
+                    return fn(*args, **kwargs)
+                with self.span(name):
+                    return fn(*args, **kwargs)
+
+            return _wrapped
+
+        return _decorator
+
+    def add_span(self, trace: dict | None, name: str, start_ns: int, end_ns: int | None = None, **attrs: Any) -> None:
+        """Attach a span to `trace` from any thread, also after the trace finished."""
+        if trace is None or not self.enabled:
+            return
+        sp = {
+            "span_id": _new_id(8),
+            "parent_id": trace["span_id"],
+            "name": str(name),
+            "start_ns": int(start_ns),
+            "end_ns": int(end_ns if end_ns is not None else time.time_ns()),
+            "attrs": dict(attrs),
+        }
+        with self._lock:
+            trace["spans"].append(sp)
+            finished = bool(trace.get("end_ns"))
+        if finished:
+            self._export(trace, [sp], include_root=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._traces.clear()
+
+    def recent(self, limit: int = 20, name: str = "") -> dict:
+        with self._lock:
+            traces = [t for t in self._traces if not name or t["name"] == name]
+            snap = [{**t, "attrs": dict(t["attrs"]), "spans": list(t["spans"])} for t in traces]
+        stages: dict[str, list[float]] = {}
+        for t in snap:
+            stages.setdefault("total", []).append((t["end_ns"] - t["start_ns"]) / 1e6)
+            for sp in t["spans"]:
+                stages.setdefault(sp["name"], []).append((sp["end_ns"] - sp["start_ns"]) / 1e6)
+        lim = max(1, int(limit))
+        return {
+            "capacity": self._traces.maxlen,
+            "count": len(snap),
+            "traces": [self._summary(t) for t in reversed(snap[-lim:])],
+            "stages": {k: self._histogram(v) for k, v in sorted(stages.items())},
+        }
+
+    @staticmethod
+    def _summary(trace: dict) -> dict:
+        t0 = int(trace["start_ns"])
+        spans = sorted(trace["spans"], key=lambda s: int(s["start_ns"]))
+        return {
+            "trace_id": trace["trace_id"],
+            "name": trace["name"],
+            "ts": t0 / 1e9,
+            "duration_ms": round((int(trace["end_ns"]) - t0) / 1e6, 3),
+            "attrs": trace["attrs"],
+            "spans": [
+                {
+                    "name": sp["name"],
+                    "offset_ms": round((int(sp["start_ns"]) - t0) / 1e6, 3),
+                    "duration_ms": round((int(sp["end_ns"]) - int(sp["start_ns"])) / 1e6, 3),
+                    **({"attrs": sp["attrs"]} if sp["attrs"] else {}),
+                }
+                for sp in spans
+            ],
+        }
+
+    @staticmethod
+    def _histogram(samples_ms: list[float]) -> dict:
+        ordered = sorted(samples_ms)
+        counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        for v in ordered:
+            for i, le in enumerate(HISTOGRAM_BUCKETS_MS):
+                if v <= le:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+        return {
+            "count": len(ordered),
+            "p50_ms": round(_percentile(ordered, 50), 3),
+            "p95_ms": round(_percentile(ordered, 95), 3),
+            "max_ms": round(ordered[-1], 3) if ordered else 0.0,
+            "buckets_ms": [{"le": le, "count": c} for le, c in zip(list(HISTOGRAM_BUCKETS_MS) + ["+Inf"], counts)],
+        }
+
+    def _otlp_document(self, trace: dict, spans: list[dict], include_root: bool) -> dict:
+        out = []
+        if include_root:
+            out.append(
+                {
+                    "traceId": trace["trace_id"],
+                    "spanId": trace["span_id"],
+                    "name": trace["name"],
+                    "kind": 2,
+                    "startTimeUnixNano": str(trace["start_ns"]),
+                    "endTimeUnixNano": str(trace["end_ns"]),
+                    "attributes": _otlp_attrs(trace["attrs"]),
+                }
+            )
+        for sp in spans:
+            out.append(
+                {
+                    "traceId": trace["trace_id"],
+                    "spanId": sp["span_id"],
+                    "parentSpanId": sp["parent_id"],
+                    "name": sp["name"],
+                    "kind": 1,
+                    "startTimeUnixNano": str(sp["start_ns"]),
+                    "endTimeUnixNano": str(sp["end_ns"]),
+                    "attributes": _otlp_attrs(sp["attrs"]),
+                }
+            )
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attrs({"service.name": self.service_name})},
+                    "scopeSpans": [{"scope": {"name": "molbot_direct_chat.tracing"}, "spans": out}],
+                }
+            ]
+        }
+
+    def _export(self, trace: dict, spans: list[dict], include_root: bool) -> None:
+        if self.otlp_path is None:
+            return
+        try:
+            with self._lock:
+                line = json.dumps(self._otlp_document(trace, list(spans), include_root), ensure_ascii=False)
+            self.otlp_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.otlp_path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except Exception:
+            self._export_errors += 1
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(str(os.environ.get(name, default)).strip())
+    except Exception:
+        return default
+
+
+TRACER = Tracer(
+    capacity=max(1, _env_int("DIRECT_CHAT_TRACE_RING", 200)),
+    enabled=str(os.environ.get("DIRECT_CHAT_TRACE_ENABLED", "1")).strip().lower() not in ("0", "false", "no", "off"),
+    otlp_path=(Path(os.environ["DIRECT_CHAT_TRACE_OTLP_PATH"]).expanduser() if os.environ.get("DIRECT_CHAT_TRACE_OTLP_PATH") else None),
+)
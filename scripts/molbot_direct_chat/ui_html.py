@@ -413,6 +413,8 @@ HTML = r"""<!doctype html>
 	      return new Promise((resolve) => setTimeout(resolve, ms));
 	    }
 
+    let modelsVersion = null;
+
     async function refreshModels(force = false) {
       const qs = force ? "?refresh=1" : "";
       let payload = { default_model: "openai-codex/gpt-5.1-codex-mini", models: [] };
@@ -420,7 +422,29 @@ HTML = r"""<!doctype html>
         const r = await fetch(`/api/models${qs}`);
         if (r.ok) payload = await r.json();
       } catch {}
+      renderModels(payload);
+    }
+
+    // Long-poll: the server answers when its background catalog refresh finds a change.
+    async function watchModels() {
+      while (true) {
+        try {
+          const since = modelsVersion === null ? -1 : modelsVersion;
+          const r = await fetch(`/api/models?since=${since}&wait=25`);
+          if (!r.ok) {
+            await sleep(10000);
+            continue;
+          }
+          const payload = await r.json();
+          if (payload.version !== modelsVersion) renderModels(payload);
+        } catch {
+          await sleep(10000);
+        }
+      }
+    }
 
+    function renderModels(payload) {
+      if (Number.isInteger(payload.version)) modelsVersion = payload.version;
       const models = Array.isArray(payload.models) ? payload.models : [];
       modelEl.innerHTML = "";
 
@@ -1717,6 +1741,12 @@ HTML = r"""<!doctype html>
         await refreshModels(true);
       }
       localStorage.setItem(MODEL_KEY, modelEl.value || "");
+      // Preload local models so the first turn skips the load.
+      fetch("/api/models", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ model: modelEl.value || "" }),
+      }).catch(() => {});
       abortCurrentStream();
       await loadServerHistory();
       inputEl.focus();
@@ -1769,7 +1799,8 @@ HTML = r"""<!doctype html>
     syncVoiceState();
     refreshModels()
       .then(() => loadServerHistory())
-      .then(() => inputEl.focus());
+      .then(() => inputEl.focus())
+      .then(() => watchModels());
     refreshMeter();
     setInterval(refreshMeter, 2000);
   </script>
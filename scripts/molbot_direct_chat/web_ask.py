@@ -6,13 +6,16 @@ import os
 import re
 import shutil
 import subprocess
+import threading
 import time
 from pathlib import Path
 from urllib.parse import quote_plus
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
 
+from .gemini_client import DEFAULT_BASE_URL as DEFAULT_GEMINI_BASE_URL
+from .gemini_client import GEMINI_CLIENT, GEMINI_USAGE, cache_key as _gemini_cache_key
+from .profile_sync import PROFILE_SYNC
 from .util import normalize_text, parse_json_object
+from .web_ask_daemon import DAEMON as WEB_ASK_DAEMON, daemon_enabled
 
 
 # Web automation runner (Node + Playwright)
@@ -23,6 +26,7 @@ WEB_ASK_BOOTSTRAP_PATH = SCRIPTS_ROOT / "web_ask_bootstrap.sh"
 WEB_ASK_LOG_PATH = Path.home() / ".openclaw" / "logs" / "web_ask.log"
 WEB_ASK_LOCK_PATH = Path.home() / ".openclaw" / "web_ask_shadow" / ".web_ask.lock"
 WEB_ASK_THREAD_DIR = Path.home() / ".openclaw" / "web_ask_shadow" / "threads"
+WEB_ASK_SHADOW_USER_DATA_DIR = Path.home() / ".openclaw" / "web_ask_shadow" / "google-chrome"
 GEMINI_API_USAGE_PATH = Path.home() / ".openclaw" / "logs" / "gemini_api_usage.json"
 GEMINI_API_USAGE_LOCK_PATH = Path.home() / ".openclaw" / "logs" / ".gemini_api_usage.lock"
 
@@ -115,6 +119,20 @@ def _gemini_api_prompt_char_limit() -> int:
     return max(128, n)
 
 
+def _gemini_api_base_url() -> str:
+    return str(os.environ.get("GEMINI_API_BASE_URL", "") or DEFAULT_GEMINI_BASE_URL).strip()
+
+
+def _gemini_api_hedge_width() -> int:
+    """How many allowlisted models to query at once (1 = sequential, the default)."""
+    raw = str(os.environ.get("GEMINI_API_HEDGE", "1")).strip()
+    try:
+        n = int(raw)
+    except Exception:
+        n = 1
+    return max(1, min(4, n))
+
+
 def _gemini_api_models_safe() -> list[str]:
     models = _gemini_api_models()
     if _gemini_api_allow_paid():
@@ -124,33 +142,7 @@ def _gemini_api_models_safe() -> list[str]:
 
 
 def _gemini_api_usage_reserve(units: int = 1) -> tuple[bool, int, int]:
-    limit = _gemini_api_daily_limit()
-    today = time.strftime("%Y-%m-%d", time.localtime())
-    used = 0
-    try:
-        GEMINI_API_USAGE_PATH.parent.mkdir(parents=True, exist_ok=True)
-        GEMINI_API_USAGE_LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
-        with GEMINI_API_USAGE_LOCK_PATH.open("a+", encoding="utf-8") as lockf:
-            fcntl.flock(lockf.fileno(), fcntl.LOCK_EX)
-            data = {}
-            if GEMINI_API_USAGE_PATH.exists():
-                try:
-                    data = json.loads(GEMINI_API_USAGE_PATH.read_text(encoding="utf-8"))
-                except Exception:
-                    data = {}
-            date = str(data.get("date", ""))
-            used = int(data.get("used", 0) or 0)
-            if date != today:
-                used = 0
-            if used + units > limit:
-                return False, used, limit
-            used += units
-            payload = {"date": today, "used": used, "limit": limit, "updated_ts": time.time()}
-            GEMINI_API_USAGE_PATH.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-            return True, used, limit
-    except Exception:
-        # Fail closed: if usage persistence fails, don't risk unbounded calls.
-        return False, used, limit
+    return GEMINI_USAGE.reserve(GEMINI_API_USAGE_PATH, GEMINI_API_USAGE_LOCK_PATH, units, _gemini_api_daily_limit())
 
 
 def _gemini_api_extract_text(payload: dict) -> str:
@@ -206,30 +198,21 @@ def _gemini_api_generate_once(
     contents: list[dict],
     timeout_ms: int,
 ) -> tuple[bool, str, str]:
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
-    body = {"contents": contents}
-    data = json.dumps(body, ensure_ascii=False).encode("utf-8")
-    req = Request(
-        url=url,
-        data=data,
-        headers={"Content-Type": "application/json; charset=utf-8"},
-        method="POST",
-    )
     timeout_s = max(8.0, float(timeout_ms) / 1000.0)
     try:
-        with urlopen(req, timeout=timeout_s) as resp:
-            raw = resp.read().decode("utf-8", errors="replace")
-    except HTTPError as e:
-        try:
-            detail = e.read().decode("utf-8", errors="replace")
-        except Exception:
-            detail = str(e)
-        status = _gemini_api_status_from_error(int(getattr(e, "code", 0) or 0), detail)
-        return False, status, detail[:800]
-    except URLError as e:
+        code, raw = GEMINI_CLIENT.post_generate(_gemini_api_base_url(), model, api_key, {"contents": contents}, timeout_s)
+    except OSError as e:  # requests' exceptions are IOError subclasses
         return False, "upstream_error", str(e)[:800]
     except Exception as e:
         return False, "runner_error", str(e)[:800]
+    if code >= 400:
+        detail = raw
+        try:
+            err = json.loads(raw).get("error", {})
+            detail = str(err.get("message", "") or raw)
+        except Exception:
+            pass
+        return False, _gemini_api_status_from_error(code, detail), detail[:800]
 
     try:
         payload = json.loads(raw)
@@ -305,7 +288,24 @@ def _run_gemini_api(prompt: str, timeout_ms: int = 60000, followups: list[str] |
             "timings": {"start": started, "end": time.time(), "duration": 0.0},
         }
 
-    reserved, used, max_daily = _gemini_api_usage_reserve(units=1)
+    prompts = [prompt]
+    if isinstance(followups, list):
+        prompts.extend([str(x).strip() for x in followups if str(x).strip()])
+
+    # Identical asks within the cache TTL are answered from memory and don't spend quota.
+    key = _gemini_cache_key(models, prompts)
+    use_cache = _env_flag("GEMINI_API_CACHE", "1")
+    if use_cache:
+        hit = GEMINI_CLIENT.cached(key)
+        if hit is not None:
+            ended = time.time()
+            hit["cached"] = True
+            hit["timings"] = {"start": started, "end": ended, "duration": round(ended - started, 3)}
+            return hit
+
+    width = _gemini_api_hedge_width()
+    raced = models[:width] if width > 1 and len(models) > 1 else []
+    reserved, used, max_daily = _gemini_api_usage_reserve(units=max(1, len(raced)))
     if not reserved:
         return {
             "ok": False,
@@ -315,67 +315,41 @@ def _run_gemini_api(prompt: str, timeout_ms: int = 60000, followups: list[str] |
             "timings": {"start": started, "end": time.time(), "duration": 0.0},
         }
 
-    prompts = [prompt]
-    if isinstance(followups, list):
-        prompts.extend([str(x).strip() for x in followups if str(x).strip()])
-
-    last_error = {
-        "ok": False,
-        "status": "runner_error",
-        "text": "",
-        "evidence": "no_model_attempted",
-        "timings": {"start": started, "end": time.time(), "duration": 0.0},
-    }
-
-    for model in models:
-        contents: list[dict] = []
-        turns: list[dict] = []
-        failed = False
-        fail_status = ""
-        fail_evidence = ""
-
-        for p in prompts:
-            contents.append({"role": "user", "parts": [{"text": p}]})
-            ok, status, out = _gemini_api_generate_once(model=model, api_key=api_key, contents=contents, timeout_ms=timeout_ms)
-            if not ok:
-                failed = True
-                fail_status = status
-                fail_evidence = out
-                break
-            answer = str(out).strip()
-            turns.append({"prompt": p, "text": answer})
-            contents.append({"role": "model", "parts": [{"text": answer}]})
-
-        if not failed:
-            ended = time.time()
-            payload = {
-                "ok": True,
+    def _success(model: str, turns: list[dict], hedged: bool) -> dict:
+        ended = time.time()
+        payload = {
+            "ok": True,
+            "status": "ok",
+            "text": (turns[-1]["text"] if turns else ""),
+            "turns": turns if len(turns) > 1 else None,
+            "provider": "gemini_api",
+            "model_used": model,
+            "evidence": "gemini_api_generateContent",
+            "timings": {"start": started, "end": ended, "duration": round(ended - started, 3)},
+        }
+        if hedged:
+            payload["hedged_models"] = list(raced)
+        _log_web_ask(
+            {
+                "ts": time.time(),
+                "site": "gemini",
                 "status": "ok",
-                "text": (turns[-1]["text"] if turns else ""),
-                "turns": turns if len(turns) > 1 else None,
+                "ok": True,
+                "runner_code": 0,
+                "prompt": prompt[:220],
+                "duration": payload["timings"]["duration"],
+                "evidence": payload["evidence"],
                 "provider": "gemini_api",
                 "model_used": model,
-                "evidence": "gemini_api_generateContent",
-                "timings": {"start": started, "end": ended, "duration": round(ended - started, 3)},
             }
-            _log_web_ask(
-                {
-                    "ts": time.time(),
-                    "site": "gemini",
-                    "status": "ok",
-                    "ok": True,
-                    "runner_code": 0,
-                    "prompt": prompt[:220],
-                    "duration": payload["timings"]["duration"],
-                    "evidence": payload["evidence"],
-                    "provider": "gemini_api",
-                    "model_used": model,
-                }
-            )
-            return payload
+        )
+        if use_cache:
+            GEMINI_CLIENT.store(key, payload)
+        return payload
 
+    def _failure(model: str, fail_status: str, fail_evidence: str) -> dict:
         ended = time.time()
-        last_error = {
+        return {
             "ok": False,
             "status": fail_status or "runner_error",
             "text": "",
@@ -384,41 +358,87 @@ def _run_gemini_api(prompt: str, timeout_ms: int = 60000, followups: list[str] |
             "model_used": model,
             "timings": {"start": started, "end": ended, "duration": round(ended - started, 3)},
         }
+
+    def _log_failure(err: dict) -> None:
+        _log_web_ask(
+            {
+                "ts": time.time(),
+                "site": "gemini",
+                "status": err["status"],
+                "ok": False,
+                "runner_code": -1,
+                "prompt": prompt[:220],
+                "duration": err.get("timings", {}).get("duration", None),
+                "evidence": err.get("evidence", ""),
+                "provider": "gemini_api",
+                "model_used": err.get("model_used", ""),
+            }
+        )
+
+    last_error = {
+        "ok": False,
+        "status": "runner_error",
+        "text": "",
+        "evidence": "no_model_attempted",
+        "timings": {"start": started, "end": time.time(), "duration": 0.0},
+    }
+
+    sequential = models
+    if raced:
+        # Hedged: the same conversation on several free models, first complete answer wins.
+        race_timeout_s = len(prompts) * max(8.0, float(timeout_ms) / 1000.0) + 5.0
+        winner, results = GEMINI_CLIENT.race(
+            [(m, (lambda cancel, m=m: _gemini_api_conversation(m, api_key, prompts, timeout_ms, cancel))) for m in raced],
+            accept=lambda r: bool(r[0]),
+            timeout_s=race_timeout_s,
+        )
+        if winner is not None:
+            return _success(winner, results[winner][3], hedged=True)
+        for model in raced:
+            _, fail_status, fail_evidence, _ = results.get(model, (False, "timeout", "hedged_race_timeout", []))
+            last_error = _failure(model, fail_status, fail_evidence)
+            if fail_status != "model_not_found":
+                _log_failure(last_error)
+                return last_error
+        sequential = models[len(raced) :]
+
+    for model in sequential:
+        ok, fail_status, fail_evidence, turns = _gemini_api_conversation(model, api_key, prompts, timeout_ms)
+        if ok:
+            return _success(model, turns, hedged=False)
+        last_error = _failure(model, fail_status, fail_evidence)
         # If model doesn't exist, try next model. For other failures, stop fast.
         if fail_status != "model_not_found":
-            _log_web_ask(
-                {
-                    "ts": time.time(),
-                    "site": "gemini",
-                    "status": last_error["status"],
-                    "ok": False,
-                    "runner_code": -1,
-                    "prompt": prompt[:220],
-                    "duration": last_error["timings"]["duration"],
-                    "evidence": last_error["evidence"],
-                    "provider": "gemini_api",
-                    "model_used": model,
-                }
-            )
+            _log_failure(last_error)
             return last_error
 
-    _log_web_ask(
-        {
-            "ts": time.time(),
-            "site": "gemini",
-            "status": last_error["status"],
-            "ok": False,
-            "runner_code": -1,
-            "prompt": prompt[:220],
-            "duration": last_error.get("timings", {}).get("duration", None),
-            "evidence": last_error.get("evidence", ""),
-            "provider": "gemini_api",
-            "model_used": last_error.get("model_used", ""),
-        }
-    )
+    _log_failure(last_error)
     return last_error
 
 
+def _gemini_api_conversation(
+    model: str,
+    api_key: str,
+    prompts: list[str],
+    timeout_ms: int,
+    cancel: threading.Event | None = None,
+) -> tuple[bool, str, str, list[dict]]:
+    """(ok, status, error evidence, turns) of one multi-turn conversation with `model`."""
+    contents: list[dict] = []
+    turns: list[dict] = []
+    for p in prompts:
+        if cancel is not None and cancel.is_set():
+            return False, "cancelled", "", turns
+        contents.append({"role": "user", "parts": [{"text": p}]})
+        ok, status, out = _gemini_api_generate_once(model=model, api_key=api_key, contents=contents, timeout_ms=timeout_ms)
+        if not ok:
+            return False, status, out, turns
+        answer = str(out).strip()
+        turns.append({"prompt": p, "text": answer})
+        contents.append({"role": "model", "parts": [{"text": answer}]})
+    return True, "ok", "", turns
+
+
 def _load_browser_profile_config() -> dict:
     config = dict(DEFAULT_BROWSER_PROFILE_CONFIG)
     try:
@@ -506,7 +526,7 @@ def _prepare_shadow_chrome_user_data(profile_dir: str) -> tuple[str, str | None]
     if not src_root.exists() or not src_profile.exists():
         return str(src_root), "source_profile_missing"
 
-    dst_root = Path.home() / ".openclaw" / "web_ask_shadow" / "google-chrome"
+    dst_root = WEB_ASK_SHADOW_USER_DATA_DIR
     dst_profile = dst_root / profile_dir
     dst_root.mkdir(parents=True, exist_ok=True)
     dst_profile.parent.mkdir(parents=True, exist_ok=True)
@@ -516,6 +536,14 @@ def _prepare_shadow_chrome_user_data(profile_dir: str) -> tuple[str, str | None]
     if (dst_profile / ".web_ask_bootstrap_keep").exists():
         return str(dst_root), "shadow_kept_bootstrap_marker"
 
+    if str(os.environ.get("WEB_ASK_PROFILE_SYNC", "")).strip().lower() != "full":
+        try:
+            dst_profile.mkdir(parents=True, exist_ok=True)
+            PROFILE_SYNC.sync(src_root, dst_root, profile_dir)
+            return str(dst_root), None
+        except Exception as e:
+            return str(src_root), f"shadow_sync_failed:{e}"
+
     local_state_src = src_root / "Local State"
     local_state_dst = dst_root / "Local State"
     try:
@@ -671,6 +699,7 @@ def run_web_ask(site_key: str, prompt: str, timeout_ms: int = 60000, followups:
 
     WEB_ASK_THREAD_DIR.mkdir(parents=True, exist_ok=True)
     thread_file = WEB_ASK_THREAD_DIR / f"{site_key}_thread.txt"
+    daemon_pid = WEB_ASK_DAEMON.ensure_running(node) if daemon_enabled() else None
 
     last_payload = {
         "ok": False,
@@ -682,7 +711,11 @@ def run_web_ask(site_key: str, prompt: str, timeout_ms: int = 60000, followups:
 
     for idx, profile_candidate in enumerate(fallback_profiles):
         real_user_data_dir = str(Path.home() / ".config" / "google-chrome")
-        shadow_user_data_dir, shadow_warn = _prepare_shadow_chrome_user_data(profile_candidate)
+        if daemon_pid is not None and WEB_ASK_DAEMON.context_open(str(WEB_ASK_SHADOW_USER_DATA_DIR), profile_candidate):
+            # The daemon has this shadow profile open: syncing over a live profile would corrupt it.
+            shadow_user_data_dir, shadow_warn = str(WEB_ASK_SHADOW_USER_DATA_DIR), None
+        else:
+            shadow_user_data_dir, shadow_warn = _prepare_shadow_chrome_user_data(profile_candidate)
         cmd = [
             node,
             str(WEB_ASK_SCRIPT_PATH),
@@ -704,44 +737,61 @@ def run_web_ask(site_key: str, prompt: str, timeout_ms: int = 60000, followups:
         if followups:
             cmd.extend(["--followups-json", json.dumps(followups, ensure_ascii=False)])
 
-        WEB_ASK_LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
-        try:
-            with WEB_ASK_LOCK_PATH.open("w", encoding="utf-8") as lockf:
-                fcntl.flock(lockf.fileno(), fcntl.LOCK_EX)
-                proc = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=max(20, int(timeout_ms / 1000) + 20),
-                )
-        except subprocess.TimeoutExpired:
-            last_payload = {
-                "ok": False,
-                "status": "timeout",
-                "text": "",
-                "evidence": "playwright_runner_timeout",
-                "timings": {"start": started, "end": time.time(), "duration": round(time.time() - started, 3)},
-            }
-            continue
-        except Exception as e:
-            last_payload = {
-                "ok": False,
-                "status": "runner_error",
-                "text": "",
-                "evidence": str(e),
-                "timings": {"start": started, "end": time.time(), "duration": round(time.time() - started, 3)},
-            }
-            continue
+        payload: dict | None = None
+        runner_code = 0
+        runner = "daemon"
+        if daemon_pid is not None:
+            # Warm daemon: jobs are ordered per site tab inside the daemon, so no global flock.
+            payload = WEB_ASK_DAEMON.ask(
+                site_key,
+                prompt,
+                profile_dir=profile_candidate,
+                user_data_dir=shadow_user_data_dir,
+                timeout_ms=timeout_ms,
+                thread_file=str(thread_file),
+                followups=followups,
+            )
+        if payload is None:
+            runner = "oneshot"
+            WEB_ASK_LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                with WEB_ASK_LOCK_PATH.open("w", encoding="utf-8") as lockf:
+                    fcntl.flock(lockf.fileno(), fcntl.LOCK_EX)
+                    proc = subprocess.run(
+                        cmd,
+                        capture_output=True,
+                        text=True,
+                        timeout=max(20, int(timeout_ms / 1000) + 20),
+                    )
+            except subprocess.TimeoutExpired:
+                last_payload = {
+                    "ok": False,
+                    "status": "timeout",
+                    "text": "",
+                    "evidence": "playwright_runner_timeout",
+                    "timings": {"start": started, "end": time.time(), "duration": round(time.time() - started, 3)},
+                }
+                continue
+            except Exception as e:
+                last_payload = {
+                    "ok": False,
+                    "status": "runner_error",
+                    "text": "",
+                    "evidence": str(e),
+                    "timings": {"start": started, "end": time.time(), "duration": round(time.time() - started, 3)},
+                }
+                continue
 
-        payload = parse_json_object(proc.stdout) or {}
-        if not payload:
-            payload = {
-                "ok": False,
-                "status": "invalid_output",
-                "text": "",
-                "evidence": (proc.stderr or proc.stdout or "").strip()[:800],
-                "timings": {"start": started, "end": time.time(), "duration": round(time.time() - started, 3)},
-            }
+            runner_code = proc.returncode
+            payload = parse_json_object(proc.stdout) or {}
+            if not payload:
+                payload = {
+                    "ok": False,
+                    "status": "invalid_output",
+                    "text": "",
+                    "evidence": (proc.stderr or proc.stdout or "").strip()[:800],
+                    "timings": {"start": started, "end": time.time(), "duration": round(time.time() - started, 3)},
+                }
 
         if "timings" not in payload or not isinstance(payload.get("timings"), dict):
             payload["timings"] = {"start": started, "end": time.time(), "duration": round(time.time() - started, 3)}
@@ -750,7 +800,8 @@ def run_web_ask(site_key: str, prompt: str, timeout_ms: int = 60000, followups:
         payload["status"] = str(payload.get("status", "error"))
         payload["text"] = str(payload.get("text", ""))
         payload["evidence"] = str(payload.get("evidence", ""))
-        payload["runner_code"] = proc.returncode
+        payload["runner_code"] = runner_code
+        payload["runner"] = runner
         payload["profile_used"] = profile_candidate
         payload["attempt"] = idx + 1
         if shadow_warn:
@@ -762,7 +813,8 @@ def run_web_ask(site_key: str, prompt: str, timeout_ms: int = 60000, followups:
                 "site": site_key,
                 "status": payload["status"],
                 "ok": payload["ok"],
-                "runner_code": proc.returncode,
+                "runner_code": runner_code,
+                "runner": runner,
                 "prompt": prompt[:220],
                 "duration": payload.get("timings", {}).get("duration", None),
                 "evidence": payload.get("evidence", ""),
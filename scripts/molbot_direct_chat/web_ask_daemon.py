@@ -0,0 +1,172 @@
+"""Client for the persistent web_ask browser daemon (`scripts/web_ask_daemon.js`).
+
+The daemon keeps one warm Chrome context per profile and one tab per site, so
+repeat asks skip Node startup, browser launch and profile load. Requests are
+single JSON lines over a Unix socket; the daemon is spawned on first use and
+exits by itself after an hour without jobs.
+
+`ask` returns None whenever the daemon cannot be reached or started, so the
+caller can fall back to the one-shot `web_ask_playwright.js` runner.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+
+SCRIPTS_ROOT = Path(__file__).resolve().parents[1]  # .../scripts
+DAEMON_SCRIPT_PATH = SCRIPTS_ROOT / "web_ask_daemon.js"
+DAEMON_SOCKET_PATH = Path.home() / ".openclaw" / "web_ask_shadow" / "web_ask_daemon.sock"
+DAEMON_LOG_PATH = Path.home() / ".openclaw" / "logs" / "web_ask_daemon.out"
+
+
+def daemon_enabled() -> bool:
+    return str(os.environ.get("WEB_ASK_DAEMON", "1")).strip().lower() not in ("0", "false", "no", "off")
+
+
+class WebAskDaemon:
+    def __init__(
+        self,
+        socket_path: Path | str = DAEMON_SOCKET_PATH,
+        script_path: Path | str = DAEMON_SCRIPT_PATH,
+        start_timeout_s: float = 8.0,
+        retry_spawn_s: float = 300.0,
+    ) -> None:
+        self.socket_path = Path(socket_path)
+        self.script_path = Path(script_path)
+        self.start_timeout_s = float(start_timeout_s)
+        self.retry_spawn_s = float(retry_spawn_s)
+        self._spawn_failed_at: float | None = None
+        self._lock = threading.Lock()
+        self._stats = {"asks": 0, "unavailable": 0, "spawned": 0, "errors": 0}
+
+    def request(self, obj: dict, timeout_s: float) -> dict | None:
+        """Send one request line and read one reply line.
+
+        None if the daemon is unreachable; a `timeout` reply if it accepted the
+        request but did not answer in time (it still owns the profile then).
+        """
+        sent = False
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(max(0.2, float(timeout_s)))
+                sock.connect(str(self.socket_path))
+                sock.sendall((json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8"))
+                sent = True
+                buf = bytearray()
+                while b"\n" not in buf:
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    buf.extend(chunk)
+        except socket.timeout:
+            if not sent:
+                return None
+            return {"ok": False, "status": "timeout", "text": "", "evidence": "daemon_reply_timeout"}
+        except (OSError, ValueError):
+            return None
+        try:
+            out = json.loads(bytes(buf).split(b"\n", 1)[0].decode("utf-8", errors="replace"))
+        except ValueError:
+            return None
+        return out if isinstance(out, dict) else None
+
+    def ping(self) -> int | None:
+        """Daemon pid when it answers, else None."""
+        out = self.request({"op": "ping"}, timeout_s=1.0)
+        if not out or not out.get("ok"):
+            return None
+        try:
+            return int(out.get("pid") or 0) or None
+        except (TypeError, ValueError):
+            return None
+
+    def ensure_running(self, node: str, extra_args: list[str] | None = None) -> int | None:
+        with self._lock:
+            pid = self.ping()
+            if pid is not None:
+                self._spawn_failed_at = None
+                return pid
+            # A daemon that cannot start (e.g. playwright not installed) is retried only every retry_spawn_s.
+            if self._spawn_failed_at is not None and (time.monotonic() - self._spawn_failed_at) < self.retry_spawn_s:
+                return None
+            if node and self.script_path.exists():
+                self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+                DAEMON_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    with DAEMON_LOG_PATH.open("ab") as logf:
+                        subprocess.Popen(
+                            [node, str(self.script_path), "--socket", str(self.socket_path), *(extra_args or [])],
+                            stdin=subprocess.DEVNULL,
+                            stdout=logf,
+                            stderr=logf,
+                            start_new_session=True,
+                        )
+                    self._stats["spawned"] += 1
+                except Exception:
+                    self._stats["errors"] += 1
+                    self._spawn_failed_at = time.monotonic()
+                    return None
+                deadline = time.monotonic() + self.start_timeout_s
+                while pid is None and time.monotonic() < deadline:
+                    time.sleep(0.1)
+                    pid = self.ping()
+            if pid is None:
+                self._spawn_failed_at = time.monotonic()
+            return pid
+
+    def context_open(self, user_data_dir: str, profile_dir: str) -> bool:
+        """True when the daemon holds a live context for this profile (its files must not be synced over)."""
+        out = self.request({"op": "status"}, timeout_s=2.0) or {}
+        for ctx in out.get("contexts") or []:
+            if isinstance(ctx, dict) and ctx.get("user_data_dir") == user_data_dir and ctx.get("profile_dir") == profile_dir:
+                return True
+        return False
+
+    def ask(
+        self,
+        site_key: str,
+        prompt: str,
+        profile_dir: str,
+        user_data_dir: str,
+        timeout_ms: int,
+        thread_file: str,
+        followups: list[str] | None = None,
+    ) -> dict | None:
+        req = {
+            "op": "ask",
+            "site": site_key,
+            "prompt": prompt,
+            "followups": list(followups or []),
+            "profile_dir": profile_dir,
+            "user_data_dir": user_data_dir,
+            "timeout_ms": int(timeout_ms),
+            "thread_file": thread_file,
+        }
+        # Every turn may wait up to timeout_ms, plus launch/navigation on a cold context.
+        turns = 1 + len(req["followups"])
+        out = self.request(req, timeout_s=turns * (timeout_ms / 1000.0) + 30.0)
+        with self._lock:
+            if out is None:
+                self._stats["unavailable"] += 1
+            else:
+                self._stats["asks"] += 1
+        return out
+
+    def status(self) -> dict:
+        out = self.request({"op": "status"}, timeout_s=2.0)
+        with self._lock:
+            stats = dict(self._stats)
+        return {"running": out is not None, "daemon": out or {}, **stats}
+
+    def shutdown(self) -> bool:
+        return self.request({"op": "shutdown"}, timeout_s=2.0) is not None
+
+
+DAEMON = WebAskDaemon()
@@ -2,8 +2,14 @@ from __future__ import annotations
 
 import json
 import re
+import time
 import urllib.parse
 import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .search_cache import SwrCache
+from .tracing import TRACER
+from .util import normalize_text
 
 
 SEARXNG_URL = "http://127.0.0.1:8080/search"
@@ -13,6 +19,9 @@ SITE_DOMAIN_FILTERS = {
 }
 SEARCH_VERB_RE = r"(?:busca|buscá|buscar|investiga|investigar|search|encontra|encontrá|encontrar)"
 WEB_DEST_RE = r"(youtube|wikipedia|google|internet|la\s+red|web|la\s+web)"
+# Results kept per cached query; callers slice to their own max_results.
+CACHED_RESULTS = 20
+SEARCH_CACHE = SwrCache(ttl_s=300.0, stale_s=1800.0, max_entries=256)
 
 
 def _clean_query(raw: str) -> str:
@@ -158,16 +167,37 @@ def extract_web_search_request(message: str) -> tuple[str, str | None] | None:
     return None
 
 
+def _cache_key(query: str, site_key: str | None) -> tuple[str, str]:
+    return normalize_text(query).strip(" ,.;:!?¡¿\"'"), str(site_key or "").strip().lower()
+
+
+@TRACER.wrap("searxng_search")
 def searxng_search(
-    query: str, *, site_key: str | None = None, max_results: int = 6, timeout_s: int = 12
+    query: str, *, site_key: str | None = None, max_results: int = 6, timeout_s: int = 12, use_cache: bool = True
 ) -> dict:
     """
     Calls local SearXNG. Requires `search.formats` to include `json` in SearXNG settings.
+    Successful results are cached per normalized (query, site_key), see `SEARCH_CACHE`.
     """
     q = (query or "").strip()
     if not q:
         return {"ok": False, "status": "empty_query", "query": "", "results": [], "error": "empty_query"}
+    if not use_cache:
+        return _searxng_fetch(q, site_key=site_key, max_results=max_results, timeout_s=timeout_s)
 
+    payload = SEARCH_CACHE.get(
+        _cache_key(q, site_key),
+        lambda: _searxng_fetch(q, site_key=site_key, max_results=CACHED_RESULTS, timeout_s=timeout_s),
+        cacheable=lambda p: bool(p.get("ok")),
+    )
+    out = dict(payload)
+    out["query"] = q
+    if isinstance(payload.get("results"), list):
+        out["results"] = list(payload["results"][: max(1, int(max_results))])
+    return out
+
+
+def _searxng_fetch(q: str, *, site_key: str | None, max_results: int, timeout_s: int) -> dict:
     domain = SITE_DOMAIN_FILTERS.get(str(site_key or "").strip().lower(), "")
     q_eff = f"{q} site:{domain}".strip() if domain else q
     data = urllib.parse.urlencode({"q": q_eff, "format": "json"}).encode("utf-8")
@@ -215,6 +245,120 @@ def searxng_search(
     return {"ok": True, "status": "ok", "query": q, "results": trimmed, "site_key": site_key}
 
 
+_TRACKING_PARAM_RE = re.compile(r"^(?:utm_\w+|fbclid|gclid|yclid|mc_eid|ref|ref_src)$", flags=re.IGNORECASE)
+_QUESTION_LEAD_RE = re.compile(
+    r"^(?:que|qué|quien|quién|como|cómo|cuando|cuándo|donde|dónde|por\s*que|por\s*qué|cual|cuál|cuales|cuáles)"
+    r"(?:\s+(?:es|son|fue|fueron|era|hay|significa|funciona|paso|pasó))?\s+",
+    flags=re.IGNORECASE,
+)
+_FILLER_WORDS = {"el", "la", "los", "las", "un", "una", "unos", "unas", "de", "del", "que", "en", "y", "a", "al", "por", "para", "con", "se", "lo"}
+
+
+def canonical_url(url: str) -> str:
+    """Dedup key: lowercase host without www, no fragment/tracking params, sorted query."""
+    p = urllib.parse.urlsplit((url or "").strip())
+    host = (p.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if p.port and p.port not in (80, 443):
+        host = f"{host}:{p.port}"
+    query = sorted(
+        (k, v) for k, v in urllib.parse.parse_qsl(p.query, keep_blank_values=True) if not _TRACKING_PARAM_RE.match(k)
+    )
+    path = p.path.rstrip("/") or "/"
+    return urllib.parse.urlunsplit(("", host, path, urllib.parse.urlencode(query), "")).lstrip("/")
+
+
+def query_variants(query: str, max_variants: int = 3) -> list[tuple[str, str | None]]:
+    """(query, site_key) reformulations for a research-style question."""
+    q = (query or "").strip()
+    if not q:
+        return []
+    out: list[tuple[str, str | None]] = [(q, None)]
+    core = _QUESTION_LEAD_RE.sub("", q.strip(" ¿?¡!")).strip()
+    keywords = " ".join(w for w in core.split() if w.lower() not in _FILLER_WORDS)
+    if keywords and normalize_text(keywords) != normalize_text(q):
+        out.append((keywords, None))
+    out.append((keywords or q, "wikipedia"))
+    return out[: max(1, int(max_variants))]
+
+
+def rrf_merge(result_lists: list[list[dict]], k: int = 60) -> list[dict]:
+    """Reciprocal rank fusion over result lists, deduplicated by `canonical_url`."""
+    scores: dict[str, float] = {}
+    merged: dict[str, dict] = {}
+    for results in result_lists:
+        seen: set[str] = set()
+        for rank, r in enumerate(results, 1):
+            url = str(r.get("url", "")).strip() if isinstance(r, dict) else ""
+            if not url:
+                continue
+            key = canonical_url(url)
+            if key in seen:
+                continue
+            seen.add(key)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            prev = merged.get(key)
+            if prev is None:
+                merged[key] = dict(r)
+            elif len(str(r.get("content", ""))) > len(str(prev.get("content", ""))):
+                prev["content"] = r.get("content", "")
+    order = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return [merged[key] for key in order]
+
+
+@TRACER.wrap("searxng_multi_search")
+def searxng_multi_search(
+    query: str,
+    *,
+    variants: list[tuple[str, str | None]] | None = None,
+    max_results: int = 8,
+    max_workers: int = 3,
+    budget_s: float = 6.0,
+) -> dict:
+    """
+    Fan-out mode: runs `variants` (default `query_variants`) concurrently, at most
+    `max_workers` at a time, and merges whatever finished within `budget_s`.
+    """
+    q = (query or "").strip()
+    if not q:
+        return {"ok": False, "status": "empty_query", "query": "", "results": [], "error": "empty_query"}
+    variants = variants or query_variants(q)
+    deadline = time.monotonic() + float(budget_s)
+    per_call_timeout = max(1, int(budget_s + 0.999))
+    pool = ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), len(variants))), thread_name_prefix="searxng-fanout")
+    futures = {
+        pool.submit(searxng_search, vq, site_key=vs, max_results=CACHED_RESULTS, timeout_s=per_call_timeout): i
+        for i, (vq, vs) in enumerate(variants)
+    }
+    finished: dict[int, dict] = {}
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for fut in done:
+                try:
+                    finished[futures[fut]] = fut.result()
+                except Exception as e:
+                    finished[futures[fut]] = {"ok": False, "error": str(e), "results": []}
+    finally:
+        # Late variants keep running only to warm SEARCH_CACHE; nobody waits for them.
+        pool.shutdown(wait=False, cancel_futures=True)
+    ok_lists = [finished[i]["results"] for i in sorted(finished) if finished[i].get("ok")]
+    base = {
+        "query": q,
+        "site_key": None,
+        "mode": "multi",
+        "variants": [{"query": vq, "site_key": vs, "done": i in finished} for i, (vq, vs) in enumerate(variants)],
+    }
+    if not ok_lists:
+        errors = [str(finished[i].get("error", "")) for i in sorted(finished)]
+        return {"ok": False, "status": "all_variants_failed", "results": [], "error": "; ".join(e for e in errors if e) or "timeout", **base}
+    return {"ok": True, "status": "ok", "results": rrf_merge(ok_lists)[: max(1, int(max_results))], **base}
+
+
 def format_results_for_prompt(search_payload: dict) -> str:
     q = str(search_payload.get("query", "")).strip()
     results = search_payload.get("results", [])
@@ -234,6 +378,10 @@ def format_results_for_prompt(search_payload: dict) -> str:
         if len(snippet) > 280:
             snippet = snippet[:280] + "..."
         engine_note = f" [{engine}]" if engine else ""
+        page_chunks = r.get("page_chunks")
+        if isinstance(page_chunks, list) and page_chunks:
+            # Fetched page text (page_fetch.PageFetcher.enrich) replaces the snippet.
+            snippet = "\n".join(str(c) for c in page_chunks)
         lines.append(f"{i}. {title}{engine_note}\n{url}\n{snippet}".strip())
     return "\n\n".join(lines).strip()
 
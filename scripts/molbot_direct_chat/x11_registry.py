@@ -0,0 +1,424 @@
+"""In-process X11 window registry fed by property/structure events.
+
+Instead of forking `wmctrl`/`xdotool` per query, one background thread listens
+on the root window for `_NET_CLIENT_LIST`, `_NET_ACTIVE_WINDOW` and
+`_NET_CURRENT_DESKTOP` changes and on every managed client for title, desktop,
+PID and configure events, and keeps the result in memory. Lookups are dict
+reads under a lock. Geometry is fetched lazily and cached until the next
+ConfigureNotify for that window.
+
+python-xlib is optional: when it is missing, DISPLAY is unset or the connection
+drops, `shared_registry()` returns None and callers keep their subprocess path.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Callable
+
+
+STICKY_DESKTOP = 0xFFFFFFFF
+
+
+class DependencyError(RuntimeError):
+    pass
+
+
+def _lazy_import_xlib():
+    try:
+        from Xlib import X, Xatom, display  # type: ignore
+        from Xlib.error import XError  # type: ignore
+    except Exception as e:
+        raise DependencyError(f"python_xlib_unavailable:{e}")
+    return X, Xatom, display, XError
+
+
+def format_window_id(wid: int) -> str:
+    """Same spelling as `wmctrl -l` / normalized `xdotool getactivewindow`."""
+    return f"0x{int(wid):08x}"
+
+
+def parse_window_id(win_id: str | int) -> int | None:
+    if isinstance(win_id, int):
+        return win_id
+    raw = str(win_id or "").strip().lower()
+    try:
+        return int(raw, 16) if raw.startswith("0x") else int(raw)
+    except Exception:
+        return None
+
+
+@dataclass(frozen=True)
+class WindowInfo:
+    win_id: str
+    title: str = ""
+    desktop: int | None = None
+    pid: int | None = None
+    geometry: tuple[int, int, int, int] | None = None
+
+
+class XlibBackend:
+    """Thin python-xlib adapter; events come back as small tuples.
+
+    Event tuples: ("root", prop_name), ("window", wid, prop_name),
+    ("configure", wid), ("destroy", wid).
+    """
+
+    _ROOT_PROPS = ("_NET_CLIENT_LIST", "_NET_ACTIVE_WINDOW", "_NET_CURRENT_DESKTOP", "_NET_NUMBER_OF_DESKTOPS")
+    _WINDOW_PROPS = ("_NET_WM_NAME", "WM_NAME", "_NET_WM_DESKTOP", "_NET_WM_PID")
+
+    def __init__(self, display_name: str | None = None) -> None:
+        X, Xatom, display, XError = _lazy_import_xlib()
+        self._X = X
+        self._Xatom = Xatom
+        self._XError = XError
+        # Events and queries use separate connections so lookups never wait on
+        # the blocking `next_event()` of the listener thread.
+        self._events = display.Display(display_name)
+        self._query = display.Display(display_name)
+        self._query_lock = threading.Lock()
+        self._atoms: dict[str, int] = {}
+        self._names: dict[int, str] = {}
+        for name in self._ROOT_PROPS + self._WINDOW_PROPS + ("UTF8_STRING",):
+            atom = self._events.intern_atom(name)
+            self._atoms[name] = atom
+            self._names[atom] = name
+        self._root = self._events.screen().root
+        self._root.change_attributes(event_mask=X.PropertyChangeMask | X.SubstructureNotifyMask)
+        self._events.flush()
+
+    def close(self) -> None:
+        for d in (self._events, self._query):
+            try:
+                d.close()
+            except Exception:
+                pass
+
+    def _prop(self, wid: int | None, name: str, kind: Any) -> Any:
+        with self._query_lock:
+            win = self._query.screen().root if wid is None else self._query.create_resource_object("window", wid)
+            try:
+                prop = win.get_full_property(self._atoms.get(name) or self._query.intern_atom(name), kind)
+            except self._XError:
+                return None
+        return None if prop is None else prop.value
+
+    def _card(self, wid: int | None, name: str) -> int | None:
+        value = self._prop(wid, name, self._Xatom.CARDINAL if name != "_NET_ACTIVE_WINDOW" else self._Xatom.WINDOW)
+        try:
+            return int(value[0]) if value is not None and len(value) else None
+        except Exception:
+            return None
+
+    def client_list(self) -> list[int]:
+        value = self._prop(None, "_NET_CLIENT_LIST", self._Xatom.WINDOW)
+        return [int(w) for w in value] if value is not None else []
+
+    def active_window(self) -> int | None:
+        return self._card(None, "_NET_ACTIVE_WINDOW")
+
+    def current_desktop(self) -> int | None:
+        return self._card(None, "_NET_CURRENT_DESKTOP")
+
+    def desktop_count(self) -> int | None:
+        return self._card(None, "_NET_NUMBER_OF_DESKTOPS")
+
+    def title(self, wid: int) -> str:
+        for name, kind in (("_NET_WM_NAME", self._atoms["UTF8_STRING"]), ("WM_NAME", self._X.AnyPropertyType)):
+            value = self._prop(wid, name, kind)
+            if value:
+                if isinstance(value, bytes):
+                    return value.decode("utf-8", errors="replace")
+                return str(value)
+        return ""
+
+    def desktop(self, wid: int) -> int | None:
+        return self._card(wid, "_NET_WM_DESKTOP")
+
+    def pid(self, wid: int) -> int | None:
+        return self._card(wid, "_NET_WM_PID")
+
+    def geometry(self, wid: int) -> tuple[int, int, int, int] | None:
+        with self._query_lock:
+            try:
+                win = self._query.create_resource_object("window", wid)
+                geo = win.get_geometry()
+                pos = win.translate_coords(self._query.screen().root, 0, 0)
+            except self._XError:
+                return None
+        return (-int(pos.x), -int(pos.y), int(geo.width), int(geo.height))
+
+    def watch(self, wid: int) -> None:
+        try:
+            win = self._events.create_resource_object("window", wid)
+            win.change_attributes(event_mask=self._X.PropertyChangeMask | self._X.StructureNotifyMask)
+            self._events.flush()
+        except self._XError:
+            return
+
+    def next_event(self) -> tuple | None:
+        ev = self._events.next_event()
+        X = self._X
+        if ev.type == X.PropertyNotify:
+            name = self._names.get(int(ev.atom))
+            if not name:
+                return None
+            wid = int(ev.window.id)
+            if wid == int(self._root.id):
+                return ("root", name)
+            return ("window", wid, name)
+        if ev.type == X.ConfigureNotify:
+            return ("configure", int(ev.window.id))
+        if ev.type == X.DestroyNotify:
+            return ("destroy", int(ev.window.id))
+        return None
+
+
+class WindowRegistry:
+    def __init__(self, backend_factory: Callable[[], Any] | None = None) -> None:
+        self._backend_factory = backend_factory or XlibBackend
+        self._lock = threading.Lock()
+        self._backend: Any = None
+        self._thread: threading.Thread | None = None
+        self._ready = False
+        self._order: list[int] = []
+        self._windows: dict[int, WindowInfo] = {}
+        self._geometry_stale: set[int] = set()
+        self._active: int | None = None
+        self._current_desktop: int | None = None
+        self._desktop_count: int | None = None
+        self._error = ""
+        self._stats = {"events": 0, "lookups": 0, "resyncs": 0, "geometry_fetches": 0}
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def start(self) -> bool:
+        with self._lock:
+            if self._ready:
+                return True
+            try:
+                self._backend = self._backend_factory()
+            except Exception as e:
+                self._error = str(e)[:200]
+                return False
+        try:
+            self._resync()
+        except Exception as e:
+            self._error = f"resync:{type(e).__name__}"
+            self.stop()
+            return False
+        th = threading.Thread(target=self._event_loop, name="x11_registry", daemon=True)
+        self._thread = th
+        with self._lock:
+            self._ready = True
+        th.start()
+        return True
+
+    def stop(self) -> None:
+        with self._lock:
+            self._ready = False
+            backend, self._backend = self._backend, None
+        if backend is not None and hasattr(backend, "close"):
+            backend.close()
+
+    # -- state maintenance (listener thread) ---------------------------------
+
+    def _read_window(self, wid: int) -> WindowInfo:
+        b = self._backend
+        desktop = b.desktop(wid)
+        if desktop == STICKY_DESKTOP:
+            desktop = -1
+        return WindowInfo(format_window_id(wid), title=b.title(wid), desktop=desktop, pid=b.pid(wid))
+
+    def _sync_client_list(self) -> None:
+        order = self._backend.client_list()
+        with self._lock:
+            known = set(self._windows)
+        fresh = {wid: self._read_window(wid) for wid in order if wid not in known}
+        for wid in fresh:
+            self._backend.watch(wid)
+        with self._lock:
+            self._order = list(order)
+            keep = set(order)
+            self._windows = {wid: info for wid, info in self._windows.items() if wid in keep}
+            self._windows.update(fresh)
+            self._geometry_stale &= keep
+
+    def _resync(self) -> None:
+        b = self._backend
+        self._sync_client_list()
+        active, desk, count = b.active_window(), b.current_desktop(), b.desktop_count()
+        with self._lock:
+            self._active = active or None
+            self._current_desktop = desk
+            self._desktop_count = count
+            self._stats["resyncs"] += 1
+
+    def apply_event(self, event: tuple) -> None:
+        kind = event[0]
+        b = self._backend
+        if kind == "root":
+            prop = event[1]
+            if prop == "_NET_CLIENT_LIST":
+                self._sync_client_list()
+            elif prop == "_NET_ACTIVE_WINDOW":
+                active = b.active_window()
+                with self._lock:
+                    self._active = active or None
+            elif prop == "_NET_CURRENT_DESKTOP":
+                desk = b.current_desktop()
+                with self._lock:
+                    self._current_desktop = desk
+            elif prop == "_NET_NUMBER_OF_DESKTOPS":
+                count = b.desktop_count()
+                with self._lock:
+                    self._desktop_count = count
+        elif kind == "window":
+            wid, prop = event[1], event[2]
+            with self._lock:
+                if wid not in self._windows:
+                    return
+            if prop in ("_NET_WM_NAME", "WM_NAME"):
+                change = {"title": b.title(wid)}
+            elif prop == "_NET_WM_DESKTOP":
+                desktop = b.desktop(wid)
+                change = {"desktop": -1 if desktop == STICKY_DESKTOP else desktop}
+            elif prop == "_NET_WM_PID":
+                change = {"pid": b.pid(wid)}
+            else:
+                return
+            with self._lock:
+                info = self._windows.get(wid)
+                if info is not None:
+                    self._windows[wid] = replace(info, **change)
+        elif kind == "configure":
+            with self._lock:
+                if event[1] in self._windows:
+                    self._geometry_stale.add(event[1])
+        elif kind == "destroy":
+            with self._lock:
+                self._windows.pop(event[1], None)
+                self._order = [w for w in self._order if w != event[1]]
+        with self._lock:
+            self._stats["events"] += 1
+
+    def _event_loop(self) -> None:
+        backend = self._backend
+        while self._ready and backend is self._backend:
+            try:
+                event = backend.next_event()
+            except Exception as e:
+                with self._lock:
+                    self._ready = False
+                    self._error = f"event_loop:{type(e).__name__}"
+                if hasattr(backend, "close"):
+                    backend.close()
+                return
+            if event is None:
+                continue
+            try:
+                self.apply_event(event)
+            except Exception:
+                # A window may vanish between the event and the property read;
+                # _NET_CLIENT_LIST will follow and resync the set.
+                continue
+
+    # -- lookups ---------------------------------------------------------------
+
+    def _count_lookup(self) -> None:
+        self._stats["lookups"] += 1
+
+    def windows(self) -> list[WindowInfo]:
+        """Managed windows in `_NET_CLIENT_LIST` order (the order `wmctrl -l` prints)."""
+        with self._lock:
+            self._count_lookup()
+            return [self._windows[w] for w in self._order if w in self._windows]
+
+    def window(self, win_id: str | int) -> WindowInfo | None:
+        wid = parse_window_id(win_id)
+        with self._lock:
+            self._count_lookup()
+            return self._windows.get(wid) if wid is not None else None
+
+    def active_window(self) -> str:
+        with self._lock:
+            self._count_lookup()
+            return format_window_id(self._active) if self._active else ""
+
+    def current_desktop(self) -> int | None:
+        with self._lock:
+            self._count_lookup()
+            return self._current_desktop
+
+    def desktop_ids(self) -> set[int]:
+        with self._lock:
+            self._count_lookup()
+            return set(range(int(self._desktop_count))) if self._desktop_count else set()
+
+    def geometry(self, win_id: str | int) -> tuple[int, int, int, int] | None:
+        wid = parse_window_id(win_id)
+        if wid is None:
+            return None
+        with self._lock:
+            self._count_lookup()
+            info = self._windows.get(wid)
+            if info is not None and info.geometry is not None and wid not in self._geometry_stale:
+                return info.geometry
+        geo = self._backend.geometry(wid)
+        with self._lock:
+            self._stats["geometry_fetches"] += 1
+            info = self._windows.get(wid)
+            if info is not None and geo is not None:
+                self._windows[wid] = replace(info, geometry=geo)
+                self._geometry_stale.discard(wid)
+        return geo
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self._ready,
+                "windows": len(self._windows),
+                "active": format_window_id(self._active) if self._active else "",
+                "current_desktop": self._current_desktop,
+                "error": self._error,
+                **self._stats,
+            }
+
+
+_SHARED: WindowRegistry | None = None
+_SHARED_LOCK = threading.Lock()
+_SHARED_RETRY_AT = 0.0
+_SHARED_RETRY_SEC = 30.0
+
+
+def _registry_enabled() -> bool:
+    if str(os.environ.get("DIRECT_CHAT_X11_REGISTRY", "1")).strip().lower() in ("0", "false", "no", "off"):
+        return False
+    return bool(os.environ.get("DISPLAY"))
+
+
+def shared_registry() -> WindowRegistry | None:
+    """Process-wide registry, started on first use; None means "use wmctrl/xdotool"."""
+    global _SHARED, _SHARED_RETRY_AT
+    reg = _SHARED
+    if reg is not None and reg.ready:
+        return reg
+    if not _registry_enabled():
+        return None
+    with _SHARED_LOCK:
+        if _SHARED is not None and _SHARED.ready:
+            return _SHARED
+        now = time.monotonic()
+        if now < _SHARED_RETRY_AT:
+            return None
+        candidate = WindowRegistry()
+        if candidate.start():
+            _SHARED = candidate
+            return candidate
+        _SHARED_RETRY_AT = now + _SHARED_RETRY_SEC
+        return None
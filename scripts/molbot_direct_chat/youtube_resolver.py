@@ -0,0 +1,141 @@
+"""Query -> YouTube video resolution: concurrent sources, first valid hit wins.
+
+Sources (yt-dlp, SearXNG site/general) run in a shared thread pool; the first
+result accepted by the caller's predicate wins and the rest are cancelled
+(pending futures are dropped, running subprocesses started through
+`run_cancellable` are killed). Wins are cached per normalized query, with a
+shorter TTL for "latest video" queries since a new upload changes the answer.
+"""
+
+from __future__ import annotations
+
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable
+
+from .util import normalize_text
+
+
+Source = Callable[[threading.Event], "str | None"]
+
+
+def run_cancellable(cmd: list[str], timeout_s: float, cancel: threading.Event) -> str:
+    """stdout of `cmd`, or "" on error/timeout/cancel (the process is killed)."""
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    except Exception:
+        return ""
+    deadline = time.monotonic() + float(timeout_s)
+    while True:
+        try:
+            out, _ = proc.communicate(timeout=0.1)
+            return out or ""
+        except subprocess.TimeoutExpired:
+            if cancel.is_set() or time.monotonic() >= deadline:
+                proc.kill()
+                proc.communicate()
+                return ""
+        except Exception:
+            proc.kill()
+            return ""
+
+
+class YouTubeResolver:
+    def __init__(
+        self,
+        ttl_s: float = 6 * 3600.0,
+        latest_ttl_s: float = 600.0,
+        max_entries: int = 256,
+        max_workers: int = 6,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl_s = float(ttl_s)
+        self.latest_ttl_s = float(latest_ttl_s)
+        self.max_entries = max(1, int(max_entries))
+        self._clock = clock
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="yt-resolve")
+        self._lock = threading.Lock()
+        # (normalized query, latest) -> (url, source, stored_at)
+        self._cache: OrderedDict[tuple[str, bool], tuple[str, str, float]] = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "races": 0, "race_wins": 0, "cancelled": 0}
+
+    @staticmethod
+    def _key(query: str, latest: bool) -> tuple[str, bool]:
+        return normalize_text(query or ""), bool(latest)
+
+    def cached(self, query: str, latest: bool = False) -> tuple[str, str] | None:
+        key = self._key(query, latest)
+        ttl = self.latest_ttl_s if latest else self.ttl_s
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is None:
+                self._stats["misses"] += 1
+                return None
+            if (self._clock() - hit[2]) > ttl:
+                self._cache.pop(key, None)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._cache.move_to_end(key)
+            self._stats["hits"] += 1
+            return hit[0], hit[1]
+
+    def store(self, query: str, latest: bool, url: str, source: str) -> None:
+        key = self._key(query, latest)
+        if not key[0] or not url:
+            return
+        with self._lock:
+            self._cache[key] = (url, source, self._clock())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def race(
+        self,
+        sources: list[tuple[str, Source]],
+        accept: Callable[[str], bool],
+        timeout_s: float = 16.0,
+    ) -> tuple[str | None, str]:
+        """(url, source name) of the first accepted result, or (None, "")."""
+        cancel = threading.Event()
+        futures = {self._pool.submit(fn, cancel): name for name, fn in sources}
+        pending = set(futures)
+        deadline = time.monotonic() + float(timeout_s)
+        with self._lock:
+            self._stats["races"] += 1
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for fut in done:
+                    try:
+                        url = fut.result()
+                    except Exception:
+                        url = None
+                    if url and accept(url):
+                        with self._lock:
+                            self._stats["race_wins"] += 1
+                        return url, futures[fut]
+            return None, ""
+        finally:
+            cancel.set()
+            if pending:
+                for fut in pending:
+                    fut.cancel()
+                with self._lock:
+                    self._stats["cancelled"] += len(pending)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._cache), **self._stats}
+
+
+RESOLVER = YouTubeResolver()
@@ -24,18 +24,103 @@ from urllib.parse import parse_qs, urlparse
 from urllib.parse import quote_plus
 from urllib.request import Request, urlopen
 from datetime import datetime, timezone
+from functools import cached_property
 
 import requests
 
 from molbot_direct_chat import desktop_ops, web_ask, web_search
+from molbot_direct_chat.catalog_refresher import CatalogRefresher as _CatalogRefresher
+from molbot_direct_chat.frame_diff import FrameDiffEngine
+from molbot_direct_chat.guardrail import GuardrailEngine as _GuardrailEngine
+from molbot_direct_chat.history_store import HISTORY as _HISTORY
+from molbot_direct_chat.intent_router import Intent, IntentRouter
+from molbot_direct_chat.ocr_service import OCR as _OCR
+from molbot_direct_chat.ollama_session import WARMER as _OLLAMA_WARMER
+from molbot_direct_chat.ollama_session import native_chat_payload as _ollama_native_payload
+from molbot_direct_chat.page_fetch import PAGES as _PAGES
+from molbot_direct_chat.prompt_budget import fit_messages as _fit_messages
+from molbot_direct_chat.proc_index import PROC_INDEX as _PROC_INDEX
+from molbot_direct_chat.proc_index import profile_directory_from_args as _profile_directory_from_args  # noqa: F401
+from molbot_direct_chat.prom_metrics import Registry as _PromRegistry
+from molbot_direct_chat.reader_prefetch import ReaderPrefetcher
 from molbot_direct_chat.reader_ui_html import READER_HTML
+from molbot_direct_chat.tracing import TRACER as _TRACER
 from molbot_direct_chat.ui_html import HTML as UI_HTML
 from molbot_direct_chat.util import extract_url as _extract_url
 from molbot_direct_chat.util import normalize_text as _normalize_text
 from molbot_direct_chat.util import safe_session_id as _safe_session_id
+from molbot_direct_chat.x11_registry import shared_registry as _x11_registry
+from molbot_direct_chat.youtube_resolver import RESOLVER as _YOUTUBE_RESOLVER
+from molbot_direct_chat.youtube_resolver import run_cancellable as _run_cancellable
 
 _VRAM_CACHE = {"ts": 0.0, "data": None}
-_MODEL_CATALOG_CACHE = {"ts": 0.0, "data": None}
+
+# Prometheus exposition (`GET /metrics`). Updated in place on the hot path; queue
+# depth gauges are read at scrape time (see `_register_prom_gauges`).
+_PROM = _PromRegistry()
+_PROM_HTTP_SECONDS = _PROM.histogram(
+    "direct_chat_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")
+)
+_PROM_HTTP_REQUESTS = _PROM.counter(
+    "direct_chat_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+# Route label values: anything else (typos, scanner probes) is "unmatched", so
+# unknown paths cannot use up the family's series cap and push real routes into "other".
+_HTTP_ROUTES = frozenset(
+    {
+        "/",
+        "/favicon.ico",
+        "/metrics",
+        "/reader",
+        "/api/chat",
+        "/api/chat/poll",
+        "/api/chat/stream",
+        "/api/history",
+        "/api/metrics",
+        "/api/models",
+        "/api/reader",
+        "/api/reader/books",
+        "/api/reader/progress",
+        "/api/reader/rescan",
+        "/api/reader/session",
+        "/api/reader/session/barge-in",
+        "/api/reader/session/barge_in",
+        "/api/reader/session/commit",
+        "/api/reader/session/next",
+        "/api/reader/session/start",
+        "/api/stt/diag",
+        "/api/stt/inject",
+        "/api/stt/level",
+        "/api/stt/poll",
+        "/api/trace/recent",
+        "/api/voice",
+    }
+)
+_PROM_MODEL_SECONDS = _PROM.histogram(
+    "direct_chat_model_backend_duration_seconds", "Model backend call latency.", ("backend", "outcome")
+)
+_PROM_TTS_SYNTH_SECONDS = _PROM.histogram(
+    "direct_chat_tts_synth_duration_seconds", "TTS synthesis time per chunk.", ("engine",)
+)
+_PROM_TTS_FIRST_AUDIO_SECONDS = _PROM.histogram(
+    "direct_chat_tts_playback_start_seconds", "Time from TTS enqueue to first audio playback."
+)
+_PROM_TTS_PLAY_SECONDS = _PROM.histogram(
+    "direct_chat_tts_chunk_playback_seconds", "Playback time per TTS chunk.", buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 40.0, 80.0)
+)
+_PROM_TTS_STREAMS = _PROM.counter("direct_chat_tts_streams_total", "Finished TTS streams by result.", ("result",))
+_PROM_STT_DROPS = _PROM.counter("direct_chat_stt_drops_total", "STT items dropped by reason.", ("reason",))
+_PROM_READER_INTERVAL_SECONDS = _PROM.histogram(
+    "direct_chat_reader_chunk_interval_seconds",
+    "Time between consecutive reader chunk commits.",
+    ("mode",),
+    buckets=(1.0, 2.5, 5.0, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 120.0, 300.0),
+)
+_PROM_QUEUE_DEPTH = _PROM.gauge("direct_chat_queue_depth", "Current depth of internal queues.", ("queue",))
+_PROM_RSS_BYTES = _PROM.gauge("direct_chat_process_resident_memory_bytes", "Resident memory of the DC process.")
+_PROM_SEARXNG_CACHE = _PROM.counter(
+    "direct_chat_searxng_cache_events_total", "SearXNG result cache events since start.", ("event",)
+)
 
 
 SCRIPT_DIR = Path(__file__).resolve().parent
@@ -387,6 +472,7 @@ def _reader_mark_barge_in_from_stream(
         sid = _safe_session_id(str(pending.get("session_id", "")))
     if not sid:
         return
+    _reader_prefetch_invalidate(sid, reason=str(reason or "barge_in"))
     pm = playback_ms
     if pm is None and stream_id > 0:
         try:
@@ -1400,6 +1486,7 @@ class STTManager:
         r = str(reason or "drop_unknown")[:120]
         self._drop_reason = r
         self._drop_reason_counts[r] = int(self._drop_reason_counts.get(r, 0) or 0) + 1
+        _PROM_STT_DROPS.inc(r.split(":", 1)[0][:48])
         if any(k in r for k in ("text_", "command_", "tts_guard_", "empty_text")):
             self._items_dropped_text += 1
         else:
@@ -2029,12 +2116,8 @@ def _voice_chat_model_payload(session_id: str) -> dict:
     backend_override = str(os.environ.get("DIRECT_CHAT_STT_BRIDGE_BACKEND", "")).strip().lower()
     if backend_override in ("cloud", "local"):
         backend = backend_override
-    history = _load_history(sid, model=model_id, backend=backend)
     hist_limit = max(0, _int_env("DIRECT_CHAT_STT_BRIDGE_HISTORY_MAX", 24))
-    if isinstance(history, list) and hist_limit > 0:
-        history = history[-hist_limit:]
-    elif hist_limit <= 0:
-        history = []
+    history = _load_history(sid, model=model_id, backend=backend, limit=hist_limit)[-hist_limit:] if hist_limit > 0 else []
     return {
         "session_id": sid,
         "model": model_id,
@@ -2192,6 +2275,7 @@ def _apply_voice_pause_interrupt(session_id: str, source: str = "voice_cmd", key
         key = "voz" if src in ("voice_any", "stt_any") else "detenete"
     reader_active = bool(_reader_voice_any_barge_target_active(sid))
     if reader_active:
+        _reader_prefetch_invalidate(sid, reason="reader_user_paused")
         _READER_STORE.set_continuous(sid, False, reason="reader_user_paused")
         _READER_STORE.set_reader_state(sid, "paused", reason="reader_user_paused")
     if _tts_is_playing():
@@ -3041,7 +3125,9 @@ def _tts_speak_alltalk(text: str, state: dict) -> tuple[Path | None, str]:
         return None, f"alltalk_request_error:{e}"
 
 
+@_TRACER.wrap("speak_reply_async")
 def _speak_reply_async(text: str) -> int:
+    trace, queued_ns = _TRACER.current(), time.time_ns()
     stream_id, stop_event = _start_new_tts_stream()
     _set_voice_status(stream_id, None, "queued")
 
@@ -3058,6 +3144,7 @@ def _speak_reply_async(text: str) -> int:
                     return
                 _TTS_PLAYING_STREAM_ID = stream_id
                 _TTS_PLAYING_EVENT.set()
+            _TRACER.add_span(trace, "tts_playback_start", queued_ns, stream_id=stream_id, dry_run=True)
             _tts_touch()
             interrupted = False
             try:
@@ -3106,12 +3193,22 @@ def _speak_reply_async(text: str) -> int:
                 for chunk in chunks:
                     if stop_event.is_set():
                         return
-                    wav_path, detail = _tts_speak_alltalk(chunk, state)
+                    t_synth = time.perf_counter()
+                    wav_path = _READER_PREFETCH.take(chunk, wait_s=_alltalk_tts_timeout_sec())
+                    if wav_path is not None:
+                        detail = "ok_prefetched"
+                        _PROM_TTS_SYNTH_SECONDS.observe(time.perf_counter() - t_synth, "prefetched")
+                    else:
+                        wav_path, detail = _tts_speak_alltalk(chunk, state)
+                        if wav_path is not None:
+                            _PROM_TTS_SYNTH_SECONDS.observe(time.perf_counter() - t_synth, "alltalk")
                     if wav_path is None:
+                        t_synth = time.perf_counter()
                         fb_path, fb_detail = _tts_speak_local_fallback(chunk)
                         if fb_path is None:
                             producer_error["detail"] = f"{detail}|{fb_detail}"
                             return
+                        _PROM_TTS_SYNTH_SECONDS.observe(time.perf_counter() - t_synth, "fallback")
                         wav_path, detail = fb_path, fb_detail
                     while not stop_event.is_set():
                         try:
@@ -3166,7 +3263,11 @@ def _speak_reply_async(text: str) -> int:
                 if not playback_started:
                     playback_started = True
                     _mark_tts_stream_playback_start(stream_id)
+                    _TRACER.add_span(trace, "tts_playback_start", queued_ns, stream_id=stream_id)
+                    _PROM_TTS_FIRST_AUDIO_SECONDS.observe((time.time_ns() - queued_ns) / 1e9)
+                t_play = time.perf_counter()
                 ok, detail = _play_audio_blocking(item, stop_event)
+                _PROM_TTS_PLAY_SECONDS.observe(time.perf_counter() - t_play)
                 try:
                     item.unlink(missing_ok=True)
                 except Exception:
@@ -3192,18 +3293,19 @@ def _speak_reply_async(text: str) -> int:
                     _TTS_PLAYING_EVENT.clear()
             _tts_touch()
 
-        if interrupted:
-            _set_voice_status(stream_id, False, _pop_tts_stop_reason(stream_id))
-            return
-        if stop_event.is_set():
+        if interrupted or stop_event.is_set():
+            _PROM_TTS_STREAMS.inc("interrupted")
             _set_voice_status(stream_id, False, _pop_tts_stop_reason(stream_id))
             return
         if producer_error["detail"]:
+            _PROM_TTS_STREAMS.inc("error")
             _set_voice_status(stream_id, False, producer_error["detail"])
             return
         if played_any:
+            _PROM_TTS_STREAMS.inc("ok")
             _set_voice_status(stream_id, True, last_detail)
             return
+        _PROM_TTS_STREAMS.inc("no_audio")
         _set_voice_status(stream_id, False, "tts_no_audio")
 
     try:
@@ -3222,7 +3324,34 @@ def _maybe_speak_reply(reply: str, allowed_tools: set[str]) -> None:
     _speak_reply_async(reply)
 
 
+def _wmctrl_rows() -> list[tuple[str, str, str, str]]:
+    """(win_id, desktop, pid, title) per managed window, as `wmctrl -lp` prints them."""
+    reg = _x11_registry()
+    if reg is not None:
+        return [
+            (w.win_id, str(w.desktop if w.desktop is not None else -1), str(w.pid or 0), w.title or "N/A")
+            for w in reg.windows()
+        ]
+    if not shutil.which("wmctrl"):
+        return []
+    try:
+        proc = subprocess.run(["wmctrl", "-lp"], capture_output=True, text=True, timeout=3)
+    except Exception:
+        return []
+    rows: list[tuple[str, str, str, str]] = []
+    for line in (proc.stdout or "").splitlines():
+        parts = line.split(None, 4)
+        if len(parts) < 5:
+            continue
+        wid, desk_raw, pid_raw, _host, title = parts
+        rows.append((wid, desk_raw, pid_raw, title))
+    return rows
+
+
 def _wmctrl_list() -> dict[str, str]:
+    reg = _x11_registry()
+    if reg is not None:
+        return {w.win_id: (w.title.strip() or "N/A") for w in reg.windows()}
     if not shutil.which("wmctrl"):
         return {}
     try:
@@ -3242,6 +3371,9 @@ def _wmctrl_list() -> dict[str, str]:
 
 
 def _wmctrl_desktop_ids() -> set[int]:
+    reg = _x11_registry()
+    if reg is not None:
+        return reg.desktop_ids()
     if not shutil.which("wmctrl"):
         return set()
     try:
@@ -3261,6 +3393,9 @@ def _wmctrl_desktop_ids() -> set[int]:
 
 
 def _wmctrl_active_desktop() -> int | None:
+    reg = _x11_registry()
+    if reg is not None:
+        return reg.current_desktop()
     if not shutil.which("wmctrl"):
         return None
     try:
@@ -3282,38 +3417,12 @@ def _wmctrl_current_desktop() -> int | None:
 
 
 def _pid_cmd_args(pid_raw: str) -> list[str]:
-    try:
-        pid = int(str(pid_raw).strip())
-    except Exception:
-        return []
-    try:
-        raw = Path(f"/proc/{pid}/cmdline").read_bytes()
-    except Exception:
-        return []
-    return [p.decode("utf-8", errors="ignore").strip() for p in raw.split(b"\x00") if p]
-
-
-def _profile_directory_from_args(args: list[str]) -> str:
-    for i, arg in enumerate(args):
-        if arg.startswith("--profile-directory="):
-            return arg.split("=", 1)[1].strip().strip("'\"")
-        if arg == "--profile-directory" and (i + 1) < len(args):
-            return args[i + 1].strip().strip("'\"")
-    merged = " ".join(args)
-    m = re.search(r"--profile-directory=(.+?)(?:\s--|$)", merged)
-    if m:
-        return m.group(1).strip().strip("'\"")
-    m = re.search(r"--profile-directory\s+(.+?)(?:\s--|$)", merged)
-    if m:
-        return m.group(1).strip().strip("'\"")
-    return ""
+    info = _PROC_INDEX.get(pid_raw)
+    return list(info.args) if info is not None else []
 
 
 def _pid_profile_directory(pid_raw: str) -> str:
-    args = _pid_cmd_args(pid_raw)
-    if not args:
-        return ""
-    return _profile_directory_from_args(args)
+    return _PROC_INDEX.profile_directory(pid_raw)
 
 
 def _window_matches_profile(pid_raw: str, expected_profile: str | None) -> bool:
@@ -3340,6 +3449,9 @@ def _xdotool_command(args: list[str], timeout: float = 3.0) -> tuple[int, str]:
 
 
 def _xdotool_window_geometry(win_id: str) -> tuple[int, int, int, int] | None:
+    reg = _x11_registry()
+    if reg is not None:
+        return reg.geometry(win_id)
     rc, out = _xdotool_command(["getwindowgeometry", "--shell", win_id], timeout=2.0)
     if rc != 0 or not out:
         return None
@@ -3361,6 +3473,9 @@ def _xdotool_window_geometry(win_id: str) -> tuple[int, int, int, int] | None:
 
 
 def _xdotool_active_window() -> str:
+    reg = _x11_registry()
+    if reg is not None:
+        return reg.active_window()
     rc, out = _xdotool_command(["getactivewindow"], timeout=1.5)
     if rc != 0 or not out:
         return ""
@@ -3374,23 +3489,13 @@ def _xdotool_active_window() -> str:
 
 
 def _wmctrl_window_desktop(win_id: str) -> int | None:
-    if not shutil.which("wmctrl"):
-        return None
-    try:
-        proc = subprocess.run(["wmctrl", "-lp"], capture_output=True, text=True, timeout=3)
-        for line in (proc.stdout or "").splitlines():
-            parts = line.split(None, 4)
-            if len(parts) < 5:
-                continue
-            wid, desk_raw, _pid, _host, _title = parts
-            if wid.strip().lower() != win_id.strip().lower():
-                continue
-            try:
-                return int(desk_raw)
-            except Exception:
-                return None
-    except Exception:
-        return None
+    for wid, desk_raw, _pid, _title in _wmctrl_rows():
+        if wid.strip().lower() != win_id.strip().lower():
+            continue
+        try:
+            return int(desk_raw)
+        except Exception:
+            return None
     return None
 
 
@@ -3428,16 +3533,23 @@ def _site_title_looks_loaded(site_key: str | None, url: str, title: str) -> bool
 def _find_new_profiled_chrome_window(
     before_ids: set[str], expected_profile: str | None, max_desktops: int = 16, timeout_s: float = 10.0
 ) -> tuple[str, int | None]:
+    expected = str(expected_profile or "").strip().lower()
     deadline = time.time() + max(0.8, timeout_s)
     while time.time() < deadline:
+        # One window listing per poll (not one per desktop), one /proc lookup per PID.
+        by_desktop = _wmctrl_windows_by_desktop()
         for desk_idx in range(max_desktops):
-            for wid, pid_raw, title in _wmctrl_windows_for_desktop(desk_idx):
-                if wid in before_ids:
-                    continue
-                t = str(title).lower()
-                if not any(tok in t for tok in ("chrome", "google", "gemini", "about:blank")):
-                    continue
-                if expected_profile and not _window_matches_profile(pid_raw, expected_profile):
+            wins = [
+                (wid, pid_raw, title)
+                for wid, pid_raw, title in by_desktop.get(desk_idx, [])
+                if wid not in before_ids
+                and any(tok in str(title).lower() for tok in ("chrome", "google", "gemini", "about:blank"))
+            ]
+            if not wins:
+                continue
+            profiles = _window_profiles(wins) if expected else {}
+            for wid, _pid_raw, _title in wins:
+                if expected and profiles.get(wid, "").strip().lower() != expected:
                     continue
                 return wid, desk_idx
         time.sleep(0.12)
@@ -3466,26 +3578,40 @@ def _preferred_workspace_and_anchor(expected_profile: str | None = None) -> tupl
     return desk, ""
 
 
+def _wmctrl_windows_by_desktop() -> dict[int, list[tuple[str, str, str]]]:
+    out: dict[int, list[tuple[str, str, str]]] = {}
+    for wid, desk_raw, pid_raw, title in _wmctrl_rows():
+        try:
+            desk = int(desk_raw)
+        except Exception:
+            continue
+        out.setdefault(desk, []).append((wid, pid_raw, title))
+    return out
+
+
+def _window_profiles(windows: list[tuple[str, str, str]]) -> dict[str, str]:
+    """Profile directory per window id; each distinct PID is resolved once."""
+    infos = _PROC_INDEX.resolve_many(pid_raw for _wid, pid_raw, _title in windows)
+    out: dict[str, str] = {}
+    for wid, pid_raw, _title in windows:
+        try:
+            info = infos.get(int(str(pid_raw).strip()))
+        except Exception:
+            info = None
+        out[wid] = info.profile_directory if info is not None else ""
+    return out
+
+
 def _wmctrl_windows_for_desktop(desktop_idx: int) -> list[tuple[str, str, str]]:
-    if not shutil.which("wmctrl"):
-        return []
     out: list[tuple[str, str, str]] = []
-    try:
-        proc = subprocess.run(["wmctrl", "-lp"], capture_output=True, text=True, timeout=3)
-        for line in (proc.stdout or "").splitlines():
-            parts = line.split(None, 4)
-            if len(parts) < 5:
-                continue
-            wid, desk_raw, pid_raw, _host, title = parts
-            try:
-                desk = int(desk_raw)
-            except Exception:
-                continue
-            if desk != desktop_idx:
-                continue
-            out.append((wid, pid_raw, title))
-    except Exception:
-        return []
+    for wid, desk_raw, pid_raw, title in _wmctrl_rows():
+        try:
+            desk = int(desk_raw)
+        except Exception:
+            continue
+        if desk != desktop_idx:
+            continue
+        out.append((wid, pid_raw, title))
     return out
 
 
@@ -3604,53 +3730,33 @@ def _gemini_window_requires_login(win_id: str) -> tuple[bool, str]:
 def _wmctrl_current_desktop_site_windows(
     site_key: str, expected_profile: str | None = None, desktop_idx: int | None = None
 ) -> list[tuple[str, str]]:
-    if not shutil.which("wmctrl"):
-        return []
     desk = desktop_idx if desktop_idx is not None else _wmctrl_current_desktop()
     if desk is None:
         return []
     token = "gemini" if site_key == "gemini" else ("chatgpt" if site_key == "chatgpt" else site_key)
     out: list[tuple[str, str]] = []
-    try:
-        proc = subprocess.run(["wmctrl", "-lp"], capture_output=True, text=True, timeout=3)
-        for line in (proc.stdout or "").splitlines():
-            parts = line.split(None, 4)
-            if len(parts) < 5:
-                continue
-            win_id, desktop_raw, pid_raw, _host, title = parts
-            try:
-                desktop_i = int(desktop_raw)
-            except Exception:
-                continue
-            title_n = title.lower().strip()
-            if desktop_i != desk:
-                continue
-            if token not in title_n:
-                continue
-            if "molbot direct chat" in title_n:
-                continue
-            if expected_profile and not _window_matches_profile(pid_raw, expected_profile):
-                continue
-            out.append((win_id, title))
-    except Exception:
-        return []
+    for win_id, desktop_raw, pid_raw, title in _wmctrl_rows():
+        try:
+            desktop_i = int(desktop_raw)
+        except Exception:
+            continue
+        title_n = title.lower().strip()
+        if desktop_i != desk:
+            continue
+        if token not in title_n:
+            continue
+        if "molbot direct chat" in title_n:
+            continue
+        if expected_profile and not _window_matches_profile(pid_raw, expected_profile):
+            continue
+        out.append((win_id, title))
     return out
 
 
 def _wmctrl_window_pid(win_id: str) -> str | None:
-    if not shutil.which("wmctrl"):
-        return None
-    try:
-        proc = subprocess.run(["wmctrl", "-lp"], capture_output=True, text=True, timeout=3)
-        for line in (proc.stdout or "").splitlines():
-            parts = line.split(None, 4)
-            if len(parts) < 3:
-                continue
-            wid, _desktop_raw, pid_raw = parts[:3]
-            if wid.lower().strip() == str(win_id).lower().strip():
-                return pid_raw
-    except Exception:
-        return None
+    for wid, _desktop_raw, pid_raw, _title in _wmctrl_rows():
+        if wid.lower().strip() == str(win_id).lower().strip():
+            return pid_raw
     return None
 
 
@@ -3775,15 +3881,55 @@ def _capture_window_snapshot(win_id: str, out_path: Path) -> bool:
     return out_path.exists()
 
 
+def _capture_window_image(win_id: str) -> bytes | None:
+    """PNG bytes of a window, kept in memory (OCR-only snapshots need no file)."""
+    import_bin = shutil.which("import")
+    if not import_bin:
+        return None
+    try:
+        proc = subprocess.run(
+            [import_bin, "-window", win_id, "png:-"],
+            capture_output=True,
+            timeout=4,
+        )
+    except Exception:
+        return None
+    return proc.stdout or None
+
+
+def _capture_player_frame(win_id: str) -> bytes | None:
+    """Raw 8-bit grayscale thumbnail of the YouTube player region (no PNG, no file)."""
+    import_bin = shutil.which("import")
+    geom = _xdotool_window_geometry(win_id) if import_bin else None
+    if not geom:
+        return None
+    _, _, gw, gh = geom
+    x0, y0, x1, y1 = _YOUTUBE_PLAYER_REGION
+    crop = f"{max(1, int((x1 - x0) * gw))}x{max(1, int((y1 - y0) * gh))}+{int(x0 * gw)}+{int(y0 * gh)}"
+    tw, th = _YOUTUBE_FRAME_THUMB
+    try:
+        proc = subprocess.run(
+            [import_bin, "-window", win_id, "-crop", crop, "+repage", "-resize", f"{tw}x{th}!",
+             "-colorspace", "Gray", "-depth", "8", "gray:-"],
+            capture_output=True,
+            timeout=3,
+        )
+    except Exception:
+        return None
+    data = proc.stdout or b""
+    return data if len(data) == tw * th else None
+
+
+_FRAME_DIFF = FrameDiffEngine(capture=_capture_player_frame)
+
+
 def _youtube_try_skip_ads(win_id: str, timeout_s: float = 7.0) -> tuple[int, str]:
     geom = _xdotool_window_geometry(win_id)
     if not geom:
         return 0, "geometry_not_found"
     gx, gy, gw, gh = geom
-    screen_dir = Path.home() / ".openclaw" / "logs" / "youtube_transport_screens"
-    screen_dir.mkdir(parents=True, exist_ok=True)
 
-    can_ocr = bool(shutil.which("tesseract")) and bool(shutil.which("import"))
+    can_ocr = _OCR.available() and bool(shutil.which("import"))
     if not can_ocr:
         return 0, "skip_ocr_unavailable"
 
@@ -3793,8 +3939,8 @@ def _youtube_try_skip_ads(win_id: str, timeout_s: float = 7.0) -> tuple[int, str
     loops = 0
     while time.time() < deadline:
         loops += 1
-        snap = screen_dir / f"youtube_transport_{int(time.time() * 1000)}.png"
-        if not _capture_window_snapshot(win_id, snap):
+        snap = _capture_window_image(win_id)
+        if not snap:
             last_detail = "snapshot_failed"
             break
         txt = _ocr_read_text(snap)
@@ -3861,19 +4007,22 @@ def _youtube_read_playback_second(win_id: str) -> int | None:
         my = gy + max(42, int(gh * 0.86))
         _xdotool_command(["mousemove", str(mx), str(my)], timeout=2.0)
         time.sleep(0.10)
-    screen_dir = Path.home() / ".openclaw" / "logs" / "youtube_transport_screens"
-    screen_dir.mkdir(parents=True, exist_ok=True)
-    snap = screen_dir / f"youtube_clock_{int(time.time() * 1000)}.png"
-    if not _capture_window_snapshot(win_id, snap):
-        return None
-    txt = _ocr_read_text(snap)
-    if not txt:
+    snap = _capture_window_image(win_id)
+    if not snap:
         return None
-    # Typical OCR match: "0:03 / 53:41".
-    m = re.search(r"\b(\d{1,2}):(\d{2})\s*/\s*\d{1,2}:\d{2}\b", txt)
-    if not m:
-        # Fallback: first mm:ss token seen in the controls.
-        m = re.search(r"\b(\d{1,2}):(\d{2})\b", txt)
+    m = None
+    # Player bar first; whole frame only if the controls were not found there.
+    for region in (_YOUTUBE_PLAYER_BAR_REGION, None):
+        txt = _ocr_read_text(snap, region)
+        if not txt:
+            continue
+        # Typical OCR match: "0:03 / 53:41".
+        m = re.search(r"\b(\d{1,2}):(\d{2})\s*/\s*\d{1,2}:\d{2}\b", txt)
+        if not m:
+            # Fallback: first mm:ss token seen in the controls.
+            m = re.search(r"\b(\d{1,2}):(\d{2})\b", txt)
+        if m:
+            break
     if not m:
         return None
     try:
@@ -3923,7 +4072,7 @@ def _youtube_wait_loaded_title(win_id: str, timeout_s: float = 16.0) -> tuple[bo
     return False, last
 
 
-def _youtube_visual_progress(win_id: str, interval_s: float = 2.8) -> tuple[bool, str]:
+def _youtube_visual_progress_snapshots(win_id: str, interval_s: float = 2.8) -> tuple[bool, str]:
     screen_dir = Path.home() / ".openclaw" / "logs" / "youtube_transport_screens"
     screen_dir.mkdir(parents=True, exist_ok=True)
     p1 = screen_dir / f"youtube_visual_{int(time.time() * 1000)}_a.png"
@@ -3943,6 +4092,30 @@ def _youtube_visual_progress(win_id: str, interval_s: float = 2.8) -> tuple[bool
     return False, "visual_static"
 
 
+def _youtube_toggle_playback(win_id: str) -> int:
+    """Send YouTube's 'k' (play/pause) and drop the window's frame-diff baseline.
+
+    A baseline captured before the toggle shows the previous playback state, so
+    comparing against it would count the transition itself as motion.
+    """
+    rc, _ = _xdotool_command(["key", "--window", win_id, "k"], timeout=2.0)
+    _FRAME_DIFF.forget(win_id)
+    return rc
+
+
+def _youtube_visual_progress(win_id: str, interval_s: float = 2.8) -> tuple[bool, str]:
+    """Frame-diff on the player region; `interval_s` is now only the upper bound.
+
+    Falls back to two full-window snapshots when the frame-diff path is disabled
+    or cannot capture (no ImageMagick, no geometry).
+    """
+    if _env_flag("DIRECT_CHAT_YT_FRAME_DIFF", True):
+        ok, detail = _FRAME_DIFF.progress(win_id, max_wait_s=float(interval_s))
+        if not detail.startswith("visual_snap_"):
+            return ok, detail
+    return _youtube_visual_progress_snapshots(win_id, interval_s=interval_s)
+
+
 def _best_youtube_window_candidate(wins: list[tuple[str, str]]) -> tuple[str, str] | None:
     best: tuple[str, str] | None = None
     best_score = -10**9
@@ -4033,7 +4206,7 @@ def _youtube_transport_action(action: str, close_window: bool = False, session_i
     rc_key = 0
     if action_norm != "play":
         # YouTube keyboard control: 'k' toggles play/pause consistently across layouts.
-        rc_key, _ = _xdotool_command(["key", "--window", win_id, "k"], timeout=2.0)
+        rc_key = _youtube_toggle_playback(win_id)
         if rc_key != 0:
             return False, f"youtube_key_toggle_failed win={win_id}"
 
@@ -4055,7 +4228,7 @@ def _youtube_transport_action(action: str, close_window: bool = False, session_i
                     )
                 else:
                     # Rescue path: if ad is visible but static, one toggle can resume.
-                    rc_key, _ = _xdotool_command(["key", "--window", win_id, "k"], timeout=2.0)
+                    rc_key = _youtube_toggle_playback(win_id)
                     if rc_key != 0:
                         return False, f"youtube_key_toggle_failed win={win_id}"
                     toggle_count += 1
@@ -4063,7 +4236,7 @@ def _youtube_transport_action(action: str, close_window: bool = False, session_i
                         f"ad_detected_rescue_toggle:{pre_progress_detail};confirm={pre2_detail};visual={vis_detail_pre}"
                     )
         else:
-            rc_key, _ = _xdotool_command(["key", "--window", win_id, "k"], timeout=2.0)
+            rc_key = _youtube_toggle_playback(win_id)
             if rc_key != 0:
                 return False, f"youtube_key_toggle_failed win={win_id}"
             toggle_count += 1
@@ -4077,7 +4250,7 @@ def _youtube_transport_action(action: str, close_window: bool = False, session_i
         if (not progressing) and str(progress_detail).startswith("clock_stalled") and (not ad_detected):
             # If autoplay already started, first toggle can pause at 0:00.
             # Re-toggle once and verify progress again.
-            _xdotool_command(["key", "--window", win_id, "k"], timeout=2.0)
+            _youtube_toggle_playback(win_id)
             toggle_count += 1
             time.sleep(0.20)
             progressing2, progress_detail2 = _youtube_is_progressing(win_id, wait_s=1.35)
@@ -4092,7 +4265,7 @@ def _youtube_transport_action(action: str, close_window: bool = False, session_i
             elif ad_detected and toggle_count <= 1:
                 # OCR can fail for the ad timer; if ad frame is static, retry one
                 # explicit resume and validate with visual movement.
-                rc_key, _ = _xdotool_command(["key", "--window", win_id, "k"], timeout=2.0)
+                rc_key = _youtube_toggle_playback(win_id)
                 if rc_key == 0:
                     toggle_count += 1
                     time.sleep(0.20)
@@ -4101,7 +4274,7 @@ def _youtube_transport_action(action: str, close_window: bool = False, session_i
                         progressing = True
                     progress_detail = f"{progress_detail};ad_rescue_visual={vis_detail2}"
             elif toggle_count <= 0 and (not ad_detected):
-                rc_key, _ = _xdotool_command(["key", "--window", win_id, "k"], timeout=2.0)
+                rc_key = _youtube_toggle_playback(win_id)
                 if rc_key == 0:
                     toggle_count += 1
                     time.sleep(0.20)
@@ -4238,19 +4411,17 @@ def _extract_gemini_ask_request(message: str) -> str | None:
     return prompt[:320]
 
 
-def _ocr_read_text(image_path: Path) -> str:
-    if not shutil.which("tesseract"):
-        return ""
-    try:
-        proc = subprocess.run(
-            ["tesseract", str(image_path), "stdout"],
-            capture_output=True,
-            text=True,
-            timeout=8,
-        )
-        return re.sub(r"\s+", " ", (proc.stdout or "").lower()).strip()
-    except Exception:
-        return ""
+# Fractional (x0, y0, x1, y1) region of a YouTube window holding the player
+# controls (left column, lower part) in both default and theater layouts.
+_YOUTUBE_PLAYER_BAR_REGION = (0.0, 0.35, 0.78, 1.0)
+# Video area in both default and theater layouts, above the controls bar so the
+# fading overlay after a toggle does not read as motion.
+_YOUTUBE_PLAYER_REGION = (0.05, 0.15, 0.62, 0.55)
+_YOUTUBE_FRAME_THUMB = (64, 36)
+
+
+def _ocr_read_text(image: Path | bytes, region: tuple[float, float, float, float] | None = None) -> str:
+    return _OCR.read(image, region).text
 
 
 def _ocr_contains_text(image_path: Path, expected: str) -> bool:
@@ -4278,7 +4449,7 @@ def _ocr_contains_text(image_path: Path, expected: str) -> bool:
         return False
 
 
-def _ocr_contains_any(image_path: Path, expected_terms: list[str]) -> bool:
+def _ocr_contains_any(image_path: Path | bytes, expected_terms: list[str]) -> bool:
     txt = _ocr_read_text(image_path)
     if not txt:
         return False
@@ -4289,46 +4460,17 @@ def _ocr_contains_any(image_path: Path, expected_terms: list[str]) -> bool:
     return False
 
 
-def _ocr_phrase_centers(image_path: Path, phrase: str) -> list[tuple[int, int]]:
-    if not shutil.which("tesseract"):
-        return []
-    try:
-        proc = subprocess.run(
-            ["tesseract", str(image_path), "stdout", "hocr"],
-            capture_output=True,
-            text=True,
-            timeout=10,
-        )
-        raw = proc.stdout or ""
-    except Exception:
-        return []
-    if not raw.strip():
-        return []
-
+def _ocr_phrase_centers(
+    image_path: Path | bytes, phrase: str, region: tuple[float, float, float, float] | None = None
+) -> list[tuple[int, int]]:
     words: list[tuple[str, tuple[int, int, int, int]]] = []
-    for m in re.finditer(
-        r"<span[^>]*class=[\"']ocrx_word[\"'][^>]*title=[\"']([^\"']+)[\"'][^>]*>(.*?)</span>",
-        raw,
-        flags=re.IGNORECASE | re.DOTALL,
-    ):
-        title = m.group(1) or ""
-        body = re.sub(r"<[^>]+>", "", m.group(2) or "")
-        body = html.unescape(body).strip()
-        if not body:
-            continue
-        bb = re.search(r"bbox\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)", title)
-        if not bb:
-            continue
-        try:
-            x1, y1, x2, y2 = [int(bb.group(i)) for i in range(1, 5)]
-        except Exception:
-            continue
-        norm_word = re.sub(r"[^\wáéíóúüñ]+", "", _normalize_text(body))
+    for word in _OCR.read(image_path, region).words:
+        norm_word = re.sub(r"[^\wáéíóúüñ]+", "", _normalize_text(word.text))
         if not norm_word:
             continue
-        words.append((norm_word, (x1, y1, x2, y2)))
+        words.append((norm_word, word.bbox))
     if not words:
-        return None
+        return []
 
     tokens = [w for w, _ in words]
     pnorm = _normalize_text(phrase)
@@ -4355,7 +4497,7 @@ def _ocr_phrase_centers(image_path: Path, phrase: str) -> list[tuple[int, int]]:
     return out
 
 
-def _ocr_find_phrase_center(image_path: Path, phrases: list[str]) -> tuple[int, int] | None:
+def _ocr_find_phrase_center(image_path: Path | bytes, phrases: list[str]) -> tuple[int, int] | None:
     for phrase in phrases:
         centers = _ocr_phrase_centers(image_path, phrase)
         if centers:
@@ -4366,7 +4508,8 @@ def _ocr_find_phrase_center(image_path: Path, phrases: list[str]) -> tuple[int,
 def _looks_like_phrase_still_in_composer(
     image_path: Path, phrase: str, win_h: int, threshold_pct: int = 72
 ) -> bool:
-    pts = _ocr_phrase_centers(image_path, phrase)
+    # Snapshots are window-sized, so only the band below the threshold matters.
+    pts = _ocr_phrase_centers(image_path, phrase, region=(0.0, max(0, min(100, threshold_pct)) / 100.0, 1.0, 1.0))
     if not pts:
         return False
     threshold = int(win_h * threshold_pct / 100)
@@ -4887,9 +5030,11 @@ def _reset_recorded_browser_windows(session_id: str) -> None:
         _browser_windows_save(data)
 
 
+_OPEN_REQUEST_TOKENS = ("abr", "abri", "abir", "abrir", "open", "entra", "entrar", "ir a", "lanz", "inici")
+
+
 def _looks_like_open_request(normalized: str) -> bool:
-    tokens = ("abr", "abri", "abir", "abrir", "open", "entra", "entrar", "ir a", "lanz", "inici")
-    return any(t in normalized for t in tokens)
+    return any(t in normalized for t in _OPEN_REQUEST_TOKENS)
 
 
 def _looks_like_direct_gemini_open(normalized: str) -> bool:
@@ -5621,29 +5766,39 @@ def _is_direct_youtube_video_url(url: str) -> bool:
     return False
 
 
+def _youtube_autoplay_url(url: str) -> str:
+    if "autoplay=" in url:
+        return url
+    return url + ("&" if "?" in url else "?") + "autoplay=1"
+
+
 def _pick_first_youtube_video_url(query: str) -> tuple[str | None, str]:
     clean_query = _sanitize_youtube_query(query) or (query or "").strip()
     wants_latest = _youtube_query_asks_latest(clean_query)
 
-    def from_ytdlp(mode: str) -> str | None:
+    cached = _YOUTUBE_RESOLVER.cached(clean_query, wants_latest)
+    if cached:
+        return _youtube_autoplay_url(cached[0]), "ok_cache"
+
+    def from_ytdlp(mode: str, cancel: threading.Event | None = None) -> str | None:
         ytdlp = shutil.which("yt-dlp")
         if not ytdlp:
             return None
+        cmd = [
+            ytdlp,
+            "--no-playlist",
+            "--get-id",
+            "--default-search",
+            "ytsearch",
+            f"{mode}:{clean_query}",
+        ]
         try:
-            proc = subprocess.run(
-                [
-                    ytdlp,
-                    "--no-playlist",
-                    "--get-id",
-                    "--default-search",
-                    "ytsearch",
-                    f"{mode}:{clean_query}",
-                ],
-                capture_output=True,
-                text=True,
-                timeout=14,
-            )
-            vid = (proc.stdout or "").strip().splitlines()
+            if cancel is None:
+                proc = subprocess.run(cmd, capture_output=True, text=True, timeout=14)
+                out = proc.stdout or ""
+            else:
+                out = _run_cancellable(cmd, 14.0, cancel)
+            vid = out.strip().splitlines()
             if not vid:
                 return None
             v = vid[0].strip()
@@ -5653,13 +5808,12 @@ def _pick_first_youtube_video_url(query: str) -> tuple[str | None, str]:
         except Exception:
             return None
 
-    yd_mode = "ytsearchdate1" if wants_latest else "ytsearch1"
-    yd = from_ytdlp(yd_mode)
-    if yd:
-        chosen = yd
-        if "autoplay=" not in chosen:
-            chosen = chosen + ("&" if "?" in chosen else "?") + "autoplay=1"
-        return chosen, f"ok_ytdlp:{yd_mode}"
+    if wants_latest:
+        # SearXNG does not sort by upload date: "latest" asks yt-dlp first.
+        yd = from_ytdlp("ytsearchdate1")
+        if yd:
+            _YOUTUBE_RESOLVER.store(clean_query, True, yd, "ytdlp:ytsearchdate1")
+            return _youtube_autoplay_url(yd), "ok_ytdlp:ytsearchdate1"
 
     def normalize_candidate(raw_url: str) -> str:
         u = str(raw_url or "").strip()
@@ -5685,44 +5839,38 @@ def _pick_first_youtube_video_url(query: str) -> tuple[str | None, str]:
             return ""
         return ""
 
-    results: list[dict] = []
-    sp = web_search.searxng_search(clean_query, site_key="youtube", max_results=10)
-    if sp.get("ok") and isinstance(sp.get("results"), list):
-        results.extend([r for r in sp.get("results", []) if isinstance(r, dict)])
-    # Fallback: some SearXNG setups don't keep YouTube engine/domain filter stable.
-    sp2 = web_search.searxng_search(clean_query, site_key=None, max_results=12)
-    if sp2.get("ok") and isinstance(sp2.get("results"), list):
-        results.extend([r for r in sp2.get("results", []) if isinstance(r, dict)])
-    if not results:
-        yd = from_ytdlp("ytsearch1")
-        if yd:
-            chosen = yd
-            if "autoplay=" not in chosen:
-                chosen = chosen + ("&" if "?" in chosen else "?") + "autoplay=1"
-            return chosen, "ok_ytdlp:fallback"
-        return None, "no_results"
-
-    preferred: str | None = None
-    for r in results:
-        if not isinstance(r, dict):
-            continue
-        url = normalize_candidate(str(r.get("url", "")).strip())
-        if not url:
-            continue
-        if not _is_direct_youtube_video_url(url):
-            continue
-        preferred = url
-        break
-    chosen = preferred
+    saw_results: list[bool] = []
+
+    def from_searxng(site_key: str | None, max_results: int) -> str | None:
+        sp = web_search.searxng_search(clean_query, site_key=site_key, max_results=max_results)
+        if not (sp.get("ok") and isinstance(sp.get("results"), list)):
+            return None
+        results = [r for r in sp.get("results", []) if isinstance(r, dict)]
+        if results:
+            saw_results.append(True)
+        for r in results:
+            url = normalize_candidate(str(r.get("url", "")).strip())
+            if url and _is_direct_youtube_video_url(url):
+                return url
+        return None
+
+    # Fallback query without site filter: some SearXNG setups don't keep the
+    # YouTube engine/domain filter stable.
+    chosen, source = _YOUTUBE_RESOLVER.race(
+        [
+            ("ytdlp:ytsearch1", lambda cancel: from_ytdlp("ytsearch1", cancel)),
+            ("searxng:youtube", lambda cancel: from_searxng("youtube", 10)),
+            ("searxng", lambda cancel: from_searxng(None, 12)),
+        ],
+        accept=_is_direct_youtube_video_url,
+    )
     if not chosen:
-        yd = from_ytdlp("ytsearch1")
-        if yd:
-            chosen = yd
-        else:
-            return None, "no_youtube_video_url"
-    if "autoplay=" not in chosen:
-        chosen = chosen + ("&" if "?" in chosen else "?") + "autoplay=1"
-    return chosen, "ok"
+        return None, ("no_youtube_video_url" if saw_results else "no_results")
+    _YOUTUBE_RESOLVER.store(clean_query, wants_latest, chosen, source)
+    if source.startswith("ytdlp:"):
+        return _youtube_autoplay_url(chosen), ("ok_ytdlp:fallback" if wants_latest else f"ok_{source}")
+    return _youtube_autoplay_url(chosen), "ok"
+
 
 def _sanitize_history_component(value: str, limit: int = 80) -> str:
     cleaned = re.sub(r"[^a-zA-Z0-9._-]+", "_", str(value or "").strip()).strip("._-")
@@ -5742,9 +5890,20 @@ def _history_scope_key(session_id: str, model: str | None = None, backend: str |
 
 
 def _history_path(session_id: str, model: str | None = None, backend: str | None = None) -> Path:
+    """Legacy per-model history file; only read to seed a view of the session log."""
     return HISTORY_DIR / f"{_history_scope_key(session_id, model=model, backend=backend)}.json"
 
 
+def _history_log_path(session_id: str) -> Path:
+    return HISTORY_DIR / f"{_safe_session_id(session_id)}.history.jsonl"
+
+
+def _history_view_key(session_id: str, model: str | None = None, backend: str | None = None) -> str:
+    base = _safe_session_id(session_id)
+    scope = _history_scope_key(session_id, model=model, backend=backend)
+    return scope[len(base) + 2 :] if scope != base else ""
+
+
 def _chat_events_path(session_id: str) -> Path:
     sid = _safe_session_id(session_id or "default")
     return HISTORY_DIR / f"{sid}__chat_events.json"
@@ -5830,6 +5989,7 @@ def _save_chat_events_state(session_id: str, state: dict) -> None:
     p.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
+@_TRACER.wrap("chat_events_append")
 def _chat_events_append(session_id: str, role: str, content: str, source: str = "", ts: float | None = None) -> dict:
     sid = _safe_session_id(session_id or "default")
     role_norm = str(role or "").strip().lower()
@@ -5880,27 +6040,39 @@ def _chat_events_reset(session_id: str) -> None:
         _save_chat_events_state(sid, {"seq": 0, "items": []})
 
 
-def _load_history(session_id: str, model: str | None = None, backend: str | None = None) -> list:
-    p = _history_path(session_id, model=model, backend=backend)
-    if not p.exists():
-        return []
+def _load_history(session_id: str, model: str | None = None, backend: str | None = None, limit: int = 200) -> list:
     try:
-        data = json.loads(p.read_text(encoding="utf-8"))
-        if isinstance(data, list):
-            out = []
-            for item in data:
-                if isinstance(item, dict) and item.get("role") in ("user", "assistant") and isinstance(item.get("content"), str):
-                    out.append({"role": item["role"], "content": item["content"]})
-            return out[-200:]
+        return _HISTORY.tail(
+            _history_log_path(session_id),
+            _history_view_key(session_id, model=model, backend=backend),
+            limit=max(0, min(200, int(limit))),
+            legacy=_history_path(session_id, model=model, backend=backend),
+        )
     except Exception:
         return []
-    return []
 
 
+@_TRACER.wrap("save_history")
 def _save_history(session_id: str, history: list, model: str | None = None, backend: str | None = None) -> None:
-    p = _history_path(session_id, model=model, backend=backend)
-    payload = history[-200:]
-    p.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    _HISTORY.save(
+        _history_log_path(session_id),
+        _history_view_key(session_id, model=model, backend=backend),
+        history[-200:],
+        model=str(model or ""),
+        backend=str(backend or ""),
+        legacy=_history_path(session_id, model=model, backend=backend),
+    )
+
+
+def _record_history_turn(session_id: str, history, message: str, reply: str, model: str | None = None, backend: str | None = None) -> None:
+    """Persist one turn server-side; the store only appends what the client tail doesn't already have."""
+    tail = history[-80:] if isinstance(history, list) else []
+    _save_history(
+        session_id,
+        tail + [{"role": "user", "content": message}, {"role": "assistant", "content": reply}],
+        model=model,
+        backend=backend,
+    )
 
 
 class ReaderSessionStore:
@@ -6426,6 +6598,10 @@ class ReaderSessionStore:
                 out["pending_chunk_index"] = got_index
                 return out
             now = float(time.time())
+            prev_commit_ts = float(sess.get("last_commit_ts", 0.0) or 0.0)
+            if prev_commit_ts > 0.0 and now >= prev_commit_ts:
+                mode = "continuous" if bool(sess.get("continuous_enabled", False)) else "manual"
+                _PROM_READER_INTERVAL_SECONDS.observe(now - prev_commit_ts, mode)
             cursor = max(0, int(sess.get("cursor", 0) or 0))
             sess["cursor"] = max(cursor, got_index + 1)
             sess["pending"] = None
@@ -7132,9 +7308,57 @@ class ReaderLibraryIndex:
 _READER_LIBRARY = ReaderLibraryIndex()
 
 
+_GUARDRAIL = _GuardrailEngine(GUARDRAIL_SCRIPT_PATH, Path(__file__).resolve().parent.parent)
+
+
+def _guardrail_mode() -> str:
+    """inprocess (default) | script (old subprocess path) | audit (in-process decides, script double-checks)."""
+    mode = str(os.environ.get("GUARDRAIL_MODE", "inprocess") or "inprocess").strip().lower()
+    return mode if mode in ("inprocess", "script", "audit") else "inprocess"
+
+
+def _guardrail_audit_redis_url() -> str:
+    """Redis URL for the audit-mode script run: a separate DB, so its INCR mirrors the
+    in-process count instead of adding to it (default: the next DB index of REDIS_URL)."""
+    explicit = str(os.environ.get("GUARDRAIL_AUDIT_REDIS_URL", "") or "").strip()
+    if explicit:
+        return explicit
+    base = urlparse(str(os.environ.get("REDIS_URL", "") or "redis://127.0.0.1:6379/0"))
+    try:
+        db = int((base.path or "/0").strip("/") or 0)
+    except ValueError:
+        db = 0
+    return base._replace(path=f"/{(db + 1) % 16}").geturl()
+
+
+def _guardrail_audit_async(session_id: str, tool_name: str, params: dict | None, verdict: tuple[bool, str]) -> None:
+    def _run() -> None:
+        try:
+            script = _guardrail_check_script(session_id, tool_name, params, redis_url=_guardrail_audit_redis_url())
+            _GUARDRAIL.record_audit(tool_name, params, verdict, script)
+        except Exception:
+            pass
+
+    threading.Thread(target=_run, name="guardrail-audit", daemon=True).start()
+
+
+@_TRACER.wrap("guardrail_check")
 def _guardrail_check(session_id: str, tool_name: str, params: dict | None = None) -> tuple[bool, str]:
     if str(os.environ.get("GUARDRAIL_ENABLED", "1")).strip().lower() not in ("1", "true", "yes"):
         return True, "guardrail_disabled"
+    mode = _guardrail_mode()
+    if mode == "script":
+        return _guardrail_check_script(session_id, tool_name, params)
+    verdict = _GUARDRAIL.check(session_id, tool_name, params)
+    if mode == "audit":
+        # The script counts in its own Redis DB; it is only compared, never obeyed.
+        _guardrail_audit_async(session_id, tool_name, params, verdict)
+    return verdict
+
+
+def _guardrail_check_script(
+    session_id: str, tool_name: str, params: dict | None = None, redis_url: str = ""
+) -> tuple[bool, str]:
     fail_closed = str(os.environ.get("GUARDRAIL_FAIL_CLOSED", "0")).strip().lower() in ("1", "true", "yes")
     if not GUARDRAIL_SCRIPT_PATH.exists():
         return True, "guardrail_script_missing"
@@ -7146,6 +7370,7 @@ def _guardrail_check(session_id: str, tool_name: str, params: dict | None = None
             text=True,
             timeout=6.0,
             cwd=str(Path(__file__).resolve().parent.parent),
+            env={**os.environ, "REDIS_URL": redis_url} if redis_url else None,
         )
     except Exception as e:
         if fail_closed:
@@ -7470,6 +7695,81 @@ def _reader_voice_unavailable_detail() -> str:
     return _voice_diagnostics("tts_start_failed:stream_not_created")
 
 
+def _reader_prefetch_synth(text: str) -> tuple[Path | None, str]:
+    return _tts_speak_alltalk(text, _load_voice_state())
+
+
+def _reader_prefetch_split(text: str) -> list[str]:
+    # Must match the piece boundaries `_speak_reply_async` uses, or `take()` never hits.
+    return _chunk_text_for_tts(text, max_len=_int_env("DIRECT_CHAT_TTS_CHUNK_MAX_LEN", 250))
+
+
+_READER_PREFETCH = ReaderPrefetcher(
+    synth=lambda text: _reader_prefetch_synth(text),
+    split=lambda text: _reader_prefetch_split(text),
+    max_ready=max(1, _int_env("DIRECT_CHAT_READER_PREFETCH_MAX_READY", 24)),
+)
+
+
+def _tts_active_queue_depth() -> int:
+    q = _TTS_ACTIVE_QUEUE
+    return q.qsize() if q is not None else 0
+
+
+def _register_prom_gauges() -> None:
+    _PROM_QUEUE_DEPTH.set_function(lambda: _STT_MANAGER._queue.qsize(), "stt")
+    _PROM_QUEUE_DEPTH.set_function(_tts_active_queue_depth, "tts")
+    _PROM_QUEUE_DEPTH.set_function(lambda: _READER_PREFETCH.status()["queued"], "reader_prefetch_jobs")
+    _PROM_QUEUE_DEPTH.set_function(lambda: _READER_PREFETCH.status()["ready"], "reader_prefetch_ready")
+    _PROM_RSS_BYTES.set_function(lambda: (_proc_rss_mb(os.getpid()) or 0.0) * 1024 * 1024)
+    for event in ("hits", "stale_hits", "misses", "coalesced", "refreshes", "evictions"):
+        _PROM_SEARXNG_CACHE.set_function(lambda event=event: web_search.SEARCH_CACHE.stats()[event], event)
+
+
+_register_prom_gauges()
+
+
+def _reader_prefetch_enabled() -> bool:
+    if _env_flag("DIRECT_CHAT_TTS_DRY_RUN", False):
+        return False
+    return _env_flag("DIRECT_CHAT_READER_PREFETCH", True)
+
+
+def _reader_prefetch_invalidate(session_id: str, reason: str = "") -> None:
+    try:
+        _READER_PREFETCH.invalidate(_safe_session_id(session_id), reason=reason)
+    except Exception:
+        return
+
+
+def _reader_prefetch_schedule(session_id: str, chunk: dict) -> int:
+    if not _reader_prefetch_enabled():
+        return 0
+    lookahead = max(0, _int_env("DIRECT_CHAT_READER_PREFETCH_CHUNKS", 2))
+    sid = _safe_session_id(session_id)
+    if lookahead <= 0 or not _READER_STORE.is_continuous(sid):
+        return 0
+    st_full = _READER_STORE.get_session(sid, include_chunks=True)
+    chunks = st_full.get("chunks") if st_full.get("ok") else None
+    if not isinstance(chunks, list):
+        return 0
+    idx = int(chunk.get("chunk_index", 0) or 0)
+    upcoming: list[dict] = []
+    for i in range(idx + 1, min(len(chunks), idx + 1 + lookahead)):
+        raw = chunks[i] if isinstance(chunks[i], dict) else {}
+        upcoming.append(
+            {
+                "chunk_index": i,
+                "chunk_id": str(raw.get("id", "")),
+                "text": str(raw.get("text", "")).strip()[:8000],
+            }
+        )
+    try:
+        return int(_READER_PREFETCH.schedule(sid, idx, upcoming))
+    except Exception:
+        return 0
+
+
 def _reader_emit_chunk(
     session_id: str,
     chunk: dict,
@@ -7495,6 +7795,7 @@ def _reader_emit_chunk(
                 text_len=len(chunk_text),
                 start_offset_chars=start_offset,
             )
+            _reader_prefetch_schedule(session_id, chunk)
         else:
             tts_gate_required = False
             tts_unavailable_detail = _reader_voice_unavailable_detail()
@@ -7550,11 +7851,99 @@ def _reader_force_commit_pending_if_stalled(session_id: str, state: dict | None)
     )
 
 
-def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id: str) -> dict | None:
-    text = message.lower()
-    normalized = _normalize_text(message)
-    shadow_explicit = any(k in normalized for k in ("shadow", "experimental", "modo shadow"))
+_NEW_CHAT_TOKENS = ("chat nuevo", "nuevo chat", "iniciar una conversacion", "iniciar conversacion")
+_LOCAL_MIC_USE_RE = re.compile(r"\bmic(?:rofono)?\s+usar\s+([^\s]+)")
+_LOCAL_STT_THRESHOLD_SEGMENT_RE = re.compile(r"\bstt\s+umbral\s+(?:segment|segmento|segmentacion)\s+([0-9]+(?:\.[0-9]+)?)")
+_LOCAL_STT_THRESHOLD_BARGE_RE = re.compile(r"\bstt\s+umbral\s+(?:barge|barge-any|bargeany|bargein)\s+([0-9]+(?:\.[0-9]+)?)")
+_LOCAL_STT_THRESHOLD_RE = re.compile(r"\bstt\s+umbral\s+([0-9]+(?:\.[0-9]+)?)")
+_LOCAL_STT_GAIN_RE = re.compile(r"\bstt\s+(?:ganancia|gain)\s+([0-9]+(?:\.[0-9]+)?)")
+_LOCAL_STT_AGC_TARGET_RE = re.compile(r"\bstt\s+agc\s+(?:target|objetivo)\s+([0-9]+(?:\.[0-9]+)?)")
+_LOCAL_READER_MANUAL_RE = re.compile(r"\b(?:modo\s+manual|manual)\s+(on|off)\b", flags=re.IGNORECASE)
+_LOCAL_READER_CONTINUOUS_RE = re.compile(r"\bcontinuo\s+(on|off)\b", flags=re.IGNORECASE)
+_LOCAL_READER_CONTINUE_ALIAS = r"(?:continuar|continua|contiuna|contionua|segui|seguir|sigue|continue|resume|reanuda(?:r)?)"
+_LOCAL_READER_CONTINUE_FROM_RES = tuple(
+    re.compile(pat, flags=re.IGNORECASE)
+    for pat in (
+        rf"\b(?:ok\s+)?{_LOCAL_READER_CONTINUE_ALIAS}\s+(?:la\s+lectura\s+)?desde\s+(?:la\s+)?frase\s+[\"“”'](.+?)[\"“”']\s*$",
+        rf"\b(?:ok\s+)?{_LOCAL_READER_CONTINUE_ALIAS}\s+(?:la\s+lectura\s+)?desde\s+[\"“”'](.+?)[\"“”']\s*$",
+        rf"\b(?:ok\s+)?{_LOCAL_READER_CONTINUE_ALIAS}\s+(?:la\s+lectura\s+)?desde\s+(?:la\s+)?frase\s+(.+)$",
+        rf"\b(?:ok\s+)?{_LOCAL_READER_CONTINUE_ALIAS}\s+(?:la\s+lectura\s+)?desde\s+(.+)$",
+    )
+)
+_LOCAL_READER_JUMP_RE = re.compile(
+    r"\b(?:ir(?:\s+a)?|anda|andá|salta|saltar|vamos)\s+(?:al\s+)?(?:parrafo|párrafo|bloque)\s+(\d+)\b",
+    flags=re.IGNORECASE,
+)
+_LOCAL_READER_JUMP_SHORT_RE = re.compile(r"\b(?:parrafo|párrafo|bloque)\s+(\d+)\b", flags=re.IGNORECASE)
+_LOCAL_READER_NEXT_RE = re.compile(r"\bnext\b")
+_LOCAL_CLOSE_OPENED_RE = re.compile(r"\blo\s+que\s+abriste\b", flags=re.IGNORECASE)
+_LOCAL_CLOSE_RECENT_RE = re.compile(r"\babriste\s+reci[eé]n\b", flags=re.IGNORECASE)
+_LOCAL_DESKTOP_OPEN_RE = re.compile(
+    r"(?:abr[ií]|abrir|open)\s+(?:la\s+)?(?:carpeta|archivo|documento)?\s*([^\n\r]+?)\s+(?:del|en|de)\s+(?:mi\s+)?(?:escritorio|desktop)\b",
+    flags=re.IGNORECASE,
+)
+_LOCAL_WEB_LOGIN_RE = re.compile(
+    r"(?:login|loguea|logueate|inicia\s+sesion|iniciar\s+sesion)\s+(?:en\s+)?(chatgpt|chat\s*gpt|gemini)\b",
+    flags=re.IGNORECASE,
+)
+_LOCAL_YOUTUBE_ABOUT_RE = re.compile(r"(?:video|videos)\s+de\s+youtube\s+sobre\s+(.+)", flags=re.IGNORECASE)
+
+
+class _LocalActionContext:
+    """Per-message state shared by the local action handlers (derived fields computed on first use)."""
+
+    def __init__(self, message: str, allowed_tools: set[str], session_id: str) -> None:
+        self.message = message
+        self.text = message.lower()
+        self.normalized = _normalize_text(message)
+        self.allowed_tools = allowed_tools
+        self.session_id = session_id
+
+    @cached_property
+    def shadow_explicit(self) -> bool:
+        return any(k in self.normalized for k in ("shadow", "experimental", "modo shadow"))
+
+    @cached_property
+    def site_keys(self) -> list[str]:
+        return _canonical_site_keys(self.message)
 
+    @cached_property
+    def wants_open(self) -> bool:
+        return _looks_like_open_request(self.normalized)
+
+    @cached_property
+    def wants_search(self) -> bool:
+        return ("busc" in self.normalized) or any(
+            k in self.normalized for k in ("search", "investiga", "investigar", "encontra", "encontrá", "encontrar")
+        )
+
+    @cached_property
+    def wants_new_chat(self) -> bool:
+        return any(k in self.normalized for k in _NEW_CHAT_TOKENS)
+
+    @cached_property
+    def topic(self) -> str | None:
+        return _extract_topic(self.message)
+
+    @cached_property
+    def search_req(self) -> tuple[str, str | None] | None:
+        message, normalized, site_keys = self.message, self.normalized, self.site_keys
+        search_req = web_search.extract_web_search_request(message)
+        if not search_req and ("youtube" in site_keys) and _looks_like_youtube_play_request(normalized):
+            yt_query = _extract_youtube_search_intent_query(message)
+            if yt_query:
+                search_req = (yt_query, "youtube")
+        if search_req and search_req[1] is None:
+            query_implicit, _site_none = search_req
+            has_only_youtube_hint = ("youtube" in site_keys) and (not any(sk in site_keys for sk in ("google", "wikipedia", "chatgpt", "gemini", "gmail")))
+            youtube_intent = self.wants_search or self.wants_open or _looks_like_youtube_play_request(normalized)
+            if has_only_youtube_hint and youtube_intent:
+                search_req = (query_implicit, "youtube")
+        return search_req
+
+
+def _local_action_diego_anchor(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
     if (
         ("cliente" in normalized and "diego" in normalized and any(k in normalized for k in ("fij", "usar", "set")))
         or ("este cliente es diego" in normalized)
@@ -7571,7 +7960,13 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             return {"reply": "No pude detectar el workspace de la ventana activa."}
         _save_trusted_dc_anchor(active, desk, title)
         return {"reply": f"Listo. Fijé este cliente como diego (anchor={active})."}
+    return None
 
+
+def _local_action_voice_toggle(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
     if "tts" in allowed_tools:
         if any(k in normalized for k in ("voz off", "silenciar voz", "mute voz", "apaga la voz", "desactiva voz")):
             _set_voice_enabled(False, session_id=session_id)
@@ -7583,7 +7978,11 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             _set_voice_enabled(True, session_id=session_id)
             _speak_reply_async("Prueba de voz activada. Sistema listo.")
             return {"reply": "Ejecuté prueba de voz."}
+    return None
 
+
+def _local_action_mic_list(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
     if any(k in normalized for k in ("mic lista", "microfono lista", "microfono listar", "mic list", "listar microfonos")):
         devices = _stt_list_input_devices()
         state = _load_voice_state()
@@ -7608,8 +8007,11 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             "reply": "Micrófonos de entrada:\n" + "\n".join(lines) + "\nUsá: mic usar <indice> | mic usar default",
             "no_auto_tts": True,
         }
+    return None
 
-    match_mic_use = re.search(r"\bmic(?:rofono)?\s+usar\s+([^\s]+)", normalized)
+
+def _local_action_mic_use(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    match_mic_use = match
     if match_mic_use:
         token = str(match_mic_use.group(1) or "").strip().lower()
         if token in ("default", "defecto", "por_defecto", "por-defecto"):
@@ -7624,11 +8026,11 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             return {"reply": f"No existe el micrófono {idx}. Probá primero 'mic lista'.", "no_auto_tts": True}
         _set_stt_runtime_config(stt_device=str(idx))
         return {"reply": f"Listo: STT usará micrófono {idx}.", "no_auto_tts": True}
+    return None
 
-    match_stt_threshold_segment = re.search(
-        r"\bstt\s+umbral\s+(?:segment|segmento|segmentacion)\s+([0-9]+(?:\.[0-9]+)?)",
-        normalized,
-    )
+
+def _local_action_stt_threshold_segment(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    match_stt_threshold_segment = match
     if match_stt_threshold_segment:
         try:
             thr = max(0.0005, float(match_stt_threshold_segment.group(1)))
@@ -7636,11 +8038,11 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             thr = 0.002
         _set_stt_runtime_config(stt_segment_rms_threshold=thr)
         return {"reply": f"Listo: umbral STT de segmentación en {thr:.4f}.", "no_auto_tts": True}
+    return None
 
-    match_stt_threshold_barge = re.search(
-        r"\bstt\s+umbral\s+(?:barge|barge-any|bargeany|bargein)\s+([0-9]+(?:\.[0-9]+)?)",
-        normalized,
-    )
+
+def _local_action_stt_threshold_barge(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    match_stt_threshold_barge = match
     if match_stt_threshold_barge:
         try:
             thr = max(0.001, float(match_stt_threshold_barge.group(1)))
@@ -7648,8 +8050,11 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             thr = 0.012
         _set_stt_runtime_config(stt_barge_rms_threshold=thr)
         return {"reply": f"Listo: umbral STT de barge en {thr:.4f}.", "no_auto_tts": True}
+    return None
 
-    match_stt_threshold = re.search(r"\bstt\s+umbral\s+([0-9]+(?:\.[0-9]+)?)", normalized)
+
+def _local_action_stt_threshold(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    match_stt_threshold = match
     if match_stt_threshold:
         try:
             thr = max(0.001, float(match_stt_threshold.group(1)))
@@ -7657,8 +8062,11 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             thr = 0.012
         _set_stt_runtime_config(stt_rms_threshold=thr)
         return {"reply": f"Listo: umbral STT unificado en {thr:.4f} (segmentación + barge).", "no_auto_tts": True}
+    return None
 
-    match_stt_gain = re.search(r"\bstt\s+(?:ganancia|gain)\s+([0-9]+(?:\.[0-9]+)?)", normalized)
+
+def _local_action_stt_gain(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    match_stt_gain = match
     if match_stt_gain:
         try:
             gain = max(0.05, float(match_stt_gain.group(1)))
@@ -7666,15 +8074,22 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             gain = 1.0
         _set_stt_runtime_config(stt_preamp_gain=gain)
         return {"reply": f"Listo: ganancia STT en {gain:.2f}.", "no_auto_tts": True}
+    return None
+
 
+def _local_action_stt_agc_toggle(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
     if any(k in normalized for k in ("stt agc on", "agc stt on", "stt auto ganancia on")):
         _set_stt_runtime_config(stt_agc_enabled=True)
         return {"reply": "Listo: STT AGC activado.", "no_auto_tts": True}
     if any(k in normalized for k in ("stt agc off", "agc stt off", "stt auto ganancia off")):
         _set_stt_runtime_config(stt_agc_enabled=False)
         return {"reply": "Listo: STT AGC desactivado.", "no_auto_tts": True}
+    return None
+
 
-    match_stt_agc_target = re.search(r"\bstt\s+agc\s+(?:target|objetivo)\s+([0-9]+(?:\.[0-9]+)?)", normalized)
+def _local_action_stt_agc_target(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    match_stt_agc_target = match
     if match_stt_agc_target:
         try:
             target = max(0.01, min(0.30, float(match_stt_agc_target.group(1))))
@@ -7682,7 +8097,11 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             target = 0.06
         _set_stt_runtime_config(stt_agc_target_rms=target)
         return {"reply": f"Listo: objetivo AGC STT en {target:.3f}.", "no_auto_tts": True}
+    return None
+
 
+def _local_action_stt_barge_any(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
     if any(
         k in normalized
         for k in (
@@ -7706,7 +8125,11 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
     ):
         _set_stt_runtime_config(stt_barge_any=False)
         return {"reply": "Listo: STT barge-any desactivado (solo comandos de voz).", "no_auto_tts": True}
+    return None
+
 
+def _local_action_stt_chat(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
     if any(k in normalized for k in ("stt chat on", "chat stt on", "voice chat on", "voz chat on")):
         _set_stt_runtime_config(stt_chat_enabled=True)
         return {
@@ -7717,14 +8140,22 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
     if any(k in normalized for k in ("stt chat off", "chat stt off", "voice chat off", "voz chat off")):
         _set_stt_runtime_config(stt_chat_enabled=False)
         return {"reply": "Listo: STT chat desactivado (solo comandos por voz).", "no_auto_tts": True}
+    return None
+
 
+def _local_action_stt_debug(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
     if any(k in normalized for k in ("stt debug on", "debug stt on", "stt depuracion on")):
         _set_stt_runtime_config(stt_debug=True)
         return {"reply": "STT debug activado.", "no_auto_tts": True}
     if any(k in normalized for k in ("stt debug off", "debug stt off", "stt depuracion off")):
         _set_stt_runtime_config(stt_debug=False)
         return {"reply": "STT debug desactivado.", "no_auto_tts": True}
+    return None
+
 
+def _local_action_stt_diag(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
     if any(k in normalized for k in ("mic nivel", "stt nivel", "nivel stt", "stt diag", "diagnostico stt")):
         st = _STT_MANAGER.status()
         no_audio = bool(st.get("stt_no_audio_input", False))
@@ -7758,7 +8189,11 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             ),
             "no_auto_tts": True,
         }
+    return None
+
 
+def _local_action_reader_help(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
     # Reader UX v0.3: local commands in DC chat, no model round-trip needed.
     if any(k in normalized for k in ("ayuda lectura", "help lectura")):
         return {
@@ -7780,7 +8215,11 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             ),
             "no_auto_tts": True,
         }
+    return None
+
 
+def _local_action_library_rescan(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
     if any(k in normalized for k in ("biblioteca rescan", "actualizar biblioteca", "rescan biblioteca")):
         out = _READER_LIBRARY.rescan()
         return {
@@ -7791,7 +8230,11 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             ),
             "no_auto_tts": True,
         }
+    return None
+
 
+def _local_action_library_list(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
     if any(k in normalized for k in ("biblioteca", "mis libros", "lista de libros", "libros")):
         out = _READER_LIBRARY.list_books()
         books = out.get("books", []) if isinstance(out, dict) else []
@@ -7815,8 +8258,12 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             "reply": f"Biblioteca ({total}):\n{body}{more}\nDecí: leer libro <n>",
             "no_auto_tts": True,
         }
+    return None
+
 
-    m_manual = re.search(r"\b(?:modo\s+manual|manual)\s+(on|off)\b", normalized, flags=re.IGNORECASE)
+def _local_action_reader_manual(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    session_id = ctx.session_id
+    m_manual = match
     if m_manual:
         st = _READER_STORE.get_session(session_id, include_chunks=False)
         if not st.get("ok"):
@@ -7825,6 +8272,7 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
         manual_on = mode == "on"
         _READER_STORE.set_manual_mode(session_id, manual_on, reason="reader_manual_mode_command")
         if manual_on:
+            _reader_prefetch_invalidate(session_id, reason="reader_manual_mode_on")
             _READER_STORE.set_continuous(session_id, False, reason="reader_manual_mode_on")
         else:
             _READER_STORE.set_continuous(session_id, True, reason="reader_manual_mode_off_autopilot")
@@ -7843,8 +8291,12 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             "no_auto_tts": True,
             "reader": _reader_meta(session_id, st_after, auto_continue=has_more),
         }
+    return None
+
 
-    m_cont = re.search(r"\bcontinuo\s+(on|off)\b", normalized, flags=re.IGNORECASE)
+def _local_action_reader_continuous(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    session_id = ctx.session_id
+    m_cont = match
     if m_cont:
         st = _READER_STORE.get_session(session_id, include_chunks=False)
         if not st.get("ok"):
@@ -7852,6 +8304,8 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
         mode = str(m_cont.group(1) or "").strip().lower()
         enable = mode == "on"
         reason = "reader_continuous_opt_in" if enable else "reader_continuous_opt_out"
+        if not enable:
+            _reader_prefetch_invalidate(session_id, reason=reason)
         _READER_STORE.set_manual_mode(session_id, not enable, reason="reader_continuous_alias")
         _READER_STORE.set_continuous(session_id, enable, reason=reason)
         st_after = _READER_STORE.get_session(session_id, include_chunks=False)
@@ -7869,7 +8323,12 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             "no_auto_tts": True,
             "reader": _reader_meta(session_id, st_after, auto_continue=False),
         }
+    return None
+
 
+def _local_action_reader_comment(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    session_id = ctx.session_id
     if any(
         k in normalized
         for k in (
@@ -7909,7 +8368,13 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             "no_auto_tts": True,
             "reader": _reader_meta(session_id, st_after, auto_continue=False),
         }
+    return None
+
 
+def _local_action_reader_open_book(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
     read_idx = _extract_reader_book_index(normalized)
     if read_idx is not None:
         out = _READER_LIBRARY.list_books()
@@ -8004,6 +8469,7 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
                     "no_auto_tts": True,
                     "reader": _reader_meta(session_id, st_before, auto_continue=bool(st_before.get("continuous_enabled", False)) and has_more),
                 }
+        _reader_prefetch_invalidate(session_id, reason="reader_session_start")
         started = _READER_STORE.start_session(
             session_id,
             chunks=[],
@@ -8063,7 +8529,12 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
                 tts_gate_required=tts_gate_required,
             ),
         }
+    return None
+
 
+def _local_action_reader_pause(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    session_id = ctx.session_id
     if any(
         k in normalized
         for k in (
@@ -8092,21 +8563,21 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             "no_auto_tts": True,
             "reader": _reader_meta(session_id, st_after, auto_continue=False),
         }
+    return None
 
-    continue_phrase_alias = r"(?:continuar|continua|contiuna|contionua|segui|seguir|sigue|continue|resume|reanuda(?:r)?)"
-    continue_from_patterns = (
-        rf"\b(?:ok\s+)?{continue_phrase_alias}\s+(?:la\s+lectura\s+)?desde\s+(?:la\s+)?frase\s+[\"“”'](.+?)[\"“”']\s*$",
-        rf"\b(?:ok\s+)?{continue_phrase_alias}\s+(?:la\s+lectura\s+)?desde\s+[\"“”'](.+?)[\"“”']\s*$",
-        rf"\b(?:ok\s+)?{continue_phrase_alias}\s+(?:la\s+lectura\s+)?desde\s+(?:la\s+)?frase\s+(.+)$",
-        rf"\b(?:ok\s+)?{continue_phrase_alias}\s+(?:la\s+lectura\s+)?desde\s+(.+)$",
-    )
+
+def _local_action_reader_continue_from(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    message = ctx.message
+    normalized = ctx.normalized
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
     continue_from_phrase = ""
     for src in (message, normalized):
         text_src = str(src or "").strip()
         if not text_src:
             continue
-        for pat in continue_from_patterns:
-            m_continue_from = re.search(pat, text_src, flags=re.IGNORECASE)
+        for pat in _LOCAL_READER_CONTINUE_FROM_RES:
+            m_continue_from = pat.search(text_src)
             if not m_continue_from:
                 continue
             continue_from_phrase = str(m_continue_from.group(1) or "").strip()
@@ -8127,6 +8598,7 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             not manual_mode,
             reason="reader_continue_from_phrase_autopilot" if (not manual_mode) else "reader_continue_from_phrase_manual_mode",
         )
+        _reader_prefetch_invalidate(session_id, reason="reader_seek_phrase")
         sought = _READER_STORE.seek_phrase(session_id, phrase=phrase)
         if not sought.get("ok"):
             return {
@@ -8172,14 +8644,13 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
                 tts_gate_required=tts_gate_required,
             ),
         }
+    return None
 
-    m_jump_paragraph = re.search(
-        r"\b(?:ir(?:\s+a)?|anda|andá|salta|saltar|vamos)\s+(?:al\s+)?(?:parrafo|párrafo|bloque)\s+(\d+)\b",
-        normalized,
-        flags=re.IGNORECASE,
-    )
-    if not m_jump_paragraph:
-        m_jump_paragraph = re.search(r"\b(?:parrafo|párrafo|bloque)\s+(\d+)\b", normalized, flags=re.IGNORECASE)
+
+def _local_action_reader_jump(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
+    m_jump_paragraph = match
     if m_jump_paragraph:
         try:
             target_paragraph = int(str(m_jump_paragraph.group(1) or "0").strip())
@@ -8196,6 +8667,7 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             not manual_mode,
             reason="reader_jump_paragraph_autopilot" if (not manual_mode) else "reader_jump_paragraph_manual_mode",
         )
+        _reader_prefetch_invalidate(session_id, reason="reader_jump_paragraph")
         jumped = _READER_STORE.jump_to_chunk(session_id, target_paragraph)
         if not jumped.get("ok"):
             err = str(jumped.get("error", "")).strip()
@@ -8240,7 +8712,13 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
                 tts_gate_required=tts_gate_required,
             ),
         }
+    return None
 
+
+def _local_action_reader_back_phrase(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
     if any(k in normalized for k in ("volver una frase",)):
         st_before = _READER_STORE.get_session(session_id, include_chunks=False)
         if not st_before.get("ok"):
@@ -8251,6 +8729,7 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             not manual_mode,
             reason="reader_rewind_sentence_autopilot" if (not manual_mode) else "reader_rewind_sentence_manual_mode",
         )
+        _reader_prefetch_invalidate(session_id, reason="reader_rewind_sentence")
         rew = _READER_STORE.rewind(session_id, unit="sentence")
         if not rew.get("ok"):
             return {"reply": "No pude retroceder una frase en esta sesión.", "no_auto_tts": True}
@@ -8291,7 +8770,13 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
                 tts_gate_required=tts_gate_required,
             ),
         }
+    return None
 
+
+def _local_action_reader_back_paragraph(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
     if any(k in normalized for k in ("volver un parrafo", "volver un párrafo")):
         st_before = _READER_STORE.get_session(session_id, include_chunks=False)
         if not st_before.get("ok"):
@@ -8302,6 +8787,7 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             not manual_mode,
             reason="reader_rewind_paragraph_autopilot" if (not manual_mode) else "reader_rewind_paragraph_manual_mode",
         )
+        _reader_prefetch_invalidate(session_id, reason="reader_rewind_paragraph")
         rew = _READER_STORE.rewind(session_id, unit="paragraph")
         if not rew.get("ok"):
             return {"reply": "No pude retroceder un párrafo en esta sesión.", "no_auto_tts": True}
@@ -8342,7 +8828,12 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
                 tts_gate_required=tts_gate_required,
             ),
         }
+    return None
 
+
+def _local_action_reader_status(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    session_id = ctx.session_id
     if any(k in normalized for k in ("estado lectura", "donde voy", "status lectura")):
         st = _READER_STORE.get_session(session_id, include_chunks=False)
         if not st.get("ok"):
@@ -8369,7 +8860,13 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             "no_auto_tts": True,
             "reader": _reader_meta(session_id, st, auto_continue=False),
         }
+    return None
 
+
+def _local_action_reader_repeat(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
     if any(k in normalized for k in ("repetir", "repeti")):
         st = _READER_STORE.get_session(session_id, include_chunks=True)
         if not st.get("ok"):
@@ -8417,12 +8914,18 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
                 tts_gate_required=tts_gate_required,
             ),
         }
+    return None
 
+
+def _local_action_reader_next(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
     if any(
         k in normalized
         for k in ("segui", "siguiente", "continuar", "continua", "contiuna", "contionua", "seguir leyendo", "sigas leyendo")
     ) or bool(
-        re.search(r"\bnext\b", normalized)
+        _LOCAL_READER_NEXT_RE.search(normalized)
     ):
         st_before = _READER_STORE.get_session(session_id, include_chunks=False)
         if not st_before.get("ok"):
@@ -8495,7 +8998,13 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
                 tts_gate_required=tts_gate_required,
             ),
         }
+    return None
 
+
+def _local_action_youtube_transport(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    message = ctx.message
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
     yt_transport = _extract_youtube_transport_request(message)
     if yt_transport:
         if "firefox" not in allowed_tools:
@@ -8521,11 +9030,16 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
         if action == "play":
             return {"reply": f"Listo: reanudé YouTube. ({detail})"}
         return {"reply": f"Listo: pausé YouTube. ({detail})"}
+    return None
 
+
+def _local_action_close_web_windows(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    session_id = ctx.session_id
     close_words = any(k in normalized for k in ("cerr", "close", "cierra"))
     close_web_human_variant = bool(
-        re.search(r"\blo\s+que\s+abriste\b", normalized, flags=re.IGNORECASE)
-        or re.search(r"\babriste\s+reci[eé]n\b", normalized, flags=re.IGNORECASE)
+        _LOCAL_CLOSE_OPENED_RE.search(normalized)
+        or _LOCAL_CLOSE_RECENT_RE.search(normalized)
     )
 
     # Close browser windows opened by this system (tracked by session).
@@ -8548,7 +9062,12 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
         if any(k in normalized for k in ("reset", "reinic", "olvid", "limpia")):
             _reset_recorded_browser_windows(session_id=session_id)
             return {"reply": "Listo: limpié el registro de ventanas web abiertas por el sistema para esta sesión."}
+    return None
 
+
+def _local_action_close_recent_window(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    session_id = ctx.session_id
     # Human variant fallback:
     # "cerrá la ventana que abriste recién" (without explicit "web/browser")
     if any(k in normalized for k in ("cerr", "close", "cierra")) and any(
@@ -8564,7 +9083,13 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             return {"reply": f"Cerré {fallback_closed} ventana(s) web por fallback de sitio."}
 
         return {"reply": "No veo ventanas registradas por esta sesión para cerrar."}
+    return None
 
+
+def _local_action_desktop_item(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
     # Safe local opens/closes for Desktop items (no deletion).
     # Examples:
     # - "abrí carpeta Lucy del escritorio"
@@ -8591,11 +9116,7 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
                 return {"reply": f"Cerré {closed} ventana(s) que abrí. Errores: {', '.join(errors)[:260]}"}
             return {"reply": f"Cerré {closed} ventana(s) que abrí (solo las registradas por el sistema)."}
 
-        m_open = re.search(
-            r"(?:abr[ií]|abrir|open)\s+(?:la\s+)?(?:carpeta|archivo|documento)?\s*([^\n\r]+?)\s+(?:del|en|de)\s+(?:mi\s+)?(?:escritorio|desktop)\b",
-            normalized,
-            flags=re.IGNORECASE,
-        )
+        m_open = _LOCAL_DESKTOP_OPEN_RE.search(normalized)
         if m_open:
             if "desktop" not in allowed_tools:
                 return {"reply": "La herramienta local 'desktop' está deshabilitada en esta sesión."}
@@ -8611,14 +9132,16 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             return {
                 "reply": f"Listo: abrí {res.get('kind')} '{res.get('name')}'.{verify} Ruta: {res.get('path')}"
             }
+    return None
+
 
+def _local_action_web_login(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
+    shadow_explicit = ctx.shadow_explicit
     # One-time helper: open a shadow-profile Chrome window so the user can login manually.
     # This avoids brittle automation failures like "login_required" for ChatGPT/Gemini.
-    m_login = re.search(
-        r"(?:login|loguea|logueate|inicia\s+sesion|iniciar\s+sesion)\s+(?:en\s+)?(chatgpt|chat\s*gpt|gemini)\b",
-        normalized,
-        flags=re.IGNORECASE,
-    )
+    m_login = match
     if m_login:
         if ("web_ask" not in allowed_tools) and ("firefox" not in allowed_tools):
             return {"reply": "La herramienta local 'web_ask' está deshabilitada en esta sesión."}
@@ -8645,7 +9168,13 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
                 f"dialoga con {site_key}: <tu pregunta>"
             )
         }
+    return None
+
 
+def _local_action_gemini_ask(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    message = ctx.message
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
     gemini_ask_text = _extract_gemini_ask_request(message)
     if gemini_ask_text:
         if ("web_ask" not in allowed_tools) and ("firefox" not in allowed_tools):
@@ -8660,7 +9189,13 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
         result = web_ask.run_web_ask("gemini", gemini_ask_text, timeout_ms=60000, followups=None)
         reply = web_ask.format_web_ask_reply("gemini", gemini_ask_text, result)
         return {"reply": reply}
+    return None
+
 
+def _local_action_gemini_write(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    message = ctx.message
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
     gemini_write_text = _extract_gemini_write_request(message)
     if gemini_write_text:
         if ("web_ask" not in allowed_tools) and ("firefox" not in allowed_tools):
@@ -8684,7 +9219,13 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
         if ok:
             return {"reply": f"Listo: escribí en Gemini \"{gemini_write_text}\" y di Enter. ({detail})"}
         return {"reply": f"No pude escribir en Gemini automáticamente (no verificado). ({detail})"}
+    return None
+
 
+def _local_action_web_ask(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    message = ctx.message
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
     web_req = web_ask.extract_web_ask_request(message)
     if web_req is not None:
         # web_ask is separate from opening URLs via firefox. Keep backward-compat:
@@ -8709,7 +9250,15 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
                 "Si querés hacerlo, pedí explícitamente: 'login shadow gemini' o 'login shadow chatgpt'."
             )
         return {"reply": reply}
+    return None
+
 
+def _local_action_firefox_open(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    message = ctx.message
+    text = ctx.text
+    normalized = ctx.normalized
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
     if "firefox" in text and any(k in normalized for k in ("abr", "open", "lanz", "inici")):
         if "firefox" not in allowed_tools:
             return {"reply": "La herramienta local 'firefox' está deshabilitada en esta sesión."}
@@ -8721,15 +9270,15 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
         if error:
             return {"reply": error}
         return {"reply": f"Listo, abrí Firefox en: {opened[0]}"}
+    return None
 
-    site_keys = _canonical_site_keys(message)
-    wants_open = _looks_like_open_request(normalized)
-    wants_search = ("busc" in normalized) or any(
-        k in normalized for k in ("search", "investiga", "investigar", "encontra", "encontrá", "encontrar")
-    )
-    wants_new_chat = any(k in normalized for k in ("chat nuevo", "nuevo chat", "iniciar una conversacion", "iniciar conversacion"))
-    topic = _extract_topic(message)
 
+def _local_action_gemini_open(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
+    wants_search = ctx.wants_search
+    wants_new_chat = ctx.wants_new_chat
     # "Open Gemini" uses deterministic Chrome flow when Gemini is configured on Chrome;
     # otherwise it opens the configured browser/site URL directly.
     if "firefox" in allowed_tools and _looks_like_direct_gemini_open(normalized) and not wants_search and not wants_new_chat:
@@ -8750,18 +9299,14 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
         if error:
             return {"reply": error}
         return {"reply": f"Abrí Gemini en {browser_gemini} para esta sesión: {opened[0]}"}
+    return None
+
 
-    search_req = web_search.extract_web_search_request(message)
-    if not search_req and ("youtube" in site_keys) and _looks_like_youtube_play_request(normalized):
-        yt_query = _extract_youtube_search_intent_query(message)
-        if yt_query:
-            search_req = (yt_query, "youtube")
-    if search_req and search_req[1] is None:
-        query_implicit, _site_none = search_req
-        has_only_youtube_hint = ("youtube" in site_keys) and (not any(sk in site_keys for sk in ("google", "wikipedia", "chatgpt", "gemini", "gmail")))
-        youtube_intent = wants_search or wants_open or _looks_like_youtube_play_request(normalized)
-        if has_only_youtube_hint and youtube_intent:
-            search_req = (query_implicit, "youtube")
+def _local_action_youtube_play(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
+    search_req = ctx.search_req
     if "firefox" in allowed_tools and search_req and search_req[1] == "youtube" and _looks_like_youtube_play_request(normalized):
         query = search_req[0]
         video_url, reason = _pick_first_youtube_video_url(query)
@@ -8781,7 +9326,21 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
         if ok_play:
             return {"reply": f"Abrí y reproduzco un video de YouTube sobre '{query}': {opened[0]}"}
         return {"reply": f"Abrí el video de YouTube sobre '{query}', pero no pude confirmar play real. ({play_detail})"}
+    return None
+
 
+def _web_search_mode(payload: dict) -> str:
+    """"single" (one SearXNG query) or "multi" (fan-out + RRF merge) for chat-grounding searches."""
+    raw = str(payload.get("web_search_mode") or os.environ.get("DIRECT_CHAT_WEB_SEARCH_MODE", "single"))
+    return "multi" if raw.strip().lower() == "multi" else "single"
+
+
+def _local_action_web_search(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    normalized = ctx.normalized
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
+    wants_open = ctx.wants_open
+    search_req = ctx.search_req
     if search_req and ("web_search" in allowed_tools):
         query, site_key = search_req
         if "firefox" in allowed_tools and site_key == "google" and wants_open:
@@ -8890,7 +9449,15 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             err = str(sp.get("error", "web_search_failed"))
             return {"reply": f"No pude buscar en SearXNG local: {err}"}
         return {"reply": web_search.format_results_for_user(sp)}
+    return None
+
 
+def _local_action_site_new_chat(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
+    site_keys = ctx.site_keys
+    wants_new_chat = ctx.wants_new_chat
+    topic = ctx.topic
     if "firefox" in allowed_tools and wants_new_chat and topic and ("chatgpt" in site_keys or "gemini" in site_keys):
         entries = []
         if "chatgpt" in site_keys:
@@ -8924,8 +9491,14 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
                 "Dame contexto geopolítico actual, actores clave, riesgos y escenarios probables.'"
             )
             return {"reply": f"Abrí recursos para el tema '{topic}': {' | '.join(opened)}\n{prompt}"}
+    return None
+
 
-    m_yt_about = re.search(r"(?:video|videos)\s+de\s+youtube\s+sobre\s+(.+)", normalized, flags=re.IGNORECASE)
+def _local_action_youtube_about(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
+    topic = ctx.topic
+    m_yt_about = match
     if "firefox" in allowed_tools and m_yt_about:
         query = m_yt_about.group(1).strip(" .")
         if query in ("el tema", "ese tema", "este tema") and topic:
@@ -8944,7 +9517,16 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
         if error:
             return {"reply": error}
         return {"reply": f"Abrí videos de YouTube sobre '{query}': {opened[0]}"}
+    return None
+
 
+def _local_action_open_sites(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
+    site_keys = ctx.site_keys
+    wants_open = ctx.wants_open
+    wants_search = ctx.wants_search
+    wants_new_chat = ctx.wants_new_chat
     if "firefox" in allowed_tools and site_keys and wants_open and not wants_search and not wants_new_chat:
         entries = [(site_key, _site_url(site_key)) for site_key in site_keys]
         urls = [u for _k, u in entries if u]
@@ -8960,7 +9542,13 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
             return {"reply": error}
         listing = " | ".join(opened)
         return {"reply": f"Abrí estos sitios: {listing}"}
+    return None
+
 
+def _local_action_desktop_list(ctx: _LocalActionContext, match: re.Match | None) -> dict | None:
+    text = ctx.text
+    allowed_tools = ctx.allowed_tools
+    session_id = ctx.session_id
     wants_desktop = any(k in text for k in ("escritorio", "desktop"))
     asks_dirs = any(k in text for k in ("carpeta", "carpetas", "folder", "folders", "directorio", "directorios"))
     asks_files = any(k in text for k in ("archivo", "archivos", "file", "files"))
@@ -8997,10 +9585,112 @@ def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id
                 + (", ".join(files) if files else "(ninguno)")
             )
         }
-
     return None
 
 
+_YOUTUBE_SITE_TOKENS = tuple(SITE_CANONICAL_TOKENS.get("youtube", []))
+_GEMINI_SITE_TOKENS = tuple(SITE_CANONICAL_TOKENS.get("gemini", []))
+
+# Ordered intent table for `_maybe_handle_local_action`. Keywords are necessary
+# (not sufficient) substrings of the normalized message: intents without a hit are
+# skipped, the rest run by priority and may still fall through with None.
+_LOCAL_ACTION_ROUTER = IntentRouter(
+    (
+        Intent("diego_anchor", _local_action_diego_anchor, 10, ("cliente",)),
+        Intent(
+            "voice_toggle",
+            _local_action_voice_toggle,
+            20,
+            (
+                "voz off", "silenciar voz", "mute voz", "apaga la voz", "desactiva voz",
+                "voz on", "activa voz", "encende voz", "enciende voz",
+                "voz test", "proba voz", "probar voz", "test de voz",
+            ),
+        ),
+        Intent("mic_list", _local_action_mic_list, 30, ("mic lista", "microfono lista", "microfono listar", "mic list", "listar microfonos")),
+        Intent("mic_use", _local_action_mic_use, 40, ("mic",), (_LOCAL_MIC_USE_RE,)),
+        Intent("stt_threshold_segment", _local_action_stt_threshold_segment, 50, ("umbral",), (_LOCAL_STT_THRESHOLD_SEGMENT_RE,)),
+        Intent("stt_threshold_barge", _local_action_stt_threshold_barge, 60, ("umbral",), (_LOCAL_STT_THRESHOLD_BARGE_RE,)),
+        Intent("stt_threshold", _local_action_stt_threshold, 70, ("umbral",), (_LOCAL_STT_THRESHOLD_RE,)),
+        Intent("stt_gain", _local_action_stt_gain, 80, ("ganancia", "gain"), (_LOCAL_STT_GAIN_RE,)),
+        Intent(
+            "stt_agc_toggle",
+            _local_action_stt_agc_toggle,
+            90,
+            ("stt agc on", "agc stt on", "stt auto ganancia on", "stt agc off", "agc stt off", "stt auto ganancia off"),
+        ),
+        Intent("stt_agc_target", _local_action_stt_agc_target, 100, ("agc",), (_LOCAL_STT_AGC_TARGET_RE,)),
+        Intent(
+            "stt_barge_any",
+            _local_action_stt_barge_any,
+            110,
+            ("barge any on", "stt barge-any on", "stt bargein any on", "barge any off", "stt barge-any off", "stt bargein any off"),
+        ),
+        Intent(
+            "stt_chat",
+            _local_action_stt_chat,
+            120,
+            ("stt chat on", "chat stt on", "voice chat on", "voz chat on", "stt chat off", "chat stt off", "voice chat off", "voz chat off"),
+        ),
+        Intent("stt_debug", _local_action_stt_debug, 130, ("stt debug on", "debug stt on", "stt depuracion on", "stt debug off", "debug stt off", "stt depuracion off")),
+        Intent("stt_diag", _local_action_stt_diag, 140, ("mic nivel", "stt nivel", "nivel stt", "stt diag", "diagnostico stt")),
+        Intent("reader_help", _local_action_reader_help, 150, ("ayuda lectura", "help lectura")),
+        Intent("library_rescan", _local_action_library_rescan, 160, ("biblioteca rescan", "actualizar biblioteca", "rescan biblioteca")),
+        Intent("library_list", _local_action_library_list, 170, ("biblioteca", "libros")),
+        Intent("reader_manual", _local_action_reader_manual, 180, ("manual",), (_LOCAL_READER_MANUAL_RE,)),
+        Intent("reader_continuous", _local_action_reader_continuous, 190, ("continuo",), (_LOCAL_READER_CONTINUOUS_RE,)),
+        Intent("reader_comment", _local_action_reader_comment, 200, ("bloque", "que leiste")),
+        Intent("reader_open_book", _local_action_reader_open_book, 210, ("leer", "leeme", "abri"), (_READER_BOOK_CMD_RE,)),
+        Intent(
+            "reader_pause",
+            _local_action_reader_pause,
+            220,
+            ("detenete", "detente", "pausa lectura", "pausar la lectura", "pausar lectura", "detener lectura", "parar lectura", "pares la lectura", "stop lectura"),
+        ),
+        Intent("reader_continue_from", _local_action_reader_continue_from, 230, ("desde",)),
+        Intent("reader_jump", _local_action_reader_jump, 240, ("parrafo", "bloque"), (_LOCAL_READER_JUMP_RE, _LOCAL_READER_JUMP_SHORT_RE)),
+        Intent("reader_back_phrase", _local_action_reader_back_phrase, 250, ("volver una frase",)),
+        Intent("reader_back_paragraph", _local_action_reader_back_paragraph, 260, ("volver un parrafo",)),
+        Intent("reader_status", _local_action_reader_status, 270, ("estado lectura", "donde voy", "status lectura")),
+        Intent("reader_repeat", _local_action_reader_repeat, 280, ("repeti",)),
+        Intent(
+            "reader_next",
+            _local_action_reader_next,
+            290,
+            ("segui", "siguiente", "continua", "contiuna", "contionua", "sigas leyendo", "next"),
+        ),
+        Intent("youtube_transport", _local_action_youtube_transport, 300, _YOUTUBE_SITE_TOKENS),
+        Intent("close_web_windows", _local_action_close_web_windows, 310, ("web", "navegador", "browser")),
+        Intent("close_recent_window", _local_action_close_recent_window, 320, ("cerr", "close", "cierra")),
+        Intent("desktop_item", _local_action_desktop_item, 330, ("escritorio", "desktop")),
+        Intent("web_login", _local_action_web_login, 340, ("login", "loguea", "sesion"), (_LOCAL_WEB_LOGIN_RE,)),
+        Intent("gemini_ask", _local_action_gemini_ask, 350, _GEMINI_SITE_TOKENS),
+        Intent("gemini_write", _local_action_gemini_write, 360, _GEMINI_SITE_TOKENS),
+        Intent("web_ask", _local_action_web_ask, 370, always=True),
+        Intent("firefox_open", _local_action_firefox_open, 380, ("firefox",)),
+        Intent("gemini_open", _local_action_gemini_open, 390, _GEMINI_SITE_TOKENS),
+        Intent("youtube_play", _local_action_youtube_play, 400, always=True),
+        Intent("web_search", _local_action_web_search, 410, always=True),
+        Intent("site_new_chat", _local_action_site_new_chat, 420, _NEW_CHAT_TOKENS),
+        Intent("youtube_about", _local_action_youtube_about, 430, ("youtube",), (_LOCAL_YOUTUBE_ABOUT_RE,)),
+        Intent("open_sites", _local_action_open_sites, 440, _OPEN_REQUEST_TOKENS),
+        Intent("desktop_list", _local_action_desktop_list, 450, ("escritorio", "desktop")),
+    )
+)
+
+
+def _maybe_handle_local_action(message: str, allowed_tools: set[str], session_id: str) -> dict | None:
+    ctx = _LocalActionContext(message, allowed_tools, session_id)
+    with _TRACER.span("local_action_route") as span:
+        result, report = _LOCAL_ACTION_ROUTER.dispatch(ctx.normalized, ctx)
+        if span is not None:
+            span["attrs"]["intent"] = report.intent
+    if result is None:
+        return None
+    result.setdefault("local_intent", report.intent)
+    return result
+
+
 def _is_voice_control_command(message: str) -> bool:
     normalized = _normalize_text(message)
     keys = ("voz on", "voz off", "voz test", "activa voz", "desactiva voz", "silenciar voz", "mute voz")
@@ -9114,7 +9804,7 @@ def _discover_cloud_models() -> tuple[str, list[str]]:
 
 
 def _discover_ollama_models() -> list[str]:
-    base = str(os.environ.get("DIRECT_CHAT_OLLAMA_URL", "http://127.0.0.1:11434")).strip().rstrip("/")
+    base = _ollama_base_url()
     timeout_s = float(_int_env("DIRECT_CHAT_OLLAMA_LIST_TIMEOUT_SEC", 3))
     found: list[str] = []
 
@@ -9210,14 +9900,26 @@ def _model_alias_map() -> dict[str, str]:
     return aliases
 
 
-def _model_catalog(force_refresh: bool = False) -> dict:
-    ttl = max(2, _int_env("DIRECT_CHAT_MODEL_CATALOG_TTL_SEC", 8))
-    now = time.time()
-    cached = _MODEL_CATALOG_CACHE.get("data")
-    cache_ts = float(_MODEL_CATALOG_CACHE.get("ts", 0.0) or 0.0)
-    if (not force_refresh) and cached and (now - cache_ts) < ttl:
-        return cached
+def _model_context_tokens(model_id: str, backend: str, selector_id: str = "") -> int:
+    """Context window used for prompt budgeting (and Ollama `num_ctx`).
+
+    DIRECT_CHAT_MODEL_CONTEXT_TOKENS="model=tokens,..." overrides per model id or
+    selector id; otherwise DIRECT_CHAT_LOCAL_NUM_CTX / DIRECT_CHAT_CLOUD_CONTEXT_TOKENS.
+    """
+    overrides = _split_alias_csv(str(os.environ.get("DIRECT_CHAT_MODEL_CONTEXT_TOKENS", "")).strip())
+    for key in (selector_id, model_id):
+        try:
+            if key and key in overrides:
+                return max(512, int(overrides[key]))
+        except Exception:
+            continue
+    if backend == "local":
+        return max(512, _int_env("DIRECT_CHAT_LOCAL_NUM_CTX", 8192))
+    return max(512, _int_env("DIRECT_CHAT_CLOUD_CONTEXT_TOKENS", 128000))
 
+
+def _build_model_catalog() -> dict:
+    now = time.time()
     default_cloud, cloud_models = _discover_cloud_models()
     installed_local = _discover_ollama_models()
     local_candidates, local_strict_allowlist = _configured_local_model_candidates()
@@ -9255,6 +9957,7 @@ def _model_catalog(force_refresh: bool = False) -> dict:
                 "label": mid,
                 "backend": "cloud",
                 "available": True,
+                "context_tokens": _model_context_tokens(mid, "cloud"),
             }
         )
 
@@ -9277,6 +9980,7 @@ def _model_catalog(force_refresh: bool = False) -> dict:
                 "available": is_available,
                 "runtime_model": runtime_id,
                 "alias_of": runtime_id if runtime_id != mid else "",
+                "context_tokens": _model_context_tokens(runtime_id, "local", selector_id=mid),
             }
         )
 
@@ -9290,11 +9994,72 @@ def _model_catalog(force_refresh: bool = False) -> dict:
         "by_id": by_id,
         "ts": now,
     }
-    _MODEL_CATALOG_CACHE["ts"] = now
-    _MODEL_CATALOG_CACHE["data"] = data
     return data
 
 
+# Discovery (Ollama HTTP + `ollama list`, openclaw.json) runs in a background
+# thread; requests get the last good catalog. Rebuilt every
+# DIRECT_CHAT_MODEL_CATALOG_TTL_SEC and right after openclaw.json changes.
+_MODEL_CATALOG = _CatalogRefresher(
+    _build_model_catalog,
+    interval_s=max(2, _int_env("DIRECT_CHAT_MODEL_CATALOG_TTL_SEC", 8)),
+    watch_paths=[Path.home() / ".openclaw" / "openclaw.json"],
+)
+
+
+def _model_catalog(force_refresh: bool = False) -> dict:
+    data = _MODEL_CATALOG.get(force=force_refresh)
+    return data if data is not None else _build_model_catalog()
+
+
+def _ollama_base_url() -> str:
+    return str(os.environ.get("DIRECT_CHAT_OLLAMA_URL", "http://127.0.0.1:11434")).strip().rstrip("/")
+
+
+def _ollama_session_mode() -> bool:
+    """Native /api/chat with keep_alive + fixed num_ctx, stable prompt prefix."""
+    return _env_flag("DIRECT_CHAT_OLLAMA_SESSION_MODE", True)
+
+
+def _ollama_keep_alive(model: str) -> str:
+    per_model = _split_alias_csv(str(os.environ.get("DIRECT_CHAT_OLLAMA_KEEP_ALIVE_MODELS", "")).strip())
+    return per_model.get(model) or str(os.environ.get("DIRECT_CHAT_OLLAMA_KEEP_ALIVE", "30m")).strip()
+
+
+def _local_num_ctx(runtime_model: str) -> int:
+    catalog = _model_catalog()
+    for meta in catalog.get("models", []):
+        if isinstance(meta, dict) and meta.get("backend") == "local" and meta.get("runtime_model") == runtime_model:
+            return int(meta.get("context_tokens", 0) or 0) or _model_context_tokens(runtime_model, "local")
+    return _model_context_tokens(runtime_model, "local")
+
+
+def _warm_local_model(model_id: str) -> dict:
+    catalog = _model_catalog()
+    meta = catalog.get("by_id", {}).get(model_id) if isinstance(catalog.get("by_id"), dict) else None
+    if not isinstance(meta, dict):
+        return {"ok": False, "model": model_id, "error": "UNKNOWN_MODEL"}
+    if meta.get("backend") != "local" or not meta.get("available"):
+        return {"ok": True, "model": model_id, "backend": meta.get("backend"), "warming": False}
+    runtime = str(meta.get("runtime_model", "")).strip() or model_id
+    started = _OLLAMA_WARMER.warm(
+        _ollama_base_url(),
+        runtime,
+        keep_alive=_ollama_keep_alive(runtime),
+        num_ctx=int(meta.get("context_tokens", 0) or 0) or _model_context_tokens(runtime, "local"),
+    )
+    return {"ok": True, "model": model_id, "backend": "local", "runtime_model": runtime, "warming": started}
+
+
+def _warm_startup_models() -> None:
+    wanted = _split_csv(str(os.environ.get("DIRECT_CHAT_OLLAMA_WARM_MODELS", "")).strip())
+    if not wanted:
+        wanted = [str(_model_catalog().get("default_model", "")).strip()]
+    for model_id in wanted:
+        if model_id:
+            _warm_local_model(model_id)
+
+
 class _ModelSelectionError(Exception):
     def __init__(self, code: str, model: str, detail: str):
         super().__init__(detail)
@@ -9371,6 +10136,7 @@ def _resolve_model_request(model: str, model_backend: str | None = None) -> dict
         "resolved_model": runtime_model,
         "resolved_backend": backend if backend in ("cloud", "local") else "cloud",
         "requested_backend": requested_backend if requested_backend in ("cloud", "local") else "",
+        "context_tokens": int(known.get("context_tokens", 0) or 0),
     }
 
 
@@ -9423,10 +10189,25 @@ class Handler(BaseHTTPRequestHandler):
             "proc": {"pid": pid, "rss_mb": rss_mb},
             "sys": {"ram_total_mb": mem_total_mb, "ram_used_mb": mem_used_mb, "ram_avail_mb": mem_avail_mb},
             "gpu": {"vram": vram},
+            "local_actions": _LOCAL_ACTION_ROUTER.stats(),
+            "proc_index": _PROC_INDEX.stats(),
+            "ocr": _OCR.stats(),
+            "frame_diff": _FRAME_DIFF.stats(),
+            "youtube_resolver": _YOUTUBE_RESOLVER.stats(),
+            "searxng_cache": web_search.SEARCH_CACHE.stats(),
+            "page_fetch": _PAGES.stats(),
+            "ollama_warm": _OLLAMA_WARMER.status(),
+            "web_ask_daemon": web_ask.WEB_ASK_DAEMON.status(),
+            "profile_sync": web_ask.PROFILE_SYNC.stats(),
+            "model_catalog": _MODEL_CATALOG.stats(),
+            "guardrail": _GUARDRAIL.stats(),
+            "history": _HISTORY.stats(),
+            "gemini_api": {**web_ask.GEMINI_CLIENT.stats(), "usage": web_ask.GEMINI_USAGE.stats()},
         }
 
     def _json(self, status: int, payload: dict):
         raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        _TRACER.annotate(status=int(status))
         try:
             self.send_response(status)
             self.send_header("Content-Type", "application/json; charset=utf-8")
@@ -9521,6 +10302,7 @@ class Handler(BaseHTTPRequestHandler):
             "tts_available": bool(server_ok or fallback_tools),
             "tts_diagnostic": _voice_diagnostics(),
             "tts_playing": bool(_tts_is_playing()),
+            "reader_prefetch": _READER_PREFETCH.status(),
             "last_status": _VOICE_LAST_STATUS,
             **_tts_playback_state(),
             "ui_last_session_id": str(ui_last_sid or ""),
@@ -9529,10 +10311,38 @@ class Handler(BaseHTTPRequestHandler):
             **stt_status,
         }
 
+    def send_response(self, code, message=None):
+        self._response_status = int(code)
+        super().send_response(code, message)
+
+    def _observe_request(self, method: str, serve) -> None:
+        t0 = time.perf_counter()
+        self._response_status = 0
+        try:
+            serve()
+        finally:
+            path = urlparse(self.path).path
+            status = int(getattr(self, "_response_status", 0) or 0)
+            route = path if path in _HTTP_ROUTES else "unmatched"
+            _PROM_HTTP_SECONDS.observe(time.perf_counter() - t0, method, route)
+            _PROM_HTTP_REQUESTS.inc(method, route, str(status or "aborted"))
+
     def do_GET(self):
+        self._observe_request("GET", self._do_get)
+
+    def _do_get(self):
         parsed = urlparse(self.path)
         path = parsed.path
 
+        if path == "/metrics":
+            raw = _PROM.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", _PROM.CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+            return
+
         if path == "/":
             raw = HTML.encode("utf-8")
             self.send_response(200)
@@ -9617,7 +10427,11 @@ class Handler(BaseHTTPRequestHandler):
             sid = _safe_session_id((query.get("session", ["default"])[0]))
             model = str(query.get("model", [""])[0]).strip()
             model_backend = str(query.get("model_backend", [""])[0]).strip().lower()
-            hist = _load_history(sid, model=model, backend=model_backend)
+            try:
+                limit = int(query.get("limit", ["200"])[0])
+            except Exception:
+                limit = 200
+            hist = _load_history(sid, model=model, backend=model_backend, limit=limit)
             self._json(
                 200,
                 {
@@ -9649,15 +10463,40 @@ class Handler(BaseHTTPRequestHandler):
             self._json(200, self._metrics_payload())
             return
 
+        if path == "/api/trace/recent":
+            query = parse_qs(parsed.query)
+            try:
+                limit = max(1, min(200, int(query.get("limit", ["20"])[0])))
+            except Exception:
+                limit = 20
+            name = str(query.get("name", [""])[0]).strip()
+            self._json(200, {"ok": True, "enabled": _TRACER.enabled, **_TRACER.recent(limit=limit, name=name)})
+            return
+
         if path == "/api/models":
-            force = str(parse_qs(parsed.query).get("refresh", ["0"])[0]).strip().lower() in ("1", "true", "yes")
-            catalog = _model_catalog(force_refresh=force)
+            query = parse_qs(parsed.query)
+            force = str(query.get("refresh", ["0"])[0]).strip().lower() in ("1", "true", "yes")
+            since_raw = str(query.get("since", [""])[0]).strip()
+            if since_raw and not force:
+                # Long-poll: answer once the catalog version moves past `since` (or after `wait` seconds).
+                try:
+                    since = int(since_raw)
+                    wait_s = min(55.0, max(0.0, float(str(query.get("wait", ["25"])[0]).strip() or "25")))
+                except Exception:
+                    self._json(400, {"error": "since/wait must be numeric"})
+                    return
+                version, catalog = _MODEL_CATALOG.wait_for_change(since, wait_s)
+                catalog = catalog if catalog is not None else _model_catalog()
+            else:
+                catalog = _model_catalog(force_refresh=force)
+                version = _MODEL_CATALOG.version
             self._json(
                 200,
                 {
                     "default_model": str(catalog.get("default_model", "")),
                     "models": catalog.get("models", []),
                     "updated_ts": catalog.get("ts"),
+                    "version": version,
                 },
             )
             return
@@ -9820,10 +10659,24 @@ class Handler(BaseHTTPRequestHandler):
         self.send_header("Content-Type", "text/html; charset=utf-8")
         self.end_headers()
 
-    def _build_messages(self, message: str, history: list, mode: str, allowed_tools: set[str], attachments: list) -> list:
+    def _build_messages(
+        self,
+        message: str,
+        history: list,
+        mode: str,
+        allowed_tools: set[str],
+        attachments: list,
+        context_tokens: int = 0,
+        history_drop_step: int = 1,
+        volatile_context: dict | None = None,
+    ) -> list:
+        """System + history + [volatile context] + user turn; with `context_tokens`, fitted to that budget.
+
+        The budget report is left in `self._prompt_budget` for the response metadata.
+        """
         clean = []
         if isinstance(history, list):
-            for item in history[-60:]:
+            for item in history[-(200 if context_tokens else 60):]:
                 if not isinstance(item, dict):
                     continue
                 role = item.get("role")
@@ -9850,7 +10703,22 @@ class Handler(BaseHTTPRequestHandler):
             "role": "system",
             "content": _build_system_prompt(mode, allowed_tools),
         }
-        return [system] + clean + [{"role": "user", "content": message + extra}]
+        user = {"role": "user", "content": message + extra}
+        self._prompt_budget = None
+        if context_tokens <= 0:
+            return [system] + clean + ([volatile_context] if volatile_context else []) + [user]
+        messages, report = _fit_messages(
+            system,
+            clean,
+            user,
+            context_tokens=context_tokens,
+            reserve_tokens=max(0, _int_env("DIRECT_CHAT_REPLY_RESERVE_TOKENS", 1024)),
+            drop_step=history_drop_step,
+            tail=volatile_context,
+        )
+        self._prompt_budget = report
+        _TRACER.annotate(prompt_tokens=report["prompt_tokens"], history_kept=report["history_kept"])
+        return messages
 
     def _call_gateway(self, payload: dict) -> dict:
         timeout_s = max(8.0, float(_int_env("DIRECT_CHAT_GATEWAY_TIMEOUT_SEC", 45)))
@@ -9877,13 +10745,18 @@ class Handler(BaseHTTPRequestHandler):
             raise _BackendCallError("MODEL_TIMEOUT", f"gateway timeout after {timeout_s:.0f}s", status=504) from e
 
     def _call_ollama(self, payload: dict) -> dict:
-        base = str(os.environ.get("DIRECT_CHAT_OLLAMA_URL", "http://127.0.0.1:11434")).strip().rstrip("/")
+        base = _ollama_base_url()
         timeout_s = max(10.0, float(_int_env("DIRECT_CHAT_OLLAMA_TIMEOUT_SEC", 120)))
         conn_timeout_s = max(2.0, float(_int_env("DIRECT_CHAT_OLLAMA_CONNECT_TIMEOUT_SEC", 4)))
 
         v1_payload = dict(payload)
         v1_payload["stream"] = False
 
+        if _ollama_session_mode():
+            model = str(payload.get("model", "")).strip()
+            legacy_payload = _ollama_native_payload(payload, _ollama_keep_alive(model), _local_num_ctx(model))
+            return self._call_ollama_native(base, legacy_payload, model, conn_timeout_s, timeout_s, last_err="")
+
         try:
             r = requests.post(f"{base}/v1/chat/completions", json=v1_payload, timeout=(conn_timeout_s, timeout_s))
             if r.status_code < 400:
@@ -9911,7 +10784,13 @@ class Handler(BaseHTTPRequestHandler):
         temp = payload.get("temperature")
         if temp is not None:
             legacy_payload["options"] = {"temperature": temp}
+        return self._call_ollama_native(
+            base, legacy_payload, str(payload.get("model", "")).strip(), conn_timeout_s, timeout_s, last_err=last_err
+        )
 
+    def _call_ollama_native(
+        self, base: str, legacy_payload: dict, model: str, conn_timeout_s: float, timeout_s: float, last_err: str
+    ) -> dict:
         try:
             r2 = requests.post(f"{base}/api/chat", json=legacy_payload, timeout=(conn_timeout_s, timeout_s))
         except requests.exceptions.Timeout as e:
@@ -9931,18 +10810,31 @@ class Handler(BaseHTTPRequestHandler):
             content = str(raw.get("response", "") if isinstance(raw, dict) else "")
         return {
             "id": raw.get("id", "ollama-local"),
-            "model": str(payload.get("model", "")).strip(),
+            "model": model,
             "choices": [{"message": {"role": "assistant", "content": content}}],
             "provider": "ollama",
             "raw": raw,
         }
 
     def _call_model_backend(self, backend: str, payload: dict) -> dict:
-        if backend == "local":
-            return self._call_ollama(payload)
-        return self._call_gateway(payload)
+        t0 = time.perf_counter()
+        outcome = "error"
+        try:
+            with _TRACER.span("call_model_backend", backend=backend, model=str(payload.get("model", ""))):
+                out = self._call_ollama(payload) if backend == "local" else self._call_gateway(payload)
+            outcome = "ok"
+            return out
+        finally:
+            _PROM_MODEL_SECONDS.observe(time.perf_counter() - t0, str(backend or "cloud"), outcome)
 
     def do_POST(self):
+        def _serve() -> None:
+            with _TRACER.trace(f"POST {urlparse(self.path).path}"):
+                self._do_post()
+
+        self._observe_request("POST", _serve)
+
+    def _do_post(self):
         if self.path == "/api/reader/rescan":
             try:
                 out = _READER_LIBRARY.rescan()
@@ -9979,6 +10871,8 @@ class Handler(BaseHTTPRequestHandler):
                         meta["book_format"] = str(book_meta.get("format", ""))
                         meta["book_source_path"] = str(book_meta.get("source_path", ""))
                     metadata = meta
+                if reset:
+                    _reader_prefetch_invalidate(sid, reason="reader_session_start")
                 out = _READER_STORE.start_session(sid, chunks=chunks, text=text, reset=reset, metadata=metadata)
                 self._json(200, out)
             except ValueError as e:
@@ -10068,6 +10962,7 @@ class Handler(BaseHTTPRequestHandler):
                         playback_ms = float(raw_playback)
                     except Exception:
                         playback_ms = None
+                _reader_prefetch_invalidate(sid, reason=detail)
                 out = _READER_STORE.mark_barge_in(
                     sid,
                     detail=detail,
@@ -10304,6 +11199,16 @@ class Handler(BaseHTTPRequestHandler):
                 self._json(500, {"error": str(e)})
             return
 
+        if self.path == "/api/models":
+            # Model switched in the UI: preload it (local models only).
+            try:
+                payload = self._parse_payload()
+                out = _warm_local_model(str(payload.get("model", "")).strip())
+                self._json(200 if out.get("ok") else 400, out)
+            except Exception as e:
+                self._json(500, {"ok": False, "error": str(e)})
+            return
+
         if self.path == "/api/history":
             try:
                 payload = self._parse_payload()
@@ -10374,6 +11279,7 @@ class Handler(BaseHTTPRequestHandler):
                 reader_state = str(st_reader.get("reader_state", "")).strip().lower() if st_reader.get("ok") else ""
                 reader_active = bool(_READER_STORE.is_continuous(session_id) or reader_state == "reading")
                 if (not reader_control_command) and reader_active:
+                    _reader_prefetch_invalidate(session_id, reason="reader_user_interrupt")
                     _READER_STORE.set_continuous(session_id, False, reason="reader_user_interrupt")
                     _READER_STORE.set_reader_state(session_id, "commenting", reason="reader_user_interrupt")
                 # Typed input should barge-in current TTS playback, even outside strict
@@ -10399,15 +11305,7 @@ class Handler(BaseHTTPRequestHandler):
                 local_action = _maybe_handle_local_action(message, allowed_tools, session_id=session_id)
                 if local_action is not None:
                     reply = str(local_action.get("reply", ""))
-                    merged_local = []
-                    raw_hist = payload.get("history", [])
-                    if isinstance(raw_hist, list):
-                        for item in raw_hist[-80:]:
-                            if isinstance(item, dict) and item.get("role") in ("user", "assistant") and isinstance(item.get("content"), str):
-                                merged_local.append({"role": item["role"], "content": item["content"]})
-                    merged_local.append({"role": "user", "content": message})
-                    merged_local.append({"role": "assistant", "content": reply})
-                    _save_history(session_id, merged_local, model=model, backend=requested_backend)
+                    _record_history_turn(session_id, payload.get("history", []), message, reply, model=model, backend=requested_backend)
                     if record_chat_events:
                         _chat_events_append(
                             session_id,
@@ -10460,14 +11358,7 @@ class Handler(BaseHTTPRequestHandler):
             local_action = _maybe_handle_local_action(message, allowed_tools, session_id=session_id)
             if local_action is not None:
                 reply = str(local_action.get("reply", ""))
-                merged_local = []
-                if isinstance(history, list):
-                    for item in history[-80:]:
-                        if isinstance(item, dict) and item.get("role") in ("user", "assistant") and isinstance(item.get("content"), str):
-                            merged_local.append({"role": item["role"], "content": item["content"]})
-                merged_local.append({"role": "user", "content": message})
-                merged_local.append({"role": "assistant", "content": reply})
-                _save_history(session_id, merged_local, model=model, backend=resolved_backend)
+                _record_history_turn(session_id, history, message, reply, model=model, backend=resolved_backend)
                 if record_chat_events:
                     _chat_events_append(
                         session_id,
@@ -10503,7 +11394,7 @@ class Handler(BaseHTTPRequestHandler):
                 self._json(200, local_action)
                 return
 
-            messages = self._build_messages(message, history, mode, allowed_tools_for_prompt, attachments)
+            search_context: dict | None = None
             q = web_search.extract_web_search_query(message)
             if q and ("web_search" in allowed_tools):
                 ok_g, gd = _guardrail_check(
@@ -10530,7 +11421,14 @@ class Handler(BaseHTTPRequestHandler):
                         return
                     self._json(200, {"reply": blocked})
                     return
-                sp = web_search.searxng_search(q)
+                if _web_search_mode(payload) == "multi":
+                    sp = web_search.searxng_multi_search(
+                        q,
+                        max_workers=max(1, _int_env("DIRECT_CHAT_WEB_SEARCH_FANOUT", 3)),
+                        budget_s=max(1.0, _int_env("DIRECT_CHAT_WEB_SEARCH_BUDGET_MS", 6000) / 1000.0),
+                    )
+                else:
+                    sp = web_search.searxng_search(q)
                 if not sp.get("ok"):
                     err = str(sp.get("error", "web_search_failed"))
                     if self.path == "/api/chat/stream":
@@ -10551,19 +11449,42 @@ class Handler(BaseHTTPRequestHandler):
                     self._json(200, {"reply": f"No pude buscar en SearXNG local: {err}"})
                     return
 
+                if _env_flag("DIRECT_CHAT_WEB_FETCH_PAGES", False):
+                    sp = _PAGES.enrich(
+                        sp,
+                        top_k=max(0, _int_env("DIRECT_CHAT_WEB_FETCH_TOP_K", 3)),
+                        budget_s=max(0.2, _int_env("DIRECT_CHAT_WEB_FETCH_BUDGET_MS", 2500) / 1000.0),
+                    )
                 context = web_search.format_results_for_prompt(sp)
-                messages = [
-                    messages[0],
-                    {
-                        "role": "system",
-                        "content": (
-                            "Se te proveen resultados de busqueda web desde SearXNG local. "
-                            "Usalos como base. Si no alcanza para responder, deci que falta. "
-                            "No intentes usar herramientas de busqueda externas. "
-                            "Cita fuentes mencionando el numero de resultado (1,2,3...).\n\n" + context
-                        ),
-                    },
-                ] + messages[1:]
+                search_context = {
+                    "role": "system",
+                    "content": (
+                        "Se te proveen resultados de busqueda web desde SearXNG local. "
+                        "Usalos como base. Si no alcanza para responder, deci que falta. "
+                        "No intentes usar herramientas de busqueda externas. "
+                        "Cita fuentes mencionando el numero de resultado (1,2,3...).\n\n" + context
+                    ),
+                }
+
+            with _TRACER.span("build_messages"):
+                messages = self._build_messages(
+                    message,
+                    history,
+                    mode,
+                    allowed_tools_for_prompt,
+                    attachments,
+                    context_tokens=(
+                        int(model_resolution.get("context_tokens", 0) or 0)
+                        if _env_flag("DIRECT_CHAT_PROMPT_BUDGET", True)
+                        else 0
+                    ),
+                    # Local session mode drops old turns in blocks so the cached
+                    # prompt prefix survives several turns between cuts.
+                    history_drop_step=8 if (resolved_backend == "local" and _ollama_session_mode()) else 1,
+                    # Volatile context goes right before the user turn, inside the budget,
+                    # so the system + history prefix stays identical across turns.
+                    volatile_context=search_context,
+                )
 
             if self.path == "/api/chat/stream":
                 # Robust pseudo-stream: avoids hanging when upstream SSE behavior
@@ -10581,14 +11502,7 @@ class Handler(BaseHTTPRequestHandler):
                         "Reformulá en un paso más concreto (por ejemplo: "
                         "'buscá X en YouTube' o 'abrí Y')."
                     )
-                merged = []
-                if isinstance(history, list):
-                    for item in history[-80:]:
-                        if isinstance(item, dict) and item.get("role") in ("user", "assistant") and isinstance(item.get("content"), str):
-                            merged.append({"role": item["role"], "content": item["content"]})
-                merged.append({"role": "user", "content": message})
-                merged.append({"role": "assistant", "content": full})
-                _save_history(session_id, merged, model=model, backend=resolved_backend)
+                _record_history_turn(session_id, history, message, full, model=model, backend=resolved_backend)
                 if record_chat_events:
                     _chat_events_append(
                         session_id,
@@ -10637,15 +11551,8 @@ class Handler(BaseHTTPRequestHandler):
                 )
             _maybe_speak_reply(reply, allowed_tools)
 
-            # Persist merged history server-side as fallback.
-            merged = []
-            if isinstance(history, list):
-                for item in history[-80:]:
-                    if isinstance(item, dict) and item.get("role") in ("user", "assistant") and isinstance(item.get("content"), str):
-                        merged.append({"role": item["role"], "content": item["content"]})
-            merged.append({"role": "user", "content": message})
-            merged.append({"role": "assistant", "content": reply})
-            _save_history(session_id, merged, model=model, backend=resolved_backend)
+            # Persist the turn server-side as fallback.
+            _record_history_turn(session_id, history, message, reply, model=model, backend=resolved_backend)
             if record_chat_events:
                 _chat_events_append(
                     session_id,
@@ -10663,6 +11570,7 @@ class Handler(BaseHTTPRequestHandler):
                     "raw": response_data,
                     "model": model,
                     "model_backend": resolved_backend,
+                    "prompt_budget": getattr(self, "_prompt_budget", None),
                     "chat_seq": int(_chat_events_poll(session_id, after_seq=0, limit=1).get("seq", 0) or 0),
                 },
             )
@@ -10670,7 +11578,7 @@ class Handler(BaseHTTPRequestHandler):
             self._json(400, e.as_payload())
         except _BackendCallError as e:
             if e.code == "MISSING_MODEL":
-                _model_catalog(force_refresh=True)
+                _MODEL_CATALOG.request_refresh()
             self._json(e.status, e.as_payload())
         except HTTPError as e:
             detail = e.read().decode("utf-8", errors="replace")
@@ -10703,6 +11611,11 @@ def main():
         _sync_stt_with_voice(enabled=bool(boot_state.get("enabled", False)), session_id="")
     except Exception:
         pass
+    if _ollama_session_mode():
+        try:
+            _warm_startup_models()
+        except Exception:
+            pass
     print(f"Direct chat ready: http://{args.host}:{args.port}")
     print(f"Target gateway: http://127.0.0.1:{args.gateway_port}/v1/chat/completions")
     httpd.serve_forever()
@@ -38,6 +38,16 @@ def api_chat(message: str) -> str:
     return str(data.get('reply', ''))
 
 
+def proc_index_stats() -> dict:
+    # /proc reads done by DC's PID->profile cache; should stay ~flat per round.
+    try:
+        with urllib.request.urlopen(BASE + '/api/metrics', timeout=10) as resp:
+            data = json.loads(resp.read().decode('utf-8'))
+        return dict(data.get('proc_index') or {})
+    except Exception:
+        return {}
+
+
 def count_profile1_chrome() -> int:
     # Don't import psutil; use /proc via pgrep output.
     import subprocess
@@ -73,6 +83,10 @@ def main() -> None:
         print('  close ->', reply.splitlines()[0][:200])
         time.sleep(0.6)
 
+        stats = proc_index_stats()
+        if stats:
+            print('  proc_index:', {k: stats.get(k) for k in ('entries', 'reads', 'hits', 'revalidated', 'invalidated')})
+
     api_chat('reset ventanas web')
     print('Stress test done.')
 
@@ -0,0 +1,316 @@
+#!/usr/bin/env node
+"use strict";
+
+// Long-lived web_ask runner: keeps one warm persistent Chrome context per
+// user-data-dir (profile) and one tab per site inside it, and accepts jobs as
+// JSON lines over a local Unix socket. Jobs for the same tab run in order;
+// different sites run concurrently in their own tabs. A periodic health check
+// closes contexts whose tabs stopped responding, that sat idle too long, or
+// that served too many jobs; the next job relaunches them.
+//
+// Protocol (one request per connection, one JSON line each way):
+//   {"op": "ask", "site", "prompt", "followups", "profile_dir", "user_data_dir", "timeout_ms", "thread_file"}
+//   {"op": "ping"} | {"op": "status"} | {"op": "recycle"} | {"op": "shutdown"}
+
+const fs = require("fs");
+const net = require("net");
+const os = require("os");
+const path = require("path");
+const {
+  SITE_CONFIG,
+  askInPage,
+  buildPrompts,
+  finish,
+  launchContext,
+  launchErrorStatus,
+  mkResult,
+  nowEpoch,
+} = require("./web_ask_playwright.js");
+
+function parseArgs(argv) {
+  const out = {};
+  for (let i = 2; i < argv.length; i += 1) {
+    const token = argv[i];
+    if (!token.startsWith("--")) continue;
+    const key = token.slice(2);
+    const next = argv[i + 1];
+    if (next && !next.startsWith("--")) {
+      out[key] = next;
+      i += 1;
+    } else {
+      out[key] = "true";
+    }
+  }
+  return out;
+}
+
+function intArg(raw, fallback) {
+  const n = parseInt(String(raw || ""), 10);
+  return Number.isFinite(n) && n > 0 ? n : fallback;
+}
+
+const args = parseArgs(process.argv);
+const SOCKET_PATH = String(
+  args.socket || path.join(os.homedir(), ".openclaw", "web_ask_shadow", "web_ask_daemon.sock")
+);
+const HEADLESS = String(args.headless || "false").toLowerCase() === "true";
+const HEALTH_MS = intArg(args["health-ms"], 30000);
+const IDLE_MS = intArg(args["idle-ms"], 15 * 60 * 1000);
+const MAX_JOBS = intArg(args["max-jobs"], 40);
+const EXIT_IDLE_MS = intArg(args["exit-idle-ms"], 60 * 60 * 1000);
+
+const startedAt = nowEpoch();
+let lastJobAt = Date.now();
+const stats = { jobs: 0, ok: 0, failed: 0, launches: 0, recycled: 0, health_failures: 0 };
+
+// userDataDir -> { profileDir, context, tabs: Map(site -> { page, chain, pending }), jobs, lastUsed, launching }
+const contexts = new Map();
+
+async function closeEntry(userDataDir, reason) {
+  const entry = contexts.get(userDataDir);
+  if (!entry) return;
+  contexts.delete(userDataDir);
+  stats.recycled += 1;
+  log({ event: "recycle", user_data_dir: userDataDir, reason });
+  try {
+    const ctx = await entry.launching;
+    await ctx.close();
+  } catch {
+    // already gone
+  }
+}
+
+async function getEntry(userDataDir, profileDir) {
+  let entry = contexts.get(userDataDir);
+  if (entry && entry.profileDir !== profileDir) {
+    // One Chrome instance per user-data-dir: a different profile needs a relaunch.
+    await waitIdle(entry);
+    await closeEntry(userDataDir, "profile_changed");
+    entry = null;
+  }
+  if (!entry) {
+    entry = { profileDir, tabs: new Map(), jobs: 0, lastUsed: Date.now(), context: null };
+    entry.launching = launchContext(userDataDir, profileDir, HEADLESS);
+    contexts.set(userDataDir, entry);
+    stats.launches += 1;
+    try {
+      entry.context = await entry.launching;
+    } catch (err) {
+      contexts.delete(userDataDir);
+      throw err;
+    }
+    entry.context.on("close", () => {
+      if (contexts.get(userDataDir) === entry) contexts.delete(userDataDir);
+    });
+  }
+  entry.context = await entry.launching;
+  return entry;
+}
+
+function waitIdle(entry) {
+  return Promise.all([...entry.tabs.values()].map((tab) => tab.chain.catch(() => {})));
+}
+
+async function getTab(entry, site) {
+  let tab = entry.tabs.get(site);
+  if (tab && tab.page.isClosed()) {
+    entry.tabs.delete(site);
+    tab = null;
+  }
+  if (!tab) {
+    const blank = entry.context.pages().find((p) => p.url() === "about:blank" && ![...entry.tabs.values()].some((t) => t.page === p));
+    const page = blank || (await entry.context.newPage());
+    tab = { page, chain: Promise.resolve(), pending: 0 };
+    entry.tabs.set(site, tab);
+  }
+  return tab;
+}
+
+async function runAsk(req) {
+  const t0 = nowEpoch();
+  const site = String(req.site || "").trim().toLowerCase();
+  const prompt = String(req.prompt || "").trim();
+  const result = mkResult(site, t0);
+  if (!SITE_CONFIG[site]) return finish(result, "unsupported_site", false);
+  if (!prompt) return finish(result, "missing_prompt", false);
+  const userDataDir = String(req.user_data_dir || path.join(os.homedir(), ".config", "google-chrome"));
+  const profileDir = String(req.profile_dir || "Default");
+  const timeoutMs = Math.max(5000, parseInt(String(req.timeout_ms || "60000"), 10) || 60000);
+  const followups = Array.isArray(req.followups) ? req.followups : [];
+
+  let entry;
+  try {
+    entry = await getEntry(userDataDir, profileDir);
+  } catch (err) {
+    const { status, raw } = launchErrorStatus(err);
+    return finish(result, status, false, "", raw.slice(0, 500));
+  }
+  const warm = entry.jobs > 0;
+  const tab = await getTab(entry, site);
+  // Counted from queueing so the health check never recycles a context with work waiting.
+  tab.pending += 1;
+  const job = tab.chain.then(async () => {
+    entry.lastUsed = Date.now();
+    try {
+      const prompts = buildPrompts(prompt, JSON.stringify(followups));
+      return await askInPage(tab.page, site, prompts, {
+        startedAt: t0,
+        timeoutMs,
+        threadFile: String(req.thread_file || ""),
+        reuseUrl: true,
+      });
+    } finally {
+      tab.pending -= 1;
+      entry.jobs += 1;
+      entry.lastUsed = Date.now();
+    }
+  });
+  tab.chain = job.catch(() => {});
+  const out = await job;
+  out.meta = Object.assign({}, out.meta, { daemon: true, warm_context: warm, context_jobs: entry.jobs });
+  return out;
+}
+
+async function pageAlive(page) {
+  if (page.isClosed()) return false;
+  let timer;
+  try {
+    return await Promise.race([
+      page.evaluate(() => 1).then((v) => v === 1),
+      new Promise((resolve) => {
+        timer = setTimeout(() => resolve(false), 5000);
+      }),
+    ]);
+  } catch {
+    return false;
+  } finally {
+    clearTimeout(timer);
+  }
+}
+
+async function healthCheck() {
+  const now = Date.now();
+  for (const [userDataDir, entry] of [...contexts.entries()]) {
+    if (!entry.context) continue;
+    const busy = [...entry.tabs.values()].some((tab) => tab.pending > 0);
+    if (busy) continue;
+    if (now - entry.lastUsed > IDLE_MS) {
+      await closeEntry(userDataDir, "idle");
+      continue;
+    }
+    if (entry.jobs >= MAX_JOBS) {
+      await closeEntry(userDataDir, "max_jobs");
+      continue;
+    }
+    for (const [site, tab] of [...entry.tabs.entries()]) {
+      if (!(await pageAlive(tab.page))) {
+        stats.health_failures += 1;
+        await closeEntry(userDataDir, `unhealthy_tab:${site}`);
+        break;
+      }
+    }
+  }
+  if (contexts.size === 0 && now - lastJobAt > EXIT_IDLE_MS) {
+    shutdown("idle_exit");
+  }
+}
+
+function statusPayload() {
+  const out = [];
+  for (const [userDataDir, entry] of contexts.entries()) {
+    out.push({
+      user_data_dir: userDataDir,
+      profile_dir: entry.profileDir,
+      jobs: entry.jobs,
+      idle_s: Math.round((Date.now() - entry.lastUsed) / 1000),
+      tabs: [...entry.tabs.entries()].map(([site, tab]) => ({ site, pending: tab.pending, url: tab.page.isClosed() ? "" : tab.page.url() })),
+    });
+  }
+  return { ok: true, pid: process.pid, started_at: startedAt, stats, contexts: out };
+}
+
+function log(event) {
+  try {
+    const file = path.join(os.homedir(), ".openclaw", "logs", "web_ask_daemon.log");
+    fs.mkdirSync(path.dirname(file), { recursive: true });
+    fs.appendFileSync(file, JSON.stringify(Object.assign({ ts: nowEpoch() }, event)) + "\n");
+  } catch {
+    // logging is best-effort
+  }
+}
+
+async function handle(req) {
+  const op = String(req.op || "ask");
+  if (op === "ping") return { ok: true, pid: process.pid };
+  if (op === "status") return statusPayload();
+  if (op === "recycle") {
+    for (const userDataDir of [...contexts.keys()]) await closeEntry(userDataDir, "requested");
+    return { ok: true };
+  }
+  if (op === "shutdown") {
+    setImmediate(() => shutdown("requested"));
+    return { ok: true };
+  }
+  if (op !== "ask") return { ok: false, status: "unknown_op", evidence: op };
+  lastJobAt = Date.now();
+  stats.jobs += 1;
+  const out = await runAsk(req);
+  if (out.ok) stats.ok += 1;
+  else stats.failed += 1;
+  log({ event: "ask", site: out.meta && out.meta.site, status: out.status, duration: out.timings.duration });
+  return out;
+}
+
+const server = net.createServer((sock) => {
+  let buf = "";
+  sock.setEncoding("utf-8");
+  sock.on("data", (chunk) => {
+    buf += chunk;
+    const nl = buf.indexOf("\n");
+    if (nl < 0) return;
+    const line = buf.slice(0, nl);
+    buf = "";
+    let req;
+    try {
+      req = JSON.parse(line);
+    } catch {
+      sock.end(JSON.stringify({ ok: false, status: "bad_request", evidence: "invalid_json" }) + "\n");
+      return;
+    }
+    handle(req)
+      .catch((err) => ({ ok: false, status: "internal_error", evidence: String(err && err.message ? err.message : err) }))
+      .then((out) => {
+        if (!sock.destroyed) sock.end(JSON.stringify(out) + "\n");
+      });
+  });
+  sock.on("error", () => {});
+});
+
+let stopping = false;
+async function shutdown(reason) {
+  if (stopping) return;
+  stopping = true;
+  log({ event: "shutdown", reason });
+  server.close();
+  for (const userDataDir of [...contexts.keys()]) await closeEntry(userDataDir, "shutdown");
+  try {
+    fs.rmSync(SOCKET_PATH, { force: true });
+  } catch {}
+  process.exit(0);
+}
+
+fs.mkdirSync(path.dirname(SOCKET_PATH), { recursive: true });
+try {
+  fs.rmSync(SOCKET_PATH, { force: true });
+} catch {}
+server.listen(SOCKET_PATH, () => {
+  try {
+    fs.chmodSync(SOCKET_PATH, 0o600);
+  } catch {}
+  log({ event: "listen", socket: SOCKET_PATH, pid: process.pid });
+});
+setInterval(() => {
+  healthCheck().catch(() => {});
+}, HEALTH_MS);
+process.on("SIGTERM", () => shutdown("sigterm"));
+process.on("SIGINT", () => shutdown("sigint"));
@@ -371,57 +371,58 @@ function clearSingletonArtifacts(userDataDir) {
   }
 }
 
-async function main() {
-  const args = parseArgs(process.argv);
-  const site = String(args.site || "").trim().toLowerCase();
-  const prompt = String(args.prompt || "").trim();
-  const profileDir = String(args["profile-dir"] || "Default");
-  const userDataDir = String(args["user-data-dir"] || path.join(os.homedir(), ".config", "google-chrome"));
-  const timeoutMs = Math.max(5000, parseInt(String(args["timeout-ms"] || "60000"), 10) || 60000);
-  const headless = String(args.headless || "false").toLowerCase() === "true";
-  const threadFile = String(args["thread-file"] || "").trim();
-  const followup = String(args.followup || "").trim();
-  const followup2 = String(args.followup2 || "").trim();
-  const followupsJson = String(args["followups-json"] || "").trim();
-
-  const startedAt = nowEpoch();
-  const result = mkResult(site, startedAt);
-  const cfg = SITE_CONFIG[site];
-  if (!cfg) {
-    console.log(JSON.stringify(finish(result, "unsupported_site", false), null, 2));
-    process.exit(2);
-  }
-  if (!prompt) {
-    console.log(JSON.stringify(finish(result, "missing_prompt", false), null, 2));
-    process.exit(2);
+function buildPrompts(prompt, followupsJson, followup = "", followup2 = "") {
+  const prompts = [prompt];
+  if (followupsJson) {
+    try {
+      const parsed = JSON.parse(followupsJson);
+      if (Array.isArray(parsed)) {
+        for (const item of parsed) {
+          const clean = String(item || "").trim();
+          if (clean) prompts.push(clean);
+        }
+      }
+    } catch {
+      // fallback to legacy args
+    }
   }
+  if (prompts.length === 1 && followup) prompts.push(followup);
+  if (prompts.length <= 2 && followup2) prompts.push(followup2);
+  return prompts;
+}
 
-  let context;
+function launchContext(userDataDir, profileDir, headless) {
   clearSingletonArtifacts(userDataDir);
-  try {
-    context = await chromium.launchPersistentContext(userDataDir, {
-      channel: "chrome",
-      headless,
-      viewport: null,
-      args: [
-        `--profile-directory=${profileDir}`,
-        "--no-first-run",
-        "--no-default-browser-check",
-      ],
-    });
-  } catch (err) {
-    const raw = String(err && err.message ? err.message : err);
-    const lower = raw.toLowerCase();
-    const status =
-      lower.includes("lock") || lower.includes("singleton")
-        ? "profile_locked"
-        : "launch_failed";
-    console.log(JSON.stringify(finish(result, status, false, "", raw.slice(0, 500)), null, 2));
-    process.exit(3);
-  }
+  return chromium.launchPersistentContext(userDataDir, {
+    channel: "chrome",
+    headless,
+    viewport: null,
+    args: [
+      `--profile-directory=${profileDir}`,
+      "--no-first-run",
+      "--no-default-browser-check",
+    ],
+  });
+}
+
+function launchErrorStatus(err) {
+  const raw = String(err && err.message ? err.message : err);
+  const lower = raw.toLowerCase();
+  const status =
+    lower.includes("lock") || lower.includes("singleton")
+      ? "profile_locked"
+      : "launch_failed";
+  return { status, raw };
+}
 
+// Runs one ask (prompt + followups) in an already open page and returns the result object.
+// `reuseUrl`: skip navigation when the page already shows the target URL (warm daemon tabs).
+async function askInPage(page, site, prompts, opts) {
+  const cfg = SITE_CONFIG[site];
+  const result = mkResult(site, opts.startedAt || nowEpoch());
+  const timeoutMs = opts.timeoutMs;
+  const threadFile = opts.threadFile || "";
   try {
-    const page = context.pages()[0] || (await context.newPage());
     let targetUrl = cfg.url;
     if (threadFile && site === "chatgpt") {
       try {
@@ -434,25 +435,10 @@ async function main() {
       }
     }
 
-    const prompts = [prompt];
-    if (followupsJson) {
-      try {
-        const parsed = JSON.parse(followupsJson);
-        if (Array.isArray(parsed)) {
-          for (const item of parsed) {
-            const clean = String(item || "").trim();
-            if (clean) prompts.push(clean);
-          }
-        }
-      } catch {
-        // fallback to legacy args
-      }
+    if (!opts.reuseUrl || page.url() !== targetUrl) {
+      await page.goto(targetUrl, { waitUntil: "domcontentloaded", timeout: timeoutMs });
+      await page.waitForTimeout(900);
     }
-    if (prompts.length === 1 && followup) prompts.push(followup);
-    if (prompts.length <= 2 && followup2) prompts.push(followup2);
-
-    await page.goto(targetUrl, { waitUntil: "domcontentloaded", timeout: timeoutMs });
-    await page.waitForTimeout(900);
 
     const turns = [];
     for (let turnIndex = 0; turnIndex < prompts.length; turnIndex += 1) {
@@ -461,8 +447,7 @@ async function main() {
       if (!ready.ok || !ready.input) {
         const cap = await safeScreenshot(page, site);
         result.turns = turns;
-        console.log(JSON.stringify(finish(result, ready.status || "selector_changed", false, "", cap.path || cap.error), null, 2));
-        return;
+        return finish(result, ready.status || "selector_changed", false, "", cap.path || cap.error);
       }
 
       const baseline = await extractLastResponseText(page, cfg.responseSelectors);
@@ -482,8 +467,7 @@ async function main() {
         if (await detectSelectorAny(page, cfg.loginSelectors)) status = "login_required";
         else if (await detectHumanVerification(page)) status = "captcha_required";
         result.turns = turns;
-        console.log(JSON.stringify(finish(result, status, false, "", cap.path || cap.error), null, 2));
-        return;
+        return finish(result, status, false, "", cap.path || cap.error);
       }
 
       turns.push({ prompt: turnPrompt, text: responseText });
@@ -504,36 +488,88 @@ async function main() {
 
     const lastText = turns.length ? String(turns[turns.length - 1].text || "") : "";
     result.turns = turns;
-    console.log(JSON.stringify(finish(result, "ok", true, lastText), null, 2));
+    return finish(result, "ok", true, lastText);
   } catch (err) {
     const raw = String(err && err.message ? err.message : err);
     const status = /timeout/i.test(raw) ? "timeout" : "blocked";
     let evidence = raw.slice(0, 500);
     try {
-      const p = context.pages()[0];
-      if (p) {
-        const cap = await safeScreenshot(p, site);
-        evidence = cap.path || cap.error || evidence;
-      }
+      const cap = await safeScreenshot(page, site);
+      evidence = cap.path || cap.error || evidence;
     } catch {}
-    console.log(JSON.stringify(finish(result, status, false, "", evidence), null, 2));
+    return finish(result, status, false, "", evidence);
+  }
+}
+
+async function main() {
+  const args = parseArgs(process.argv);
+  const site = String(args.site || "").trim().toLowerCase();
+  const prompt = String(args.prompt || "").trim();
+  const profileDir = String(args["profile-dir"] || "Default");
+  const userDataDir = String(args["user-data-dir"] || path.join(os.homedir(), ".config", "google-chrome"));
+  const timeoutMs = Math.max(5000, parseInt(String(args["timeout-ms"] || "60000"), 10) || 60000);
+  const headless = String(args.headless || "false").toLowerCase() === "true";
+  const threadFile = String(args["thread-file"] || "").trim();
+  const followup = String(args.followup || "").trim();
+  const followup2 = String(args.followup2 || "").trim();
+  const followupsJson = String(args["followups-json"] || "").trim();
+
+  const startedAt = nowEpoch();
+  const result = mkResult(site, startedAt);
+  const cfg = SITE_CONFIG[site];
+  if (!cfg) {
+    console.log(JSON.stringify(finish(result, "unsupported_site", false), null, 2));
+    process.exit(2);
+  }
+  if (!prompt) {
+    console.log(JSON.stringify(finish(result, "missing_prompt", false), null, 2));
+    process.exit(2);
+  }
+
+  let context;
+  try {
+    context = await launchContext(userDataDir, profileDir, headless);
+  } catch (err) {
+    const { status, raw } = launchErrorStatus(err);
+    console.log(JSON.stringify(finish(result, status, false, "", raw.slice(0, 500)), null, 2));
+    process.exit(3);
+  }
+
+  try {
+    const page = context.pages()[0] || (await context.newPage());
+    const prompts = buildPrompts(prompt, followupsJson, followup, followup2);
+    const out = await askInPage(page, site, prompts, { startedAt, timeoutMs, threadFile, reuseUrl: false });
+    console.log(JSON.stringify(out, null, 2));
   } finally {
     await context.close().catch(() => {});
   }
 }
 
-main().catch((err) => {
-  const fallback = {
-    ok: false,
-    text: "",
-    status: "internal_error",
-    evidence: String(err && err.message ? err.message : err),
-    timings: {
-      start: nowEpoch(),
-      end: nowEpoch(),
-      duration: 0,
-    },
-  };
-  console.log(JSON.stringify(fallback, null, 2));
-  process.exit(1);
-});
+module.exports = {
+  SITE_CONFIG,
+  askInPage,
+  buildPrompts,
+  finish,
+  launchContext,
+  launchErrorStatus,
+  mkResult,
+  nowEpoch,
+};
+
+if (require.main === module) {
+  main().catch((err) => {
+    const fallback = {
+      ok: false,
+      text: "",
+      status: "internal_error",
+      evidence: String(err && err.message ? err.message : err),
+      timings: {
+        start: nowEpoch(),
+        end: nowEpoch(),
+        duration: 0,
+      },
+    };
+    console.log(JSON.stringify(fallback, null, 2));
+    process.exit(1);
+  });
+}
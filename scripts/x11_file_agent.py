@@ -1,16 +1,23 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import ctypes
+import ctypes.util
 import datetime as dt
 import json
 import os
 import pathlib
+import select
 import shlex
 import signal
+import struct
 import subprocess
 import sys
+import threading
 import time
-from typing import Any, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Tuple
 
 IPC_DIR = os.environ.get(
     "X11_FILE_IPC_DIR", "/home/lucy-ubuntu/Lucy_Workspace/infra/ipc"
@@ -28,6 +35,25 @@ LOG = IPC / "agent.log"
 
 DEFAULT_TIMEOUT = float(os.environ.get("X11_FILE_AGENT_TIMEOUT", "6"))
 LEGACY_OUTBOX = os.environ.get("X11_FILE_AGENT_LEGACY_OUTBOX", "true").lower() == "true"
+# "auto" = inotify when available, else poll; "poll" forces the old 100 ms loop.
+WATCH_MODE = os.environ.get("X11_FILE_AGENT_WATCH", "auto").strip().lower()
+# Safety rescan of the inbox while watching (covers anything inotify could miss).
+RESCAN_S = float(os.environ.get("X11_FILE_AGENT_RESCAN_S", "60"))
+# Worker threads per request kind; unknown kinds share the NOOP pool (they only produce an error).
+WORKERS = {
+    "EXEC": max(1, int(os.environ.get("X11_FILE_AGENT_EXEC_WORKERS", "4"))),
+    "NOTIFY": max(1, int(os.environ.get("X11_FILE_AGENT_NOTIFY_WORKERS", "2"))),
+    "NOOP": max(1, int(os.environ.get("X11_FILE_AGENT_NOOP_WORKERS", "1"))),
+}
+# Requests taken from the inbox but not finished yet; intake pauses while it is reached.
+MAX_INFLIGHT = max(1, int(os.environ.get("X11_FILE_AGENT_MAX_INFLIGHT", "32")))
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+_EVENT_HEADER = struct.Struct("iIII")
 
 
 def now_iso() -> str:
@@ -59,7 +85,7 @@ def run_cmd(cmd: str, timeout_s: float) -> Tuple[int, str, str]:
         stderr=subprocess.PIPE,
         env=env,
         text=True,
-        preexec_fn=os.setsid,
+        start_new_session=True,
     )
     try:
         stdout, stderr = proc.communicate(timeout=timeout_s)
@@ -124,6 +150,7 @@ def build_outbox(
     stdout: str,
     stderr: str,
     stage: str,
+    timing: dict[str, float] | None = None,
 ) -> dict[str, Any]:
     base: dict[str, Any] = {
         "version": "lucy_output_v1",
@@ -132,6 +159,8 @@ def build_outbox(
         "status": status,
         "response_ts": now_iso(),
     }
+    if timing is not None:
+        base["timing"] = timing
 
     if ok:
         base["result"] = {
@@ -152,13 +181,25 @@ def build_outbox(
     return base
 
 
-def handle_request(path: pathlib.Path) -> None:
-    try:
-        content = path.read_text(encoding="utf-8", errors="replace")
-    except Exception:
-        content = ""
+def ordering_key(payload: dict[str, Any]) -> str:
+    meta = payload.get("meta") if isinstance(payload.get("meta"), dict) else {}
+    return str(meta.get("ordering_key") or "").strip()
+
+
+def handle_request(
+    path: pathlib.Path,
+    parsed: Tuple[str, str, str, dict[str, Any]] | None = None,
+    enqueued: float | None = None,
+) -> None:
+    started = time.monotonic()
+    if parsed is None:
+        try:
+            content = path.read_text(encoding="utf-8", errors="replace")
+        except Exception:
+            content = ""
+        parsed = parse_request(path, content)
 
-    cid, kind, command, _payload = parse_request(path, content)
+    cid, kind, command, _payload = parsed
     timeout_s = DEFAULT_TIMEOUT
     stage = "dispatch"
 
@@ -191,6 +232,10 @@ def handle_request(path: pathlib.Path) -> None:
         stdout=stdout,
         stderr=stderr,
         stage=stage,
+        timing={
+            "queue_wait_ms": round(max(0.0, started - (enqueued if enqueued is not None else started)) * 1000, 1),
+            "exec_ms": round((time.monotonic() - started) * 1000, 1),
+        },
     )
 
     out_path = OUTBOX / f"{cid}.json"
@@ -219,27 +264,222 @@ def handle_request(path: pathlib.Path) -> None:
             pass
 
 
-def main() -> None:
-    log(f"x11_file_agent: ipc={IPC}")
-    log(f"x11_file_agent: inbox={INBOX}")
-    log(f"x11_file_agent: outbox={OUTBOX}")
-
-    while True:
+class Dispatcher:
+    """Runs requests on bounded per-kind thread pools.
+
+    Requests sharing `meta.ordering_key` run one at a time in arrival order; the
+    rest run concurrently. `submit` blocks once `max_inflight` requests are
+    queued or running, so the inbox itself is the backlog.
+    """
+
+    def __init__(
+        self,
+        workers: dict[str, int] | None = None,
+        max_inflight: int = MAX_INFLIGHT,
+        handler: Callable[..., None] | None = None,
+    ) -> None:
+        self._handler = handler or handle_request
+        self._pools = {
+            kind: ThreadPoolExecutor(max_workers=max(1, int(n)), thread_name_prefix=f"x11-{kind.lower()}")
+            for kind, n in (workers or WORKERS).items()
+        }
+        self._slots = threading.BoundedSemaphore(max(1, int(max_inflight)))
+        self._lock = threading.Lock()
+        self._paths: set[str] = set()
+        self._keys: dict[str, deque] = {}
+
+    def in_flight(self, path: pathlib.Path) -> bool:
+        with self._lock:
+            return str(path) in self._paths
+
+    def submit(self, path: pathlib.Path) -> bool:
+        """Queue one inbox file; False when it is already in flight or gone."""
+        if self.in_flight(path):
+            return False
         try:
-            reqs = sorted(INBOX.iterdir(), key=lambda p: p.stat().st_mtime)
+            content = path.read_text(encoding="utf-8", errors="replace")
+        except FileNotFoundError:
+            return False
         except Exception:
-            reqs = []
+            content = ""
+        parsed = parse_request(path, content)
+        self._slots.acquire()
+        job = (path, parsed, time.monotonic())
+        with self._lock:
+            self._paths.add(str(path))
+            key = ordering_key(parsed[3])
+            if key:
+                if key in self._keys:
+                    self._keys[key].append(job)
+                    return True
+                self._keys[key] = deque()
+        self._start(job)
+        return True
+
+    def _start(self, job: tuple) -> None:
+        kind = job[1][1]
+        pool = self._pools.get(kind) or self._pools.get("NOOP") or next(iter(self._pools.values()))
+        pool.submit(self._run, job)
+
+    def _run(self, job: tuple) -> None:
+        path, parsed, enqueued = job
+        try:
+            self._handler(path, parsed, enqueued)
+        except Exception as exc:
+            log(f"x11_file_agent: request failed cid={parsed[0]} err={exc}")
+        finally:
+            nxt = None
+            with self._lock:
+                self._paths.discard(str(path))
+                key = ordering_key(parsed[3])
+                if key and key in self._keys:
+                    if self._keys[key]:
+                        nxt = self._keys[key].popleft()
+                    else:
+                        del self._keys[key]
+            self._slots.release()
+            if nxt is not None:
+                self._start(nxt)
+
+    def shutdown(self, wait: bool = True) -> None:
+        if wait:
+            # Keyed followers are started from finishing jobs, so wait for those before closing the pools.
+            while True:
+                with self._lock:
+                    if not self._paths:
+                        break
+                time.sleep(0.01)
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait)
+
+
+class InboxWatcher:
+    """inotify on one directory (IN_CLOSE_WRITE | IN_MOVED_TO) through libc; OSError if unavailable."""
+
+    def __init__(self, directory: pathlib.Path) -> None:
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError("libc not found")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify not supported")
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self.fd, str(directory).encode("utf-8"), IN_CLOSE_WRITE | IN_MOVED_TO)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, "inotify_add_watch failed")
+
+    def read(self, timeout_s: float) -> list[str] | None:
+        """File names finished since the last call ([] on timeout); None when the kernel queue overflowed."""
+        ready, _, _ = select.select([self.fd], [], [], max(0.0, timeout_s))
+        if not ready:
+            return []
+        names: list[str] = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            off = 0
+            while off + _EVENT_HEADER.size <= len(data):
+                _wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, off)
+                off += _EVENT_HEADER.size
+                raw = data[off : off + length].split(b"\0", 1)[0]
+                off += length
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if raw:
+                    names.append(os.fsdecode(raw))
+
+    def close(self) -> None:
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+def is_request(path: pathlib.Path) -> bool:
+    if path.name.startswith(".") or path.name.endswith(".tmp"):
+        return False
+    return path.is_file()
+
 
+def scan_inbox() -> list[pathlib.Path]:
+    try:
+        reqs = sorted(INBOX.iterdir(), key=lambda p: p.stat().st_mtime)
+    except Exception:
+        reqs = []
+    return [p for p in reqs if is_request(p)]
+
+
+def poll_requests(skip: Callable[[pathlib.Path], bool] | None = None) -> Iterator[pathlib.Path]:
+    # In-flight requests stay in the inbox until handled, so `skip` filters them out;
+    # otherwise every scan would be "non-empty" and the loop would spin on iterdir()/stat().
+    while True:
+        reqs = [p for p in scan_inbox() if skip is None or not skip(p)]
         if not reqs:
             time.sleep(0.1)
             continue
+        yield from reqs
+
+
+def watch_requests(
+    watcher: InboxWatcher,
+    rescan_s: float = RESCAN_S,
+    skip: Callable[[pathlib.Path], bool] | None = None,
+) -> Iterator[pathlib.Path]:
+    # The watch exists before this scan, so a file landing in between is seen by one or the other;
+    # consumers skip paths that are gone by the time they get to them.
+    pending = scan_inbox()
+    next_rescan = time.monotonic() + rescan_s
+    while True:
+        for req in pending:
+            if is_request(req) and (skip is None or not skip(req)):
+                yield req
+        names = watcher.read(next_rescan - time.monotonic())
+        if names is None or time.monotonic() >= next_rescan:
+            pending = scan_inbox()
+            next_rescan = time.monotonic() + rescan_s
+        else:
+            pending = [INBOX / name for name in names]
+
+
+def open_watcher() -> InboxWatcher | None:
+    if WATCH_MODE == "poll":
+        return None
+    try:
+        return InboxWatcher(INBOX)
+    except OSError as exc:
+        log(f"x11_file_agent: inotify unavailable ({exc}); polling every 100 ms")
+        return None
 
-        for req in reqs:
-            if not req.is_file():
-                continue
-            if req.name.startswith(".") or req.name.endswith(".tmp"):
-                continue
-            handle_request(req)
+
+def iter_requests(skip: Callable[[pathlib.Path], bool] | None = None) -> Iterator[pathlib.Path]:
+    watcher = open_watcher()
+    if watcher is None:
+        log("x11_file_agent: watch=poll")
+        return poll_requests(skip)
+    log("x11_file_agent: watch=inotify")
+    return watch_requests(watcher, skip=skip)
+
+
+def main() -> None:
+    log(f"x11_file_agent: ipc={IPC}")
+    log(f"x11_file_agent: inbox={INBOX}")
+    log(f"x11_file_agent: outbox={OUTBOX}")
+
+    log(f"x11_file_agent: workers={WORKERS} max_inflight={MAX_INFLIGHT}")
+
+    dispatcher = Dispatcher()
+    try:
+        for req in iter_requests(skip=dispatcher.in_flight):
+            if is_request(req):
+                dispatcher.submit(req)
+    finally:
+        dispatcher.shutdown(wait=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+import json
+import os
+import sys
+import unittest
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+import bench_direct_chat as bench  # noqa: E402
+
+
+class TestBenchDirectChat(unittest.TestCase):
+    def test_inprocess_post_uses_stubbed_backend(self) -> None:
+        with bench.bench_environment() as dc:
+            status, body = bench.post_inprocess(
+                dc,
+                "/api/chat",
+                {"session_id": "bench_t", "message": bench.MODEL_MESSAGE, "model": bench.BENCH_MODEL},
+            )
+            self.assertEqual(status, 200)
+            self.assertIn("benchmark", body.get("reply", ""))
+            self.assertEqual(body.get("model_backend"), "cloud")
+            self.assertEqual(len(dc._load_history("bench_t", model=bench.BENCH_MODEL, backend="cloud")), 2)
+
+    def test_run_bench_reports_latency_and_allocations(self) -> None:
+        out = bench.run_bench(iterations=5, only=["route_local_action_hit", "post_chat_local_action"])
+        self.assertEqual(set(out["scenarios"]), {"route_local_action_hit", "post_chat_local_action"})
+        for res in out["scenarios"].values():
+            self.assertEqual(res["iterations"], 5)
+            self.assertLessEqual(res["p50_ms"], res["p99_ms"])
+            self.assertGreaterEqual(res["alloc_peak_kib"], 0.0)
+
+    def test_compare_flags_only_exceeded_limits(self) -> None:
+        results = {"scenarios": {"a": {"p50_ms": 1.0, "p99_ms": 5.0, "alloc_peak_kib": 10.0}}}
+        thresholds = bench.thresholds_from(results, headroom=2.0)
+        self.assertEqual(bench.compare(results, thresholds), [])
+        slower = {"scenarios": {"a": {"p50_ms": 1.0, "p99_ms": 11.0, "alloc_peak_kib": 10.0}}}
+        self.assertEqual(bench.compare(slower, thresholds), ["a.p99_ms=11.0 > 10.0"])
+
+    def test_sub_ms_p99_gets_absolute_floor(self) -> None:
+        results = {"scenarios": {"a": {"p50_ms": 0.4, "p99_ms": 0.6, "alloc_peak_kib": 10.0}}}
+        thresholds = bench.thresholds_from(results, headroom=3.0)
+        self.assertEqual(thresholds["scenarios"]["a"]["p99_ms"], bench.P99_FLOOR_MS)
+        self.assertEqual(thresholds["scenarios"]["a"]["p50_ms"], 1.2)
+        # A scheduler hiccup in the tail passes; a slower median does not.
+        noisy = {"scenarios": {"a": {"p50_ms": 0.45, "p99_ms": 3.8, "alloc_peak_kib": 10.0}}}
+        self.assertEqual(bench.compare(noisy, thresholds), [])
+        slower = {"scenarios": {"a": {"p50_ms": 1.5, "p99_ms": 3.8, "alloc_peak_kib": 10.0}}}
+        self.assertEqual(bench.compare(slower, thresholds), ["a.p50_ms=1.5 > 1.2"])
+
+    def test_compare_fails_scenarios_without_threshold(self) -> None:
+        results = {"scenarios": {"a": {"p50_ms": 1.0, "p99_ms": 5.0, "alloc_peak_kib": 10.0}, "b": {"p50_ms": 1.0, "p99_ms": 1.0, "alloc_peak_kib": 1.0}}}
+        thresholds = bench.thresholds_from({"scenarios": {"a": results["scenarios"]["a"]}}, headroom=2.0)
+        failures = bench.compare(results, thresholds)
+        self.assertEqual(len(failures), 1)
+        self.assertTrue(failures[0].startswith("b: no threshold"))
+
+    def test_committed_thresholds_cover_every_scenario(self) -> None:
+        committed = json.loads(bench.THRESHOLDS_PATH.read_text(encoding="utf-8"))["scenarios"]
+        with bench.bench_environment() as dc:
+            names = set(bench.build_scenarios(dc))
+        self.assertEqual(names - set(committed), set())
+
+    def test_committed_p99_limits_respect_floor(self) -> None:
+        committed = json.loads(bench.THRESHOLDS_PATH.read_text(encoding="utf-8"))["scenarios"]
+        for name, lim in committed.items():
+            self.assertGreaterEqual(lim["p99_ms"], bench.P99_FLOOR_MS, name)
+
+
+if __name__ == "__main__":
+    unittest.main()
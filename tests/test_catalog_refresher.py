@@ -0,0 +1,137 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+import openclaw_direct_chat as dc  # noqa: E402
+from molbot_direct_chat.catalog_refresher import CatalogRefresher  # noqa: E402
+
+
+def _wait_until(pred, timeout_s: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if pred():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestCatalogRefresher(unittest.TestCase):
+    def test_first_get_builds_inline_then_serves_cached(self) -> None:
+        calls = []
+        ref = CatalogRefresher(lambda: calls.append(1) or {"n": len(calls)}, interval_s=3600, watch_interval_s=3600)
+        self.assertEqual(ref.get(), {"n": 1})
+        self.assertEqual(ref.get(), {"n": 1})
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(ref.version, 1)
+        self.assertEqual(ref.get(force=True), {"n": 2})
+
+    def test_slow_background_build_does_not_block_get(self) -> None:
+        gate = threading.Event()
+        started = threading.Event()
+        state = {"n": 0}
+
+        def build():
+            state["n"] += 1
+            if state["n"] > 1:
+                started.set()
+                gate.wait(5)
+            return {"n": state["n"]}
+
+        ref = CatalogRefresher(build, interval_s=0.05, watch_interval_s=0.02)
+        self.assertEqual(ref.get(), {"n": 1})
+        self.assertTrue(started.wait(2))
+        t0 = time.monotonic()
+        self.assertEqual(ref.get(), {"n": 1})
+        self.assertLess(time.monotonic() - t0, 0.1)
+        gate.set()
+        self.assertTrue(_wait_until(lambda: ref.get()["n"] >= 2))
+        ref.close()
+
+    def test_failed_build_keeps_last_good_value(self) -> None:
+        state = {"fail": False}
+
+        def build():
+            if state["fail"]:
+                raise RuntimeError("ollama down")
+            return {"ok": True}
+
+        ref = CatalogRefresher(build, interval_s=3600, watch_interval_s=3600)
+        ref.get()
+        state["fail"] = True
+        self.assertFalse(ref.refresh())
+        self.assertEqual(ref.get(), {"ok": True})
+        self.assertEqual(ref.stats()["errors"], 1)
+
+    def test_watched_file_change_triggers_refresh_and_wakes_waiters(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            cfg = Path(td) / "openclaw.json"
+            cfg.write_text('{"m": "a"}', encoding="utf-8")
+            ref = CatalogRefresher(
+                lambda: {"cfg": cfg.read_text(encoding="utf-8"), "ts": time.time()},
+                interval_s=3600,
+                watch_paths=[cfg],
+                watch_interval_s=0.02,
+            )
+            ref.get()
+            v0 = ref.version
+            # Unchanged content (only "ts" differs) does not bump the version.
+            ref.refresh()
+            self.assertEqual(ref.version, v0)
+            out = {}
+            waiter = threading.Thread(target=lambda: out.update(res=ref.wait_for_change(v0, 3.0)))
+            waiter.start()
+            time.sleep(0.05)
+            cfg.write_text('{"m": "bb"}', encoding="utf-8")
+            waiter.join(3)
+            version, data = out["res"]
+            self.assertEqual(version, v0 + 1)
+            self.assertEqual(data["cfg"], '{"m": "bb"}')
+            self.assertGreaterEqual(ref.stats()["watch_triggers"], 1)
+            ref.close()
+
+    def test_wait_for_change_times_out_with_current_value(self) -> None:
+        ref = CatalogRefresher(lambda: {"x": 1}, interval_s=3600, watch_interval_s=3600)
+        t0 = time.monotonic()
+        version, data = ref.wait_for_change(1, 0.1)
+        self.assertGreaterEqual(time.monotonic() - t0, 0.09)
+        self.assertEqual((version, data), (1, {"x": 1}))
+        self.assertEqual(ref.wait_for_change(0, 5.0), (1, {"x": 1}))
+
+
+class TestDirectChatModelCatalog(unittest.TestCase):
+    def test_down_ollama_never_blocks_catalog_reads(self) -> None:
+        gate = threading.Event()
+        calls = []
+
+        def discover():
+            calls.append(1)
+            if len(calls) > 1:
+                gate.wait(5)
+            return ["llama3:latest"]
+
+        ref = CatalogRefresher(dc._build_model_catalog, interval_s=0.05, watch_interval_s=0.02)
+        try:
+            with patch.object(dc, "_MODEL_CATALOG", ref), patch.object(dc, "_discover_ollama_models", side_effect=discover):
+                first = dc._model_catalog()
+                self.assertTrue(_wait_until(lambda: len(calls) > 1))
+                t0 = time.monotonic()
+                again = dc._model_catalog()
+                self.assertLess(time.monotonic() - t0, 0.1)
+                self.assertEqual(again["models"], first["models"])
+        finally:
+            ref.close()
+            gate.set()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+import export_history_jsonl as exporter  # noqa: E402
+from molbot_direct_chat.dataset_dedup import DedupIndex, exact_key, pair_signature, similarity  # noqa: E402
+
+
+LONG = (
+    "La batalla de Trafalgar fue un enfrentamiento naval ocurrido el 21 de octubre de 1805 "
+    "en el marco de la tercera coalición entre la flota británica y la flota combinada franco española"
+)
+
+
+class TestDedupPrimitives(unittest.TestCase):
+    def test_exact_key_ignores_case_and_whitespace(self) -> None:
+        self.assertEqual(exact_key("Desactivá  la voz", "Listo: desactivé la voz."), exact_key("desactivá la voz ", "listo:  desactivé la voz."))
+        self.assertNotEqual(exact_key("a", "b"), exact_key("a", "c"))
+
+    def test_minhash_similarity_tracks_overlap(self) -> None:
+        base = pair_signature("contame de trafalgar", LONG)
+        near = pair_signature("contame de trafalgar", LONG + " dirigida por Nelson")
+        far = pair_signature("abrí youtube", "Listo, abrí YouTube en el navegador con el video pedido.")
+        self.assertGreaterEqual(similarity(base, near), 0.7)
+        self.assertLess(similarity(base, far), 0.2)
+        self.assertEqual(similarity(base, pair_signature("contame de trafalgar", LONG)), 1.0)
+
+
+class TestDedupIndex(unittest.TestCase):
+    def test_exact_and_near_verdicts(self) -> None:
+        idx = DedupIndex(threshold=0.7)
+        try:
+            self.assertEqual(idx.check(exact_key("q", LONG), pair_signature("q", LONG), "q"), "unique")
+            self.assertEqual(idx.check(exact_key("Q", LONG), pair_signature("Q", LONG), "Q"), "exact")
+            edited = LONG + " dirigida por Nelson"
+            self.assertEqual(idx.check(exact_key("q", edited), pair_signature("q", edited), "q"), "near")
+            other = "Listo, abrí YouTube en el navegador con el video pedido."
+            self.assertEqual(idx.check(exact_key("abrí youtube", other), pair_signature("abrí youtube", other)), "unique")
+            st = idx.stats()
+            self.assertEqual((st["kept"], st["exact_dropped"], st["near_dropped"]), (2, 1, 1))
+            self.assertEqual(st["top_exact_prompts"][0]["prompt"], "q")
+        finally:
+            idx.close()
+
+    def test_persistent_db_dedups_across_runs(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            db = Path(td) / "dedup.sqlite"
+            first = DedupIndex(db, near=False)
+            self.assertEqual(first.check(exact_key("a", "b")), "unique")
+            first.close()
+            second = DedupIndex(db, near=False)
+            self.assertEqual(second.check(exact_key("a", "b")), "exact")
+            second.close()
+
+    def test_owner_reclaims_its_pairs_once_per_run(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            db = Path(td) / "dedup.sqlite"
+            first = DedupIndex(db, near=False)
+            self.assertEqual(first.check(exact_key("a", "b"), owner="s1"), "unique")
+            self.assertEqual(first.check(exact_key("a", "b"), owner="s1"), "exact")
+            first.close()
+            second = DedupIndex(db, near=False)
+            self.assertEqual(second.check(exact_key("a", "b"), owner="s2"), "exact")
+            self.assertEqual(second.check(exact_key("a", "b"), owner="s1"), "unique")
+            self.assertEqual(second.check(exact_key("a", "b"), owner="s1"), "exact")
+            self.assertEqual(second.stats()["owned_kept"], 1)
+            second.close()
+
+
+class TestExportDedup(unittest.TestCase):
+    def test_export_drops_repeated_local_action_pairs_and_reports_stats(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            in_dir = Path(td) / "in"
+            in_dir.mkdir()
+            for i in range(30):
+                turns = [
+                    {"role": "user", "content": "desactivá la voz"},
+                    {"role": "assistant", "content": "Listo: desactivé la voz."},
+                    {"role": "user", "content": f"contame de trafalgar {i}" if i < 2 else "contame de trafalgar"},
+                    {"role": "assistant", "content": LONG + (f" y algo más {i}" if i % 2 else "")},
+                ]
+                (in_dir / f"s{i:02d}__cloud__m.json").write_text(json.dumps(turns, ensure_ascii=False), encoding="utf-8")
+            out = Path(td) / "out.jsonl"
+            summary = exporter.run_export(
+                exporter.parse_args(["--in", str(in_dir), "--out", str(out), "--dedup", "near", "--near-threshold", "0.7", "--workers", "2"])
+            )
+            rows = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+            self.assertEqual(sum(1 for r in rows if r["completion"] == "Listo: desactivé la voz."), 1)
+            self.assertEqual(summary["rows"], len(rows))
+            self.assertLess(len(rows), 6)
+            dedup = summary["dedup"]
+            self.assertEqual(dedup["mode"], "near")
+            self.assertEqual(dedup["kept"] + dedup["exact_dropped"] + dedup["near_dropped"], 60)
+            self.assertGreaterEqual(dedup["exact_dropped"], 29)
+            self.assertGreaterEqual(dedup["near_dropped"], 1)
+            self.assertEqual(dedup["top_exact_prompts"][0]["prompt"], "desactivá la voz")
+            plain = exporter.run_export(exporter.parse_args(["--in", str(in_dir), "--out", str(out)]))
+            self.assertEqual(plain["rows"], 60)
+            self.assertNotIn("dedup", plain)
+
+    def test_checkpoint_delta_with_persistent_index_carries_whole_session(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            in_dir = Path(td) / "in"
+            in_dir.mkdir()
+            for i in range(3):
+                turns = [
+                    {"role": "user", "content": "desactivá la voz"},
+                    {"role": "assistant", "content": "Listo: desactivé la voz."},
+                    {"role": "user", "content": f"pregunta {i}"},
+                    {"role": "assistant", "content": f"respuesta {i}"},
+                ]
+                (in_dir / f"s{i}__cloud__m.json").write_text(json.dumps(turns, ensure_ascii=False), encoding="utf-8")
+            argv = ["--in", str(in_dir), "--out", str(Path(td) / "out.jsonl"), "--dedup", "exact"]
+            argv += ["--checkpoint", str(Path(td) / "ckpt.json"), "--dedup-db", str(Path(td) / "dedup.sqlite")]
+            first = exporter.run_export(exporter.parse_args(argv))
+            self.assertEqual(first["rows"], 4)
+            changed = in_dir / "s0__cloud__m.json"
+            turns = json.loads(changed.read_text(encoding="utf-8"))
+            turns += [{"role": "user", "content": "pregunta nueva"}, {"role": "assistant", "content": "respuesta nueva"}]
+            changed.write_text(json.dumps(turns, ensure_ascii=False), encoding="utf-8")
+            os.utime(changed, ns=(changed.stat().st_atime_ns, changed.stat().st_mtime_ns + 1_000_000))
+            delta = exporter.run_export(exporter.parse_args(argv))
+            rows = [json.loads(line) for line in Path(delta["export"]["outputs"][0]).read_text(encoding="utf-8").splitlines()]
+            # Replacing s0's rows with the delta keeps its earlier pairs.
+            self.assertEqual(
+                [r["completion"] for r in rows], ["Listo: desactivé la voz.", "respuesta 0", "respuesta nueva"]
+            )
+            self.assertEqual({r["session_id"] for r in rows}, {"s0"})
+            self.assertEqual(delta["dedup"]["owned_kept"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
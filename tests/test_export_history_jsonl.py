@@ -0,0 +1,118 @@
+import gzip
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+import bench_history_export as bench  # noqa: E402
+import export_history_jsonl as exporter  # noqa: E402
+
+
+def _export(*argv: str) -> dict:
+    return exporter.run_export(exporter.parse_args(list(argv)))
+
+
+class TestExportHistoryJsonl(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = Path(self.tmp.name)
+        self.corpus = self.base / "in"
+        bench.make_corpus(self.corpus, 40, turns=4)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_parallel_sharded_output_matches_serial(self) -> None:
+        serial = _export("--in", str(self.corpus), "--out", str(self.base / "s" / "p.jsonl"), "--shards", "3", "--batch", "4")
+        parallel = _export(
+            "--in", str(self.corpus), "--out", str(self.base / "p" / "p.jsonl"), "--shards", "3", "--workers", "2", "--batch", "4", "--queue", "2"
+        )
+        self.assertEqual(serial["rows"], 40 * 4)
+        self.assertEqual(serial["rows"], parallel["rows"])
+        self.assertEqual(serial["pairs_per_backend_model"], parallel["pairs_per_backend_model"])
+        names = [Path(p).name for p in serial["export"]["outputs"]]
+        self.assertEqual(names, ["p-00000-of-00003.jsonl", "p-00001-of-00003.jsonl", "p-00002-of-00003.jsonl"])
+        sessions_by_shard = []
+        for a, b in zip(serial["export"]["outputs"], parallel["export"]["outputs"]):
+            self.assertEqual(Path(a).read_bytes(), Path(b).read_bytes())
+            sessions_by_shard.append({json.loads(line)["session_id"] for line in Path(a).read_text(encoding="utf-8").splitlines()})
+        self.assertEqual(sum(len(s) for s in sessions_by_shard), 40)
+        for i, sids in enumerate(sessions_by_shard):
+            self.assertTrue(all(exporter.shard_of(sid, 3) == i for sid in sids))
+
+    def test_gzip_output_is_deterministic(self) -> None:
+        first = _export("--in", str(self.corpus), "--out", str(self.base / "a" / "p.jsonl.gz"), "--max-lines", "7")
+        second = _export("--in", str(self.corpus), "--out", str(self.base / "b" / "p.jsonl.gz"), "--max-lines", "7")
+        self.assertEqual(first["export"]["compress"], "gzip")
+        self.assertEqual((first["rows"], second["rows"]), (7, 7))
+        a, b = self.base / "a" / "p.jsonl.gz", self.base / "b" / "p.jsonl.gz"
+        self.assertEqual(a.read_bytes(), b.read_bytes())
+        self.assertEqual(len(gzip.decompress(a.read_bytes()).decode("utf-8").splitlines()), 7)
+
+    def test_checkpoint_reexports_only_changed_sessions(self) -> None:
+        ckpt = self.base / "ckpt.json"
+        out = str(self.base / "o" / "p.jsonl")
+        full = _export("--in", str(self.corpus), "--out", out, "--checkpoint", str(ckpt))
+        self.assertEqual(full["checkpoint"]["sessions_exported"], 40)
+        self.assertEqual(full["export"]["outputs"], [str(self.base / "o" / "p.run-00001.jsonl")])
+        first_out = Path(full["export"]["outputs"][0])
+        first_bytes = first_out.read_bytes()
+        again = _export("--in", str(self.corpus), "--out", out, "--checkpoint", str(ckpt))
+        self.assertEqual((again["rows"], again["checkpoint"]["sessions_unchanged"]), (0, 40))
+        # Re-running with the same --out writes a new delta and leaves the earlier one intact.
+        self.assertEqual(again["export"]["outputs"], [str(self.base / "o" / "p.run-00002.jsonl")])
+        self.assertEqual(first_out.read_bytes(), first_bytes)
+        self.assertEqual(len(first_bytes.decode("utf-8").splitlines()), 40 * 4)
+        self.assertFalse(Path(out).exists())
+        log = sorted(self.corpus.glob(f"*{exporter.LOG_SUFFIX}"))[0]
+        with log.open("a", encoding="utf-8") as f:
+            f.write(json.dumps({"view": "cloud__nuevo", "role": "user", "content": "hola"}) + "\n")
+            f.write(json.dumps({"view": "cloud__nuevo", "role": "assistant", "content": "chau"}) + "\n")
+        inc = _export("--in", str(self.corpus), "--out", out, "--checkpoint", str(ckpt))
+        self.assertEqual((inc["checkpoint"]["sessions_exported"], inc["checkpoint"]["run"]), (1, 3))
+        rows = [json.loads(line) for line in Path(inc["export"]["outputs"][0]).read_text(encoding="utf-8").splitlines()]
+        self.assertEqual({r["session_id"] for r in rows}, {log.name[: -len(exporter.LOG_SUFFIX)]})
+        self.assertIn("chau", {r["completion"] for r in rows})
+        # Different export options invalidate the checkpoint.
+        reset = _export("--in", str(self.corpus), "--out", out, "--checkpoint", str(ckpt), "--mode", "messages")
+        self.assertTrue(reset["checkpoint"]["reset"])
+        self.assertEqual(reset["checkpoint"]["sessions_exported"], 40)
+        self.assertEqual(first_out.read_bytes(), first_bytes)
+
+    def test_checkpoint_run_numbers_skip_existing_shards(self) -> None:
+        ckpt = self.base / "ckpt.json"
+        out = self.base / "o" / "p.jsonl.gz"
+        first = _export("--in", str(self.corpus), "--out", str(out), "--checkpoint", str(ckpt), "--shards", "2")
+        self.assertEqual([Path(p).name for p in first["export"]["outputs"]], ["p.run-00001-00000-of-00002.jsonl.gz", "p.run-00001-00001-of-00002.jsonl.gz"])
+        before = {p: Path(p).read_bytes() for p in first["export"]["outputs"]}
+        ckpt.unlink()
+        second = _export("--in", str(self.corpus), "--out", str(out), "--checkpoint", str(ckpt), "--shards", "2")
+        self.assertEqual(second["checkpoint"]["run"], 2)
+        self.assertEqual({p: Path(p).read_bytes() for p in before}, before)
+
+    def test_legacy_file_superseded_by_log_view_is_not_exported_twice(self) -> None:
+        d = self.base / "dup"
+        d.mkdir()
+        turns = [{"role": "user", "content": "q"}, {"role": "assistant", "content": "a"}]
+        (d / "s1__cloud__m.json").write_text(json.dumps(turns), encoding="utf-8")
+        (d / "s1.history.jsonl").write_text(
+            "".join(json.dumps({"view": "cloud__m", **t}) + "\n" for t in turns), encoding="utf-8"
+        )
+        res = _export("--in", str(d), "--out", str(self.base / "dup.jsonl"))
+        self.assertEqual(res["rows"], 1)
+
+    def test_bench_runs_on_a_small_corpus(self) -> None:
+        out = bench.run_bench(30, [1, 2], shards=2)
+        self.assertEqual([r["rows"] for r in out["runs"]], [180, 180])
+        self.assertEqual(out["incremental"]["sessions_exported"], out["incremental"]["sessions_touched"])
+
+
+if __name__ == "__main__":
+    unittest.main()
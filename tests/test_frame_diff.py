@@ -0,0 +1,124 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+from molbot_direct_chat.frame_diff import FrameDiffEngine, mean_abs_diff  # noqa: E402
+import openclaw_direct_chat as direct_chat  # noqa: E402
+
+
+_SIZE = 64 * 36
+
+
+def _frame(level: int) -> bytes:
+    return bytes([level % 256]) * _SIZE
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, s: float) -> None:
+        self.now += s
+
+
+class TestFrameDiffEngine(unittest.TestCase):
+    def _engine(self, frames: list[bytes | None]) -> tuple[FrameDiffEngine, list]:
+        clock = _Clock()
+        calls: list = []
+
+        def capture(key: str) -> bytes | None:
+            calls.append(key)
+            return frames.pop(0) if frames else None
+
+        return FrameDiffEngine(capture=capture, clock=clock, sleep=clock.sleep), calls
+
+    def test_moving_frames_progress_after_two_pairs(self) -> None:
+        engine, calls = self._engine([_frame(10), _frame(20), _frame(30), _frame(40)])
+        ok, detail = engine.progress("0x1", max_wait_s=2.6)
+        self.assertTrue(ok)
+        self.assertTrue(detail.startswith("visual_changed"))
+        self.assertEqual(len(calls), 3)
+
+    def test_static_frames_decide_early(self) -> None:
+        engine, calls = self._engine([_frame(10)] * 10)
+        ok, detail = engine.progress("0x1", max_wait_s=2.6)
+        self.assertFalse(ok)
+        self.assertTrue(detail.startswith("visual_static"))
+        self.assertEqual(len(calls), 4)
+
+    def test_single_change_is_not_progress(self) -> None:
+        # An overlay fading once, then a still frame.
+        engine, _ = self._engine([_frame(10), _frame(60)] + [_frame(60)] * 20)
+        ok, detail = engine.progress("0x1", max_wait_s=1.0)
+        self.assertFalse(ok)
+        self.assertIn("changed=1", detail)
+
+    def test_baseline_is_reused_across_calls(self) -> None:
+        engine, calls = self._engine([_frame(1)] * 4 + [_frame(50), _frame(90)])
+        engine.progress("0x1")
+        calls.clear()
+        ok, detail = engine.progress("0x1")
+        self.assertTrue(ok)
+        self.assertIn("baseline", detail)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(engine.stats()["baseline_hits"], 1)
+
+    def test_paused_after_playing_baseline_decides_static_early(self) -> None:
+        # First call sees playback (baseline = a playing frame), then the video is paused.
+        engine, calls = self._engine([_frame(1), _frame(40), _frame(80)] + [_frame(200)] * 20)
+        self.assertTrue(engine.progress("0x1")[0])
+        calls.clear()
+        ok, detail = engine.progress("0x1", max_wait_s=2.6)
+        self.assertFalse(ok)
+        self.assertTrue(detail.startswith("visual_static"))
+        self.assertIn("changed=1", detail)
+        self.assertEqual(len(calls), 4)
+
+    def test_capture_failures(self) -> None:
+        engine, _ = self._engine([])
+        self.assertEqual(engine.progress("0x1"), (False, "visual_snap_a_failed"))
+        engine, _ = self._engine([_frame(1)])
+        self.assertEqual(engine.progress("0x2"), (False, "visual_snap_b_failed"))
+
+    def test_mean_abs_diff(self) -> None:
+        self.assertEqual(mean_abs_diff(_frame(10), _frame(13)), 3.0)
+        self.assertEqual(mean_abs_diff(_frame(10), b"\x00"), 255.0)
+
+
+class TestDirectChatVisualProgress(unittest.TestCase):
+    def test_falls_back_to_snapshots_when_capture_fails(self) -> None:
+        engine = FrameDiffEngine(capture=lambda key: None)
+        with (
+            patch.object(direct_chat, "_FRAME_DIFF", engine),
+            patch(
+                "openclaw_direct_chat._youtube_visual_progress_snapshots",
+                return_value=(True, "visual_changed"),
+            ) as snaps,
+        ):
+            self.assertEqual(direct_chat._youtube_visual_progress("0x1", interval_s=1.7), (True, "visual_changed"))
+        snaps.assert_called_once_with("0x1", interval_s=1.7)
+
+    def test_playback_toggle_drops_the_window_baseline(self) -> None:
+        engine = FrameDiffEngine(capture=lambda key: _frame(1), sleep=lambda s: None)
+        engine.progress("0x1", max_wait_s=0.2)
+        self.assertEqual(engine.stats()["baselines"], 1)
+        with (
+            patch.object(direct_chat, "_FRAME_DIFF", engine),
+            patch("openclaw_direct_chat._xdotool_command", return_value=(0, "")) as xdo,
+        ):
+            self.assertEqual(direct_chat._youtube_toggle_playback("0x1"), 0)
+        xdo.assert_called_once_with(["key", "--window", "0x1", "k"], timeout=2.0)
+        self.assertEqual(engine.stats()["baselines"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+import molbot_direct_chat.web_ask as web_ask  # noqa: E402
+from molbot_direct_chat.gemini_client import GeminiApiClient, UsageCounter  # noqa: E402
+
+
+class _StubGemini(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    log: list = []
+
+    def log_message(self, *_args) -> None:
+        return
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))) or b"{}")
+        model = self.path.split("/models/", 1)[1].split(":", 1)[0]
+        self.log.append({"model": model, "port": self.client_address[1], "key": self.headers.get("x-goog-api-key")})
+        if model == "gemini-missing":
+            status, out = 404, {"error": {"code": 404, "message": "model not found"}}
+        else:
+            if model == "gemini-slow":
+                time.sleep(1.0)
+            last = body["contents"][-1]["parts"][0]["text"]
+            status, out = 200, {"candidates": [{"content": {"parts": [{"text": f"{model}:{last}"}]}}]}
+        raw = json.dumps(out).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+
+class TestGeminiApiClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubGemini)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self) -> None:
+        _StubGemini.log = []
+        self.tmp = tempfile.TemporaryDirectory()
+        self.usage_path = Path(self.tmp.name) / "usage.json"
+        self.usage = UsageCounter(flush_interval_s=3600)
+        self.patches = [
+            patch.object(web_ask, "GEMINI_CLIENT", GeminiApiClient()),
+            patch.object(web_ask, "GEMINI_USAGE", self.usage),
+            patch.object(web_ask, "GEMINI_API_USAGE_PATH", self.usage_path),
+            patch.object(web_ask, "GEMINI_API_USAGE_LOCK_PATH", Path(self.tmp.name) / "usage.lock"),
+            patch.object(web_ask, "_log_web_ask"),
+            patch.dict(
+                os.environ,
+                {
+                    "GEMINI_API_ENABLED": "1",
+                    "GEMINI_API_KEY": "k-test",
+                    "GEMINI_API_BASE_URL": self.base_url,
+                    "GEMINI_API_ALLOW_PAID": "1",
+                    "GEMINI_API_HEDGE": "1",
+                    "GEMINI_API_CACHE": "1",
+                },
+                clear=False,
+            ),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self) -> None:
+        for p in reversed(self.patches):
+            p.stop()
+        self.tmp.cleanup()
+
+    @staticmethod
+    def _requests(model: str) -> list[dict]:
+        # Filtered by model: the losing request of a hedged race may still land after setUp.
+        return [r for r in _StubGemini.log if r["model"] == model]
+
+    def test_sequential_calls_reuse_one_connection(self) -> None:
+        with patch.dict(os.environ, {"GEMINI_API_MODELS": "gemini-fast"}):
+            out = web_ask._run_gemini_api("hola", timeout_ms=5000, followups=["y?"])
+        self.assertTrue(out["ok"], out)
+        self.assertEqual(out["text"], "gemini-fast:y?")
+        reqs = self._requests("gemini-fast")
+        self.assertEqual(len(reqs), 2)
+        self.assertEqual(len({r["port"] for r in reqs}), 1)
+        self.assertEqual(reqs[0]["key"], "k-test")
+
+    def test_model_not_found_falls_through_to_next_model(self) -> None:
+        with patch.dict(os.environ, {"GEMINI_API_MODELS": "gemini-missing,gemini-fast"}):
+            out = web_ask._run_gemini_api("hola", timeout_ms=5000)
+        self.assertTrue(out["ok"])
+        self.assertEqual(out["model_used"], "gemini-fast")
+
+    def test_hedged_request_takes_fastest_model(self) -> None:
+        with patch.dict(os.environ, {"GEMINI_API_MODELS": "gemini-slow,gemini-fast", "GEMINI_API_HEDGE": "2"}):
+            t0 = time.monotonic()
+            out = web_ask._run_gemini_api("hola", timeout_ms=5000)
+            elapsed = time.monotonic() - t0
+        self.assertTrue(out["ok"])
+        self.assertEqual(out["model_used"], "gemini-fast")
+        self.assertEqual(out["hedged_models"], ["gemini-slow", "gemini-fast"])
+        self.assertLess(elapsed, 0.9)
+        self.assertEqual(self.usage.stats()["used"], 2)
+
+    def test_hedged_failure_reports_first_real_error(self) -> None:
+        with patch.dict(os.environ, {"GEMINI_API_MODELS": "gemini-missing,gemini-missing2", "GEMINI_API_HEDGE": "2"}), patch.object(
+            web_ask, "_gemini_api_generate_once", return_value=(False, "model_not_found", "nope")
+        ):
+            out = web_ask._run_gemini_api("hola", timeout_ms=5000)
+        self.assertFalse(out["ok"])
+        self.assertEqual(out["status"], "model_not_found")
+
+    def test_identical_prompt_is_served_from_cache_without_quota(self) -> None:
+        with patch.dict(os.environ, {"GEMINI_API_MODELS": "gemini-fast"}):
+            first = web_ask._run_gemini_api("hola", timeout_ms=5000)
+            second = web_ask._run_gemini_api("hola", timeout_ms=5000)
+            other = web_ask._run_gemini_api("chau", timeout_ms=5000)
+        self.assertTrue(first["ok"] and second["ok"] and other["ok"])
+        self.assertTrue(second.get("cached"))
+        self.assertNotIn("cached", first)
+        self.assertEqual(second["text"], first["text"])
+        self.assertEqual(len(self._requests("gemini-fast")), 2)
+        self.assertEqual(self.usage.stats()["used"], 2)
+
+
+class TestUsageCounter(unittest.TestCase):
+    def test_counts_in_memory_and_merges_on_flush(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            path, lock = Path(td) / "usage.json", Path(td) / "usage.lock"
+            counter = UsageCounter(flush_interval_s=3600)
+            self.assertEqual(counter.reserve(path, lock, 1, 5), (True, 1, 5))
+            self.assertEqual(counter.reserve(path, lock, 1, 5), (True, 2, 5))
+            self.assertFalse(path.exists())
+            # Another process spent 2 calls in the meantime.
+            path.write_text(json.dumps({"date": time.strftime("%Y-%m-%d", time.localtime()), "used": 2}), encoding="utf-8")
+            counter.flush()
+            self.assertEqual(json.loads(path.read_text(encoding="utf-8"))["used"], 4)
+            self.assertEqual(counter.reserve(path, lock, 1, 5), (True, 5, 5))
+            ok, used, _ = counter.reserve(path, lock, 1, 5)
+            self.assertFalse(ok)
+            self.assertEqual(used, 5)
+
+    def test_existing_usage_file_is_loaded_on_first_reserve(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            path, lock = Path(td) / "usage.json", Path(td) / "usage.lock"
+            path.write_text(json.dumps({"date": "2000-01-01", "used": 99}), encoding="utf-8")
+            counter = UsageCounter(flush_interval_s=3600)
+            self.assertEqual(counter.reserve(path, lock, 1, 3), (True, 1, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
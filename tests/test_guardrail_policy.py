@@ -0,0 +1,283 @@
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+import openclaw_direct_chat as dc  # noqa: E402
+from molbot_direct_chat.guardrail import (  # noqa: E402
+    GuardrailEngine,
+    GuardrailInfraError,
+    RedisWindowCounter,
+    parse_guardrail_script,
+)
+
+
+SCRIPT = Path(REPO_ROOT) / "scripts" / "guardrail_check.sh"
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _FakeRedisCounter:
+    """INCR + EXPIRE-on-first semantics of the script's Redis key, on a fake clock."""
+
+    def __init__(self, clock: _Clock) -> None:
+        self.clock = clock
+        self.keys: dict = {}
+        self.calls: list = []
+
+    def __call__(self, key: str, window: int) -> int:
+        self.calls.append((key, window))
+        expires, count = self.keys.get(key, (None, 0))
+        if expires is not None and self.clock() >= expires:
+            expires, count = None, 0
+        count += 1
+        if count == 1:
+            expires = self.clock() + window
+        self.keys[key] = (expires, count)
+        return count
+
+
+class _FakeRedisHandler(socketserver.StreamRequestHandler):
+    def _read_command(self) -> list[str] | None:
+        head = self.rfile.readline()
+        if not head:
+            return None
+        args = []
+        for _ in range(int(head[1:-2])):
+            size = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(size + 2)[:-2].decode("utf-8"))
+        return args
+
+    def handle(self) -> None:
+        server = self.server
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            server.log.append(args)
+            cmd = args[0].upper()
+            if cmd == "INCR":
+                server.counts[args[1]] = server.counts.get(args[1], 0) + 1
+                self.wfile.write(b":%d\r\n" % server.counts[args[1]])
+            elif cmd == "EXPIRE":
+                self.wfile.write(b":1\r\n")
+            else:
+                self.wfile.write(b"+OK\r\n")
+            if server.drop_after_reply:
+                server.drop_after_reply = False
+                return
+
+
+class _FakeRedis(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _FakeRedisHandler)
+        self.log: list = []
+        self.counts: dict = {}
+        self.drop_after_reply = False
+
+
+class TestGuardrailRules(unittest.TestCase):
+    def test_rules_are_read_from_the_shipped_script(self) -> None:
+        rules = parse_guardrail_script(SCRIPT.read_text(encoding="utf-8"))
+        self.assertEqual(rules.source, "script")
+        self.assertEqual(rules.exec_tools, ("bash", "python", "code_exec"))
+        self.assertEqual(rules.domain_tools, ("browser_vision",))
+        self.assertEqual(rules.env_defaults["MAX_TOOLS_PER_WINDOW"], "10")
+        self.assertIn("prompt", rules.payload_keys)
+        self.assertTrue(rules.blocked.search("sudo RM  -rf /"))
+        self.assertTrue(rules.blocked.search(":(){:|:&};:"))
+        self.assertFalse(rules.blocked.search("rm -rf ./build"))
+
+
+class TestGuardrailEngine(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.script = self.root / "guardrail_check.sh"
+        self.script.write_text(SCRIPT.read_text(encoding="utf-8"), encoding="utf-8")
+        (self.root / "config").mkdir()
+        self.domains = self.root / "config" / "allowed_domains.txt"
+        self.domains.write_text("# allow\n.google.com\nwikipedia.org  # wiki\n", encoding="utf-8")
+        self.clock = _Clock()
+        self.counter = _FakeRedisCounter(self.clock)
+        self.engine = GuardrailEngine(self.script, self.root, reload_check_s=1.0, clock=self.clock, counter=self.counter)
+        skip = ("MAX_TOOLS_PER_WINDOW", "WINDOW_SECONDS", "ALLOWED_DOMAINS_FILE", "REDIS_URL", "GUARDRAIL_FAIL_CLOSED")
+        env = {k: v for k, v in os.environ.items() if k not in skip}
+        self.env = patch.dict(os.environ, env, clear=True)
+        self.env.start()
+
+    def tearDown(self) -> None:
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_domain_allowlist_matches_script_semantics(self) -> None:
+        ok, detail = self.engine.check("s1", "browser_vision", {"url": "https://gemini.google.com/app"})
+        self.assertTrue(ok)
+        self.assertEqual(detail, "GUARDRAIL_OK: session=s1 tool=browser_vision count=1")
+        self.assertEqual(
+            self.engine.check("s1", "browser_vision", {"url": "https://evilgoogle.com/"}),
+            (False, "POLICY_DENY: dominio no permitido (evilgoogle.com)"),
+        )
+        self.assertEqual(
+            self.engine.check("s1", "browser_vision", {"action": "open"}),
+            (False, "POLICY_DENY: browser_vision sin URL/host valido"),
+        )
+        self.assertTrue(self.engine.check("s1", "desktop", {"url": "https://evil.example"})[0])
+
+    def test_dangerous_payload_only_denied_for_exec_tools(self) -> None:
+        self.assertEqual(self.engine.check("s1", "bash", {"cmd": "dd if=/dev/zero of=/dev/sda"}), (False, "POLICY_DENY: comando peligroso detectado"))
+        self.assertTrue(self.engine.check("s1", "web_search", {"prompt": "que hace reboot"})[0])
+
+    def test_rate_limit_counts_cached_decisions_and_resets_after_window(self) -> None:
+        with patch.dict(os.environ, {"MAX_TOOLS_PER_WINDOW": "3", "WINDOW_SECONDS": "60"}):
+            for _ in range(3):
+                self.assertTrue(self.engine.check("s1", "web_search", {"prompt": "x"})[0])
+            ok, detail = self.engine.check("s1", "web_search", {"prompt": "x"})
+            self.assertFalse(ok)
+            self.assertEqual(detail, "RATE_LIMIT_EXCEEDED: session=s1 count=4 limit=3")
+            self.assertTrue(self.engine.check("s2", "web_search", {"prompt": "x"})[0])
+            self.clock.now += 61
+            self.assertTrue(self.engine.check("s1", "web_search", {"prompt": "x"})[0])
+        self.assertGreaterEqual(self.engine.stats()["cache_hits"], 2)
+        self.assertEqual(self.counter.calls[0], ("session:s1:tool_count", 60))
+
+    def test_unreachable_counter_fails_open_unless_fail_closed(self) -> None:
+        def down(key: str, window: int) -> int:
+            raise GuardrailInfraError("redis no disponible (127.0.0.1:6379)")
+
+        engine = GuardrailEngine(self.script, self.root, clock=self.clock, counter=down)
+        ok, detail = engine.check("s1", "bash", {"cmd": "ls"})
+        self.assertTrue(ok)
+        self.assertEqual(detail, "guardrail_bypass_infra_error: GUARDRAIL_ERROR: redis no disponible (127.0.0.1:6379)")
+        with patch.dict(os.environ, {"GUARDRAIL_FAIL_CLOSED": "1"}):
+            ok, detail = engine.check("s1", "bash", {"cmd": "ls"})
+        self.assertFalse(ok)
+        self.assertTrue(detail.startswith("GUARDRAIL_ERROR:"))
+        self.assertEqual(engine.stats()["infra_errors"], 2)
+
+    def test_rules_hot_reload_and_invalidate_cache(self) -> None:
+        params = {"url": "https://openai.com/x"}
+        self.assertFalse(self.engine.check("s1", "browser_vision", params)[0])
+        self.domains.write_text("google.com\nopenai.com\n", encoding="utf-8")
+        # Within the recheck interval the cached decision stands.
+        self.assertFalse(self.engine.check("s1", "browser_vision", params)[0])
+        self.clock.now += 2
+        self.assertTrue(self.engine.check("s1", "browser_vision", params)[0])
+        self.script.write_text(
+            self.script.read_text(encoding="utf-8").replace('"python" || ', '"python" || "$TOOL_NAME" == "shell" || '),
+            encoding="utf-8",
+        )
+        self.clock.now += 2
+        self.assertFalse(self.engine.check("s1", "shell", {"command": "shutdown -h now"})[0])
+        self.assertEqual(self.engine.stats()["reloads"], 3)
+
+    def test_missing_allowlist_denies_browser_vision(self) -> None:
+        self.domains.unlink()
+        ok, detail = self.engine.check("s1", "browser_vision", {"url": "https://google.com"})
+        self.assertFalse(ok)
+        self.assertIn("falta allowlist", detail)
+
+    def test_audit_records_only_mismatches(self) -> None:
+        self.engine.record_audit("web_search", {}, (True, "GUARDRAIL_OK"), (True, "guardrail_bypass_infra_error"))
+        self.engine.record_audit("bash", {"cmd": "x"}, (True, "GUARDRAIL_OK"), (False, "POLICY_DENY"))
+        st = self.engine.stats()
+        self.assertEqual((st["audit_runs"], st["audit_mismatches"]), (2, 1))
+        self.assertEqual(st["audit_recent"][0]["tool"], "bash")
+
+
+class TestRedisWindowCounter(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = _FakeRedis()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.port = self.server.server_address[1]
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_incr_expire_on_first_hit_over_one_connection(self) -> None:
+        counter = RedisWindowCounter(f"redis://:secreto@127.0.0.1:{self.port}/3")
+        self.assertEqual([counter.incr("session:s1:tool_count", 3600) for _ in range(3)], [1, 2, 3])
+        self.assertEqual(
+            self.server.log,
+            [
+                ["AUTH", "secreto"],
+                ["SELECT", "3"],
+                ["INCR", "session:s1:tool_count"],
+                ["EXPIRE", "session:s1:tool_count", "3600"],
+                ["INCR", "session:s1:tool_count"],
+                ["INCR", "session:s1:tool_count"],
+            ],
+        )
+        # A connection the server dropped is replaced transparently.
+        self.server.drop_after_reply = True
+        self.assertEqual(counter.incr("session:s1:tool_count", 3600), 4)
+        self.assertEqual(counter.incr("session:s1:tool_count", 3600), 5)
+
+    def test_unreachable_redis_backs_off(self) -> None:
+        clock = _Clock()
+        self.server.server_close()
+        counter = RedisWindowCounter(f"redis://127.0.0.1:{self.port}/0", retry_after_s=5.0, clock=clock)
+        with self.assertRaises(GuardrailInfraError):
+            counter.incr("k", 60)
+        with patch("molbot_direct_chat.guardrail.socket.create_connection") as connect:
+            with self.assertRaises(GuardrailInfraError):
+                counter.incr("k", 60)
+            connect.assert_not_called()
+            clock.now += 6
+            connect.side_effect = OSError("refused")
+            with self.assertRaises(GuardrailInfraError):
+                counter.incr("k", 60)
+            connect.assert_called_once()
+
+
+class TestDirectChatGuardrail(unittest.TestCase):
+    def test_audit_script_counts_in_a_separate_redis_db(self) -> None:
+        with patch.dict(os.environ, {"REDIS_URL": "redis://127.0.0.1:6379/0"}):
+            os.environ.pop("GUARDRAIL_AUDIT_REDIS_URL", None)
+            self.assertEqual(dc._guardrail_audit_redis_url(), "redis://127.0.0.1:6379/1")
+        with patch.dict(os.environ, {"GUARDRAIL_AUDIT_REDIS_URL": "redis://otro:6380/5"}):
+            self.assertEqual(dc._guardrail_audit_redis_url(), "redis://otro:6380/5")
+
+    def test_inprocess_mode_does_not_spawn_the_script(self) -> None:
+        engine = GuardrailEngine(SCRIPT, Path(REPO_ROOT), counter=_FakeRedisCounter(_Clock()))
+        with patch.object(dc, "_GUARDRAIL", engine), patch.object(dc.subprocess, "run") as run, patch.dict(
+            os.environ, {"GUARDRAIL_ENABLED": "1", "GUARDRAIL_MODE": "inprocess"}
+        ):
+            t0 = time.perf_counter()
+            ok, detail = dc._guardrail_check("s-dc", "browser_vision", {"url": "https://es.wikipedia.org/wiki/X"})
+            elapsed = time.perf_counter() - t0
+        self.assertTrue(ok, detail)
+        self.assertLess(elapsed, 0.05)
+        run.assert_not_called()
+
+    def test_script_mode_keeps_subprocess_path(self) -> None:
+        with patch.object(dc, "_guardrail_check_script", return_value=(False, "POLICY_DENY: x")) as script, patch.dict(
+            os.environ, {"GUARDRAIL_ENABLED": "1", "GUARDRAIL_MODE": "script"}
+        ):
+            self.assertEqual(dc._guardrail_check("s", "bash", {}), (False, "POLICY_DENY: x"))
+        script.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+import openclaw_direct_chat as dc  # noqa: E402
+import molbot_direct_chat.history_store as history_store  # noqa: E402
+from molbot_direct_chat.history_store import HistoryStore, iter_log, replay_views  # noqa: E402
+
+
+def _turns(n: int, prefix: str = "q") -> list[dict]:
+    out = []
+    for i in range(n):
+        out.append({"role": "user", "content": f"{prefix}{i}"})
+        out.append({"role": "assistant", "content": f"a{i}"})
+    return out
+
+
+class TestHistoryStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log = Path(self.tmp.name) / "s1.history.jsonl"
+        self.store = HistoryStore(view_limit=200)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def _lines(self) -> list[dict]:
+        return [json.loads(line) for line in self.log.read_text(encoding="utf-8").splitlines()]
+
+    def test_growing_client_history_only_appends_new_messages(self) -> None:
+        for n in range(1, 6):
+            self.store.save(self.log, "cloud__m1", _turns(n), model="m1", backend="cloud")
+        lines = self._lines()
+        self.assertEqual(len(lines), 10)
+        self.assertEqual({(r["model"], r["backend"]) for r in lines}, {("m1", "cloud")})
+        self.assertEqual(self.store.tail(self.log, "cloud__m1"), _turns(5))
+        # Re-sending the same history (or a trimmed tail of it) writes nothing.
+        self.store.save(self.log, "cloud__m1", _turns(5)[-4:])
+        self.assertEqual(len(self._lines()), 10)
+
+    def test_views_share_one_log_and_edits_reset_only_their_view(self) -> None:
+        self.store.save(self.log, "cloud__m1", _turns(2))
+        self.store.save(self.log, "local__m2", _turns(1, "x"))
+        self.store.save(self.log, "cloud__m1", [{"role": "user", "content": "nuevo"}])
+        self.assertEqual(self.store.tail(self.log, "cloud__m1"), [{"role": "user", "content": "nuevo"}])
+        self.assertEqual(self.store.tail(self.log, "local__m2"), _turns(1, "x"))
+        self.store.save(self.log, "local__m2", [])
+        self.assertEqual(self.store.tail(self.log, "local__m2"), [])
+        # A fresh store (new process) rebuilds the same views from the log tail.
+        other = HistoryStore()
+        self.assertEqual(other.tail(self.log, "cloud__m1"), [{"role": "user", "content": "nuevo"}])
+        self.assertEqual(other.tail(self.log, "local__m2"), [])
+
+    def test_tail_scan_crosses_chunk_boundaries_and_honours_limit(self) -> None:
+        self.store.save(self.log, "v", _turns(150))
+        self.store.save(self.log, "w", _turns(3, "w"))
+        with patch.object(history_store, "_READ_CHUNK", 97):
+            fresh = HistoryStore(view_limit=200)
+            items = fresh.tail(self.log, "v")
+            self.assertEqual(items, _turns(150)[-200:])
+            self.assertEqual(fresh.tail(self.log, "v", limit=3), _turns(150)[-3:])
+            self.assertEqual(fresh.tail(self.log, "w"), _turns(3, "w"))
+
+    def test_appends_by_other_writers_are_picked_up_incrementally(self) -> None:
+        self.store.save(self.log, "v", _turns(1))
+        self.assertEqual(len(self.store.tail(self.log, "v")), 2)
+        HistoryStore().save(self.log, "v", _turns(2))
+        self.assertEqual(self.store.tail(self.log, "v"), _turns(2))
+        self.assertEqual(self.store.stats()["tail_scans"], 1)
+
+    def test_legacy_file_seeds_the_view_once(self) -> None:
+        legacy = Path(self.tmp.name) / "s1__cloud__m1.json"
+        legacy.write_text(json.dumps(_turns(2)), encoding="utf-8")
+        self.assertEqual(self.store.tail(self.log, "cloud__m1", legacy=legacy), _turns(2))
+        self.store.save(self.log, "cloud__m1", _turns(3), legacy=legacy)
+        self.assertEqual(len(self._lines()), 6)
+        self.assertEqual(HistoryStore().tail(self.log, "cloud__m1", legacy=legacy), _turns(3))
+        self.assertEqual(self.store.stats()["legacy_imports"], 1)
+
+    def test_compaction_keeps_last_messages_per_view(self) -> None:
+        store = HistoryStore(view_limit=4, compact_bytes=1)
+        store.compact_bytes = 2000
+        for n in range(1, 40):
+            store.save(self.log, "v", _turns(n)[-4:])
+        store.save(self.log, "e", _turns(1))
+        store.save(self.log, "e", [])
+        self.assertGreaterEqual(store.stats()["compactions"], 1)
+        self.assertLess(self.log.stat().st_size, 2000)
+        self.assertEqual(store.tail(self.log, "v"), _turns(39)[-4:])
+        views = replay_views(iter_log(self.log))
+        self.assertEqual(views["v"]["messages"][-4:], _turns(39)[-4:])
+        self.assertEqual(views["e"]["messages"], [])
+
+
+class TestDirectChatHistory(unittest.TestCase):
+    def test_turns_append_to_session_log_and_load_reads_the_tail(self) -> None:
+        with tempfile.TemporaryDirectory() as td, patch.object(dc, "HISTORY_DIR", Path(td)), patch.object(dc, "_HISTORY", HistoryStore()):
+            history: list = []
+            for i in range(3):
+                dc._record_history_turn("sess", history, f"hola {i}", f"ok {i}", model="m/x", backend="cloud")
+                history = dc._load_history("sess", model="m/x", backend="cloud")
+            self.assertEqual(len(history), 6)
+            self.assertEqual(dc._load_history("sess", model="m/x", backend="cloud", limit=2)[-1], {"role": "assistant", "content": "ok 2"})
+            self.assertEqual(dc._load_history("sess", model="otro", backend="cloud"), [])
+            files = sorted(p.name for p in Path(td).iterdir())
+            self.assertEqual(files, ["sess.history.jsonl"])
+            self.assertEqual(len(Path(td, "sess.history.jsonl").read_text(encoding="utf-8").splitlines()), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
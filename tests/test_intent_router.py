@@ -0,0 +1,95 @@
+import os
+import re
+import sys
+import unittest
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+from molbot_direct_chat.intent_router import Intent, IntentRouter, KeywordTrie  # noqa: E402
+
+
+class TestKeywordTrie(unittest.TestCase):
+    def test_scan_finds_overlapping_and_nested_keywords(self) -> None:
+        trie = KeywordTrie(("segui", "seguir leyendo", "leyendo", "voz on", "on"))
+        hits = trie.scan("por favor seguir leyendo con voz on")
+        self.assertEqual(hits, {"segui", "seguir leyendo", "leyendo", "voz on", "on"})
+
+    def test_scan_without_hits(self) -> None:
+        trie = KeywordTrie(("biblioteca", "libros"))
+        self.assertEqual(trie.scan("hola que tal"), set())
+        self.assertEqual(trie.scan(""), set())
+
+    def test_keywords_with_regex_metacharacters_are_literal(self) -> None:
+        trie = KeywordTrie(("c++", "a.b"))
+        self.assertEqual(trie.scan("uso c++ y axb"), {"c++"})
+
+
+class TestIntentRouter(unittest.TestCase):
+    def setUp(self) -> None:
+        self.calls: list[str] = []
+
+        def _handler(name: str, result: dict | None):
+            def _fn(ctx, match):
+                self.calls.append(name)
+                if result is None:
+                    return None
+                out = dict(result)
+                if match is not None:
+                    out["group"] = match.group(1)
+                return out
+
+            return _fn
+
+        self.router = IntentRouter(
+            (
+                Intent("late", _handler("late", {"reply": "late"}), 30, ("voz",)),
+                Intent("early", _handler("early", None), 10, ("voz",)),
+                Intent("mic", _handler("mic", {"reply": "mic"}), 20, ("mic",), (re.compile(r"mic usar (\d+)"),)),
+                Intent("fallback", _handler("fallback", {"reply": "fallback"}), 40, always=True),
+            )
+        )
+
+    def test_dispatch_runs_candidates_by_priority_and_falls_through(self) -> None:
+        out, report = self.router.dispatch("voz on", ctx=None)
+        self.assertEqual(out, {"reply": "late"})
+        self.assertEqual(self.calls, ["early", "late"])
+        self.assertEqual(report.intent, "late")
+        self.assertEqual(report.evaluated, ["early", "late"])
+        self.assertEqual(set(report.timings_ms), {"early", "late"})
+
+    def test_intents_without_keyword_hit_are_skipped(self) -> None:
+        out, report = self.router.dispatch("hola", ctx=None)
+        self.assertEqual(out, {"reply": "fallback"})
+        self.assertEqual(self.calls, ["fallback"])
+        self.assertEqual(report.candidates, 1)
+
+    def test_pattern_match_is_passed_to_handler(self) -> None:
+        out, report = self.router.dispatch("mic usar 3", ctx=None)
+        self.assertEqual(out, {"reply": "mic", "group": "3"})
+        self.assertEqual(report.intent, "mic")
+
+    def test_keyword_hit_without_pattern_match_skips_handler(self) -> None:
+        out, report = self.router.dispatch("mic lista", ctx=None)
+        self.assertEqual(out, {"reply": "fallback"})
+        self.assertEqual(self.calls, ["fallback"])
+        self.assertEqual(report.evaluated, ["mic", "fallback"])
+
+    def test_stats_aggregate_per_intent(self) -> None:
+        self.router.dispatch("voz on", ctx=None)
+        self.router.dispatch("voz off", ctx=None)
+        stats = self.router.stats()
+        self.assertEqual(stats["routes"], 2)
+        self.assertEqual(stats["per_intent"]["late"]["matched"], 2)
+        self.assertEqual(stats["per_intent"]["early"]["evaluated"], 2)
+        self.assertEqual(stats["per_intent"]["early"]["matched"], 0)
+
+    def test_duplicate_intent_names_are_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            IntentRouter((Intent("a", lambda c, m: None, 1, ("x",)), Intent("a", lambda c, m: None, 2, ("y",))))
+
+
+if __name__ == "__main__":
+    unittest.main()
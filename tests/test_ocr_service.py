@@ -0,0 +1,129 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+from molbot_direct_chat.ocr_service import OcrService, OcrWord, TesseractCliEngine, parse_hocr  # noqa: E402
+import openclaw_direct_chat as direct_chat  # noqa: E402
+
+
+# 1000x800 PNG header is enough for size detection; the fake engine ignores pixels.
+_PNG = b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\rIHDR" + (1000).to_bytes(4, "big") + (800).to_bytes(4, "big") + b"\x08\x02"
+
+
+class _FakeEngine:
+    name = "fake"
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def recognize(self, data: bytes) -> list[OcrWord]:
+        self.calls += 1
+        return [
+            OcrWord("Pregúntale", (100, 700, 220, 730)),
+            OcrWord("a", (225, 700, 235, 730)),
+            OcrWord("Gemini", (240, 700, 330, 730)),
+            OcrWord("0:03", (20, 600, 60, 620)),
+            OcrWord("/", (62, 600, 66, 620)),
+            OcrWord("53:41", (70, 600, 120, 620)),
+            OcrWord("12:00", (900, 100, 960, 120)),
+        ]
+
+
+class TestOcrService(unittest.TestCase):
+    def setUp(self) -> None:
+        self.engine = _FakeEngine()
+        self.ocr = OcrService(engine_factory=lambda: self.engine)
+
+    def test_one_engine_run_serves_text_and_words(self) -> None:
+        res = self.ocr.read(_PNG)
+        self.assertEqual(res.text, "pregúntale a gemini 0:03 / 53:41 12:00")
+        self.assertEqual(res.size, (1000, 800))
+        self.assertEqual(len(self.ocr.read(bytes(_PNG)).words), 7)
+        self.assertEqual(self.engine.calls, 1)
+        self.assertEqual(self.ocr.stats()["cache_hits"], 1)
+
+    def test_region_is_answered_from_cached_frame(self) -> None:
+        self.ocr.read(_PNG)
+        bottom = self.ocr.read(_PNG, region=(0.0, 0.8, 1.0, 1.0))
+        self.assertEqual(bottom.text, "pregúntale a gemini")
+        left = self.ocr.read(_PNG, region=(0.0, 0.35, 0.78, 1.0))
+        self.assertNotIn("12:00", left.text)
+        self.assertEqual(self.engine.calls, 1)
+        self.assertEqual(self.ocr.stats()["region_hits"], 2)
+
+    def test_cold_region_without_pillow_ocrs_full_frame_once(self) -> None:
+        with patch("molbot_direct_chat.ocr_service.OcrService._crop", return_value=None):
+            bottom = self.ocr.read(_PNG, region=(0.0, 0.8, 1.0, 1.0))
+            full = self.ocr.read(_PNG)
+        self.assertEqual(bottom.text, "pregúntale a gemini")
+        self.assertEqual(len(full.words), 7)
+        self.assertEqual(self.engine.calls, 1)
+
+    def test_cropped_words_are_mapped_back_to_frame(self) -> None:
+        with patch(
+            "molbot_direct_chat.ocr_service.OcrService._crop",
+            return_value=(b"crop", (0, 640), (1000, 800)),
+        ):
+            res = self.ocr.read(_PNG, region=(0.0, 0.8, 1.0, 1.0))
+        self.assertEqual(res.words[0].bbox, (100, 1340, 220, 1370))
+        self.assertEqual(self.ocr.stats()["crops"], 1)
+
+    def test_file_frames_are_keyed_by_mtime_and_size(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            snap = Path(td) / "snap.png"
+            snap.write_bytes(_PNG)
+            self.ocr.read(snap)
+            self.ocr.read(snap)
+            self.assertEqual(self.engine.calls, 1)
+            snap.write_bytes(_PNG + b"\x00")
+            self.ocr.read(snap)
+            self.assertEqual(self.engine.calls, 2)
+            self.assertEqual(self.ocr.read(Path(td) / "missing.png").words, [])
+
+    def test_no_engine_returns_empty(self) -> None:
+        ocr = OcrService(engine_factory=lambda: None)
+        self.assertFalse(ocr.available())
+        self.assertEqual(ocr.read(_PNG).text, "")
+
+    def test_parse_hocr(self) -> None:
+        raw = (
+            "<span class='ocr_line'><span class='ocrx_word' title='bbox 1 2 30 40; x_wconf 90'>Hola</span> "
+            "<span class='ocrx_word' title='bbox 35 2 60 40'><strong>&amp;</strong></span>"
+            "<span class='ocrx_word' title='bbox 0 0 1 1'> </span></span>"
+        )
+        self.assertEqual(parse_hocr(raw), [OcrWord("Hola", (1, 2, 30, 40)), OcrWord("&", (35, 2, 60, 40))])
+
+    def test_cli_engine_uses_shared_language(self) -> None:
+        class _Proc:
+            stdout = b""
+
+        for env, lang in (({}, "spa+eng"), ({"OCR_LANG": "por"}, "por")):
+            with patch.dict(os.environ, env, clear=False), patch(
+                "molbot_direct_chat.ocr_service.subprocess.run", return_value=_Proc()
+            ) as run:
+                if not env:
+                    os.environ.pop("OCR_LANG", None)
+                TesseractCliEngine().recognize(_PNG)
+            self.assertEqual(run.call_args.args[0], ["tesseract", "stdin", "stdout", "-l", lang, "hocr"])
+
+
+class TestDirectChatOcr(unittest.TestCase):
+    def test_text_and_phrase_centers_share_one_pass(self) -> None:
+        engine = _FakeEngine()
+        with patch.object(direct_chat, "_OCR", OcrService(engine_factory=lambda: engine)):
+            self.assertTrue(direct_chat._composer_looks_empty(_PNG))
+            self.assertEqual(direct_chat._ocr_find_phrase_center(_PNG, ["preguntale a gemini"]), (215, 715))
+            self.assertTrue(direct_chat._looks_like_phrase_still_in_composer(_PNG, "gemini", win_h=800))
+        self.assertEqual(engine.calls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
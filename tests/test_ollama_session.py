@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+from molbot_direct_chat.ollama_session import OllamaWarmer, native_chat_payload  # noqa: E402
+import openclaw_direct_chat as direct_chat  # noqa: E402
+
+
+_CATALOG = {
+    "default_model": "qwen-32b",
+    "models": [
+        {"id": "qwen-32b", "backend": "local", "available": True, "runtime_model": "qwq:32b", "context_tokens": 16384},
+        {"id": "cloud-x", "backend": "cloud", "available": True, "context_tokens": 128000},
+    ],
+}
+_CATALOG["by_id"] = {m["id"]: m for m in _CATALOG["models"]}
+
+
+class TestOllamaSessionHelpers(unittest.TestCase):
+    def test_native_payload(self) -> None:
+        out = native_chat_payload({"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.2}, "30m", 8192)
+        self.assertEqual(
+            out,
+            {
+                "model": "m",
+                "messages": [{"role": "user", "content": "hi"}],
+                "stream": False,
+                "keep_alive": "30m",
+                "options": {"num_ctx": 8192, "temperature": 0.2},
+            },
+        )
+
+    def test_warmer_loads_once(self) -> None:
+        done = threading.Event()
+        calls: list[dict] = []
+
+        def post(url, json=None, timeout=None):
+            calls.append({"url": url, **json})
+            done.set()
+            return MagicMock(status_code=200)
+
+        warmer = OllamaWarmer(post=post)
+        self.assertTrue(warmer.warm("http://ollama:11434/", "m", "1h", 4096))
+        self.assertTrue(done.wait(2.0))
+        for _ in range(100):
+            if not warmer.status()["in_flight"]:
+                break
+            threading.Event().wait(0.01)
+        self.assertFalse(warmer.warm("http://ollama:11434", "m", "1h", 4096))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0]["url"], "http://ollama:11434/api/chat")
+        self.assertEqual(calls[0]["messages"], [])
+        self.assertEqual(calls[0]["options"], {"num_ctx": 4096})
+        self.assertTrue(warmer.status()["models"]["m"]["ok"])
+
+
+class TestDirectChatOllamaSession(unittest.TestCase):
+    def test_session_mode_uses_native_chat_with_keep_alive(self) -> None:
+        resp = MagicMock(status_code=200, content=b"{}")
+        resp.json.return_value = {"message": {"role": "assistant", "content": "hola"}}
+        handler = direct_chat.Handler.__new__(direct_chat.Handler)
+        with (
+            patch.object(direct_chat, "_model_catalog", return_value=_CATALOG),
+            patch.dict(os.environ, {"DIRECT_CHAT_OLLAMA_KEEP_ALIVE_MODELS": "qwq:32b=2h"}),
+            patch("openclaw_direct_chat.requests.post", return_value=resp) as post,
+        ):
+            out = handler._call_ollama({"model": "qwq:32b", "messages": [{"role": "user", "content": "x"}], "temperature": 0.2})
+        self.assertEqual(out["choices"][0]["message"]["content"], "hola")
+        self.assertEqual(post.call_count, 1)
+        self.assertTrue(post.call_args.args[0].endswith("/api/chat"))
+        body = post.call_args.kwargs["json"]
+        self.assertEqual(body["keep_alive"], "2h")
+        self.assertEqual(body["options"], {"num_ctx": 16384, "temperature": 0.2})
+
+    def test_model_switch_warms_local_models_only(self) -> None:
+        with (
+            patch.object(direct_chat, "_model_catalog", return_value=_CATALOG),
+            patch.object(direct_chat._OLLAMA_WARMER, "warm", return_value=True) as warm,
+        ):
+            local = direct_chat._warm_local_model("qwen-32b")
+            cloud = direct_chat._warm_local_model("cloud-x")
+            unknown = direct_chat._warm_local_model("nope")
+        self.assertEqual((local["warming"], cloud["warming"], unknown["ok"]), (True, False, False))
+        warm.assert_called_once()
+        self.assertEqual(warm.call_args.args[1], "qwq:32b")
+        self.assertEqual(warm.call_args.kwargs["num_ctx"], 16384)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -15,6 +15,9 @@ import openclaw_direct_chat as direct_chat  # noqa: E402
 
 
 class TestOpenClawYoutubeAndTools(unittest.TestCase):
+    def setUp(self) -> None:
+        direct_chat._YOUTUBE_RESOLVER.clear()
+
     def test_extract_allowed_tools_from_legacy_dict(self) -> None:
         payload = {
             "tools": {
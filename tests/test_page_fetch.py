@@ -0,0 +1,159 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+from molbot_direct_chat import web_search  # noqa: E402
+from molbot_direct_chat.page_fetch import PageFetcher, chunk_text, extract_main_text  # noqa: E402
+
+
+_ARTICLE = (
+    "<html><head><title>Fotosíntesis</title><script>var x = 1;</script></head><body>"
+    "<nav><a href='/'>Inicio</a> <a href='/b'>Blog</a></nav>"
+    "<div class='sidebar'><p>Suscribite al newsletter para recibir novedades todas las semanas.</p></div>"
+    "<article><h1>Fotosíntesis</h1>"
+    "<p>La fotosíntesis es el proceso por el cual las plantas convierten la luz en energía química.</p>"
+    "<p>Ocurre en los cloroplastos y libera oxígeno como subproducto de la fase luminosa.</p>"
+    "</article><footer>© 2026 Sitio de ejemplo con muchos enlaces legales al pie</footer></body></html>"
+)
+
+
+class _PageHandler(BaseHTTPRequestHandler):
+    hits: dict[str, int] = {}
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args) -> None:
+        return
+
+    def do_GET(self) -> None:
+        cls = type(self)
+        busy = self.path.startswith("/busy")
+        with cls.lock:
+            cls.hits[self.path] = cls.hits.get(self.path, 0) + 1
+            cls.active += int(busy)
+            cls.max_active = max(cls.max_active, cls.active)
+        try:
+            if self.path.startswith("/slow"):
+                time.sleep(1.5)
+            if self.path == "/article" and self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            if busy:
+                time.sleep(0.2)
+            body = _ARTICLE.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with cls.lock:
+                cls.active -= int(busy)
+
+
+class TestExtraction(unittest.TestCase):
+    def test_main_text_skips_boilerplate(self) -> None:
+        title, text = extract_main_text(_ARTICLE)
+        self.assertEqual(title, "Fotosíntesis")
+        self.assertIn("convierten la luz en energía química", text)
+        self.assertIn("cloroplastos", text)
+        self.assertNotIn("newsletter", text)
+        self.assertNotIn("Inicio", text)
+        self.assertNotIn("var x", text)
+
+    def test_unclosed_and_void_tags_inside_boilerplate_do_not_swallow_the_page(self) -> None:
+        html = (
+            "<html><body>"
+            "<header><img src='logo.png'><p>Portal de noticias<br>sección ciencia</header>"
+            "<nav><ul><li>Home<li>About<li><img src='x.png'>Contacto</ul><nav><a>Sub</a></nav><br></nav>"
+            "<article><p>La fotosíntesis es el proceso por el cual las plantas convierten la luz en energía química."
+            "<p>Ocurre en los cloroplastos y libera oxígeno como subproducto de la fase luminosa.</article>"
+            "<footer><p>Aviso legal<br><p>Contacto y términos de uso del sitio</footer>"
+            "</body></html>"
+        )
+        _, text = extract_main_text(html)
+        self.assertIn("convierten la luz en energía química", text)
+        self.assertIn("cloroplastos", text)
+        for boilerplate in ("Home", "About", "Sub", "Portal", "Aviso legal", "términos"):
+            self.assertNotIn(boilerplate, text)
+
+    def test_chunk_text_respects_limit(self) -> None:
+        text = "\n\n".join(["Uno dos tres. " * 10, "Corto.", "Oración larga número uno. " * 30])
+        chunks = chunk_text(text, max_chars=200)
+        self.assertTrue(all(len(c) <= 200 for c in chunks))
+        self.assertIn("Corto.", "".join(chunks))
+
+
+class TestPageFetcher(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _PageHandler)
+        cls.base = f"http://127.0.0.1:{cls.httpd.server_address[1]}"
+        threading.Thread(target=cls.httpd.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+
+    def setUp(self) -> None:
+        _PageHandler.hits = {}
+        _PageHandler.max_active = 0
+
+    def test_cache_and_conditional_revalidation(self) -> None:
+        clock = [0.0]
+        fetcher = PageFetcher(fresh_s=60.0, clock=lambda: clock[0])
+        url = f"{self.base}/article"
+        first = fetcher.fetch(url)
+        self.assertEqual(first.etag, '"v1"')
+        self.assertTrue(first.chunks)
+        fetcher.fetch(url)
+        self.assertEqual(_PageHandler.hits["/article"], 1)
+        clock[0] = 120.0
+        again = fetcher.fetch(url)
+        self.assertEqual(again.chunks, first.chunks)
+        self.assertEqual(_PageHandler.hits["/article"], 2)
+        stats = fetcher.stats()
+        self.assertEqual((stats["fetched"], stats["fresh_hits"], stats["not_modified"]), (1, 1, 1))
+
+    def test_budget_and_per_host_limit(self) -> None:
+        fetcher = PageFetcher(per_host=2)
+        # The slow page sits on another host name so it never holds a 127.0.0.1 slot.
+        urls = [f"{self.base}/busy{i}" for i in range(4)] + [self.base.replace("127.0.0.1", "localhost") + "/slow"]
+        t0 = time.monotonic()
+        pages = fetcher.fetch_many(urls, budget_s=0.9)
+        self.assertLess(time.monotonic() - t0, 1.4)
+        self.assertEqual(set(pages), set(urls[:4]))
+        self.assertLessEqual(_PageHandler.max_active, 2)
+
+    def test_enrich_feeds_prompt(self) -> None:
+        fetcher = PageFetcher()
+        payload = {
+            "ok": True,
+            "query": "fotosintesis",
+            "results": [
+                {"url": f"{self.base}/article", "title": "A", "content": "snippet corto", "engine": "e"},
+                {"url": f"{self.base}/missing.pdf", "title": "B", "content": "otro snippet", "engine": "e"},
+            ],
+        }
+        out = fetcher.enrich(payload, top_k=1, budget_s=2.0)
+        self.assertNotIn("page_chunks", payload["results"][0])
+        prompt = web_search.format_results_for_prompt(out)
+        self.assertIn("cloroplastos", prompt)
+        self.assertIn("otro snippet", prompt)
+        self.assertNotIn("snippet corto", prompt)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+from molbot_direct_chat.proc_index import ProcIndex  # noqa: E402
+import openclaw_direct_chat as direct_chat  # noqa: E402
+
+
+def _write_proc(root: Path, pid: int, start: int, args: list[str], comm: str = "chrome") -> None:
+    d = root / str(pid)
+    d.mkdir(parents=True, exist_ok=True)
+    fields = ["S"] + ["0"] * 18 + [str(start)] + ["0"] * 10
+    (d / "stat").write_text(f"{pid} ({comm}) " + " ".join(fields), encoding="utf-8")
+    (d / "cmdline").write_bytes(b"\x00".join(a.encode("utf-8") for a in args) + b"\x00")
+
+
+class TestProcIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.index = ProcIndex(proc_root=self.root, revalidate_s=0.0)
+
+    def tearDown(self) -> None:
+        self._tmp.cleanup()
+
+    def test_cached_until_start_time_changes(self) -> None:
+        _write_proc(self.root, 100, 5000, ["/opt/google/chrome/chrome", "--profile-directory=Profile 1"], comm="a) b")
+        self.assertEqual(self.index.profile_directory("100"), "Profile 1")
+        self.assertEqual(self.index.profile_directory(100), "Profile 1")
+        self.assertEqual(self.index.stats()["reads"], 1)
+        self.assertEqual(self.index.stats()["revalidated"], 1)
+
+        # Same PID recycled by another process: new start time, new cmdline.
+        _write_proc(self.root, 100, 9000, ["/usr/bin/chromium", "--profile-directory", "diego"])
+        info = self.index.get("100")
+        self.assertEqual(info.profile_directory, "diego")
+        self.assertEqual(info.start_time, 9000)
+        self.assertEqual(self.index.stats()["invalidated"], 1)
+
+    def test_revalidation_window_skips_stat_reads(self) -> None:
+        index = ProcIndex(proc_root=self.root, revalidate_s=60.0)
+        _write_proc(self.root, 7, 1, ["chrome", "--profile-directory=Default"])
+        index.get(7)
+        with patch.object(index, "_start_time", side_effect=AssertionError("stat read")):
+            self.assertEqual(index.profile_directory(7), "Default")
+        self.assertEqual(index.stats()["hits"], 1)
+
+    def test_missing_and_invalid_pids(self) -> None:
+        self.assertIsNone(self.index.get("0"))
+        self.assertIsNone(self.index.get("abc"))
+        self.assertIsNone(self.index.get(424242))
+        self.assertEqual(self.index.profile_directory("424242"), "")
+
+    def test_resolve_many_reads_each_pid_once(self) -> None:
+        _write_proc(self.root, 10, 1, ["chrome", "--profile-directory=Profile 1"])
+        _write_proc(self.root, 11, 1, ["firefox"])
+        out = self.index.resolve_many(["10", "10", "11", "10", "x"])
+        self.assertEqual(set(out), {10, 11})
+        self.assertEqual(out[11].profile_directory, "")
+        self.assertEqual(self.index.stats()["reads"], 2)
+
+
+class TestDirectChatWindowProfiles(unittest.TestCase):
+    def test_find_new_window_lists_windows_once_per_poll(self) -> None:
+        rows = [
+            ("0x01", "0", "100", "Molbot Direct Chat - Google Chrome"),
+            ("0x02", "3", "200", "Nueva pestaña - Google Chrome"),
+            ("0x03", "3", "100", "Gemini - Google Chrome"),
+        ]
+        profiles = {"100": "Profile 1", "200": "Default"}
+        with (
+            patch("openclaw_direct_chat._wmctrl_rows", return_value=rows) as mock_rows,
+            patch.object(
+                direct_chat._PROC_INDEX,
+                "resolve_many",
+                side_effect=lambda pids: {
+                    int(p): type("Info", (), {"profile_directory": profiles.get(str(p), "")})() for p in pids
+                },
+            ),
+        ):
+            wid, desk = direct_chat._find_new_profiled_chrome_window({"0x01"}, "Profile 1", timeout_s=1.0)
+        self.assertEqual((wid, desk), ("0x03", 3))
+        self.assertEqual(mock_rows.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+import molbot_direct_chat.profile_sync as profile_sync  # noqa: E402
+import molbot_direct_chat.web_ask as web_ask  # noqa: E402
+from molbot_direct_chat.profile_sync import ProfileSync  # noqa: E402
+
+
+class TestProfileSync(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = Path(self.tmp.name) / "google-chrome"
+        self.dst = Path(self.tmp.name) / "shadow"
+        prof = self.src / "Default"
+        (prof / "Network").mkdir(parents=True)
+        (prof / "Local Storage" / "leveldb").mkdir(parents=True)
+        (prof / "Cache").mkdir()
+        (self.src / "Local State").write_text('{"os_crypt": {}}', encoding="utf-8")
+        (prof / "Network" / "Cookies").write_bytes(b"cookies-v1")
+        (prof / "Login Data").write_bytes(b"logins")
+        (prof / "Local Storage" / "leveldb" / "000003.log").write_bytes(b"ls")
+        (prof / "Local Storage" / "leveldb" / "LOCK").write_bytes(b"")
+        (prof / "Cache" / "data_0").write_bytes(b"x" * 4096)
+        (prof / "History").write_bytes(b"h")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_first_sync_copies_only_session_files(self) -> None:
+        report = ProfileSync().sync(self.src, self.dst, "Default")
+        self.assertEqual(
+            sorted(report.copied),
+            ["Default/Local Storage/leveldb/000003.log", "Default/Login Data", "Default/Network/Cookies", "Local State"],
+        )
+        self.assertEqual((self.dst / "Default" / "Network" / "Cookies").read_bytes(), b"cookies-v1")
+        self.assertFalse((self.dst / "Default" / "Cache").exists())
+        self.assertFalse((self.dst / "Default" / "History").exists())
+        self.assertFalse((self.dst / "Default" / "Local Storage" / "leveldb" / "LOCK").exists())
+        self.assertTrue(ProfileSync.manifest_path(self.dst, "Default").exists())
+
+    def test_unchanged_profile_is_skipped_without_hashing(self) -> None:
+        sync = ProfileSync()
+        sync.sync(self.src, self.dst, "Default")
+        with patch.object(profile_sync, "file_digest", side_effect=AssertionError("hashed")):
+            report = sync.sync(self.src, self.dst, "Default")
+        self.assertFalse(report.changed)
+        self.assertEqual(report.hashed, 0)
+        self.assertEqual(sync.stats()["skipped"], 1)
+
+    def test_touched_file_is_hashed_but_not_copied(self) -> None:
+        sync = ProfileSync()
+        sync.sync(self.src, self.dst, "Default")
+        cookies = self.src / "Default" / "Network" / "Cookies"
+        st = cookies.stat()
+        os.utime(cookies, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000_000))
+        with patch.object(ProfileSync, "_copy", side_effect=AssertionError("copied")):
+            report = sync.sync(self.src, self.dst, "Default")
+        self.assertEqual(report.hashed, 1)
+        self.assertFalse(report.changed)
+
+    def test_changed_and_removed_files(self) -> None:
+        sync = ProfileSync()
+        sync.sync(self.src, self.dst, "Default")
+        (self.src / "Default" / "Network" / "Cookies").write_bytes(b"cookies-v2-longer")
+        (self.src / "Default" / "Login Data").unlink()
+        report = sync.sync(self.src, self.dst, "Default")
+        self.assertEqual(report.copied, ["Default/Network/Cookies"])
+        self.assertEqual(report.removed, ["Default/Login Data"])
+        self.assertEqual((self.dst / "Default" / "Network" / "Cookies").read_bytes(), b"cookies-v2-longer")
+        self.assertFalse((self.dst / "Default" / "Login Data").exists())
+
+    def test_missing_destination_file_is_restored(self) -> None:
+        sync = ProfileSync()
+        sync.sync(self.src, self.dst, "Default")
+        (self.dst / "Default" / "Login Data").unlink()
+        report = sync.sync(self.src, self.dst, "Default")
+        self.assertEqual(report.copied, ["Default/Login Data"])
+
+    def test_reflink_refusal_falls_back_to_copy_once_per_filesystem(self) -> None:
+        sync = ProfileSync()
+        calls = []
+
+        def refuse(src, dst):
+            calls.append(src)
+            raise OSError(profile_sync.errno.EOPNOTSUPP, "no reflink")
+
+        with patch.object(profile_sync, "_reflink", side_effect=refuse):
+            report = sync.sync(self.src, self.dst, "Default")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(report.method, "copy")
+        self.assertEqual(sync.stats()["copies"], 4)
+        self.assertEqual((self.dst / "Local State").read_text(encoding="utf-8"), '{"os_crypt": {}}')
+
+
+class TestPrepareShadowProfile(unittest.TestCase):
+    def test_prepare_uses_incremental_sync(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            home = Path(td)
+            src_profile = home / ".config" / "google-chrome" / "Default"
+            src_profile.mkdir(parents=True)
+            (src_profile / "Cookies").write_bytes(b"c")
+            (src_profile / "Cache").mkdir()
+            shadow = home / "shadow"
+            with patch.object(web_ask.Path, "home", return_value=home), patch.object(
+                web_ask, "WEB_ASK_SHADOW_USER_DATA_DIR", shadow
+            ), patch.object(web_ask, "PROFILE_SYNC", ProfileSync()), patch.dict(
+                os.environ, {"WEB_ASK_PROFILE_SYNC": ""}, clear=False
+            ), patch("molbot_direct_chat.web_ask.subprocess.run") as run:
+                out, warn = web_ask._prepare_shadow_chrome_user_data("Default")
+            self.assertEqual(out, str(shadow))
+            self.assertIsNone(warn)
+            run.assert_not_called()
+            self.assertEqual((shadow / "Default" / "Cookies").read_bytes(), b"c")
+            self.assertFalse((shadow / "Default" / "Cache").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
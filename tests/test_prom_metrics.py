@@ -0,0 +1,129 @@
+import os
+import sys
+import unittest
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+from molbot_direct_chat import prom_metrics  # noqa: E402
+from molbot_direct_chat.prom_metrics import Registry  # noqa: E402
+
+
+class TestPromMetrics(unittest.TestCase):
+    def test_counter_and_gauge_exposition(self) -> None:
+        reg = Registry()
+        drops = reg.counter("dc_drops_total", "Drops.", ("reason",))
+        depth = reg.gauge("dc_queue_depth", "Depth.", ("queue",))
+        drops.inc("too_short")
+        drops.inc("too_short")
+        drops.inc('quo"te')
+        depth.set_function(lambda: 3, "stt")
+        depth.set_function(lambda: 1 / 0, "broken")
+        text = reg.render()
+        self.assertIn("# TYPE dc_drops_total counter", text)
+        self.assertIn('dc_drops_total{reason="too_short"} 2', text)
+        self.assertIn('dc_drops_total{reason="quo\\"te"} 1', text)
+        self.assertIn('dc_queue_depth{queue="stt"} 3', text)
+        self.assertNotIn("broken", text)
+        self.assertTrue(text.endswith("\n"))
+
+    def test_counter_backed_by_callback(self) -> None:
+        reg = Registry()
+        stats = {"hits": 3}
+        events = reg.counter("dc_cache_events_total", "Events.", ("event",))
+        events.set_function(lambda: stats["hits"], "hits")
+        events.set_function(lambda: stats["missing"], "misses")
+        stats["hits"] = 5
+        text = reg.render()
+        self.assertIn("# TYPE dc_cache_events_total counter", text)
+        self.assertIn('dc_cache_events_total{event="hits"} 5', text)
+        self.assertNotIn("misses", text)
+
+    def test_histogram_buckets_are_cumulative(self) -> None:
+        reg = Registry()
+        hist = reg.histogram("dc_latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+        for v in (0.05, 0.5, 0.7, 3.0):
+            hist.observe(v, "/api/chat")
+        text = reg.render()
+        self.assertIn('dc_latency_seconds_bucket{route="/api/chat",le="0.1"} 1', text)
+        self.assertIn('dc_latency_seconds_bucket{route="/api/chat",le="1"} 3', text)
+        self.assertIn('dc_latency_seconds_bucket{route="/api/chat",le="+Inf"} 4', text)
+        self.assertIn('dc_latency_seconds_count{route="/api/chat"} 4', text)
+        self.assertEqual(hist.snapshot("/api/chat")["count"], 4)
+        self.assertAlmostEqual(hist.snapshot("/api/chat")["sum"], 4.25)
+
+    def test_label_cardinality_is_capped(self) -> None:
+        reg = Registry()
+        c = reg.counter("dc_paths_total", "Paths.", ("path",))
+        for i in range(prom_metrics.MAX_SERIES_PER_FAMILY + 10):
+            c.inc(f"/p{i}")
+        self.assertEqual(c.value(prom_metrics.OVERFLOW_LABEL), 10.0)
+
+    def test_invalid_registration_is_rejected(self) -> None:
+        reg = Registry()
+        reg.counter("dc_x_total", "x")
+        with self.assertRaises(ValueError):
+            reg.counter("dc_x_total", "x")
+        with self.assertRaises(ValueError):
+            reg.counter("dc-bad", "x")
+
+
+class TestDirectChatMetricsEndpoint(unittest.TestCase):
+    def test_metrics_endpoint_reports_chat_requests(self) -> None:
+        import bench_direct_chat as bench
+
+        with bench.bench_environment() as dc:
+            before = dc._PROM_HTTP_REQUESTS.value("POST", "/api/chat", "200")
+            status, _ = bench.post_inprocess(
+                dc,
+                "/api/chat",
+                {"session_id": "prom_t", "message": bench.MODEL_MESSAGE, "model": bench.BENCH_MODEL},
+            )
+            self.assertEqual(status, 200)
+            handler = bench._new_handler(dc, "/metrics")
+            handler.do_GET()
+            raw = handler.wfile.getvalue().decode("utf-8")
+        self.assertEqual(dc._PROM_HTTP_REQUESTS.value("POST", "/api/chat", "200"), before + 1)
+        self.assertIn("Content-Type: text/plain; version=0.0.4", raw)
+        self.assertIn('direct_chat_http_request_duration_seconds_count{method="POST",route="/api/chat"}', raw)
+        self.assertIn('direct_chat_queue_depth{queue="stt"}', raw)
+        self.assertIn("# TYPE direct_chat_searxng_cache_events_total counter", raw)
+        self.assertIn('direct_chat_searxng_cache_events_total{event="hits"}', raw)
+
+    def test_unknown_api_paths_do_not_crowd_out_real_routes(self) -> None:
+        import bench_direct_chat as bench
+
+        with bench.bench_environment() as dc:
+            for i in range(100):
+                bench._new_handler(dc, f"/api/x-{i}").do_GET()
+            status, _ = bench.post_inprocess(
+                dc,
+                "/api/chat",
+                {"session_id": "prom_404_t", "message": bench.MODEL_MESSAGE, "model": bench.BENCH_MODEL},
+            )
+            self.assertEqual(status, 200)
+            handler = bench._new_handler(dc, "/api/models")
+            handler.do_GET()
+        self.assertGreaterEqual(dc._PROM_HTTP_REQUESTS.value("GET", "unmatched", "404"), 100)
+        self.assertGreaterEqual(dc._PROM_HTTP_REQUESTS.value("POST", "/api/chat", "200"), 1)
+        self.assertGreaterEqual(dc._PROM_HTTP_REQUESTS.value("GET", "/api/models", "200"), 1)
+        self.assertEqual(dc._PROM_HTTP_REQUESTS.value("GET", "/api/x-5", "404"), 0)
+        self.assertEqual(dc._PROM_HTTP_REQUESTS.value("GET", prom_metrics.OVERFLOW_LABEL, "404"), 0)
+
+    def test_route_label_list_covers_every_handled_path(self) -> None:
+        import re
+
+        import openclaw_direct_chat as dc
+
+        src = open(os.path.join(REPO_ROOT, "scripts", "openclaw_direct_chat.py"), encoding="utf-8").read()
+        handler_src = src[src.index("class Handler(") :]
+        handled = set(re.findall(r'(?:path|self\.path) (?:==|in|not in) \(?"(/[^"]*)"', handler_src))
+        handled |= set(re.findall(r'(?:path|self\.path) (?:in|not in) \([^)]*?, "(/[^"]*)"\)', handler_src))
+        self.assertIn("/api/chat/stream", handled)
+        self.assertEqual(handled - dc._HTTP_ROUTES, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+from molbot_direct_chat.prompt_budget import RollingSummary, estimate_tokens, fit_messages  # noqa: E402
+
+
+def _turns(n: int, size: int = 400) -> list[dict]:
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"Turno {i}. " + ("palabra " * (size // 8))}
+        for i in range(n)
+    ]
+
+
+_SYSTEM = {"role": "system", "content": "Sos un asistente."}
+_USER = {"role": "user", "content": "¿Y ahora qué?"}
+
+
+class TestFitMessages(unittest.TestCase):
+    def test_small_history_is_kept_whole(self) -> None:
+        history = _turns(4, size=40)
+        messages, report = fit_messages(_SYSTEM, history, _USER, context_tokens=8192)
+        self.assertEqual(messages, [_SYSTEM] + history + [_USER])
+        self.assertEqual((report["history_kept"], report["history_summarized"], report["summary_tokens"]), (4, 0, 0))
+        self.assertLessEqual(report["prompt_tokens"], report["budget_tokens"])
+
+    def test_old_turns_are_summarized_within_budget(self) -> None:
+        history = _turns(60)
+        messages, report = fit_messages(_SYSTEM, history, _USER, context_tokens=4096, reserve_tokens=1024)
+        self.assertLessEqual(report["prompt_tokens"], 3072)
+        self.assertGreater(report["history_summarized"], 0)
+        self.assertEqual(report["history_kept"] + report["history_summarized"], 60)
+        self.assertEqual(messages[0], _SYSTEM)
+        self.assertTrue(messages[1]["content"].startswith("Resumen de turnos anteriores"))
+        self.assertEqual(messages[-2], history[-1])
+        self.assertEqual(messages[-1], _USER)
+        total = sum(estimate_tokens(m["content"]) + 4 for m in messages)
+        self.assertLessEqual(total, 3072 + 16)
+
+    def test_rolling_summary_extends_cached_prefix(self) -> None:
+        summaries = RollingSummary()
+        history = _turns(30)
+        first = summaries.lines(history[:20])
+        second = summaries.lines(history[:22])
+        self.assertEqual(second[:20], first)
+        self.assertEqual(len(second), 22)
+        summaries.lines(history[:22])
+        self.assertEqual(summaries.stats, {"hits": 1, "extended": 2})
+
+    def test_drop_step_keeps_prefix_stable_across_turns(self) -> None:
+        history = _turns(200, size=400)
+        prefixes: dict[int, list] = {}
+        for turn, n in enumerate(range(100, 200, 2)):
+            user = {"role": "user", "content": "pregunta " * (5 + (turn * 37) % 300)}
+            messages, report = fit_messages(_SYSTEM, history[:n], user, context_tokens=8192, drop_step=8)
+            dropped = report["history_summarized"]
+            self.assertGreater(dropped, 0)
+            # System, summary and the first kept turn: the prefix a KV cache can reuse.
+            prefixes.setdefault(dropped, []).append(messages[:3])
+        self.assertLess(len(prefixes), 50 // 2)
+        for dropped, seen in prefixes.items():
+            self.assertTrue(all(p == seen[0] for p in seen), f"prefix changed with {dropped} dropped turns")
+
+    def test_volatile_tail_is_budgeted_before_history(self) -> None:
+        history = _turns(60)
+        tail = {"role": "system", "content": "Resultados de busqueda:\n" + "fragmento de pagina " * 150}
+        messages, report = fit_messages(_SYSTEM, history, _USER, context_tokens=4096, reserve_tokens=1024, tail=tail)
+        self.assertEqual(messages[-2], tail)
+        self.assertEqual(messages[-1], _USER)
+        self.assertGreater(report["tail_tokens"], 0)
+        self.assertFalse(report["tail_truncated"])
+        self.assertLessEqual(report["prompt_tokens"], report["budget_tokens"])
+        self.assertLessEqual(sum(estimate_tokens(m["content"]) + 4 for m in messages), report["budget_tokens"] + 16)
+        huge = {"role": "system", "content": "x " * 20000}
+        messages, report = fit_messages(_SYSTEM, history, _USER, context_tokens=4096, reserve_tokens=1024, tail=huge)
+        self.assertTrue(report["tail_truncated"])
+        self.assertTrue(messages[-2]["content"].endswith("[...recortado]"))
+        self.assertLessEqual(report["prompt_tokens"], report["budget_tokens"])
+
+    def test_oversized_user_turn_is_truncated(self) -> None:
+        user = {"role": "user", "content": "adjunto " * 5000}
+        messages, report = fit_messages(_SYSTEM, [], user, context_tokens=2048, reserve_tokens=512)
+        self.assertTrue(report["user_truncated"])
+        self.assertLessEqual(report["prompt_tokens"], report["budget_tokens"])
+        self.assertTrue(messages[-1]["content"].endswith("[...recortado]"))
+
+
+class TestDirectChatPromptBudget(unittest.TestCase):
+    def test_chat_response_reports_budget(self) -> None:
+        import bench_direct_chat as bench
+
+        with bench.bench_environment() as dc:
+            dc._model_catalog()["by_id"][bench.BENCH_MODEL]["context_tokens"] = 2048
+            status, body = bench.post_inprocess(
+                dc,
+                "/api/chat",
+                {
+                    "session_id": "budget_t",
+                    "message": bench.MODEL_MESSAGE,
+                    "model": bench.BENCH_MODEL,
+                    "history": _turns(40),
+                },
+            )
+        self.assertEqual(status, 200)
+        budget = body["prompt_budget"]
+        self.assertEqual(budget["context_tokens"], 2048)
+        self.assertLessEqual(budget["prompt_tokens"], budget["budget_tokens"])
+        self.assertGreater(budget["history_summarized"], 0)
+
+    def test_search_context_counts_against_the_budget(self) -> None:
+        import bench_direct_chat as bench
+
+        sent: list = []
+        page = "Texto extraido de la pagina con muchos detalles sobre el tema buscado. " * 40
+        results = {
+            "ok": True,
+            "query": "clima",
+            "results": [{"title": f"R{i}", "url": f"https://ej.local/{i}", "snippet": page} for i in range(3)],
+        }
+        with bench.bench_environment() as dc:
+            dc._model_catalog()["by_id"][bench.BENCH_MODEL]["context_tokens"] = 2048
+            backend = dc.Handler._call_model_backend
+            dc.Handler._call_model_backend = lambda handler, b, payload: (sent.append(payload), backend(handler, b, payload))[1]
+            try:
+                # The model path (not the local web_search intent) injects the results as context.
+                with patch.object(dc.web_search, "searxng_search", return_value=results), patch.object(
+                    dc, "_guardrail_check", return_value=(True, "GUARDRAIL_OK")
+                ), patch.object(dc, "_maybe_handle_local_action", return_value=None):
+                    status, body = bench.post_inprocess(
+                        dc,
+                        "/api/chat",
+                        {
+                            "session_id": "budget_search_t",
+                            "message": "buscá en la web el clima de hoy",
+                            "model": bench.BENCH_MODEL,
+                            "allowed_tools": ["web_search"],
+                            "history": _turns(40),
+                        },
+                    )
+            finally:
+                dc.Handler._call_model_backend = backend
+        self.assertEqual(status, 200)
+        budget = body["prompt_budget"]
+        self.assertGreater(budget["tail_tokens"], 0)
+        self.assertLessEqual(budget["prompt_tokens"], budget["budget_tokens"])
+        messages = sent[-1]["messages"]
+        self.assertIn("SearXNG", messages[-2]["content"])
+        total = sum(estimate_tokens(m["content"]) + 4 for m in messages)
+        self.assertLessEqual(total, budget["budget_tokens"] + 16)
+
+
+if __name__ == "__main__":
+    unittest.main()
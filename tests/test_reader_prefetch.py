@@ -0,0 +1,148 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+from molbot_direct_chat.reader_prefetch import ReaderPrefetcher  # noqa: E402
+
+
+class _FakeSynth:
+    def __init__(self, base: Path, delay_s: float = 0.0) -> None:
+        self.base = base
+        self.delay_s = delay_s
+        self.calls: list[str] = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, text: str) -> tuple[Path | None, str]:
+        self.gate.wait(timeout=5.0)
+        if self.delay_s:
+            time.sleep(self.delay_s)
+        self.calls.append(text)
+        out = self.base / f"piece_{len(self.calls)}.wav"
+        out.write_bytes(text.encode("utf-8"))
+        return out, "ok_fake"
+
+
+def _wait_until(pred, timeout_s: float = 3.0) -> bool:
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if pred():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def _upcoming(*items: tuple[int, str]) -> list[dict]:
+    return [{"chunk_index": idx, "chunk_id": f"chunk_{idx + 1:03d}", "text": text} for idx, text in items]
+
+
+class TestReaderPrefetcher(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = tempfile.TemporaryDirectory()
+        self.synth = _FakeSynth(Path(self._tmp.name))
+
+    def tearDown(self) -> None:
+        self.synth.gate.set()
+        self._tmp.cleanup()
+
+    def test_schedule_then_take_returns_prefetched_audio(self) -> None:
+        pf = ReaderPrefetcher(synth=self.synth)
+        queued = pf.schedule("s1", 0, _upcoming((1, "dos"), (2, "tres")))
+        self.assertEqual(queued, 2)
+        self.assertTrue(_wait_until(lambda: pf.status()["ready"] == 2))
+
+        path = pf.take("dos")
+        self.assertIsNotNone(path)
+        self.assertEqual(path.read_text(encoding="utf-8"), "dos")  # type: ignore[union-attr]
+        self.assertIsNone(pf.take("dos"))
+        self.assertEqual(pf.status()["hits"], 1)
+
+    def test_split_function_defines_pieces(self) -> None:
+        pf = ReaderPrefetcher(synth=self.synth, split=lambda text: text.split("|"))
+        pf.schedule("s1", 0, _upcoming((1, "a|b")))
+        self.assertTrue(_wait_until(lambda: pf.status()["ready"] == 2))
+        self.assertIsNotNone(pf.take("a"))
+        self.assertIsNotNone(pf.take("b"))
+
+    def test_reschedule_same_window_does_not_resynthesize(self) -> None:
+        pf = ReaderPrefetcher(synth=self.synth)
+        pf.schedule("s1", 0, _upcoming((1, "dos")))
+        self.assertTrue(_wait_until(lambda: pf.status()["ready"] == 1))
+        self.assertEqual(pf.schedule("s1", 0, _upcoming((1, "dos"))), 0)
+        self.assertEqual(len(self.synth.calls), 1)
+
+    def test_advancing_window_discards_consumed_chunks(self) -> None:
+        pf = ReaderPrefetcher(synth=self.synth)
+        pf.schedule("s1", 0, _upcoming((1, "dos"), (2, "tres")))
+        self.assertTrue(_wait_until(lambda: pf.status()["ready"] == 2))
+        stale_paths = list(Path(self._tmp.name).glob("*.wav"))
+        pf.schedule("s1", 2, _upcoming((3, "cuatro")))
+        self.assertTrue(_wait_until(lambda: pf.status()["ready"] == 2))
+        self.assertIsNone(pf.take("dos"))
+        self.assertIsNotNone(pf.take("tres"))
+        self.assertIsNotNone(pf.take("cuatro"))
+        self.assertFalse(any(p.exists() and p.read_text(encoding="utf-8") == "dos" for p in stale_paths))
+
+    def test_invalidate_deletes_ready_audio_and_drops_queue(self) -> None:
+        pf = ReaderPrefetcher(synth=self.synth)
+        pf.schedule("s1", 0, _upcoming((1, "dos")))
+        self.assertTrue(_wait_until(lambda: pf.status()["ready"] == 1))
+        ready_files = list(Path(self._tmp.name).glob("*.wav"))
+        self.assertEqual(len(ready_files), 1)
+
+        pf.invalidate("s1", reason="barge_in")
+        self.assertFalse(ready_files[0].exists())
+        self.assertIsNone(pf.take("dos"))
+        self.assertEqual(pf.status()["last_invalidate"]["reason"], "barge_in")
+
+    def test_invalidate_discards_inflight_result(self) -> None:
+        self.synth.gate.clear()
+        pf = ReaderPrefetcher(synth=self.synth)
+        pf.schedule("s1", 0, _upcoming((1, "dos"), (2, "tres")))
+        self.assertTrue(_wait_until(lambda: pf.status()["inflight"] == 1))
+        pf.invalidate("s1", reason="rewind")
+        self.synth.gate.set()
+        self.assertTrue(_wait_until(lambda: pf.status()["inflight"] == 0))
+        self.assertEqual(pf.status()["ready"], 0)
+        self.assertEqual(self.synth.calls, ["dos"])
+        self.assertEqual(list(Path(self._tmp.name).glob("*.wav")), [])
+
+    def test_invalidate_is_per_session(self) -> None:
+        pf = ReaderPrefetcher(synth=self.synth)
+        pf.schedule("s1", 0, _upcoming((1, "uno s1")))
+        pf.schedule("s2", 0, _upcoming((1, "uno s2")))
+        self.assertTrue(_wait_until(lambda: pf.status()["ready"] == 2))
+        pf.invalidate("s1")
+        self.assertIsNone(pf.take("uno s1"))
+        self.assertIsNotNone(pf.take("uno s2"))
+
+    def test_take_waits_for_inflight_piece(self) -> None:
+        self.synth.delay_s = 0.2
+        pf = ReaderPrefetcher(synth=self.synth)
+        pf.schedule("s1", 0, _upcoming((1, "dos")))
+        self.assertTrue(_wait_until(lambda: pf.status()["inflight"] == 1))
+        self.assertIsNotNone(pf.take("dos", wait_s=2.0))
+
+    def test_take_of_queued_piece_drops_duplicate_job(self) -> None:
+        self.synth.gate.clear()
+        pf = ReaderPrefetcher(synth=self.synth)
+        pf.schedule("s1", 0, _upcoming((1, "dos"), (2, "tres")))
+        self.assertTrue(_wait_until(lambda: pf.status()["inflight"] == 1))
+        self.assertIsNone(pf.take("tres"))
+        self.assertEqual(pf.status()["queued"], 0)
+        self.synth.gate.set()
+        self.assertTrue(_wait_until(lambda: pf.status()["inflight"] == 0))
+        self.assertEqual(self.synth.calls, ["dos"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+from molbot_direct_chat.tracing import Tracer  # noqa: E402
+
+
+class TestTracer(unittest.TestCase):
+    def test_spans_nest_under_active_trace(self) -> None:
+        tracer = Tracer(capacity=5)
+
+        @tracer.wrap("inner")
+        def _inner() -> int:
+            return 7
+
+        with tracer.trace("POST /api/chat", path="/api/chat") as root:
+            with tracer.span("outer") as outer:
+                self.assertEqual(_inner(), 7)
+            tracer.annotate(status=200)
+
+        spans = {sp["name"]: sp for sp in root["spans"]}
+        self.assertEqual(set(spans), {"outer", "inner"})
+        self.assertEqual(spans["outer"]["parent_id"], root["span_id"])
+        self.assertEqual(spans["inner"]["parent_id"], outer["span_id"])
+        self.assertEqual(root["attrs"], {"path": "/api/chat", "status": 200})
+        self.assertIsNone(tracer.current())
+
+    def test_span_and_wrap_are_noops_without_trace(self) -> None:
+        tracer = Tracer()
+        wrapped = tracer.wrap("x")(lambda: "ok")
+        with tracer.span("orphan") as sp:
+            self.assertIsNone(sp)
+        self.assertEqual(wrapped(), "ok")
+        self.assertEqual(tracer.recent()["count"], 0)
+
+    def test_disabled_tracer_records_nothing(self) -> None:
+        tracer = Tracer(enabled=False)
+        with tracer.trace("req") as root:
+            self.assertIsNone(root)
+        self.assertEqual(tracer.recent()["count"], 0)
+
+    def test_ring_buffer_keeps_last_n_and_histograms(self) -> None:
+        tracer = Tracer(capacity=3)
+        for i in range(5):
+            with tracer.trace("req", i=i):
+                with tracer.span("stage"):
+                    pass
+        out = tracer.recent(limit=2)
+        self.assertEqual(out["capacity"], 3)
+        self.assertEqual(out["count"], 3)
+        self.assertEqual([t["attrs"]["i"] for t in out["traces"]], [4, 3])
+        self.assertEqual(out["stages"]["stage"]["count"], 3)
+        self.assertEqual(out["stages"]["total"]["count"], 3)
+        self.assertEqual(sum(b["count"] for b in out["stages"]["stage"]["buckets_ms"]), 3)
+        self.assertEqual(out["stages"]["stage"]["buckets_ms"][-1]["le"], "+Inf")
+
+    def test_add_span_from_other_thread_after_finish(self) -> None:
+        tracer = Tracer()
+        with tracer.trace("req") as root:
+            started = time.time_ns()
+        worker = threading.Thread(target=lambda: tracer.add_span(root, "tts_playback_start", started, stream_id=3))
+        worker.start()
+        worker.join()
+        spans = tracer.recent()["traces"][0]["spans"]
+        self.assertEqual([sp["name"] for sp in spans], ["tts_playback_start"])
+        self.assertEqual(spans[0]["attrs"], {"stream_id": 3})
+
+    def test_otlp_export_appends_json_lines(self) -> None:
+        with tempfile.TemporaryDirectory() as td:
+            path = Path(td) / "traces" / "otlp.jsonl"
+            tracer = Tracer(otlp_path=path)
+            with tracer.trace("req") as root:
+                with tracer.span("stage", backend="local"):
+                    pass
+            tracer.add_span(root, "late", time.time_ns())
+            lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        self.assertEqual(len(lines), 2)
+        first = lines[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        self.assertEqual([s["name"] for s in first], ["req", "stage"])
+        self.assertEqual(first[0]["traceId"], root["trace_id"])
+        self.assertEqual(first[1]["parentSpanId"], root["span_id"])
+        self.assertEqual(first[1]["attributes"], [{"key": "backend", "value": {"stringValue": "local"}}])
+        late = lines[1]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        self.assertEqual([s["name"] for s in late], ["late"])
+
+
+class TestDirectChatTracing(unittest.TestCase):
+    def test_chat_request_records_stage_spans(self) -> None:
+        import bench_direct_chat as bench
+
+        with bench.bench_environment() as dc:
+            dc._TRACER.clear()
+            status, _ = bench.post_inprocess(
+                dc,
+                "/api/chat",
+                {"session_id": "trace_t", "message": bench.MODEL_MESSAGE, "model": bench.BENCH_MODEL},
+            )
+            self.assertEqual(status, 200)
+            out = dc._TRACER.recent(limit=1, name="POST /api/chat")
+        trace = out["traces"][0]
+        self.assertEqual(trace["attrs"].get("status"), 200)
+        names = {sp["name"] for sp in trace["spans"]}
+        for stage in ("local_action_route", "build_messages", "save_history", "chat_events_append"):
+            self.assertIn(stage, names)
+
+
+if __name__ == "__main__":
+    unittest.main()
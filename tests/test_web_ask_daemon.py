@@ -0,0 +1,163 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+import molbot_direct_chat.web_ask as web_ask  # noqa: E402
+from molbot_direct_chat.web_ask_daemon import WebAskDaemon  # noqa: E402
+
+
+class _FakeDaemon:
+    """JSON-lines Unix socket server answering like web_ask_daemon.js."""
+
+    def __init__(self, path: str, delay_s: float = 0.0) -> None:
+        self.path = path
+        self.delay_s = delay_s
+        self.requests: list[dict] = []
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen(8)
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with conn:
+                req = json.loads(conn.makefile("r", encoding="utf-8").readline())
+                self.requests.append(req)
+                if req.get("op") == "ask":
+                    time.sleep(self.delay_s)
+                    out = {"ok": True, "status": "ok", "text": f"re:{req.get('prompt')}", "meta": {"daemon": True}}
+                elif req.get("op") == "status":
+                    out = {"ok": True, "pid": 4242, "contexts": [{"user_data_dir": "/shadow", "profile_dir": "Default"}]}
+                else:
+                    out = {"ok": True, "pid": 4242}
+                try:
+                    conn.sendall((json.dumps(out) + "\n").encode("utf-8"))
+                except OSError:
+                    pass
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+class TestWebAskDaemonClient(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sock_path = os.path.join(self.tmp.name, "d.sock")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_unreachable_daemon_returns_none(self) -> None:
+        client = WebAskDaemon(socket_path=self.sock_path)
+        self.assertIsNone(client.ping())
+        self.assertIsNone(client.ask("chatgpt", "hola", "Default", "/shadow", 5000, ""))
+        self.assertEqual(client.status()["unavailable"], 1)
+        self.assertFalse(client.status()["running"])
+
+    def test_ask_ping_and_context_status(self) -> None:
+        fake = _FakeDaemon(self.sock_path)
+        try:
+            client = WebAskDaemon(socket_path=self.sock_path)
+            self.assertEqual(client.ensure_running("node"), 4242)
+            out = client.ask("gemini", "hola", "Default", "/shadow", 5000, "/t.txt", followups=["y?"])
+            self.assertEqual(out["text"], "re:hola")
+            ask_req = [r for r in fake.requests if r.get("op") == "ask"][0]
+            self.assertEqual(ask_req["followups"], ["y?"])
+            self.assertEqual(ask_req["user_data_dir"], "/shadow")
+            self.assertTrue(client.context_open("/shadow", "Default"))
+            self.assertFalse(client.context_open("/shadow", "Profile 1"))
+            self.assertEqual(client.status()["spawned"], 0)
+        finally:
+            fake.close()
+
+    def test_reply_timeout_is_reported_not_unreachable(self) -> None:
+        fake = _FakeDaemon(self.sock_path, delay_s=1.0)
+        try:
+            client = WebAskDaemon(socket_path=self.sock_path)
+            out = client.request({"op": "ask", "site": "chatgpt", "prompt": "x"}, timeout_s=0.2)
+            self.assertEqual(out["status"], "timeout")
+            self.assertEqual(out["evidence"], "daemon_reply_timeout")
+        finally:
+            fake.close()
+
+    def test_failed_spawn_backs_off(self) -> None:
+        script = Path(self.tmp.name) / "daemon.js"
+        script.write_text("", encoding="utf-8")
+        client = WebAskDaemon(socket_path=self.sock_path, script_path=script, start_timeout_s=0.3)
+        with patch("molbot_direct_chat.web_ask_daemon.DAEMON_LOG_PATH", Path(self.tmp.name) / "d.out"):
+            self.assertIsNone(client.ensure_running("/bin/false"))
+            t0 = time.monotonic()
+            self.assertIsNone(client.ensure_running("/bin/false"))
+            self.assertLess(time.monotonic() - t0, 0.2)
+        self.assertEqual(client.status()["spawned"], 1)
+
+
+class TestRunWebAskDaemonPath(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patches = [
+            patch.object(web_ask, "WEB_ASK_THREAD_DIR", Path(self.tmp.name) / "threads"),
+            patch.object(web_ask, "WEB_ASK_LOCK_PATH", Path(self.tmp.name) / ".lock"),
+            patch.object(web_ask, "WEB_ASK_SHADOW_USER_DATA_DIR", Path("/shadow")),
+            patch.object(web_ask, "_resolve_site_browser_config", return_value=("chrome", "Default")),
+            patch.object(web_ask, "_log_web_ask"),
+            patch("molbot_direct_chat.web_ask.shutil.which", return_value="/usr/bin/node"),
+            patch.dict(os.environ, {"WEB_ASK_DAEMON": "1"}, clear=False),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self) -> None:
+        for p in reversed(self.patches):
+            p.stop()
+        self.tmp.cleanup()
+
+    def test_warm_daemon_skips_profile_sync_and_oneshot_runner(self) -> None:
+        daemon = web_ask.WEB_ASK_DAEMON
+        with patch.object(daemon, "ensure_running", return_value=4242), patch.object(
+            daemon, "context_open", return_value=True
+        ), patch.object(daemon, "ask", return_value={"ok": True, "status": "ok", "text": "hola"}) as ask, patch.object(
+            web_ask, "_prepare_shadow_chrome_user_data"
+        ) as prep, patch("molbot_direct_chat.web_ask.subprocess.run") as run:
+            out = web_ask.run_web_ask("chatgpt", "pregunta", timeout_ms=5000)
+        self.assertTrue(out["ok"])
+        self.assertEqual(out["runner"], "daemon")
+        self.assertEqual(ask.call_args.kwargs["user_data_dir"], "/shadow")
+        prep.assert_not_called()
+        run.assert_not_called()
+
+    def test_unreachable_daemon_falls_back_to_oneshot_runner(self) -> None:
+        daemon = web_ask.WEB_ASK_DAEMON
+        done = subprocess.CompletedProcess(args=[], returncode=0, stdout=json.dumps({"ok": True, "status": "ok", "text": "x"}), stderr="")
+        with patch.object(daemon, "ensure_running", return_value=4242), patch.object(
+            daemon, "context_open", return_value=False
+        ), patch.object(daemon, "ask", return_value=None), patch.object(
+            web_ask, "_prepare_shadow_chrome_user_data", return_value=("/shadow", None)
+        ) as prep, patch("molbot_direct_chat.web_ask.subprocess.run", return_value=done) as run:
+            out = web_ask.run_web_ask("chatgpt", "pregunta", timeout_ms=5000)
+        self.assertTrue(out["ok"])
+        self.assertEqual(out["runner"], "oneshot")
+        prep.assert_called_once_with("Default")
+        run.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
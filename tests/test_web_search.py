@@ -1,6 +1,9 @@
 import os
 import sys
+import threading
+import time
 import unittest
+from unittest.mock import patch
 
 
 REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
@@ -8,6 +11,7 @@ sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
 
 
 from molbot_direct_chat import web_search  # noqa: E402
+from molbot_direct_chat.search_cache import SwrCache  # noqa: E402
 
 
 class TestWebSearchExtraction(unittest.TestCase):
@@ -56,5 +60,154 @@ class TestWebSearchExtraction(unittest.TestCase):
         self.assertEqual(q, "resumen geopolitico de hoy")
 
 
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestSwrCache(unittest.TestCase):
+    def test_fresh_stale_and_expired(self) -> None:
+        clock = _Clock()
+        cache = SwrCache(ttl_s=10.0, stale_s=20.0, clock=clock)
+        values = iter(["v1", "v2", "v3"])
+        refreshed = threading.Event()
+
+        def fetch() -> str:
+            v = next(values)
+            if v == "v2":
+                refreshed.set()
+            return v
+
+        self.assertEqual(cache.get("k", fetch), "v1")
+        self.assertEqual(cache.get("k", fetch), "v1")
+        clock.now = 15.0
+        self.assertEqual(cache.get("k", fetch), "v1")  # stale, refresh in background
+        self.assertTrue(refreshed.wait(2.0))
+        for _ in range(100):
+            if cache.stats()["in_flight"] == 0:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(cache.get("k", fetch), "v2")
+        clock.now = 100.0
+        self.assertEqual(cache.get("k", fetch), "v3")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["stale_hits"], stats["misses"], stats["refreshes"]), (2, 1, 2, 1))
+
+    def test_concurrent_misses_share_one_fetch(self) -> None:
+        cache = SwrCache()
+        gate = threading.Event()
+        calls: list[int] = []
+
+        def fetch() -> dict:
+            calls.append(1)
+            gate.wait(2.0)
+            return {"ok": True}
+
+        out: list[dict] = []
+        threads = [threading.Thread(target=lambda: out.append(cache.get("k", fetch))) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for _ in range(100):
+            if cache.stats()["coalesced"] == 4:
+                break
+            threading.Event().wait(0.01)
+        gate.set()
+        for t in threads:
+            t.join(2.0)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(out, [{"ok": True}] * 5)
+
+    def test_errors_are_not_cached_and_size_is_bounded(self) -> None:
+        cache = SwrCache(max_entries=2)
+        self.assertEqual(cache.get("bad", lambda: {"ok": False}, cacheable=lambda v: v["ok"]), {"ok": False})
+        for key in ("a", "b", "c"):
+            cache.get(key, lambda: {"ok": True})
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["evictions"], stats["misses"]), (2, 1, 4))
+
+
+class TestSearxngSearchCache(unittest.TestCase):
+    def setUp(self) -> None:
+        web_search.SEARCH_CACHE.clear()
+
+    def test_near_identical_queries_hit_cache(self) -> None:
+        results = [{"url": f"https://example.com/{i}", "title": "", "content": "", "engine": ""} for i in range(20)]
+        with patch.object(
+            web_search, "_searxng_fetch", return_value={"ok": True, "status": "ok", "query": "x", "results": results}
+        ) as fetch:
+            first = web_search.searxng_search("Noticias de Irán", max_results=6)
+            second = web_search.searxng_search("  noticias de iran?", max_results=12)
+            web_search.searxng_search("noticias de iran", site_key="youtube")
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(len(first["results"]), 6)
+        self.assertEqual(len(second["results"]), 12)
+        self.assertEqual(second["query"], "noticias de iran?")
+
+    def test_network_errors_are_retried(self) -> None:
+        with patch.object(web_search, "_searxng_fetch", return_value={"ok": False, "status": "network_error", "results": []}) as fetch:
+            web_search.searxng_search("x")
+            web_search.searxng_search("x")
+        self.assertEqual(fetch.call_count, 2)
+
+
+def _r(url: str, content: str = "") -> dict:
+    return {"url": url, "title": url, "content": content, "engine": "e"}
+
+
+class TestMultiSearch(unittest.TestCase):
+    def test_canonical_url(self) -> None:
+        self.assertEqual(
+            web_search.canonical_url("https://www.Example.com/a/?utm_source=x&b=2&a=1#frag"),
+            web_search.canonical_url("http://example.com/a?a=1&b=2"),
+        )
+        self.assertNotEqual(web_search.canonical_url("https://example.com/a"), web_search.canonical_url("https://example.com/b"))
+
+    def test_query_variants(self) -> None:
+        variants = web_search.query_variants("¿Qué es la fotosíntesis de las plantas?")
+        self.assertEqual(variants[0], ("¿Qué es la fotosíntesis de las plantas?", None))
+        self.assertEqual(variants[1], ("fotosíntesis plantas", None))
+        self.assertEqual(variants[2], ("fotosíntesis plantas", "wikipedia"))
+
+    def test_rrf_merge_dedups_and_rewards_agreement(self) -> None:
+        merged = web_search.rrf_merge(
+            [
+                [_r("https://a.com/x"), _r("https://b.com/y", "short")],
+                [_r("https://www.b.com/y/", "a longer snippet"), _r("https://c.com/z")],
+            ]
+        )
+        self.assertEqual([m["url"] for m in merged], ["https://b.com/y", "https://a.com/x", "https://c.com/z"])
+        self.assertEqual(merged[0]["content"], "a longer snippet")
+
+    def test_fanout_merges_within_budget(self) -> None:
+        def fake_search(q: str, *, site_key=None, max_results=6, timeout_s=12) -> dict:
+            if site_key == "wikipedia":
+                time.sleep(1.0)
+                return {"ok": True, "results": [_r("https://es.wikipedia.org/wiki/X")]}
+            if q == "broken":
+                return {"ok": False, "error": "network_error", "results": []}
+            return {"ok": True, "results": [_r(f"https://{q}.com/1"), _r("https://shared.com/")]}
+
+        with patch.object(web_search, "searxng_search", side_effect=fake_search):
+            t0 = time.monotonic()
+            out = web_search.searxng_multi_search(
+                "q", variants=[("alpha", None), ("beta", None), ("broken", None), ("slow", "wikipedia")], budget_s=0.3
+            )
+            elapsed = time.monotonic() - t0
+        self.assertTrue(out["ok"])
+        self.assertLess(elapsed, 0.9)
+        self.assertEqual(out["results"][0]["url"], "https://shared.com/")
+        self.assertEqual({r["url"] for r in out["results"]}, {"https://shared.com/", "https://alpha.com/1", "https://beta.com/1"})
+        self.assertEqual([v["done"] for v in out["variants"]], [True, True, True, False])
+
+    def test_fanout_all_failed(self) -> None:
+        with patch.object(web_search, "searxng_search", return_value={"ok": False, "error": "down", "results": []}):
+            out = web_search.searxng_multi_search("q", variants=[("a", None), ("b", None)])
+        self.assertFalse(out["ok"])
+        self.assertEqual(out["status"], "all_variants_failed")
+
+
 if __name__ == "__main__":
     unittest.main()
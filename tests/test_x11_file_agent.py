@@ -0,0 +1,204 @@
+import importlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+def _load_agent(ipc: Path, **env: str):
+    with patch.dict(os.environ, {"X11_FILE_IPC_DIR": str(ipc), **env}):
+        import x11_file_agent
+
+        return importlib.reload(x11_file_agent)
+
+
+class TestX11FileAgentInbox(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.agent = _load_agent(Path(self.tmp.name))
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def _watcher(self):
+        try:
+            return self.agent.InboxWatcher(self.agent.INBOX)
+        except OSError as exc:
+            self.skipTest(f"inotify unavailable: {exc}")
+
+    def test_watcher_reports_closed_and_renamed_files_only(self) -> None:
+        watcher = self._watcher()
+        try:
+            self.assertEqual(watcher.read(0), [])
+            (self.agent.INBOX / "a.json").write_text("{}", encoding="utf-8")
+            tmp = self.agent.INBOX / "b.json.tmp"
+            tmp.write_text("{}", encoding="utf-8")
+            tmp.rename(self.agent.INBOX / "b.json")
+            names = watcher.read(1.0)
+            self.assertIn("a.json", names)
+            self.assertIn("b.json", names)
+        finally:
+            watcher.close()
+
+    def test_watch_loop_scans_backlog_then_yields_new_requests(self) -> None:
+        old = self.agent.INBOX / "old.json"
+        old.write_text("{}", encoding="utf-8")
+        (self.agent.INBOX / ".hidden").write_text("{}", encoding="utf-8")
+        watcher = self._watcher()
+        try:
+            reqs = self.agent.watch_requests(watcher, rescan_s=30)
+            self.assertEqual(next(reqs), old)
+            old.unlink()
+            new = self.agent.INBOX / "new.json"
+            writer = threading.Timer(0.05, new.write_text, args=("{}",))
+            writer.start()
+            t0 = time.monotonic()
+            self.assertEqual(next(reqs), new)
+            self.assertLess(time.monotonic() - t0, 5)
+            writer.join()
+        finally:
+            watcher.close()
+
+    def test_poll_mode_and_missing_inotify_fall_back_to_polling(self) -> None:
+        agent = _load_agent(Path(self.tmp.name), X11_FILE_AGENT_WATCH="poll")
+        self.assertIsNone(agent.open_watcher())
+        agent = _load_agent(Path(self.tmp.name))
+        with patch.object(agent, "InboxWatcher", side_effect=OSError("no inotify")):
+            self.assertIsNone(agent.open_watcher())
+        req = agent.INBOX / "p.json"
+        req.write_text("{}", encoding="utf-8")
+        self.assertEqual(next(agent.iter_requests()), req)
+
+    def test_handled_request_writes_outbox_and_leaves_inbox(self) -> None:
+        req = self.agent.INBOX / "r.json"
+        req.write_text(json.dumps({"correlation_id": "c1", "kind": "NOOP"}), encoding="utf-8")
+        self.agent.handle_request(req)
+        out = json.loads((self.agent.OUTBOX / "c1.json").read_text(encoding="utf-8"))
+        self.assertTrue(out["ok"])
+        self.assertFalse(req.exists())
+        self.assertFalse(self.agent.is_request(req))
+
+
+class TestX11FileAgentDispatcher(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.agent = _load_agent(Path(self.tmp.name))
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def _request(self, cid: str, kind: str, command: str = "", key: str = "") -> Path:
+        meta = {"command": command} if command else {}
+        if key:
+            meta["ordering_key"] = key
+        path = self.agent.INBOX / f"{cid}.json"
+        path.write_text(json.dumps({"correlation_id": cid, "kind": kind, "meta": meta}), encoding="utf-8")
+        return path
+
+    def _outbox(self, cid: str) -> dict:
+        return json.loads((self.agent.OUTBOX / f"{cid}.json").read_text(encoding="utf-8"))
+
+    def test_slow_exec_does_not_block_noop_and_envelope_reports_timing(self) -> None:
+        dispatcher = self.agent.Dispatcher()
+        try:
+            dispatcher.submit(self._request("slow0001", "EXEC", "sleep 1"))
+            dispatcher.submit(self._request("fast0001", "NOOP"))
+            deadline = time.monotonic() + 0.8
+            while not (self.agent.OUTBOX / "fast0001.json").exists() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue((self.agent.OUTBOX / "fast0001.json").exists())
+            self.assertFalse((self.agent.OUTBOX / "slow0001.json").exists())
+        finally:
+            dispatcher.shutdown(wait=True)
+        slow = self._outbox("slow0001")
+        self.assertTrue(slow["ok"])
+        self.assertGreaterEqual(slow["timing"]["exec_ms"], 900)
+        self.assertGreaterEqual(self._outbox("fast0001")["timing"]["queue_wait_ms"], 0)
+        self.assertEqual(sorted(p.name for p in self.agent.INBOX.iterdir()), [])
+
+    def test_ordering_key_serializes_only_matching_requests(self) -> None:
+        events: list = []
+        lock = threading.Lock()
+
+        def handler(path, parsed, enqueued):
+            with lock:
+                events.append(("start", parsed[0]))
+            time.sleep(0.1)
+            with lock:
+                events.append(("end", parsed[0]))
+
+        dispatcher = self.agent.Dispatcher(workers={"EXEC": 4, "NOOP": 1}, handler=handler)
+        try:
+            for i in range(3):
+                dispatcher.submit(self._request(f"keyed{i:03d}", "EXEC", "true", key="sess-1"))
+            dispatcher.submit(self._request("free0001", "EXEC", "true"))
+            self.assertFalse(dispatcher.submit(self.agent.INBOX / "keyed002.json"))
+        finally:
+            dispatcher.shutdown(wait=True)
+        keyed = [e for e in events if e[1].startswith("keyed")]
+        self.assertEqual(
+            keyed,
+            [(edge, f"keyed{i:03d}") for i in range(3) for edge in ("start", "end")],
+        )
+        self.assertLess(events.index(("start", "free0001")), events.index(("end", "keyed000")))
+
+    def test_poll_loop_sleeps_while_requests_are_in_flight(self) -> None:
+        done = threading.Event()
+        dispatcher = self.agent.Dispatcher(workers={"EXEC": 2, "NOOP": 1}, handler=lambda *_: done.wait(5))
+        scans = []
+        real_scan = self.agent.scan_inbox
+
+        def counting_scan():
+            scans.append(time.monotonic())
+            return real_scan()
+
+        def consume():
+            for req in self.agent.poll_requests(skip=dispatcher.in_flight):
+                dispatcher.submit(req)
+                if done.is_set():
+                    return
+
+        self._request("slow0002", "EXEC", "true")
+        with patch.object(self.agent, "scan_inbox", side_effect=counting_scan):
+            loop = threading.Thread(target=consume, daemon=True)
+            loop.start()
+            time.sleep(0.5)
+            count = len(scans)
+            done.set()
+            self._request("last0001", "NOOP")
+            loop.join(2)
+        dispatcher.shutdown(wait=True)
+        self.assertFalse(loop.is_alive())
+        self.assertLessEqual(count, 10)
+
+    def test_max_inflight_blocks_intake(self) -> None:
+        release = threading.Event()
+        dispatcher = self.agent.Dispatcher(
+            workers={"EXEC": 4, "NOOP": 1}, max_inflight=2, handler=lambda *_: release.wait(5)
+        )
+        try:
+            dispatcher.submit(self._request("block001", "EXEC", "true"))
+            dispatcher.submit(self._request("block002", "EXEC", "true"))
+            third = threading.Thread(target=dispatcher.submit, args=(self._request("block003", "EXEC", "true"),))
+            third.start()
+            third.join(0.2)
+            self.assertTrue(third.is_alive())
+            release.set()
+            third.join(5)
+            self.assertFalse(third.is_alive())
+        finally:
+            release.set()
+            dispatcher.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
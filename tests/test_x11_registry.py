@@ -0,0 +1,185 @@
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+from molbot_direct_chat import x11_registry  # noqa: E402
+from molbot_direct_chat.x11_registry import STICKY_DESKTOP, WindowRegistry  # noqa: E402
+
+
+class _FakeBackend:
+    def __init__(self) -> None:
+        self.clients = [0x100, 0x200]
+        self.titles = {0x100: "Molbot Direct Chat", 0x200: "YouTube - Google Chrome"}
+        self.desktops = {0x100: 0, 0x200: 1}
+        self.pids = {0x100: 11, 0x200: 22}
+        self.geometries = {0x100: (0, 0, 800, 600), 0x200: (10, 20, 1280, 720)}
+        self.active = 0x200
+        self.current = 1
+        self.desktop_total = 4
+        self.events: queue.Queue = queue.Queue()
+        self.geometry_calls = 0
+        self.watched: list[int] = []
+
+    def client_list(self):
+        return list(self.clients)
+
+    def active_window(self):
+        return self.active
+
+    def current_desktop(self):
+        return self.current
+
+    def desktop_count(self):
+        return self.desktop_total
+
+    def title(self, wid):
+        return self.titles.get(wid, "")
+
+    def desktop(self, wid):
+        return self.desktops.get(wid)
+
+    def pid(self, wid):
+        return self.pids.get(wid)
+
+    def geometry(self, wid):
+        self.geometry_calls += 1
+        return self.geometries.get(wid)
+
+    def watch(self, wid):
+        self.watched.append(wid)
+
+    def next_event(self):
+        return self.events.get(timeout=5)
+
+    def close(self):
+        return None
+
+
+class TestWindowRegistry(unittest.TestCase):
+    def setUp(self) -> None:
+        self.backend = _FakeBackend()
+        self.reg = WindowRegistry(backend_factory=lambda: self.backend)
+        # State changes are applied directly; the listener thread is covered by
+        # the live-event test below.
+        with patch("threading.Thread.start"):
+            self.assertTrue(self.reg.start())
+
+    def test_initial_snapshot_matches_wmctrl_shape(self) -> None:
+        wins = self.reg.windows()
+        self.assertEqual([w.win_id for w in wins], ["0x00000100", "0x00000200"])
+        self.assertEqual(wins[1].title, "YouTube - Google Chrome")
+        self.assertEqual(wins[1].desktop, 1)
+        self.assertEqual(wins[1].pid, 22)
+        self.assertEqual(self.reg.active_window(), "0x00000200")
+        self.assertEqual(self.reg.current_desktop(), 1)
+        self.assertEqual(self.reg.desktop_ids(), {0, 1, 2, 3})
+        self.assertEqual(self.backend.watched, [0x100, 0x200])
+
+    def test_property_events_update_single_window(self) -> None:
+        self.backend.titles[0x200] = "Otro video - YouTube - Google Chrome"
+        self.reg.apply_event(("window", 0x200, "_NET_WM_NAME"))
+        self.backend.desktops[0x200] = STICKY_DESKTOP
+        self.reg.apply_event(("window", 0x200, "_NET_WM_DESKTOP"))
+        info = self.reg.window("0x200")
+        self.assertEqual(info.title, "Otro video - YouTube - Google Chrome")
+        self.assertEqual(info.desktop, -1)
+
+    def test_client_list_and_root_events(self) -> None:
+        self.backend.clients = [0x200, 0x300]
+        self.backend.titles[0x300] = "Gemini - Google Chrome"
+        self.backend.desktops[0x300] = 1
+        self.reg.apply_event(("root", "_NET_CLIENT_LIST"))
+        self.backend.active = 0x300
+        self.reg.apply_event(("root", "_NET_ACTIVE_WINDOW"))
+        self.backend.current = 2
+        self.reg.apply_event(("root", "_NET_CURRENT_DESKTOP"))
+        self.assertEqual([w.win_id for w in self.reg.windows()], ["0x00000200", "0x00000300"])
+        self.assertIsNone(self.reg.window("0x100"))
+        self.assertEqual(self.reg.active_window(), "0x00000300")
+        self.assertEqual(self.reg.current_desktop(), 2)
+        self.reg.apply_event(("destroy", 0x300))
+        self.assertEqual([w.win_id for w in self.reg.windows()], ["0x00000200"])
+
+    def test_geometry_is_cached_until_configure_event(self) -> None:
+        self.assertEqual(self.reg.geometry("0x00000200"), (10, 20, 1280, 720))
+        self.assertEqual(self.reg.geometry("0x00000200"), (10, 20, 1280, 720))
+        self.assertEqual(self.backend.geometry_calls, 1)
+        self.backend.geometries[0x200] = (50, 60, 640, 480)
+        self.reg.apply_event(("configure", 0x200))
+        self.assertEqual(self.reg.geometry("0x00000200"), (50, 60, 640, 480))
+        self.assertEqual(self.backend.geometry_calls, 2)
+
+    def test_failed_backend_reports_not_ready(self) -> None:
+        def _boom():
+            raise x11_registry.DependencyError("python_xlib_unavailable:test")
+
+        reg = WindowRegistry(backend_factory=_boom)
+        self.assertFalse(reg.start())
+        self.assertFalse(reg.ready)
+        self.assertIn("python_xlib_unavailable", reg.status()["error"])
+
+
+class TestWindowRegistryListener(unittest.TestCase):
+    def test_listener_thread_applies_events(self) -> None:
+        backend = _FakeBackend()
+        reg = WindowRegistry(backend_factory=lambda: backend)
+        self.assertTrue(reg.start())
+        backend.titles[0x100] = "renamed"
+        backend.events.put(("window", 0x100, "WM_NAME"))
+        deadline = time.time() + 2.0
+        while time.time() < deadline and reg.window(0x100).title != "renamed":
+            time.sleep(0.01)
+        self.assertEqual(reg.window(0x100).title, "renamed")
+
+        def _dead():
+            raise OSError("display closed")
+
+        backend.next_event = _dead
+        backend.events.put(("root", "_NET_ACTIVE_WINDOW"))
+        deadline = time.time() + 6.0
+        while time.time() < deadline and reg.ready:
+            time.sleep(0.01)
+        self.assertFalse(reg.ready)
+
+
+@unittest.skipUnless(shutil.which("Xvfb"), "Xvfb not installed")
+class TestWindowRegistryXvfb(unittest.TestCase):
+    def test_registry_tracks_real_root_properties(self) -> None:
+        try:
+            x11_registry._lazy_import_xlib()
+        except x11_registry.DependencyError as e:
+            self.skipTest(str(e))
+        from Xlib import Xatom, display
+
+        proc = subprocess.Popen(["Xvfb", ":97", "-screen", "0", "640x480x24"], stderr=subprocess.DEVNULL)
+        try:
+            time.sleep(0.5)
+            reg = WindowRegistry(backend_factory=lambda: x11_registry.XlibBackend(":97"))
+            self.assertTrue(reg.start())
+            d = display.Display(":97")
+            root = d.screen().root
+            root.change_property(d.intern_atom("_NET_CURRENT_DESKTOP"), Xatom.CARDINAL, 32, [3])
+            d.flush()
+            deadline = time.time() + 3.0
+            while time.time() < deadline and reg.current_desktop() != 3:
+                time.sleep(0.02)
+            self.assertEqual(reg.current_desktop(), 3)
+            reg.stop()
+            d.close()
+        finally:
+            proc.terminate()
+            proc.wait(timeout=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "scripts"))
+
+
+from molbot_direct_chat.youtube_resolver import YouTubeResolver, run_cancellable  # noqa: E402
+import openclaw_direct_chat as direct_chat  # noqa: E402
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestYouTubeResolver(unittest.TestCase):
+    def test_first_accepted_result_wins_and_cancels_the_rest(self) -> None:
+        resolver = YouTubeResolver()
+        slow_cancelled = threading.Event()
+
+        def slow(cancel: threading.Event) -> str | None:
+            cancel.wait(5.0)
+            if cancel.is_set():
+                slow_cancelled.set()
+            return "https://www.youtube.com/watch?v=slow"
+
+        t0 = time.monotonic()
+        url, source = resolver.race(
+            [
+                ("slow", slow),
+                ("bad", lambda cancel: "https://www.youtube.com/results?search_query=x"),
+                ("fast", lambda cancel: "https://www.youtube.com/watch?v=fast"),
+            ],
+            accept=lambda u: "watch?v=" in u,
+        )
+        self.assertEqual((url, source), ("https://www.youtube.com/watch?v=fast", "fast"))
+        self.assertLess(time.monotonic() - t0, 2.0)
+        self.assertTrue(slow_cancelled.wait(2.0))
+
+    def test_no_accepted_result(self) -> None:
+        resolver = YouTubeResolver()
+        self.assertEqual(resolver.race([("a", lambda c: None)], accept=bool), (None, ""))
+
+    def test_latest_queries_expire_sooner(self) -> None:
+        clock = _Clock()
+        resolver = YouTubeResolver(ttl_s=3600.0, latest_ttl_s=60.0, clock=clock)
+        resolver.store("Lofi  Girl", False, "https://www.youtube.com/watch?v=a", "searxng")
+        resolver.store("ultimo video de lofi girl", True, "https://www.youtube.com/watch?v=b", "ytdlp:ytsearchdate1")
+        clock.now = 120.0
+        self.assertEqual(resolver.cached("lofi girl", False), ("https://www.youtube.com/watch?v=a", "searxng"))
+        self.assertIsNone(resolver.cached("ultimo video de lofi girl", True))
+        self.assertEqual(resolver.stats()["expired"], 1)
+
+    def test_run_cancellable_kills_process(self) -> None:
+        cancel = threading.Event()
+        threading.Timer(0.2, cancel.set).start()
+        t0 = time.monotonic()
+        self.assertEqual(run_cancellable([sys.executable, "-c", "import time; time.sleep(10)"], 10.0, cancel), "")
+        self.assertLess(time.monotonic() - t0, 5.0)
+
+
+class TestDirectChatYoutubePick(unittest.TestCase):
+    def setUp(self) -> None:
+        direct_chat._YOUTUBE_RESOLVER.clear()
+
+    @patch("openclaw_direct_chat.shutil.which", return_value=None)
+    @patch("openclaw_direct_chat.web_search.searxng_search")
+    def test_repeat_query_is_served_from_cache(self, mock_search, _mock_which) -> None:
+        mock_search.return_value = {"ok": True, "results": [{"url": "https://www.youtube.com/watch?v=abc123xyz"}]}
+        first = direct_chat._pick_first_youtube_video_url("Poné lofi")
+        calls = mock_search.call_count
+        second = direct_chat._pick_first_youtube_video_url("pone  LOFI")
+        self.assertEqual(first, ("https://www.youtube.com/watch?v=abc123xyz&autoplay=1", "ok"))
+        self.assertEqual(second, ("https://www.youtube.com/watch?v=abc123xyz&autoplay=1", "ok_cache"))
+        self.assertEqual(mock_search.call_count, calls)
+
+    @patch("openclaw_direct_chat.shutil.which", return_value=None)
+    @patch("openclaw_direct_chat.web_search.searxng_search", return_value={"ok": True, "results": []})
+    def test_no_results(self, _mock_search, _mock_which) -> None:
+        self.assertEqual(direct_chat._pick_first_youtube_video_url("lofi"), (None, "no_results"))
+
+
+if __name__ == "__main__":
+    unittest.main()